@@ -0,0 +1,92 @@
+"""
+Accession numbers for sample barcodes in the Medical Laboratory Management System
+
+An accession number is 14 digits:
+
+    240315 01 00042 7
+    |      |  |     +-- check digit (Luhn) over the first 13 digits
+    |      |  +-------- sequence number of the day at this site
+    |      +----------- site code (Config.ACCESSION_SITE)
+    +------------------ collection date, YYMMDD
+
+An even number of digits keeps Code128 barcodes short: the digits are
+encoded in pairs.
+
+Workstations take numbers in blocks (Config.ACCESSION_BLOCK_SIZE). A block is
+reserved in one write transaction on the accession_counters table, so
+workstations sharing a database get disjoint blocks and a number is never
+handed out twice: there is no need to try a number and retry on a UNIQUE
+error. Within a block, next() only increments a counter. Numbers left in a
+block when the application closes are skipped.
+
+Stations with their own database that sync with a head office count
+separately, so each needs its own ACCESSION_SITE code.
+"""
+import threading
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from config import Config
+from database import DatabaseManager
+
+MAX_SEQUENCE = 99999
+
+
+class AccessionError(Exception):
+    """No more accession numbers can be issued"""
+
+
+def check_digit(digits: str) -> str:
+    """Luhn check digit for a string of digits"""
+    total = 0
+    # Double every second digit from the right, starting with the rightmost
+    for position, digit in enumerate(reversed(digits)):
+        value = int(digit)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_accession(number: str) -> bool:
+    """Whether number is a well-formed accession number (catches mistyped digits)"""
+    return len(number) == 14 and number.isdigit() and check_digit(number[:-1]) == number[-1]
+
+
+class AccessionAllocator:
+    """Hand out accession numbers from blocks reserved for this workstation"""
+
+    def __init__(self, db: DatabaseManager, site: Optional[str] = None, block_size: Optional[int] = None,
+                 clock: Callable[[], datetime] = datetime.now):
+        self.db = db
+        self.site = site if site is not None else Config.ACCESSION_SITE
+        if len(self.site) != 2 or not self.site.isdigit():
+            raise ValueError(f"Accession site code must be two digits, got {self.site!r}")
+        self.block_size = block_size or Config.ACCESSION_BLOCK_SIZE
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._day = None
+        self._next = self._end = 0
+
+    def _reserve(self, day: str):
+        first = self.db.reserve_accession_block(f"{self.site}{day}", self.block_size)
+        if first > MAX_SEQUENCE:
+            raise AccessionError(f"All accession numbers for {day} at site {self.site} are used")
+        self._day, self._next, self._end = day, first, min(first + self.block_size, MAX_SEQUENCE + 1)
+
+    def next(self) -> str:
+        """The next accession number for today"""
+        with self._lock:
+            day = self.clock().strftime("%y%m%d")
+            if day != self._day or self._next >= self._end:
+                self._reserve(day)
+            sequence = self._next
+            self._next += 1
+        body = f"{day}{self.site}{sequence:05d}"
+        return body + check_digit(body)
+
+    def allocate(self, count: int) -> List[str]:
+        """count accession numbers, e.g. for a rack of tubes"""
+        return [self.next() for _ in range(count)]
@@ -0,0 +1,236 @@
+"""
+Year-partitioned archives for the Medical Laboratory Management System
+
+Archiver moves closed records older than a cutoff out of the working
+database into one archive file per year (medical_lab-archive-2023.db, ...):
+
+- paid invoices whose test requests are all completed or cancelled, together
+  with those test requests, their samples and reports
+- completed or cancelled test requests that were never invoiced, with their
+  samples and reports
+
+A sample's status history moves with the sample.
+
+Records move in batches. Each batch is one transaction over the working
+database and the attached archive file. The change_log entries of the
+deletes are marked ARCHIVE so head-office sync does not push them as
+deletions.
+
+Historical lookups attach the archive files on demand. Temporary views with
+the names of the archived tables combine each table with its archived rows,
+so the usual DatabaseManager read methods see both:
+
+    with archiver.including_archives([2022, 2023]) as db:
+        requests = db.get_test_requests_by_date_range(start, end)
+"""
+import contextlib
+import os
+import re
+import sqlite3
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from config import Config
+from database import DatabaseManager
+from models import TestStatus
+
+# Tables archived, in the order rows are moved
+ARCHIVED_TABLES = ("invoices", "invoice_test_requests", "test_requests", "sample_status_history", "samples",
+                   "medical_reports")
+
+CLOSED_TEST_STATUSES = (TestStatus.COMPLETED.value, TestStatus.CANCELLED.value)
+
+# Rows of each table that belong to the batch in temp.archive_invoices/temp.archive_requests
+BATCH_CONDITIONS = {
+    "invoices": "id IN (SELECT id FROM temp.archive_invoices)",
+    "invoice_test_requests": "invoice_id IN (SELECT id FROM temp.archive_invoices)",
+    "test_requests": "id IN (SELECT id FROM temp.archive_requests)",
+    "sample_status_history": "sample_id IN (SELECT id FROM main.samples "
+                             "WHERE test_request_id IN (SELECT id FROM temp.archive_requests))",
+    "samples": "test_request_id IN (SELECT id FROM temp.archive_requests)",
+    "medical_reports": "test_request_id IN (SELECT id FROM temp.archive_requests)",
+}
+
+
+class Archiver:
+    """Move old closed records into yearly archive files and read them back on demand"""
+
+    def __init__(self, db: DatabaseManager, archive_dir: Optional[str] = None, batch_size: Optional[int] = None):
+        self.db = db
+        self.archive_dir = archive_dir or Config.ARCHIVE_DIR
+        self.batch_size = batch_size or Config.ARCHIVE_BATCH_SIZE
+        if db.is_memory:
+            self.prefix = "medical_lab"
+        else:
+            self.prefix = os.path.splitext(os.path.basename(db.db_path))[0]
+
+    def archive_path(self, year: int) -> str:
+        return os.path.join(self.archive_dir, f"{self.prefix}-archive-{year}.db")
+
+    def archived_years(self) -> List[int]:
+        """Years that have an archive file, oldest first"""
+        if not os.path.isdir(self.archive_dir):
+            return []
+        pattern = re.compile(re.escape(self.prefix) + r"-archive-(\d{4})\.db$")
+        return sorted(int(match.group(1)) for match in map(pattern.match, os.listdir(self.archive_dir)) if match)
+
+    def archived_years_between(self, start_date: datetime, end_date: datetime) -> List[int]:
+        return [year for year in self.archived_years() if start_date.year <= year <= end_date.year]
+
+    # Archiving
+    def archive_before(self, cutoff: datetime,
+                       progress: Optional[Callable[[int, Dict[str, int]], None]] = None) -> Dict[str, int]:
+        """
+        Move the closed records dated before cutoff into their year's archive.
+
+        Args:
+            progress: Called as progress(year, moved_rows_per_table) after each batch
+
+        Returns:
+            Number of rows moved per table
+        """
+        os.makedirs(self.archive_dir, exist_ok=True)
+        totals = {table: 0 for table in ARCHIVED_TABLES}
+        conn = self.db._open_connection(isolation_level=None)
+        try:
+            while True:
+                batch = self._next_batch(conn, cutoff.isoformat(" "))
+                if batch is None:
+                    return totals
+                year, invoice_ids, request_ids = batch
+                moved = self._move_batch(conn, year, invoice_ids, request_ids)
+                for table, rows in moved.items():
+                    totals[table] += rows
+                if progress:
+                    progress(year, moved)
+        finally:
+            conn.close()
+
+    def _next_batch(self, conn, cutoff: str):
+        # Paid invoices whose test requests are all closed and before the cutoff
+        invoices = conn.execute(f'''
+            SELECT i.id, CAST(substr(i.created_at, 1, 4) AS INTEGER) AS year FROM invoices i
+            WHERE i.created_at < ? AND i.paid_at IS NOT NULL AND i.paid_amount >= i.total_amount
+              AND NOT EXISTS (
+                  SELECT 1 FROM invoice_test_requests l JOIN test_requests t ON t.id = l.test_request_id
+                  WHERE l.invoice_id = i.id
+                    AND (t.status NOT IN ({", ".join("?" for _ in CLOSED_TEST_STATUSES)}) OR t.requested_at >= ?)
+              )
+            ORDER BY year LIMIT ?
+        ''', (cutoff, *CLOSED_TEST_STATUSES, cutoff, self.batch_size)).fetchall()
+        # Closed test requests that were never invoiced
+        requests = conn.execute(f'''
+            SELECT t.id, CAST(substr(t.requested_at, 1, 4) AS INTEGER) AS year FROM test_requests t
+            WHERE t.requested_at < ? AND t.status IN ({", ".join("?" for _ in CLOSED_TEST_STATUSES)})
+              AND NOT EXISTS (SELECT 1 FROM invoice_test_requests l WHERE l.test_request_id = t.id)
+            ORDER BY year LIMIT ?
+        ''', (cutoff, *CLOSED_TEST_STATUSES, self.batch_size)).fetchall()
+        if not invoices and not requests:
+            return None
+        # One year per batch: a batch is one transaction with one archive file
+        year = min(year for _id, year in invoices + requests)
+        invoice_ids = [invoice_id for invoice_id, invoice_year in invoices if invoice_year == year]
+        request_ids = [request_id for request_id, request_year in requests if request_year == year]
+        return year, invoice_ids, request_ids
+
+    def _attach(self, conn, year: int) -> str:
+        schema = f"archive_{year}"
+        conn.execute("ATTACH DATABASE ? AS " + schema, (self.archive_path(year),))
+        self._ensure_schema(conn, schema)
+        return schema
+
+    @staticmethod
+    def _ensure_schema(conn, schema: str):
+        """Create the archived tables and indexes in schema, or add columns added since"""
+        for table in ARCHIVED_TABLES:
+            sql = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?",
+                               (table,)).fetchone()[0]
+            existing = {info[1] for info in conn.execute(f"PRAGMA {schema}.table_info({table})")}
+            if not existing:
+                conn.execute(re.sub(r"^CREATE TABLE\s+(IF NOT EXISTS\s+)?\S+",
+                                    f"CREATE TABLE {schema}.{table}", sql, count=1))
+                continue
+            for info in conn.execute(f"PRAGMA main.table_info({table})").fetchall():
+                if info[1] not in existing:
+                    conn.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {info[1]} {info[2]}")
+        indexes = conn.execute(f'''
+            SELECT sql FROM main.sqlite_master
+            WHERE type = 'index' AND sql IS NOT NULL
+              AND tbl_name IN ({", ".join("?" for _ in ARCHIVED_TABLES)})
+        ''', ARCHIVED_TABLES).fetchall()
+        for (sql,) in indexes:
+            conn.execute(re.sub(r"^CREATE\s+(UNIQUE\s+)?INDEX\s+(IF NOT EXISTS\s+)?",
+                                lambda m: f"CREATE {m.group(1) or ''}INDEX IF NOT EXISTS {schema}.", sql, count=1))
+
+    @staticmethod
+    def _columns(conn, table: str) -> str:
+        return ", ".join(info[1] for info in conn.execute(f"PRAGMA main.table_info({table})"))
+
+    def _move_batch(self, conn, year: int, invoice_ids: List[str], request_ids: List[str]) -> Dict[str, int]:
+        schema = self._attach(conn, year)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_invoices (id TEXT PRIMARY KEY)")
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_requests (id TEXT PRIMARY KEY)")
+                conn.execute("DELETE FROM temp.archive_invoices")
+                conn.execute("DELETE FROM temp.archive_requests")
+                conn.executemany("INSERT INTO temp.archive_invoices (id) VALUES (?)",
+                                 [(invoice_id,) for invoice_id in invoice_ids])
+                conn.executemany("INSERT OR IGNORE INTO temp.archive_requests (id) VALUES (?)",
+                                 [(request_id,) for request_id in request_ids])
+                conn.execute('''
+                    INSERT OR IGNORE INTO temp.archive_requests (id)
+                    SELECT test_request_id FROM main.invoice_test_requests
+                    WHERE invoice_id IN (SELECT id FROM temp.archive_invoices)
+                ''')
+                first_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM main.change_log").fetchone()[0]
+
+                moved = {}
+                for table in ARCHIVED_TABLES:
+                    columns = self._columns(conn, table)
+                    condition = BATCH_CONDITIONS[table]
+                    # OR REPLACE: rows left in both files by an interrupted run are moved again
+                    conn.execute(f"INSERT OR REPLACE INTO {schema}.{table} ({columns}) "
+                                 f"SELECT {columns} FROM main.{table} WHERE {condition}")
+                    moved[table] = conn.execute(f"DELETE FROM main.{table} WHERE {condition}").rowcount
+
+                # The rows were moved, not deleted
+                conn.execute("UPDATE main.change_log SET operation = 'ARCHIVE' WHERE seq > ? AND operation = 'DELETE'",
+                             (first_seq,))
+                conn.execute("COMMIT")
+                return moved
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.execute(f"DETACH DATABASE {schema}")
+
+    # Historical lookups
+    @contextlib.contextmanager
+    def including_archives(self, years: Optional[Iterable[int]] = None):
+        """
+        Let read methods called in the block on this thread see archived rows.
+
+        Args:
+            years: Archive years to attach (all by default). SQLite attaches
+                at most 10 databases to a connection, so pass the years a
+                lookup needs when there are many.
+        """
+        available = set(self.archived_years())
+        years = sorted(available if years is None else available.intersection(years))
+        conn = self.db._open_connection()
+        try:
+            schemas = [self._attach(conn, year) for year in years]
+            for table in ARCHIVED_TABLES:
+                columns = self._columns(conn, table)
+                # Temporary views are found before the main tables of the same name
+                conn.execute(f"CREATE TEMP VIEW {table} AS " + " UNION ALL ".join(
+                    f"SELECT {columns} FROM {schema}.{table}" for schema in ["main"] + schemas))
+            conn.execute("PRAGMA query_only = ON")
+        except BaseException:
+            conn.close()
+            raise
+        with self.db._reading_from(conn):
+            yield self.db
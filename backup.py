@@ -0,0 +1,296 @@
+"""
+Online backups for the Medical Laboratory Management System
+
+BackupManager copies the live database with the sqlite3 backup API a few
+pages per step, pausing between steps so the application keeps running
+while it is copied. SQLite starts such a copy again from the first page
+whenever another connection commits, so:
+
+- in WAL mode the whole copy reads one snapshot inside a read transaction;
+  writers carry on meanwhile and never restart it
+- in the other journal modes a read transaction would hold writers off for
+  the whole copy, so the steps run outside one; after BACKUP_MAX_RESTARTS
+  restarts the rest is copied in a single step, which holds writers off
+  only for that step
+
+The copy is checked with PRAGMA integrity_check,
+gzip-compressed next to the other backups and the oldest backups beyond
+the retention count are removed. When the field encryption keys come from a
+key file, a copy of it is kept with each backup (same name, KEY_SUFFIX):
+without the keys the encrypted patient fields of a backup cannot be read.
+Restoring checks a backup the same way, and that the current keys can read
+it, before copying it over the live database.
+
+Usage:
+    python backup.py create
+    python backup.py list
+    python backup.py restore backups/medical_lab-20240131-180000.db.gz
+"""
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from config import Config
+from database import ENCRYPTED_PATIENT_COLUMNS, DatabaseManager
+from field_encryption import ENCRYPTED_FIELD_MARKER, KEY_ID_SIZE, key_file_path
+
+
+class BackupError(Exception):
+    """A backup could not be created, verified or restored"""
+
+
+class _BackupRestarted(Exception):
+    """The stepped copy was restarted too often by other connections' commits"""
+
+
+class BackupManager:
+    """Create, rotate and restore gzip-compressed backups of a database"""
+
+    SUFFIX = ".db.gz"
+    KEY_SUFFIX = ".key"
+
+    def __init__(self, db: DatabaseManager, backup_dir: Optional[str] = None, keep: Optional[int] = None,
+                 pages_per_step: Optional[int] = None, step_pause_ms: Optional[float] = None,
+                 max_restarts: Optional[int] = None):
+        self.db = db
+        self.backup_dir = backup_dir or Config.BACKUP_DIR
+        self.keep = Config.BACKUP_KEEP if keep is None else keep
+        self.pages_per_step = pages_per_step or Config.BACKUP_PAGES_PER_STEP
+        self.step_pause = (Config.BACKUP_STEP_PAUSE_MS if step_pause_ms is None else step_pause_ms) / 1000.0
+        self.max_restarts = Config.BACKUP_MAX_RESTARTS if max_restarts is None else max_restarts
+        # Restarts of the last stepped copy, for diagnostics
+        self.restarts = 0
+        if db.is_memory:
+            self.prefix = "medical_lab"
+        else:
+            self.prefix = os.path.splitext(os.path.basename(db.db_path))[0]
+
+    def list_backups(self) -> List[str]:
+        """Paths of the existing backups, newest first"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        names = [name for name in os.listdir(self.backup_dir)
+                 if name.startswith(self.prefix + "-") and name.endswith(self.SUFFIX)]
+        return [os.path.join(self.backup_dir, name) for name in sorted(names, reverse=True)]
+
+    def key_copy_path(self, path: str) -> str:
+        """Path of the copy of the field encryption key file kept with a backup"""
+        return path[:-len(self.SUFFIX)] + self.KEY_SUFFIX
+
+    def _new_backup_path(self) -> str:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.backup_dir, f"{self.prefix}-{stamp}{self.SUFFIX}")
+        counter = 1
+        while os.path.exists(path):
+            path = os.path.join(self.backup_dir, f"{self.prefix}-{stamp}-{counter}{self.SUFFIX}")
+            counter += 1
+        return path
+
+    def create_backup(self, progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """
+        Back up the database.
+
+        Args:
+            progress: Called as progress(copied_pages, total_pages) after each step
+
+        Returns:
+            Path of the compressed backup
+        """
+        os.makedirs(self.backup_dir, exist_ok=True)
+        path = self._new_backup_path()
+        copy_path = path[:-len(".gz")] + ".tmp"
+
+        key_path = key_file_path(None if self.db.is_memory else self.db.db_path)
+        key_copy = self.key_copy_path(path)
+
+        try:
+            self._copy(copy_path, progress)
+            self._check_integrity(copy_path)
+            if key_path and os.path.exists(key_path):
+                # In place before the backup itself, and as private as the original
+                with open(key_path, "rb") as key, \
+                        os.fdopen(os.open(key_copy + ".part", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600),
+                                  "wb") as copy:
+                    shutil.copyfileobj(key, copy)
+                os.replace(key_copy + ".part", key_copy)
+            with open(copy_path, "rb") as copy, gzip.open(path + ".part", "wb", compresslevel=6) as compressed:
+                shutil.copyfileobj(copy, compressed, 1024 * 1024)
+            os.replace(path + ".part", path)
+        except (sqlite3.Error, OSError) as e:
+            if os.path.exists(key_copy):
+                os.remove(key_copy)
+            raise BackupError(f"Backup failed: {e}") from e
+        finally:
+            for leftover in (copy_path, path + ".part", key_copy + ".part"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+        self.rotate()
+        return path
+
+    def _copy(self, copy_path: str, progress: Optional[Callable[[int, int], None]]):
+        self.restarts = 0
+        last_remaining = None
+
+        def step(status, remaining, total):
+            nonlocal last_remaining
+            if last_remaining is not None and remaining > last_remaining:
+                # Another connection committed: SQLite began again at the first page
+                self.restarts += 1
+                if self.restarts > self.max_restarts:
+                    raise _BackupRestarted()
+            last_remaining = remaining
+            if progress:
+                progress(total - remaining, total)
+            # Give writers and the UI thread a turn between steps
+            if self.step_pause:
+                time.sleep(self.step_pause)
+
+        source = self.db._open_connection(isolation_level=None)
+        target = sqlite3.connect(copy_path)
+        try:
+            wal = source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+            if wal:
+                # One snapshot for the whole copy; WAL writers are not held off by it
+                source.execute("BEGIN")
+                source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            try:
+                source.backup(target, pages=self.pages_per_step, progress=step)
+            except _BackupRestarted:
+                # Busy database: copy the rest at once, under one read lock
+                source.execute("BEGIN")
+                source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                source.backup(target, progress=lambda status, remaining, total:
+                              progress(total - remaining, total) if progress else None)
+            if source.in_transaction:
+                source.execute("COMMIT")
+        finally:
+            target.close()
+            source.close()
+
+    def rotate(self) -> List[str]:
+        """Remove the oldest backups beyond the retention count and return their paths"""
+        removed = self.list_backups()[self.keep:] if self.keep > 0 else []
+        for path in removed:
+            os.remove(path)
+            if os.path.exists(self.key_copy_path(path)):
+                os.remove(self.key_copy_path(path))
+        return removed
+
+    @staticmethod
+    def _check_integrity(path: str):
+        conn = sqlite3.connect(path)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            conn.close()
+        if result != "ok":
+            raise BackupError(f"Integrity check of {path} failed: {result}")
+
+    def _check_keys(self, path: str, copy_path: str):
+        # IDs of the keys the backup's encrypted fields use; each must be known here
+        marker_size = len(ENCRYPTED_FIELD_MARKER)
+        conn = sqlite3.connect(copy_path)
+        try:
+            key_ids = set()
+            for column in ENCRYPTED_PATIENT_COLUMNS:
+                key_ids.update(row[0] for row in conn.execute(f'''
+                    SELECT DISTINCT substr({column}, ?, ?) FROM patients
+                    WHERE typeof({column}) = 'blob' AND substr({column}, 1, ?) = ?
+                ''', (marker_size + 1, KEY_ID_SIZE, marker_size, ENCRYPTED_FIELD_MARKER)))
+        finally:
+            conn.close()
+        if key_ids - set(self.db.field_cipher.key_ids):
+            key_copy = self.key_copy_path(path)
+            hint = f" Add the keys from {key_copy} to the current keys first." if os.path.exists(key_copy) else ""
+            raise BackupError(f"Backup {path} is encrypted with field encryption keys this station does not have."
+                              f"{hint}")
+
+    def verify_backup(self, path: str):
+        """Decompress a backup into a temporary file and run an integrity check on it"""
+        copy_path = self._decompress(path)
+        try:
+            self._check_integrity(copy_path)
+        finally:
+            os.remove(copy_path)
+
+    def _decompress(self, path: str) -> str:
+        copy_path = os.path.join(self.backup_dir, os.path.basename(path)[:-len(".gz")] + ".restore")
+        try:
+            with gzip.open(path, "rb") as compressed, open(copy_path, "wb") as copy:
+                shutil.copyfileobj(compressed, copy, 1024 * 1024)
+        except (OSError, EOFError) as e:
+            if os.path.exists(copy_path):
+                os.remove(copy_path)
+            raise BackupError(f"Cannot read backup {path}: {e}") from e
+        return copy_path
+
+    def restore(self, path: str, keep_current: bool = True) -> Optional[str]:
+        """
+        Replace the contents of the database with a backup.
+
+        The backup is verified first, and refused if it is encrypted with
+        field encryption keys the database's cipher does not have. With
+        keep_current the current database is backed up before it is
+        overwritten.
+
+        Returns:
+            Path of the backup of the replaced database, if one was made
+        """
+        os.makedirs(self.backup_dir, exist_ok=True)
+        copy_path = self._decompress(path)
+        try:
+            self._check_integrity(copy_path)
+            self._check_keys(path, copy_path)
+            current = self.create_backup() if keep_current else None
+            source = sqlite3.connect(copy_path)
+            target = self.db._open_connection()
+            try:
+                # Copied in one step: other connections must never see half a restore
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+        except sqlite3.Error as e:
+            raise BackupError(f"Restore failed: {e}") from e
+        finally:
+            os.remove(copy_path)
+        return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up or restore the medical lab database")
+    parser.add_argument("--db", default=Config.DATABASE_PATH, help="Database file")
+    parser.add_argument("--dir", default=Config.BACKUP_DIR, help="Backup directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("create", help="Create a backup")
+    commands.add_parser("list", help="List backups, newest first")
+    restore_parser = commands.add_parser("restore", help="Restore a backup")
+    restore_parser.add_argument("backup", help="Backup file to restore")
+    args = parser.parse_args()
+
+    manager = BackupManager(DatabaseManager(args.db), backup_dir=args.dir)
+    try:
+        if args.command == "create":
+            path = manager.create_backup(
+                progress=lambda copied, total: print(f"  {copied}/{total} pages", end="\r")
+            )
+            print()
+            print(path)
+        elif args.command == "list":
+            for path in manager.list_backups():
+                print(f"{path}  {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+        else:
+            current = manager.restore(args.backup)
+            print(f"Restored {args.backup} (previous database saved as {current})")
+    except BackupError as e:
+        parser.exit(1, f"{e}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Barcode rendering for the Medical Laboratory Management System
+
+Barcodes are encoded once (Config.BARCODE_FORMAT, Code128 by default) into
+runs of dark modules, and the runs are cached per value. Every output is
+drawn from those runs in memory, without temporary files:
+
+    render_svg("S240315000123")           SVG markup
+    render_png("S240315000123")           PNG bytes (for Tk or e-mail)
+    label_sheet_pdf(path, labels)         A4 label sheets for laser printers
+    zpl_labels(labels)                    one ZPL job for a label printer
+
+A Label is the barcode value plus up to two short lines of text, usually
+the patient name and the test. Accessioning 300 tubes produces the label
+sheets or the ZPL job in a fraction of a second.
+"""
+import functools
+import io
+from typing import List, Optional, Sequence, Tuple
+
+import barcode as barcode_lib
+from PIL import Image, ImageDraw
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen.canvas import Canvas
+
+from config import Config
+from pdf_render import register_fonts, shape
+
+# Label sheet layouts: page size, columns, rows, label size, first label
+# offset from the top left corner and distance between labels
+SHEETS = {
+    # 65 labels of 38.1 x 21.2 mm, the usual size for sample tubes
+    "L7651": dict(page=A4, columns=5, rows=13, width=38.1 * mm, height=21.2 * mm,
+                  left=4.75 * mm, top=10.7 * mm, pitch_x=40.6 * mm, pitch_y=21.2 * mm),
+    # 24 labels of 63.5 x 33.9 mm
+    "L7159": dict(page=A4, columns=3, rows=8, width=63.5 * mm, height=33.9 * mm,
+                  left=6.4 * mm, top=12.9 * mm, pitch_x=66.0 * mm, pitch_y=33.9 * mm),
+}
+
+# ZPL barcode field commands per format
+ZPL_BARCODE_COMMANDS = {"code128": "^BCN,{height},N,N,N", "code39": "^B3N,N,{height},N,N", "ean13": "^BEN,{height},N,N"}
+
+
+class Label:
+    """One label: a barcode and up to two lines of text"""
+
+    __slots__ = ("barcode", "lines")
+
+    def __init__(self, barcode: str, *lines: str):
+        self.barcode = barcode
+        self.lines = [line for line in lines if line][:2]
+
+
+@functools.lru_cache(maxsize=4096)
+def bar_runs(data: str, barcode_format: Optional[str] = None) -> Tuple[int, Tuple[Tuple[int, int], ...]]:
+    """
+    Encode data once and return (total_modules, runs), where each run is the
+    (start, width) of a dark bar in modules.
+    """
+    barcode_class = barcode_lib.get_barcode_class((barcode_format or Config.BARCODE_FORMAT).lower())
+    modules = barcode_class(data, writer=None).build()[0]
+    runs, start = [], None
+    for position, module in enumerate(modules + "0"):
+        if module == "1" and start is None:
+            start = position
+        elif module != "1" and start is not None:
+            runs.append((start, position - start))
+            start = None
+    return len(modules), tuple(runs)
+
+
+def render_svg(data: str, module_width: float = 0.33, height: float = 12.0, quiet_zone: int = 10) -> str:
+    """SVG markup of the barcode; sizes are in millimetres"""
+    total, runs = bar_runs(data)
+    width = (total + 2 * quiet_zone) * module_width
+    bars = "".join(
+        f'<rect x="{(quiet_zone + start) * module_width:.3f}" y="0" width="{run * module_width:.3f}" height="{height}"/>'
+        for start, run in runs)
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.3f}mm" height="{height}mm" '
+            f'viewBox="0 0 {width:.3f} {height}"><rect width="100%" height="100%" fill="white"/>'
+            f'<g fill="black">{bars}</g></svg>')
+
+
+def render_png(data: str, module_width: int = 2, height: int = 60, quiet_zone: int = 10) -> bytes:
+    """PNG bytes of the barcode; sizes are in pixels"""
+    total, runs = bar_runs(data)
+    image = Image.new("1", ((total + 2 * quiet_zone) * module_width, height), 1)
+    draw = ImageDraw.Draw(image)
+    for start, run in runs:
+        x = (quiet_zone + start) * module_width
+        draw.rectangle((x, 0, x + run * module_width - 1, height - 1), fill=0)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _fit(text: str, font: str, size: float, width: float) -> str:
+    """Shorten text with an ellipsis until it fits width"""
+    text = shape(text)
+    if stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + "…", font, size) > width:
+        text = text[:-1]
+    return text + "…"
+
+
+def label_sheet_pdf(path: str, labels: Sequence[Label], sheet: Optional[str] = None, skip: int = 0) -> int:
+    """
+    Write labels onto label sheets as a PDF.
+
+    Args:
+        sheet: Layout name from SHEETS (Config.LABEL_SHEET by default)
+        skip: Labels already used on the first sheet
+
+    Returns:
+        Number of sheets
+    """
+    layout = SHEETS[sheet or Config.LABEL_SHEET]
+    fonts = register_fonts()
+    page_width, page_height = layout["page"]
+    per_page = layout["columns"] * layout["rows"]
+    padding = 1.5 * mm
+    text_size = 6
+    bar_height = layout["height"] * 0.45
+    inner_width = layout["width"] - 2 * padding
+
+    canvas = Canvas(path, pagesize=layout["page"], pageCompression=1)
+    canvas.setTitle("Sample labels")
+    pages = 0
+    for index, label in enumerate(labels, start=skip):
+        slot = index % per_page
+        if slot == 0 or pages == 0:
+            if pages:
+                canvas.showPage()
+            pages += 1
+        column, row = slot % layout["columns"], slot // layout["columns"]
+        x = layout["left"] + column * layout["pitch_x"] + padding
+        top = page_height - layout["top"] - row * layout["pitch_y"] - padding
+
+        # Bars, scaled to the label width
+        total, runs = bar_runs(label.barcode)
+        module = min(inner_width / (total + 10), 0.5 * mm)
+        bar_x = x + (inner_width - total * module) / 2
+        bar_y = top - bar_height
+        path_object = canvas.beginPath()
+        for start, run in runs:
+            path_object.rect(bar_x + start * module, bar_y, run * module, bar_height)
+        canvas.drawPath(path_object, stroke=0, fill=1)
+
+        # Human-readable value and text lines
+        canvas.setFont(fonts.mono, text_size)
+        canvas.drawCentredString(x + inner_width / 2, bar_y - text_size - 0.5, label.barcode)
+        canvas.setFont(fonts.regular, text_size)
+        y = bar_y - 2 * text_size - 1
+        for line in label.lines:
+            canvas.drawString(x, y, _fit(line, fonts.regular, text_size, inner_width))
+            y -= text_size + 1
+    if pages == 0:
+        pages = 1
+    canvas.save()
+    return pages
+
+
+def _zpl_text(text: str) -> str:
+    # ^ and ~ start commands; ^FH lets them be written as hex escapes
+    return text.replace("_", "_5F").replace("^", "_5E").replace("~", "_7E")
+
+
+def zpl_labels(labels: Sequence[Label], dpi: Optional[int] = None, width_mm: float = 50.0,
+               height_mm: float = 25.0) -> str:
+    """One ZPL job printing labels on a label printer, one label each"""
+    barcode_format = Config.BARCODE_FORMAT.lower()
+    if barcode_format not in ZPL_BARCODE_COMMANDS:
+        raise ValueError(f"No ZPL command for barcode format {Config.BARCODE_FORMAT}")
+    dots = (dpi or Config.LABEL_PRINTER_DPI) / 25.4
+    width, height = round(width_mm * dots), round(height_mm * dots)
+    bar_height = round(height * 0.45)
+    margin = round(2 * dots)
+    barcode_command = ZPL_BARCODE_COMMANDS[barcode_format].format(height=bar_height)
+    # Fields that are the same on every label
+    header = f"^XA^CI28^PW{width}^LL{height}^LH0,0^BY2"
+    parts: List[str] = []
+    for label in labels:
+        parts.append(header)
+        parts.append(f"^FO{margin},{margin}{barcode_command}^FD{label.barcode}^FS")
+        y = margin + bar_height + 4
+        parts.append(f"^FO{margin},{y}^A0N,20,20^FD{label.barcode}^FS")
+        for line in label.lines:
+            y += 22
+            parts.append(f"^FO{margin},{y}^A0N,18,18^FB{width - 2 * margin},1,0,L^FH^FD{_zpl_text(line)}^FS")
+        parts.append("^XZ\n")
+    return "".join(parts)
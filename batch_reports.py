@@ -0,0 +1,151 @@
+"""
+Batch rendering of result reports for the Medical Laboratory Management System
+
+BatchReportJob prints many results at once, e.g. every result signed today:
+
+    job = BatchReportJob(db)
+    results = job.select(start_date=today, signed_only=True)
+    paths = job.render_to_directory(results, "reports/2024-05-17")
+    pages = job.render_merged(results, "reports/2024-05-17.pdf")
+
+The results and everything printed with them are read with one query
+(DatabaseManager.get_medical_reports_for_printing). The PrintDocuments are
+built in this process, in the current language, and rendered to PDF in a
+process pool with one worker per CPU, so throughput grows with the number of
+cores. Workers are started with "spawn", not forked from the Tk process.
+A merged file is rendered in parts by the workers and then joined; each
+result starts on a new page.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import translations
+from config import Config
+from database import DatabaseManager
+from models import MedicalReport, Patient, TestRequest, TestStatus, TestType
+from pdf_render import PdfRenderer, PrintDocument, result_document
+
+Result = Tuple[MedicalReport, Patient, TestType, TestRequest]
+
+# Called as progress(rendered_reports, total_reports)
+Progress = Optional[Callable[[int, int], None]]
+
+_renderer: Optional[PdfRenderer] = None
+
+
+def _init_worker(language: str):
+    global _renderer
+    # Not set_language(): there are no screens to notify in a worker
+    translations.CURRENT_LANGUAGE = language
+    # Fonts are registered once per worker process
+    _renderer = PdfRenderer()
+
+
+def _render_chunk(jobs: List[Tuple[str, PrintDocument]], renderer: Optional[PdfRenderer] = None) -> int:
+    """Render (path, document) pairs; returns the number of pages"""
+    renderer = renderer or _renderer
+    return sum(renderer.render(path, document) for path, document in jobs)
+
+
+def report_file_name(result: Result) -> str:
+    report, patient, _test_type, _test_request = result
+    return f"{report.created_at.strftime('%Y%m%d')}-{patient.id}-{report.id}.pdf"
+
+
+class BatchReportJob:
+    """Select results and render them to PDF files in parallel"""
+
+    def __init__(self, db: DatabaseManager, workers: Optional[int] = None, chunk_size: Optional[int] = None):
+        self.db = db
+        self.workers = workers or Config.REPORT_WORKERS or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    def select(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+               status: Optional[TestStatus] = None, patient_id: Optional[str] = None,
+               signed_only: bool = False) -> List[Result]:
+        """Results matching all the given filters, oldest first"""
+        return self.db.get_medical_reports_for_printing(start_date, end_date, status, patient_id, signed_only)
+
+    def render_to_directory(self, results: Sequence[Result], directory: str,
+                            progress: Progress = None) -> List[str]:
+        """Render one PDF per result into directory; returns the file paths"""
+        os.makedirs(directory, exist_ok=True)
+        jobs = [(os.path.join(directory, report_file_name(result)), result_document(*result)) for result in results]
+        self._run(jobs, len(jobs), progress)
+        return [path for path, _document in jobs]
+
+    def render_merged(self, results: Sequence[Result], path: str, progress: Progress = None) -> int:
+        """Render all results into the single PDF at path; returns the number of pages"""
+        if not results:
+            raise ValueError("No results to render")
+        # Merging needs PyPDF2; fail before rendering anything without it
+        from PyPDF2 import PdfMerger
+
+        parts_dir = tempfile.mkdtemp(prefix="batch-reports-", dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            # Each worker renders runs of consecutive results into one part
+            jobs, weights = [], []
+            chunk = self._chunk_size(len(results))
+            for start in range(0, len(results), chunk):
+                documents = [result_document(*result) for result in results[start:start + chunk]]
+                part = PrintDocument(documents[0].title)
+                for document in documents:
+                    part.new_page().extend(document)
+                jobs.append((os.path.join(parts_dir, f"part-{start:08d}.pdf"), part))
+                weights.append(len(documents))
+            pages = self._run(jobs, len(results), progress, weights=weights, chunk=1)
+
+            merger = PdfMerger()
+            for part_path, _part in jobs:
+                merger.append(part_path)
+            temp_path = f"{path}.part"
+            with open(temp_path, "wb") as f:
+                merger.write(f)
+            merger.close()
+            os.replace(temp_path, path)
+            return pages
+        finally:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+
+    def _chunk_size(self, count: int) -> int:
+        if self.chunk_size:
+            return self.chunk_size
+        # A few chunks per worker keeps every core busy to the end
+        return max(1, min(25, -(-count // (self.workers * 4))))
+
+    def _run(self, jobs: List[Tuple[str, PrintDocument]], total: int, progress: Progress,
+             weights: Optional[List[int]] = None, chunk: Optional[int] = None) -> int:
+        """Render jobs in the process pool; returns the number of pages"""
+        weights = weights or [1] * len(jobs)
+        chunk = chunk or self._chunk_size(len(jobs))
+        chunks = [(jobs[start:start + chunk], sum(weights[start:start + chunk]))
+                  for start in range(0, len(jobs), chunk)]
+        done = pages = 0
+        if progress:
+            progress(0, total)
+
+        if self.workers == 1 or len(chunks) == 1:
+            # Not worth starting processes for
+            renderer = PdfRenderer()
+            for chunk_jobs, weight in chunks:
+                pages += _render_chunk(chunk_jobs, renderer)
+                done += weight
+                if progress:
+                    progress(done, total)
+            return pages
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(chunks)),
+                                 mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(translations.CURRENT_LANGUAGE,)) as pool:
+            futures = {pool.submit(_render_chunk, chunk_jobs): weight for chunk_jobs, weight in chunks}
+            for future in as_completed(futures):
+                pages += future.result()
+                done += futures[future]
+                if progress:
+                    progress(done, total)
+        return pages
@@ -0,0 +1,466 @@
+"""
+Benchmark suite for the Medical Laboratory Management System
+
+Times every DatabaseManager read and write method, the data shaping behind the
+Results, Samples and Statistics screens, and login, against synthetic datasets
+(see synthetic_data.py) at one or more scales.
+
+Usage:
+    python benchmark.py --scales 1000,100000 --save-baseline benchmark_baseline.json
+    python benchmark.py --scales 1000,100000 --baseline benchmark_baseline.json
+
+Generated datasets are cached in --data-dir and reused between runs. Write
+benchmarks run against a throw-away copy so every run sees the same data.
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from database import DatabaseManager
+from models import (
+    Patient, TestType, TestRequest, Sample, MedicalReport, User, InventoryItem,
+    TestTemplate, UserPermission, Gender, TestStatus, SampleStatus, UserRole, Permission, OutboxMessage
+)
+from result_templates import TemplateEngine
+from accession import AccessionAllocator
+from screen_data import build_results_rows, build_samples_rows, build_statistics, build_statistics_for_period
+from synthetic_data import generate_dataset, DEFAULT_END_DATE
+
+# Method name prefixes that count as DatabaseManager read/write methods
+DB_METHOD_PREFIXES = ("get_", "create_", "update_", "delete_", "authenticate_", "generate_")
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    runs: int
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+    ops_per_sec: float
+    peak_memory_kb: float
+
+
+@dataclass
+class Benchmark:
+    name: str
+    func: Callable[[], object]
+    # Heavy full-table operations run fewer times
+    heavy: bool = False
+    covers: List[str] = field(default_factory=list)
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_benchmark(benchmark: Benchmark, repeat: int, time_budget: float) -> BenchmarkResult:
+    """Run a benchmark up to `repeat` times (at least 3, within time_budget seconds)"""
+    timings = []
+    started = time.perf_counter()
+    runs = max(3, repeat // 10) if benchmark.heavy else repeat
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        benchmark.func()
+        timings.append((time.perf_counter() - t0) * 1000.0)
+        if len(timings) >= 3 and time.perf_counter() - started > time_budget:
+            break
+
+    # Peak memory is measured in a separate run because tracemalloc slows everything down
+    tracemalloc.start()
+    benchmark.func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    mean = statistics.mean(timings)
+    return BenchmarkResult(
+        name=benchmark.name,
+        runs=len(timings),
+        mean_ms=round(mean, 4),
+        p50_ms=round(_percentile(timings, 50), 4),
+        p95_ms=round(_percentile(timings, 95), 4),
+        p99_ms=round(_percentile(timings, 99), 4),
+        max_ms=round(timings[-1], 4),
+        ops_per_sec=round(1000.0 / mean, 2) if mean else 0.0,
+        peak_memory_kb=round(peak / 1024.0, 1)
+    )
+
+
+def prepare_dataset(scale: int, seed: int, data_dir: Optional[str]) -> DatabaseManager:
+    """Return a database with `scale` test requests, generating it if not cached"""
+    if data_dir is None:
+        db = DatabaseManager(":memory:")
+        generate_dataset(db, orders=scale, seed=seed)
+        return db
+
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"loadtest_{scale}_{seed}.db")
+    if not os.path.exists(path):
+        print(f"Generating dataset with {scale} orders in {path}...")
+        # A file left by an interrupted run already holds part of the data
+        for suffix in (".tmp", ".tmp-journal"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        generate_dataset(DatabaseManager(path + ".tmp"), orders=scale, seed=seed)
+        os.replace(path + ".tmp", path)
+    return DatabaseManager(path)
+
+
+class BenchmarkSuite:
+    """All benchmarks for one dataset"""
+
+    def __init__(self, source: DatabaseManager, seed: int = 42, scratch_path: str = ":memory:"):
+        self.rng = random.Random(seed)
+        self.scratch_path = scratch_path
+        # Writes go to a scratch copy so the cached dataset is never modified
+        self.db = DatabaseManager.from_template(source, scratch_path)
+        conn = self.db._connect()
+        self.patient_ids = [row[0] for row in conn.execute("SELECT id FROM patients LIMIT 5000")]
+        self.request_ids = [row[0] for row in conn.execute("SELECT id FROM test_requests LIMIT 5000")]
+        self.sample_rows = conn.execute("SELECT id, barcode FROM samples LIMIT 5000").fetchall()
+        self.report_ids = [row[0] for row in conn.execute("SELECT id FROM medical_reports LIMIT 5000")]
+        self.invoice_ids = [row[0] for row in conn.execute("SELECT id FROM invoices LIMIT 5000")]
+        self.test_type_ids = [row[0] for row in conn.execute("SELECT id FROM test_types")]
+        self.item_ids = [row[0] for row in conn.execute("SELECT id FROM inventory_items")]
+        self.latest_change_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+        self.user_rows = conn.execute("SELECT id, username, password_hash FROM users").fetchall()
+        conn.close()
+
+        self.login_user = self.user_rows[0][1]
+        self.db.update_user_password(self.user_rows[0][0], self._hash("password"))
+        self.period_end = DEFAULT_END_DATE
+        self.period_start = DEFAULT_END_DATE - timedelta(days=30)
+
+        template_type = self.test_type_ids[0]
+        self.template = TestTemplate(id=str(uuid.uuid4()), test_type_id=template_type,
+                                     template_content="Result: {value}\nReference: 0-10")
+        self.db.create_test_template(self.template)
+        self.template_engine = TemplateEngine()
+        self.render_template = TestTemplate(
+            id=str(uuid.uuid4()), test_type_id=template_type,
+            template_content="Patient: {patient_name} ({patient_age}, {patient_gender})\n"
+                             "Test: {test_name} - {test_category}\nDate: {date}\n"
+                             "Result: {value}  Reference: {range male=13.5-17.5 female=12.0-15.5}\n" * 20
+        )
+        self.accessions = AccessionAllocator(self.db)
+        self.render_patient = self.db.get_patient(self.patient_ids[0])
+        self.render_test_type = self.db.get_test_type(template_type)
+
+    def close(self):
+        self.db.close()
+        if self.scratch_path != ":memory:" and os.path.exists(self.scratch_path):
+            os.remove(self.scratch_path)
+
+    @staticmethod
+    def _hash(password: str) -> str:
+        return hashlib.sha256(password.encode()).hexdigest()
+
+    def _pick(self, values):
+        return self.rng.choice(values)
+
+    # Write workloads: each call creates fresh rows so IDs never collide
+    def _create_patient(self):
+        patient = Patient(id=self.db.generate_patient_id(), name="Bench Patient", age=40,
+                          gender=Gender.MALE, contact_info="+249 900000000")
+        self.db.create_patient(patient)
+        return patient
+
+    def _create_test_request(self):
+        request = TestRequest(id=str(uuid.uuid4()), patient_id=self._pick(self.patient_ids),
+                              test_type_id=self._pick(self.test_type_ids), status=TestStatus.PENDING,
+                              requested_by="bench")
+        self.db.create_test_request(request)
+        return request
+
+    def _create_report(self):
+        report = MedicalReport(id=str(uuid.uuid4()), test_request_id=self._pick(self.request_ids),
+                               content="Benchmark result", signed_by="bench", signed_at=datetime.now())
+        self.db.create_medical_report(report)
+        return report
+
+    def _queue_mail(self) -> List[int]:
+        return self.db.create_outbox_messages([OutboxMessage(
+            "patient@example.com", "Your result", "Your result is attached.", "result.pdf", b"%PDF" * 5000)])
+
+    def _create_user(self):
+        name = f"bench_{uuid.uuid4().hex[:12]}"
+        user = User(id=str(uuid.uuid4()), username=name, email=f"{name}@lab.com",
+                    password_hash=self._hash("password"), role=UserRole.TECHNICIAN,
+                    permissions=[Permission.VIEW_SAMPLES, Permission.ADD_SAMPLE])
+        self.db.create_user(user)
+        return user
+
+    def _create_test_type(self):
+        test_type = TestType(id=str(uuid.uuid4()), name="Bench Test", description="",
+                             price=10.0, category="Blood")
+        self.db.create_test_type(test_type)
+        return test_type
+
+    def _create_template(self):
+        template = TestTemplate(id=str(uuid.uuid4()), test_type_id=self._pick(self.test_type_ids),
+                                template_content="Benchmark template")
+        self.db.create_test_template(template)
+        return template
+
+    def _create_permission(self):
+        permission = UserPermission(id=str(uuid.uuid4()), user_id=self.user_rows[-1][0],
+                                    permission=Permission.VIEW_REPORTS)
+        self.db.create_user_permission(permission)
+        return permission
+
+    def _login(self):
+        # Mirrors MedicalLabApp.login without the widgets
+        return self.db.authenticate_user(self.login_user, self._hash("password"))
+
+    def benchmarks(self) -> List[Benchmark]:
+        db = self.db
+        pick = self._pick
+        start, end = self.period_start, self.period_end
+
+        def updated(obj, **changes):
+            for key, value in changes.items():
+                setattr(obj, key, value)
+            return obj
+
+        return [
+            # Patients
+            Benchmark("get_patient", lambda: db.get_patient(pick(self.patient_ids))),
+            Benchmark("get_all_patients", db.get_all_patients, heavy=True),
+            Benchmark("get_patients_by_registration_date_range",
+                      lambda: db.get_patients_by_registration_date_range(start, end), heavy=True),
+            Benchmark("get_patients_by_contact", lambda: db.get_patients_by_contact(self.render_patient.contact_info)),
+            Benchmark("generate_patient_id", db.generate_patient_id),
+            Benchmark("create_patient", self._create_patient),
+            Benchmark("update_patient", lambda: db.update_patient(
+                updated(db.get_patient(pick(self.patient_ids)), updated_at=datetime.now()))),
+            Benchmark("delete_patient", lambda: db.delete_patient(self._create_patient().id),
+                      covers=["create_patient"]),
+            # Test types
+            Benchmark("get_test_type", lambda: db.get_test_type(pick(self.test_type_ids))),
+            Benchmark("get_all_test_types", db.get_all_test_types),
+            Benchmark("get_next_test_id", db.get_next_test_id),
+            Benchmark("create_test_type", self._create_test_type),
+            Benchmark("update_test_type", lambda: db.update_test_type(db.get_test_type(pick(self.test_type_ids)))),
+            Benchmark("delete_test_type", lambda: db.delete_test_type(self._create_test_type().id)),
+            # Test requests
+            Benchmark("get_test_request", lambda: db.get_test_request(pick(self.request_ids))),
+            Benchmark("get_all_test_requests", db.get_all_test_requests, heavy=True),
+            Benchmark("get_test_requests_by_patient", lambda: db.get_test_requests_by_patient(pick(self.patient_ids))),
+            Benchmark("get_test_requests_by_date_range",
+                      lambda: db.get_test_requests_by_date_range(start, end), heavy=True),
+            Benchmark("create_test_request", self._create_test_request),
+            Benchmark("update_test_request_status",
+                      lambda: db.update_test_request_status(pick(self.request_ids), TestStatus.IN_PROGRESS)),
+            Benchmark("update_test_request", lambda: db.update_test_request(db.get_test_request(pick(self.request_ids)))),
+            Benchmark("delete_test_request", lambda: db.delete_test_request(self._create_test_request().id)),
+            # Samples
+            Benchmark("get_sample", lambda: db.get_sample(pick(self.sample_rows)[0])),
+            Benchmark("get_sample_by_barcode", lambda: db.get_sample_by_barcode(pick(self.sample_rows)[1])),
+            Benchmark("get_all_samples", db.get_all_samples, heavy=True),
+            Benchmark("create_sample", lambda: db.create_sample(Sample(
+                id=str(uuid.uuid4()), test_request_id=pick(self.request_ids), barcode=uuid.uuid4().hex,
+                collected_at=datetime.now(), status=SampleStatus.VALID))),
+            Benchmark("accession_number", lambda: self.accessions.next()),
+            Benchmark("update_sample_barcode", lambda: db.update_sample_barcode(
+                pick(self.sample_rows)[0], self.accessions.next())),
+            Benchmark("get_sample_scan_rows", db.get_sample_scan_rows, heavy=True),
+            Benchmark("transition_samples", lambda: db.transition_samples(
+                [pick(self.sample_rows)[0] for _ in range(100)], SampleStatus.DAMAGED)),
+            Benchmark("update_sample_status", lambda: db.update_sample_status(
+                pick(self.sample_rows)[0], SampleStatus.INSUFFICIENT)),
+            Benchmark("get_sample_status_history", lambda: db.get_sample_status_history(pick(self.sample_rows)[0])),
+            # Medical reports
+            Benchmark("get_medical_report", lambda: db.get_medical_report(pick(self.report_ids))),
+            Benchmark("get_medical_reports_by_test_request",
+                      lambda: db.get_medical_reports_by_test_request(pick(self.request_ids))),
+            Benchmark("get_all_medical_reports", db.get_all_medical_reports, heavy=True),
+            Benchmark("get_medical_reports_for_printing",
+                      lambda: db.get_medical_reports_for_printing(start, end), heavy=True),
+            Benchmark("create_medical_report", self._create_report),
+            Benchmark("update_medical_report", lambda: db.update_medical_report(
+                updated(db.get_medical_report(pick(self.report_ids)), signed_at=datetime.now()))),
+            Benchmark("delete_medical_report", lambda: db.delete_medical_report(self._create_report().id)),
+            # Users and permissions
+            Benchmark("get_user", lambda: db.get_user(pick(self.user_rows)[0])),
+            Benchmark("get_user_by_username", lambda: db.get_user_by_username(pick(self.user_rows)[1])),
+            Benchmark("authenticate_user", self._login),
+            Benchmark("create_user", self._create_user),
+            Benchmark("update_user", lambda: db.update_user(db.get_user(self.user_rows[-1][0]))),
+            Benchmark("update_user_password",
+                      lambda: db.update_user_password(self.user_rows[-1][0], self._hash("password"))),
+            Benchmark("get_user_permissions", lambda: db.get_user_permissions(pick(self.user_rows)[0])),
+            Benchmark("get_all_user_permissions", db.get_all_user_permissions),
+            Benchmark("create_user_permission", self._create_permission),
+            Benchmark("delete_user_permission", lambda: db.delete_user_permission(self._create_permission().id)),
+            Benchmark("delete_user_permissions", lambda: db.delete_user_permissions(self._create_user().id)),
+            # Inventory
+            Benchmark("get_inventory_item", lambda: db.get_inventory_item(pick(self.item_ids))),
+            Benchmark("get_all_inventory_items", db.get_all_inventory_items),
+            Benchmark("get_low_stock_items", db.get_low_stock_items),
+            Benchmark("get_inventory_items_by_expiry_date_range",
+                      lambda: db.get_inventory_items_by_expiry_date_range(start, end + timedelta(days=90))),
+            Benchmark("create_inventory_item", lambda: db.create_inventory_item(InventoryItem(
+                id=str(uuid.uuid4()), name="Bench Item", description="", quantity=10,
+                min_quantity=5, supplier="Bench"))),
+            Benchmark("update_inventory_quantity", lambda: db.update_inventory_quantity(pick(self.item_ids), 50)),
+            # Templates
+            Benchmark("get_test_template", lambda: db.get_test_template(self.template.id)),
+            Benchmark("get_test_template_by_test_type",
+                      lambda: db.get_test_template_by_test_type(self.template.test_type_id)),
+            Benchmark("get_all_test_templates", db.get_all_test_templates),
+            Benchmark("render_result_template", lambda: self.template_engine.render(
+                self.render_template, self.render_patient, self.render_test_type)),
+            Benchmark("create_test_template", self._create_template),
+            Benchmark("update_test_template", lambda: db.update_test_template(self.template)),
+            Benchmark("delete_test_template", lambda: db.delete_test_template(self._create_template().id)),
+            # Invoices
+            Benchmark("get_invoice", lambda: db.get_invoice(pick(self.invoice_ids))),
+            Benchmark("get_all_invoices", db.get_all_invoices, heavy=True),
+            Benchmark("get_invoices_by_date_range", lambda: db.get_invoices_by_date_range(start, end), heavy=True),
+            # Change tracking
+            Benchmark("get_change_counters", db.get_change_counters),
+            Benchmark("get_latest_change_seq", db.get_latest_change_seq),
+            Benchmark("changes_since", lambda: db.changes_since(max(0, self.latest_change_seq - 1000), limit=1000)),
+            Benchmark("get_sync_state", lambda: db.get_sync_state("push_seq", "0")),
+            Benchmark("get_sync_conflicts", db.get_sync_conflicts),
+            # Mail outbox
+            Benchmark("create_outbox_messages", self._queue_mail),
+            Benchmark("update_outbox_message_sent", lambda: db.update_outbox_message_sent(self._queue_mail()[0])),
+            Benchmark("update_outbox_message_failed", lambda: db.update_outbox_message_failed(
+                self._queue_mail()[0], "SMTPDataError: (451, 'try again later')", datetime.now())),
+            Benchmark("get_outbox_messages", db.get_outbox_messages),
+            Benchmark("get_outbox_status_counts", db.get_outbox_status_counts),
+            # Screens and login
+            Benchmark("screen:results", lambda: build_results_rows(db), heavy=True),
+            Benchmark("screen:samples", lambda: build_samples_rows(db), heavy=True),
+            Benchmark("screen:statistics", lambda: build_statistics(db, now=end), heavy=True),
+            Benchmark("screen:statistics_for_period",
+                      lambda: build_statistics_for_period(db, start, end), heavy=True),
+            Benchmark("login", self._login),
+        ]
+
+
+def uncovered_methods(benchmarks: List[Benchmark]) -> List[str]:
+    """DatabaseManager read/write methods that no benchmark exercises"""
+    covered = {b.name for b in benchmarks}
+    for b in benchmarks:
+        covered.update(b.covers)
+    methods = [name for name, _ in inspect.getmembers(DatabaseManager, inspect.isfunction)
+               if name.startswith(DB_METHOD_PREFIXES)]
+    return sorted(name for name in methods if name not in covered)
+
+
+def run_suite(scales: List[int], seed: int = 42, repeat: int = 50, time_budget: float = 2.0,
+              data_dir: Optional[str] = None, only: Optional[List[str]] = None) -> Dict[str, Dict[str, dict]]:
+    """Run every benchmark at every scale; returns {scale: {benchmark: result}}"""
+    results = {}
+    for scale in scales:
+        source = prepare_dataset(scale, seed, data_dir)
+        # File-backed datasets are benchmarked on a file copy so disk I/O is included
+        scratch_path = os.path.join(data_dir, "scratch.db") if data_dir else ":memory:"
+        suite = BenchmarkSuite(source, seed=seed, scratch_path=scratch_path)
+        benchmarks = suite.benchmarks()
+        missing = uncovered_methods(benchmarks)
+        if missing:
+            print(f"Warning: no benchmark for {', '.join(missing)}", file=sys.stderr)
+
+        scale_results = {}
+        for benchmark in benchmarks:
+            if only and not any(pattern in benchmark.name for pattern in only):
+                continue
+            scale_results[benchmark.name] = asdict(run_benchmark(benchmark, repeat, time_budget))
+        results[str(scale)] = scale_results
+        suite.close()
+        source.close()
+    return results
+
+
+def compare_to_baseline(results: Dict[str, Dict[str, dict]], baseline: Dict[str, Dict[str, dict]],
+                        threshold: float = 0.2) -> List[str]:
+    """Return a line per benchmark whose p50 latency regressed by more than threshold"""
+    regressions = []
+    for scale, scale_results in results.items():
+        for name, result in scale_results.items():
+            previous = baseline.get(scale, {}).get(name)
+            if not previous or not previous["p50_ms"]:
+                continue
+            change = (result["p50_ms"] - previous["p50_ms"]) / previous["p50_ms"]
+            if change > threshold:
+                regressions.append(
+                    f"[{scale}] {name}: p50 {previous['p50_ms']:.3f}ms -> {result['p50_ms']:.3f}ms (+{change:.0%})"
+                )
+    return regressions
+
+
+def print_results(results: Dict[str, Dict[str, dict]], baseline: Optional[Dict[str, Dict[str, dict]]] = None):
+    header = f"{'benchmark':45} {'runs':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'ops/s':>10} {'peak KB':>10}"
+    for scale, scale_results in results.items():
+        print(f"\n=== {scale} orders ===")
+        print(header + ("   vs baseline" if baseline else ""))
+        for name, r in scale_results.items():
+            line = (f"{name:45} {r['runs']:>5} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} "
+                    f"{r['p99_ms']:>10.3f} {r['ops_per_sec']:>10.1f} {r['peak_memory_kb']:>10.1f}")
+            previous = (baseline or {}).get(scale, {}).get(name)
+            if previous and previous["p50_ms"]:
+                line += f"   {(r['p50_ms'] - previous['p50_ms']) / previous['p50_ms']:+.0%}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DatabaseManager hot paths")
+    parser.add_argument("--scales", default="1000", help="Comma-separated order counts, e.g. 1000,100000,1000000")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=50, help="Runs per benchmark (heavy ones run fewer)")
+    parser.add_argument("--time-budget", type=float, default=2.0, help="Max seconds per benchmark")
+    parser.add_argument("--data-dir", default="bench_data", help="Where generated datasets are cached")
+    parser.add_argument("--only", default=None, help="Comma-separated substrings of benchmarks to run")
+    parser.add_argument("--baseline", default=None, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", default=None, help="Write results to this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p50 slowdown before flagging")
+    args = parser.parse_args()
+
+    scales = [int(value) for value in args.scales.split(",")]
+    only = args.only.split(",") if args.only else None
+    results = run_suite(scales, seed=args.seed, repeat=args.repeat, time_budget=args.time_budget,
+                        data_dir=args.data_dir, only=only)
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if baseline:
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Database change detection for the Medical Laboratory Management System
+
+Every watched table has triggers that bump its row in change_counters (see
+DatabaseManager.init_database). ChangeWatcher polls PRAGMA data_version on
+one long-lived connection, which only changes when another connection
+committed, and reads the counters only then. Subscribers are told which
+tables changed, so a screen reloads only when its own data did.
+"""
+import itertools
+import sqlite3
+from typing import Callable, Dict, Iterable, Set
+
+
+class ChangeWatcher:
+    """Poll the database for commits and report the tables they changed"""
+
+    def __init__(self, db, root=None, interval_ms: int = 500):
+        self.db = db
+        self.root = root
+        self.interval_ms = interval_ms
+        self.subscribers = {}
+        self._tokens = itertools.count()
+        self._conn = None
+        self._data_version = None
+        self._counters = {}
+        self._after_id = None
+        self.running = False
+        self._open()
+
+    def _open(self):
+        self._conn = self.db._connect()
+        self._data_version = self._read_data_version()
+        self._counters = self._read_counters()
+
+    def _read_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _read_counters(self) -> Dict[str, int]:
+        return dict(self._conn.execute("SELECT table_name, version FROM change_counters").fetchall())
+
+    def subscribe(self, tables: Iterable[str], callback: Callable[[Set[str]], None]) -> int:
+        """
+        Call callback(changed_tables) whenever one of tables changed.
+
+        Returns:
+            Token for unsubscribe()
+        """
+        token = next(self._tokens)
+        self.subscribers[token] = (set(tables), callback)
+        return token
+
+    def unsubscribe(self, token: int):
+        self.subscribers.pop(token, None)
+
+    def check(self) -> Set[str]:
+        """Return the tables changed since the last check and notify their subscribers"""
+        try:
+            data_version = self._read_data_version()
+            # Connections sharing an in-memory database share its pager, so
+            # data_version does not see their commits; read the counters instead
+            if data_version == self._data_version and not self.db.is_memory:
+                return set()
+            self._data_version = data_version
+            counters = self._read_counters()
+        except sqlite3.Error:
+            # Locked or unreachable (e.g. network drive); try again next time
+            return set()
+
+        changed = {table for table, version in counters.items() if self._counters.get(table) != version}
+        self._counters = counters
+        if changed:
+            for tables, callback in list(self.subscribers.values()):
+                if tables & changed:
+                    callback(changed)
+        return changed
+
+    def start(self):
+        """Check every interval_ms on the Tk event loop"""
+        if self.running or not self.root or self.interval_ms <= 0:
+            return
+        self.running = True
+        self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        self.check()
+        if self.running:
+            self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        self.running = False
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
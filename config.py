@@ -6,10 +6,129 @@ import os
 class Config:
     # Database configuration
     DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///medical_lab.db')
+    # File path, ":memory:" or a "file:" URI (e.g. a shared-cache memory database)
+    DATABASE_PATH = os.environ.get('MEDICAL_LAB_DB', 'medical_lab.db')
     
+    # Query instrumentation (see DatabaseManager.enable_instrumentation)
+    QUERY_INSTRUMENTATION = os.environ.get('QUERY_INSTRUMENTATION', 'false').lower() in ['true', 'on', '1']
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', 'slow_queries.log')
+    
+    # Group commit of writes by a single writer thread (see write_queue.py)
+    WRITE_QUEUE = os.environ.get('WRITE_QUEUE', 'false').lower() in ['true', 'on', '1']
+    WRITE_QUEUE_WINDOW_MS = float(os.environ.get('WRITE_QUEUE_WINDOW_MS', '5'))
+    WRITE_QUEUE_MAX_BATCH = int(os.environ.get('WRITE_QUEUE_MAX_BATCH', '100'))
+    
+    # Polling interval of the change watcher that refreshes screens changed by
+    # other workstations (see change_watcher.py); 0 disables it
+    CHANGE_WATCH_INTERVAL_MS = int(os.environ.get('CHANGE_WATCH_INTERVAL_MS', '500'))
+    
+    # In-memory copy of the database for statistics and reports (see
+    # replica.py), refreshed from change_log every ANALYTICS_REFRESH_MS
+    ANALYTICS_REPLICA = os.environ.get('ANALYTICS_REPLICA', 'false').lower() in ['true', 'on', '1']
+    ANALYTICS_REFRESH_MS = int(os.environ.get('ANALYTICS_REFRESH_MS', '5000'))
+    
+    # Online backups (see backup.py). The database is copied
+    # BACKUP_PAGES_PER_STEP pages at a time with a pause between steps so the
+    # application keeps running; the newest BACKUP_KEEP backups are kept.
+    # Outside WAL mode, commits restart the copy; after BACKUP_MAX_RESTARTS
+    # restarts the rest is copied in one step.
+    BACKUP_DIR = os.environ.get('BACKUP_DIR', 'backups')
+    BACKUP_KEEP = int(os.environ.get('BACKUP_KEEP', '14'))
+    BACKUP_PAGES_PER_STEP = int(os.environ.get('BACKUP_PAGES_PER_STEP', '256'))
+    BACKUP_STEP_PAUSE_MS = float(os.environ.get('BACKUP_STEP_PAUSE_MS', '5'))
+    BACKUP_MAX_RESTARTS = int(os.environ.get('BACKUP_MAX_RESTARTS', '3'))
+    
+    # Year-partitioned archives of closed records (see archive.py). Tools >
+    # Archive Old Records offers to archive everything older than
+    # ARCHIVE_AFTER_YEARS, ARCHIVE_BATCH_SIZE invoices/requests per transaction.
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archives')
+    ARCHIVE_AFTER_YEARS = int(os.environ.get('ARCHIVE_AFTER_YEARS', '2'))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '500'))
+    
+    # Parsed Word templates, cached by file content hash (see word_import.py)
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', 'template_cache')
+    TEMPLATE_CACHE_SIZE = int(os.environ.get('TEMPLATE_CACHE_SIZE', '200'))
+    
+    # PDF reports: comma-separated regular, bold and monospace .ttf files
+    # (an Arabic-capable system font is used when unset)
+    PDF_FONT_FILES = os.environ.get('PDF_FONT_FILES')
+    
+    # Batch report rendering processes (0 = one per CPU, see batch_reports.py)
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', '0'))
+    
+    # Head-office sync (see sync.py); server settings are saved in the database
+    SYNC_INTERVAL_SECONDS = float(os.environ.get('SYNC_INTERVAL_SECONDS', '60'))
+    SYNC_BATCH_SIZE = int(os.environ.get('SYNC_BATCH_SIZE', '500'))
+    SYNC_TIMEOUT = float(os.environ.get('SYNC_TIMEOUT', '30'))
+    
+    # UI responsiveness monitoring (see responsiveness.py)
+    RESPONSIVENESS_MONITOR = os.environ.get('RESPONSIVENESS_MONITOR', 'false').lower() in ['true', 'on', '1']
+    RESPONSIVENESS_INDICATOR = os.environ.get('RESPONSIVENESS_INDICATOR', 'false').lower() in ['true', 'on', '1']
+    RESPONSIVENESS_LOG = os.environ.get('RESPONSIVENESS_LOG', 'responsiveness.log')
+
+    # SQLite storage profiles (see DatabaseManager.__init__)
+    # "wal" suits a single PC running the application; "multi_station" is for a
+    # database file on a shared network drive, where WAL must not be used because
+    # its shared-memory index does not work across machines.
+    STORAGE_PROFILE = os.environ.get('STORAGE_PROFILE', 'default')
+    STORAGE_PROFILES = {
+        'default': {
+            'journal_mode': None,
+            'busy_timeout': 5000,
+            'busy_retries': 5,
+            'busy_retry_delay': 0.05,
+            'busy_retry_max_delay': 0.5,
+            # Seconds a write may keep retrying after the first busy timeout
+            'busy_retry_max_wait': 3.0,
+        },
+        'wal': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'cache_size': -20000,  # KiB
+            'mmap_size': 268435456,
+            'temp_store': 'MEMORY',
+            'busy_timeout': 5000,
+            'busy_retries': 5,
+            'busy_retry_delay': 0.05,
+        },
+        'multi_station': {
+            'journal_mode': 'DELETE',
+            'synchronous': 'FULL',
+            'cache_size': -20000,
+            'mmap_size': 0,
+            'temp_store': 'MEMORY',
+            'busy_timeout': 10000,
+            'busy_retries': 8,
+            'busy_retry_delay': 0.1,
+        },
+    }
+
+    @classmethod
+    def get_storage_profile(cls, profile=None):
+        """
+        Resolve a storage profile.
+
+        Args:
+            profile: Profile name, a dict of overrides on top of the default
+                profile, or None for STORAGE_PROFILE
+        """
+        if profile is None:
+            profile = cls.STORAGE_PROFILE
+        if isinstance(profile, dict):
+            return {**cls.STORAGE_PROFILES['default'], **profile}
+        if profile not in cls.STORAGE_PROFILES:
+            raise ValueError(f"Unknown storage profile: {profile}")
+        return {**cls.STORAGE_PROFILES['default'], **cls.STORAGE_PROFILES[profile]}
+
     # Security configuration
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key')
     PASSWORD_SALT = os.environ.get('PASSWORD_SALT', 'dev-password-salt')
+    # Keys for encrypted patient fields (see field_encryption.py): comma-separated,
+    # newest first; otherwise read from the key file, by default
+    # field_encryption.key next to the database, created on first use
+    FIELD_ENCRYPTION_KEY = os.environ.get('FIELD_ENCRYPTION_KEY')
+    FIELD_ENCRYPTION_KEY_FILE = os.environ.get('FIELD_ENCRYPTION_KEY_FILE')
     
     # Language configuration
     LANGUAGES = {
@@ -25,9 +144,33 @@ class Config:
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() in ['true', 'on', '1']
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_FROM = os.environ.get('MAIL_FROM')  # MAIL_USERNAME if not set
+    # Outbox delivery (see mail.py): messages per minute (0 = no limit), how
+    # many messages one SMTP connection sends before reconnecting, how long an
+    # idle connection stays open, and retries with doubling delays
+    MAIL_RATE_PER_MINUTE = int(os.environ.get('MAIL_RATE_PER_MINUTE', '60'))
+    MAIL_MESSAGES_PER_CONNECTION = int(os.environ.get('MAIL_MESSAGES_PER_CONNECTION', '100'))
+    MAIL_IDLE_SECONDS = int(os.environ.get('MAIL_IDLE_SECONDS', '30'))
+    MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', '8'))
+    MAIL_RETRY_SECONDS = int(os.environ.get('MAIL_RETRY_SECONDS', '60'))
+    MAIL_RETRY_MAX_SECONDS = int(os.environ.get('MAIL_RETRY_MAX_SECONDS', '3600'))
+    MAIL_POLL_SECONDS = int(os.environ.get('MAIL_POLL_SECONDS', '30'))
     
     # Barcode configuration
     BARCODE_FORMAT = 'CODE128'
+    # Accession numbers (see accession.py): two-digit site code, unique per
+    # database, and how many numbers a workstation reserves at a time
+    ACCESSION_SITE = os.environ.get('ACCESSION_SITE', '01')
+    ACCESSION_BLOCK_SIZE = int(os.environ.get('ACCESSION_BLOCK_SIZE', '50'))
+    # Label sheet layout (see barcodes.SHEETS) and label printer resolution for ZPL
+    LABEL_SHEET = os.environ.get('LABEL_SHEET', 'L7651')
+    LABEL_PRINTER_DPI = int(os.environ.get('LABEL_PRINTER_DPI', '203'))
+    # Scan intake (see intake.py): write queued status changes once the
+    # scanner pauses this long, or at once when this many are queued or the
+    # oldest has waited INTAKE_MAX_DELAY_MS
+    INTAKE_FLUSH_MS = int(os.environ.get('INTAKE_FLUSH_MS', '1500'))
+    INTAKE_MAX_BATCH = int(os.environ.get('INTAKE_MAX_BATCH', '25'))
+    INTAKE_MAX_DELAY_MS = int(os.environ.get('INTAKE_MAX_DELAY_MS', '5000'))
     
     # Pagination
     PATIENTS_PER_PAGE = 20
@@ -0,0 +1,69 @@
+"""
+Shared pytest fixtures for the Medical Laboratory Management System tests
+
+Every test process gets its own shared-cache in-memory database, so the suite
+never touches medical_lab.db and can run in parallel (e.g. pytest -n auto).
+"""
+import sys
+import os
+import uuid
+
+# Must be set before DatabaseManager/Config are imported by any test module
+os.environ.setdefault(
+    'MEDICAL_LAB_DB',
+    f"file:medical_lab_test_{os.getpid()}?mode=memory&cache=shared"
+)
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+import pytest
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.models import Patient, TestType, User, UserRole, Gender
+
+
+def seed_database(db: DatabaseManager):
+    """Populate a database with the baseline records the tests rely on"""
+    db.create_user(User(
+        id=str(uuid.uuid4()),
+        username="admin",
+        email="admin@lab.com",
+        password_hash="240be518fabd2724ddb6f04eeb1da5967448d7e831c08c8fa822809f74c720a9",
+        role=UserRole.ADMIN
+    ))
+
+    for test_id, name, description, price, category in [
+        ("001", "Complete Blood Count", "Full blood analysis", 50.0, "Blood"),
+        ("002", "Urinalysis", "Urine test", 30.0, "Urine"),
+        ("003", "Stool Analysis", "Stool sample test", 40.0, "Stool"),
+        ("004", "X-Ray", "Radiology examination", 100.0, "Radiology"),
+    ]:
+        db.create_test_type(TestType(
+            id=test_id, name=name, description=description, price=price, category=category
+        ))
+
+    db.create_patient(Patient(
+        id="10000001",
+        name="Template Patient",
+        age=40,
+        gender=Gender.FEMALE,
+        contact_info="template.patient@example.com"
+    ))
+
+
+@pytest.fixture(scope="session")
+def template_db():
+    """Seeded in-memory database, built once per test process"""
+    db = DatabaseManager(":memory:")
+    seed_database(db)
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def db(template_db):
+    """Fresh in-memory copy of the template database for a single test"""
+    clone = DatabaseManager.from_template(template_db)
+    yield clone
+    clone.close()
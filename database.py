@@ -3,25 +3,444 @@ Database management for the Medical Laboratory Management System
 """
 import sqlite3
 import os
-from typing import List, Optional
-from datetime import datetime
+import time
+import random
+import functools
+import threading
+import contextlib
+import zlib
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
 import uuid
+from config import Config
+from field_encryption import (ENCRYPTED_FIELD_MARKER, KEY_ID_SIZE, UNREADABLE_FIELD, FieldCipher,
+                              get_field_cipher, normalize_lookup)
+from instrumentation import QueryInstrumentation, connection_factory
+from write_queue import WriteQueue
 from models import (
     Patient, TestType, TestRequest, Sample, MedicalReport, 
     Invoice, User, InventoryItem, PurchaseOrder, TestTemplate, Gender, 
-    TestStatus, SampleStatus, UserRole, PaymentMethod, Permission, UserPermission
+    TestStatus, SampleStatus, UserRole, PaymentMethod, Permission, UserPermission,
+    ChangeLogEntry, SampleStatusChange, SampleTransitionResult, SAMPLE_TRANSITIONS, MailStatus, OutboxMessage
 )
 
+def is_busy_error(error: sqlite3.Error) -> bool:
+    """True if error is SQLITE_BUSY/SQLITE_LOCKED, i.e. worth retrying"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+# Prefix of compressed medical_reports.content and test_templates.template_content
+# values, followed by the version of the format. Values stored before
+# compression was introduced are plain TEXT and are returned as they are.
+COMPRESSED_CONTENT_MARKER = b"ZC1:"
+
+def compress_content(text: Optional[str]) -> Optional[bytes]:
+    """Compress a report or template body for storage"""
+    if text is None:
+        return None
+    return COMPRESSED_CONTENT_MARKER + zlib.compress(text.encode("utf-8"), 6)
+
+def decompress_content(value) -> Optional[str]:
+    """Return the text of a stored report or template body, compressed or not"""
+    if isinstance(value, bytes):
+        if value.startswith(COMPRESSED_CONTENT_MARKER):
+            value = zlib.decompress(value[len(COMPRESSED_CONTENT_MARKER):])
+        return value.decode("utf-8")
+    return value
+
+# Columns compressed with compress_content, by table
+COMPRESSED_CONTENT_COLUMNS = {
+    "medical_reports": "content",
+    "test_templates": "template_content",
+}
+
+# Patient columns stored encrypted with the field cipher (see
+# field_encryption.py), each with the column holding its blind index
+ENCRYPTED_PATIENT_COLUMNS = {
+    "contact_info": "contact_info_index",
+}
+
+# Marker for retry_on_busy: re-raise once the retries are used up
+RAISE = object()
+
+def retry_on_busy(method=None, *, failure_result=RAISE):
+    """
+    Retry a write method with jittered, capped exponential backoff while the
+    database is locked.
+
+    The whole call, including the busy timeout of each attempt, is bounded by
+    busy_timeout + busy_retry_max_wait so a locked database cannot freeze the
+    UI for longer than that.
+
+    With the write queue enabled the call is handed to the writer thread
+    instead, which holds the write lock while it runs.
+
+    Args:
+        failure_result: Value returned instead of raising once the retries
+            are used up (e.g. False for methods that report errors that way)
+    """
+    if method is None:
+        return lambda m: retry_on_busy(m, failure_result=failure_result)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        write_queue = self._write_queue
+        if write_queue is not None:
+            if write_queue.in_writer_thread():
+                return method(self, *args, **kwargs)
+            try:
+                return write_queue.submit(wrapper, self, *args, **kwargs).result()
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or failure_result is RAISE:
+                    raise
+                print(f"Database error: {e}")
+                return failure_result
+        if getattr(self._retry_state, "deadline", None) is not None:
+            # Nested call of another write method: the outer call retries
+            return method(self, *args, **kwargs)
+        storage = self.storage
+        self._retry_state.deadline = (time.monotonic() + storage["busy_timeout"] / 1000.0
+                                      + storage["busy_retry_max_wait"])
+        attempt = 0
+        try:
+            while True:
+                try:
+                    return method(self, *args, **kwargs)
+                except sqlite3.OperationalError as e:
+                    if not is_busy_error(e):
+                        raise
+                    # Full jitter keeps competing workstations from retrying in lockstep
+                    backoff = random.uniform(0, min(storage["busy_retry_delay"] * (2 ** attempt),
+                                                    storage["busy_retry_max_delay"]))
+                    if attempt >= storage["busy_retries"] or time.monotonic() + backoff >= self._retry_state.deadline:
+                        if failure_result is RAISE:
+                            raise
+                        print(f"Database error: {e}")
+                        return failure_result
+                    time.sleep(backoff)
+                    attempt += 1
+        finally:
+            self._retry_state.deadline = None
+    return wrapper
+
+# Tables whose changes ChangeWatcher reports
+CHANGE_TRACKED_TABLES = (
+    "patients", "test_types", "test_requests", "samples", "medical_reports",
+    "invoices", "invoice_test_requests", "users", "user_permissions",
+    "inventory_items", "purchase_orders", "test_templates",
+)
+
+# Row id recorded in change_log for tables without an id column
+CHANGE_LOG_ROW_IDS = {
+    "invoice_test_requests": "{row}.invoice_id || ':' || {row}.test_request_id",
+}
+
+# Primary key columns of the tracked tables, in change_log row id order
+TABLE_PRIMARY_KEYS = {
+    "invoice_test_requests": ("invoice_id", "test_request_id"),
+}
+
+class SnapshotConnection:
+    """
+    Connection handed to read methods inside DatabaseManager.snapshot().
+
+    All of them read the same snapshot: close() and commit() leave the read
+    transaction open for the next method.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def cursor(self, *args):
+        return self._conn.cursor(*args)
+
+    def execute(self, sql, parameters=()):
+        return self._conn.execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._conn.executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
 class DatabaseManager:
-    def __init__(self, db_path: str = "medical_lab.db"):
-        self.db_path = db_path
+    def __init__(self, db_path: Optional[str] = None, storage_profile=None,
+                 field_cipher: Optional[FieldCipher] = None):
+        self.db_path = db_path or Config.DATABASE_PATH
+        self.storage = Config.get_storage_profile(storage_profile)
+        self._connection_pragmas = [
+            f"PRAGMA {name} = {self.storage[name]}"
+            for name in ("synchronous", "cache_size", "mmap_size", "temp_store")
+            if self.storage.get(name) is not None
+        ]
+        # WAL and DELETE persist in the file; other journal modes are per connection
+        if self.storage.get("journal_mode") and self.storage["journal_mode"].upper() not in ("WAL", "DELETE"):
+            self._connection_pragmas.append(f"PRAGMA journal_mode = {self.storage['journal_mode']}")
+        self._keepalive = None
+        self._retry_state = threading.local()
+        self._snapshot_state = threading.local()
+        self._write_queue = None
+        self._connection_factory = sqlite3.Connection
+        self.instrumentation = None
+        self._instrumented_methods = []
+        
+        # ":memory:" would give every connection its own empty database, so
+        # map it onto a uniquely named shared-cache URI instead
+        if self.db_path == ":memory:":
+            self.db_path = f"file:medical_lab_{uuid.uuid4().hex}?mode=memory&cache=shared"
+        self.uses_uri = self.db_path.startswith("file:")
+        
+        if self.is_memory:
+            # An in-memory database only lives while a connection is open
+            self._keepalive = self._connect()
+        
         self.init_database()
+        # One cipher for the lifetime of the manager: no key setup per value.
+        # A station that syncs must use the shared keys, never make its own.
+        self.field_cipher = field_cipher or get_field_cipher(None if self.is_memory else self.db_path,
+                                                             create=not self.get_sync_state("server_url"))
+        
+        if Config.QUERY_INSTRUMENTATION:
+            self.enable_instrumentation()
+        if Config.WRITE_QUEUE:
+            self.enable_write_queue()
+    
+    @property
+    def is_memory(self) -> bool:
+        """True if the database lives in memory rather than in a file"""
+        return self.uses_uri and "mode=memory" in self.db_path
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection to the managed database with the storage profile applied"""
+        if self._write_queue is not None and self._write_queue.in_writer_thread():
+            # Write methods on the writer thread share its group transaction
+            return self._write_queue.connection()
+        snapshot = getattr(self._snapshot_state, "connection", None)
+        if snapshot is not None:
+            return snapshot
+        return self._open_connection()
+    
+    def _open_connection(self, **kwargs) -> sqlite3.Connection:
+        timeout = self.storage["busy_timeout"] / 1000.0
+        deadline = getattr(self._retry_state, "deadline", None)
+        if deadline is not None:
+            # Inside retry_on_busy: never wait past the call's overall deadline
+            timeout = max(0.0, min(timeout, deadline - time.monotonic()))
+        conn = sqlite3.connect(self.db_path, uri=self.uses_uri, factory=self._connection_factory,
+                               timeout=timeout, **kwargs)
+        for pragma in self._connection_pragmas:
+            conn.execute(pragma)
+        return conn
+    
+    def _locked_connection(self):
+        """
+        Connection whose transaction already holds the write lock, for
+        batches that read rows and then rewrite them: no other writer can
+        commit in between. Commit and close it as usual.
+        """
+        if self._write_queue is not None and self._write_queue.in_writer_thread():
+            # The writer thread's group transaction took the lock already
+            return self._write_queue.connection()
+        conn = self._open_connection(isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+    
+    def close(self):
+        """Commit queued writes and release the connection pinning an in-memory database"""
+        self.disable_write_queue()
+        if self._keepalive is not None:
+            self._keepalive.close()
+            self._keepalive = None
+    
+    @contextlib.contextmanager
+    def snapshot(self):
+        """
+        Run several reads against one consistent view of the database.
+        
+        Inside the block, read methods called on this thread share a single
+        read-only connection, so a report sees no commits made halfway
+        through it. On a WAL database that connection holds a read
+        transaction, which does not block writers. Other journal modes would
+        block them for the whole report, so the database is copied into a
+        private in-memory snapshot first instead.
+        
+            with db.snapshot() as s:
+                invoices = s.get_invoices_by_date_range(start, end)
+                test_requests = s.get_test_requests_by_date_range(start, end)
+        """
+        if getattr(self._snapshot_state, "connection", None) is not None:
+            # Nested snapshot: keep reading the outer one
+            yield self
+            return
+        
+        source = self._open_connection(isolation_level=None)
+        try:
+            journal_mode = source.execute("PRAGMA journal_mode").fetchone()[0]
+            if journal_mode.lower() == "wal":
+                conn = source
+                conn.execute("BEGIN")
+                # The snapshot is taken by the first read, not by BEGIN
+                conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            else:
+                conn = sqlite3.connect(":memory:", factory=self._connection_factory,
+                                       isolation_level=None)
+                source.backup(conn)
+                source.close()
+            conn.execute("PRAGMA query_only = ON")
+        except BaseException:
+            source.close()
+            raise
+        
+        with self._reading_from(conn):
+            yield self
+    
+    @contextlib.contextmanager
+    def _reading_from(self, conn: sqlite3.Connection):
+        """Have read methods on this thread use conn until the block ends, then close it"""
+        self._snapshot_state.connection = SnapshotConnection(conn)
+        try:
+            yield self
+        finally:
+            self._snapshot_state.connection = None
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            conn.close()
+    
+    def copy_to(self, target: "DatabaseManager"):
+        """Copy the whole database into target using the sqlite3 backup API"""
+        source_conn = self._connect()
+        target_conn = target._connect()
+        try:
+            source_conn.backup(target_conn)
+        finally:
+            target_conn.close()
+            source_conn.close()
+    
+    # Query instrumentation
+    def enable_instrumentation(self, slow_query_ms: Optional[float] = None,
+                               log_path: Optional[str] = None) -> QueryInstrumentation:
+        """
+        Start timing every method call and SQL statement.
+        
+        Statements slower than slow_query_ms are written to the slow-query log
+        together with their EXPLAIN QUERY PLAN output.
+        """
+        self.disable_instrumentation()
+        self.instrumentation = QueryInstrumentation(
+            slow_query_ms=Config.SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms,
+            log_path=Config.SLOW_QUERY_LOG if log_path is None else log_path
+        )
+        self._connection_factory = connection_factory(self.instrumentation)
+        
+        # Wrap on the instance only, so the class stays untouched when disabled
+        for name in dir(type(self)):
+            if name.startswith("_") or name in self.UNINSTRUMENTED_METHODS:
+                continue
+            method = getattr(self, name)
+            if callable(method):
+                setattr(self, name, self.instrumentation.wrap_method(name, method))
+                self._instrumented_methods.append(name)
+        return self.instrumentation
+    
+    def disable_instrumentation(self):
+        """Stop collecting query statistics"""
+        for name in self._instrumented_methods:
+            delattr(self, name)
+        self._instrumented_methods = []
+        self._connection_factory = sqlite3.Connection
+        if self.instrumentation:
+            self.instrumentation.close()
+            self.instrumentation = None
+    
+    def get_query_stats(self) -> Optional[dict]:
+        """Snapshot of per-method and per-statement statistics, or None if disabled"""
+        return self.instrumentation.snapshot() if self.instrumentation else None
+    
+    def reset_query_stats(self):
+        if self.instrumentation:
+            self.instrumentation.reset()
+    
+    # Group commit
+    def enable_write_queue(self, window_ms: Optional[float] = None,
+                           max_batch: Optional[int] = None) -> WriteQueue:
+        """
+        Hand all write methods to a single writer thread that commits them in groups.
+        
+        A group is committed window_ms after its first write or once it holds
+        max_batch writes. Calling a write method still blocks until its write
+        is durable; use submit_write() to continue without waiting.
+        """
+        self.disable_write_queue()
+        self._write_queue = WriteQueue(
+            self,
+            window_ms=Config.WRITE_QUEUE_WINDOW_MS if window_ms is None else window_ms,
+            max_batch=Config.WRITE_QUEUE_MAX_BATCH if max_batch is None else max_batch
+        )
+        return self._write_queue
+    
+    def disable_write_queue(self):
+        """Commit the queued writes and stop the writer thread"""
+        if self._write_queue is not None:
+            # Writes still queued run on the writer thread, so detach it only once it stopped
+            self._write_queue.stop()
+            self._write_queue = None
+    
+    def submit_write(self, method_name: str, *args, **kwargs) -> Future:
+        """
+        Run a write method without waiting for it.
+        
+        Returns:
+            Future that resolves to the method's return value once the write
+            is committed (immediately if the write queue is disabled)
+        """
+        method = getattr(self, method_name)
+        if self._write_queue is not None:
+            return self._write_queue.submit(method, *args, **kwargs)
+        future = Future()
+        try:
+            future.set_result(method(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
+    def get_write_queue_stats(self) -> Optional[dict]:
+        """Batch statistics of the write queue, or None if disabled"""
+        return self._write_queue.stats() if self._write_queue else None
+    
+    UNINSTRUMENTED_METHODS = {
+        "enable_instrumentation", "disable_instrumentation", "get_query_stats",
+        "reset_query_stats", "close", "copy_to", "from_template", "init_database",
+        "enable_write_queue", "disable_write_queue", "submit_write", "get_write_queue_stats",
+        "snapshot", "compress_stored_content", "encrypt_stored_fields",
+    }
+    
+    @classmethod
+    def from_template(cls, template: "DatabaseManager", db_path: str = ":memory:") -> "DatabaseManager":
+        """Create a database (in memory by default) cloned from a seeded template"""
+        clone = cls(db_path, field_cipher=template.field_cipher)
+        template.copy_to(clone)
+        return clone
     
     def init_database(self):
         """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
+        journal_mode = self.storage.get("journal_mode")
+        if journal_mode and not self.is_memory:
+            cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+        
         # Create tables
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS patients (
@@ -31,9 +450,16 @@ class DatabaseManager:
                 gender TEXT NOT NULL,
                 contact_info TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                contact_info_index TEXT
             )
         ''')
+        # Blind index of the encrypted contact_info; databases created before
+        # field encryption get the column here
+        patient_columns = {info[1] for info in cursor.execute("PRAGMA table_info(patients)")}
+        if "contact_info_index" not in patient_columns:
+            cursor.execute("ALTER TABLE patients ADD COLUMN contact_info_index TEXT")
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_patients_contact_info_index ON patients (contact_info_index)')
         
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS test_types (
@@ -169,22 +595,255 @@ class DatabaseManager:
                 FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
             )
         ''')
+        
+        # Change counters, bumped by triggers, for ChangeWatcher
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_counters (
+                table_name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        for table in CHANGE_TRACKED_TABLES:
+            cursor.execute('INSERT OR IGNORE INTO change_counters (table_name) VALUES (?)', (table,))
+            for operation in ("INSERT", "UPDATE", "DELETE"):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {table}_{operation.lower()}_counter
+                    AFTER {operation} ON {table}
+                    BEGIN
+                        UPDATE change_counters SET version = version + 1 WHERE table_name = '{table}';
+                    END
+                ''')
+        
+        # Sync bookkeeping (see sync.py); not change-tracked itself
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_row_versions (
+                table_name TEXT NOT NULL,
+                row_id TEXT NOT NULL,
+                changed_at TEXT NOT NULL,
+                station_id TEXT NOT NULL,
+                PRIMARY KEY (table_name, row_id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_applied_ranges (
+                first_seq INTEGER NOT NULL,
+                last_seq INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_conflicts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id TEXT NOT NULL,
+                local_changed_at TEXT,
+                remote_changed_at TEXT NOT NULL,
+                remote_station TEXT NOT NULL,
+                winner TEXT NOT NULL,
+                local_row TEXT,
+                remote_row TEXT,
+                resolved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Sample status changes, oldest first per sample; not change-tracked, each site keeps its own
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sample_status_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sample_id TEXT NOT NULL,
+                from_status TEXT,
+                to_status TEXT NOT NULL,
+                changed_at TIMESTAMP NOT NULL,
+                changed_by TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sample_status_history_sample ON sample_status_history (sample_id)')
+        
+        # Accession number counters (see accession.py); not change-tracked, each site counts its own
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS accession_counters (
+                day TEXT PRIMARY KEY,
+                next_seq INTEGER NOT NULL
+            )
+        ''')
+        
+        # E-mail waiting to be sent or already sent (see mail.py); not change-tracked, each site sends its own
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS mail_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recipient TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                body TEXT NOT NULL,
+                attachment_name TEXT,
+                attachment BLOB,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at TIMESTAMP NOT NULL,
+                next_attempt_at TIMESTAMP NOT NULL,
+                claimed_by TEXT,
+                claimed_until TIMESTAMP,
+                sent_at TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_mail_outbox_due ON mail_outbox (status, next_attempt_at)')
+        
+        # Row-level change feed for changes_since()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id TEXT NOT NULL,
+                operation TEXT NOT NULL,
+                changed_at TIMESTAMP NOT NULL
+            )
+        ''')
+        for table in CHANGE_TRACKED_TABLES:
+            for operation in ("INSERT", "UPDATE", "DELETE"):
+                row = "OLD" if operation == "DELETE" else "NEW"
+                row_id = CHANGE_LOG_ROW_IDS.get(table, "{row}.id").format(row=row)
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {table}_{operation.lower()}_log
+                    AFTER {operation} ON {table}
+                    BEGIN
+                        INSERT INTO change_log (table_name, row_id, operation, changed_at)
+                        VALUES ('{table}', {row_id}, '{operation}', strftime('%Y-%m-%d %H:%M:%f', 'now'));
+                    END
+                ''')
 
         conn.commit()
         conn.close()
     
+    def changes_since(self, seq: int = 0, limit: int = 1000,
+                      tables: Optional[List[str]] = None) -> List[ChangeLogEntry]:
+        """
+        Row changes after seq, oldest first.
+        
+        Consumers remember the seq of the last entry they processed and pass
+        it back to get the next page.
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        query = 'SELECT seq, table_name, row_id, operation, changed_at FROM change_log WHERE seq > ?'
+        params = [seq]
+        if tables:
+            query += f' AND table_name IN ({", ".join("?" for _ in tables)})'
+            params.extend(tables)
+        query += ' ORDER BY seq LIMIT ?'
+        params.append(limit)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [
+            ChangeLogEntry(
+                seq=row[0],
+                table_name=row[1],
+                row_id=row[2],
+                operation=row[3],
+                changed_at=datetime.fromisoformat(row[4])
+            )
+            for row in rows
+        ]
+    
+    def get_latest_change_seq(self) -> int:
+        """Seq of the newest change_log entry (0 if there is none)"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log')
+        seq = cursor.fetchone()[0]
+        conn.close()
+        return seq
+    
+    @retry_on_busy
+    def compact_change_log(self, before_seq: int) -> int:
+        """
+        Keep only the newest entry per row among the entries before before_seq.
+        
+        A consumer that is further behind still learns about every changed
+        row and its last operation, just not about each intermediate change.
+        
+        Returns:
+            Number of entries removed
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            DELETE FROM change_log
+            WHERE seq < ? AND seq NOT IN (
+                SELECT MAX(seq) FROM change_log WHERE seq < ? GROUP BY table_name, row_id
+            )
+        ''', (before_seq, before_seq))
+        removed = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return removed
+    
+    # Sync state (see sync.py)
+    def get_sync_state(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('SELECT value FROM sync_state WHERE key = ?', (key,))
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else default
+    
+    @retry_on_busy
+    def set_sync_state(self, key: str, value: Optional[str]) -> bool:
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO sync_state (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        ''', (key, value))
+        conn.commit()
+        conn.close()
+        return True
+    
+    def get_sync_conflicts(self, limit: int = 100) -> List[dict]:
+        """Most recent last-writer-wins decisions between this station and the server"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT table_name, row_id, local_changed_at, remote_changed_at, remote_station,
+                   winner, local_row, remote_row, resolved_at
+            FROM sync_conflicts ORDER BY id DESC LIMIT ?
+        ''', (limit,))
+        columns = [column[0] for column in cursor.description]
+        conflicts = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        conn.close()
+        return conflicts
+    
+    def get_change_counters(self) -> dict:
+        """Current change counter of every tracked table"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('SELECT table_name, version FROM change_counters')
+        counters = dict(cursor.fetchall())
+        conn.close()
+        return counters
+    
     # Patient methods
+    @retry_on_busy
     def create_patient(self, patient: Patient) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
             cursor.execute('''
-                INSERT INTO patients (id, name, age, gender, contact_info, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO patients (id, name, age, gender, contact_info, contact_info_index,
+                                      created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 patient.id, patient.name, patient.age, patient.gender.value, 
-                patient.contact_info, patient.created_at, patient.updated_at
+                self.field_cipher.encrypt(patient.contact_info), self.field_cipher.blind_index(patient.contact_info),
+                patient.created_at, patient.updated_at
             ))
             conn.commit()
             return True
@@ -195,7 +854,7 @@ class DatabaseManager:
     
     def generate_patient_id(self) -> str:
         """Generate a unique 8-digit patient ID"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         while True:
@@ -210,7 +869,7 @@ class DatabaseManager:
                 return patient_id
     
     def get_patient(self, patient_id: str) -> Optional[Patient]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM patients WHERE id = ?', (patient_id,))
@@ -223,32 +882,41 @@ class DatabaseManager:
                 name=row[1],
                 age=row[2],
                 gender=Gender(row[3]),
-                contact_info=row[4],
+                contact_info=self.field_cipher.decrypt_or_placeholder(row[4]),
                 created_at=datetime.fromisoformat(row[5]),
                 updated_at=datetime.fromisoformat(row[6])
             )
         return None
     
+    @retry_on_busy
     def update_patient(self, patient: Patient) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
-            cursor.execute('''
-                UPDATE patients 
-                SET name = ?, age = ?, gender = ?, contact_info = ?, updated_at = ?
-                WHERE id = ?
-            ''', (
-                patient.name, patient.age, patient.gender.value, 
-                patient.contact_info, patient.updated_at, patient.id
-            ))
+            if patient.contact_info == UNREADABLE_FIELD:
+                # Read without its key: keep the stored value, not the placeholder
+                cursor.execute('''
+                    UPDATE patients SET name = ?, age = ?, gender = ?, updated_at = ? WHERE id = ?
+                ''', (patient.name, patient.age, patient.gender.value, patient.updated_at, patient.id))
+            else:
+                cursor.execute('''
+                    UPDATE patients 
+                    SET name = ?, age = ?, gender = ?, contact_info = ?, contact_info_index = ?, updated_at = ?
+                    WHERE id = ?
+                ''', (
+                    patient.name, patient.age, patient.gender.value, 
+                    self.field_cipher.encrypt(patient.contact_info), self.field_cipher.blind_index(patient.contact_info),
+                    patient.updated_at, patient.id
+                ))
             conn.commit()
             return cursor.rowcount > 0
         finally:
             conn.close()
     
+    @retry_on_busy
     def delete_patient(self, patient_id: str) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM patients WHERE id = ?', (patient_id,))
@@ -258,28 +926,17 @@ class DatabaseManager:
         return success
     
     def get_all_patients(self) -> List[Patient]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM patients')
         rows = cursor.fetchall()
         conn.close()
         
-        patients = []
-        for row in rows:
-            patients.append(Patient(
-                id=row[0],
-                name=row[1],
-                age=row[2],
-                gender=Gender(row[3]),
-                contact_info=row[4],
-                created_at=datetime.fromisoformat(row[5]),
-                updated_at=datetime.fromisoformat(row[6])
-            ))
-        return patients
+        return self._rows_to_patients(rows)
     
     def get_patients_by_registration_date_range(self, start_date: datetime, end_date: datetime) -> List[Patient]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -289,22 +946,52 @@ class DatabaseManager:
         rows = cursor.fetchall()
         conn.close()
         
-        patients = []
-        for row in rows:
-            patients.append(Patient(
+        return self._rows_to_patients(rows)
+    
+    def get_patients_by_contact(self, contact_info: str) -> List[Patient]:
+        """
+        Patients whose contact info is exactly contact_info (e.g. a phone
+        number), ignoring case, spaces, dashes and brackets.
+        
+        The lookup goes through the blind index, so it stays indexed although
+        the column is encrypted.
+        """
+        indexes = self.field_cipher.blind_indexes(contact_info)
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            SELECT * FROM patients
+            WHERE contact_info_index IN ({", ".join("?" for _ in indexes)})
+        ''', indexes)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        # The blind index is truncated: confirm on the decrypted values
+        wanted = normalize_lookup(contact_info)
+        return [patient for patient in self._rows_to_patients(rows)
+                if normalize_lookup(patient.contact_info or "") == wanted]
+    
+    def _rows_to_patients(self, rows) -> List[Patient]:
+        # Decrypted as one batch, with the cipher set up once
+        contacts = self.field_cipher.decrypt_many(row[4] for row in rows)
+        return [
+            Patient(
                 id=row[0],
                 name=row[1],
                 age=row[2],
                 gender=Gender(row[3]),
-                contact_info=row[4],
+                contact_info=contact_info,
                 created_at=datetime.fromisoformat(row[5]),
                 updated_at=datetime.fromisoformat(row[6])
-            ))
-        return patients
+            )
+            for row, contact_info in zip(rows, contacts)
+        ]
 
     # Test Type methods
+    @retry_on_busy
     def create_test_type(self, test_type: TestType) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -323,7 +1010,7 @@ class DatabaseManager:
             conn.close()
     
     def get_all_test_types(self) -> List[TestType]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM test_types')
@@ -343,7 +1030,7 @@ class DatabaseManager:
         return test_types
     
     def get_test_type(self, test_type_id: str) -> Optional[TestType]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM test_types WHERE id = ?', (test_type_id,))
@@ -361,8 +1048,9 @@ class DatabaseManager:
             )
         return None
     
+    @retry_on_busy
     def update_test_type(self, test_type: TestType) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -379,8 +1067,9 @@ class DatabaseManager:
         finally:
             conn.close()
     
+    @retry_on_busy
     def delete_test_type(self, test_type_id: str) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM test_types WHERE id = ?', (test_type_id,))
@@ -391,7 +1080,7 @@ class DatabaseManager:
     
     def get_next_test_id(self) -> str:
         """Generate the next sequential three-digit test ID"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Get the highest existing test ID from the test_types table
@@ -417,8 +1106,9 @@ class DatabaseManager:
         return f"{next_id:03d}"
     
     # Test Request methods
+    @retry_on_busy
     def create_test_request(self, test_request: TestRequest) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -439,7 +1129,7 @@ class DatabaseManager:
             conn.close()
     
     def get_test_request(self, test_request_id: str) -> Optional[TestRequest]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM test_requests WHERE id = ?', (test_request_id,))
@@ -459,7 +1149,7 @@ class DatabaseManager:
         return None
     
     def get_all_test_requests(self) -> List[TestRequest]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM test_requests')
@@ -479,8 +1169,9 @@ class DatabaseManager:
             ))
         return test_requests
     
+    @retry_on_busy
     def update_test_request_status(self, test_request_id: str, status: TestStatus) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         completed_at = datetime.now() if status == TestStatus.COMPLETED else None
@@ -496,9 +1187,10 @@ class DatabaseManager:
         finally:
             conn.close()
     
+    @retry_on_busy(failure_result=False)
     def update_test_request(self, test_request: TestRequest) -> bool:
         """Update all fields of a test request"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         completed_at = test_request.completed_at.isoformat() if test_request.completed_at else None
@@ -517,13 +1209,15 @@ class DatabaseManager:
             conn.commit()
             return cursor.rowcount > 0
         except sqlite3.Error as e:
+            if is_busy_error(e):
+                raise
             print(f"Database error: {e}")
             return False
         finally:
             conn.close()
     
     def get_test_requests_by_patient(self, patient_id: str) -> List[TestRequest]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM test_requests WHERE patient_id = ?', (patient_id,))
@@ -544,7 +1238,7 @@ class DatabaseManager:
         return test_requests
     
     def get_test_requests_by_date_range(self, start_date: datetime, end_date: datetime) -> List[TestRequest]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -567,8 +1261,9 @@ class DatabaseManager:
             ))
         return test_requests
 
+    @retry_on_busy(failure_result=False)
     def delete_test_request(self, test_request_id: str) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -576,14 +1271,17 @@ class DatabaseManager:
             conn.commit()
             success = cursor.rowcount > 0
             return success
-        except sqlite3.Error:
+        except sqlite3.Error as e:
+            if is_busy_error(e):
+                raise
             return False
         finally:
             conn.close()
     
     # Sample methods
+    @retry_on_busy
     def create_sample(self, sample: Sample) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -595,6 +1293,10 @@ class DatabaseManager:
                 sample.id, sample.test_request_id, sample.barcode,
                 sample.collected_at, sample.status.value, sample.notes
             ))
+            cursor.execute('''
+                INSERT INTO sample_status_history (sample_id, from_status, to_status, changed_at)
+                VALUES (?, NULL, ?, ?)
+            ''', (sample.id, sample.status.value, sample.collected_at))
             conn.commit()
             return True
         except sqlite3.IntegrityError:
@@ -602,8 +1304,22 @@ class DatabaseManager:
         finally:
             conn.close()
     
+    @retry_on_busy
+    def update_sample_barcode(self, sample_id: str, barcode: str) -> bool:
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('UPDATE samples SET barcode = ? WHERE id = ?', (barcode, sample_id))
+            conn.commit()
+            return cursor.rowcount > 0
+        except sqlite3.IntegrityError:
+            return False
+        finally:
+            conn.close()
+    
     def get_sample(self, sample_id: str) -> Optional[Sample]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM samples WHERE id = ?', (sample_id,))
@@ -622,7 +1338,7 @@ class DatabaseManager:
         return None
     
     def get_sample_by_barcode(self, barcode: str) -> Optional[Sample]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM samples WHERE barcode = ?', (barcode,))
@@ -640,8 +1356,109 @@ class DatabaseManager:
             )
         return None
     
+    def get_sample_scan_rows(self, sample_ids: Optional[List[str]] = None) -> List[tuple]:
+        """
+        What barcode scanning needs to know about samples, in one query.
+        
+        Args:
+            sample_ids: Only these samples (all samples by default)
+        
+        Returns:
+            (barcode, sample_id, status, patient_name, test_name) tuples; the
+            names are None when the request, patient or test type is missing
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        query = '''
+            SELECT s.barcode, s.id, s.status, p.name, y.name
+            FROM samples s
+            LEFT JOIN test_requests t ON t.id = s.test_request_id
+            LEFT JOIN patients p ON p.id = t.patient_id
+            LEFT JOIN test_types y ON y.id = t.test_type_id
+        '''
+        if sample_ids is None:
+            cursor.execute(query)
+        else:
+            cursor.execute(query + f"WHERE s.id IN ({', '.join('?' for _ in sample_ids)})", sample_ids)
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
+    @retry_on_busy
+    def transition_samples(self, sample_ids: List[str], status: SampleStatus, changed_by: Optional[str] = None,
+                           changed_at: Optional[datetime] = None) -> SampleTransitionResult:
+        """
+        Move samples to status in one transaction, e.g. a whole rack or run.
+        
+        Only samples whose current status allows the move (SAMPLE_TRANSITIONS)
+        are moved; the others are returned as rejected. Every move is recorded
+        in sample_status_history.
+        """
+        changed_at = changed_at or datetime.now()
+        # Also accepts a SampleStatus imported as medical_lab_system.models
+        status = SampleStatus(status.value)
+        sources = [source.value for source, targets in SAMPLE_TRANSITIONS.items() if status in targets]
+        sample_ids = list(dict.fromkeys(sample_ids))
+        result = SampleTransitionResult()
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        try:
+            # Stay below SQLite's limit on query parameters
+            for start in range(0, len(sample_ids), 500):
+                chunk = sample_ids[start:start + 500]
+                ids = ", ".join("?" for _ in chunk)
+                allowed = ", ".join("?" for _ in sources) or "NULL"
+                # The history insert comes first: it takes the write lock, so
+                # the statuses read next cannot change before the update
+                cursor.execute(f'''
+                    INSERT INTO sample_status_history (sample_id, from_status, to_status, changed_at, changed_by)
+                    SELECT id, status, ?, ?, ? FROM samples WHERE id IN ({ids}) AND status IN ({allowed})
+                ''', [status.value, changed_at, changed_by] + chunk + sources)
+                cursor.execute(f'SELECT id, status FROM samples WHERE id IN ({ids})', chunk)
+                current = dict(cursor.fetchall())
+                cursor.execute(f'UPDATE samples SET status = ? WHERE id IN ({ids}) AND status IN ({allowed})',
+                               [status.value] + chunk + sources)
+                for sample_id in chunk:
+                    if current.get(sample_id) in sources:
+                        result.moved.append(sample_id)
+                    else:
+                        result.rejected[sample_id] = SampleStatus(current[sample_id]) if sample_id in current else None
+            conn.commit()
+            return result
+        finally:
+            conn.close()
+    
+    def update_sample_status(self, sample_id: str, status: SampleStatus, changed_by: Optional[str] = None) -> bool:
+        """Move one sample to status; False if its current status does not allow it"""
+        return sample_id in self.transition_samples([sample_id], status, changed_by).moved
+    
+    def get_sample_status_history(self, sample_id: str) -> List[SampleStatusChange]:
+        """Status changes of a sample, oldest first"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT sample_id, from_status, to_status, changed_at, changed_by FROM sample_status_history
+            WHERE sample_id = ? ORDER BY id
+        ''', (sample_id,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [
+            SampleStatusChange(
+                sample_id=row[0],
+                from_status=SampleStatus(row[1]) if row[1] else None,
+                to_status=SampleStatus(row[2]),
+                changed_at=datetime.fromisoformat(row[3]),
+                changed_by=row[4]
+            )
+            for row in rows
+        ]
+    
     def get_all_samples(self) -> List[Sample]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM samples')
@@ -661,8 +1478,9 @@ class DatabaseManager:
         return samples
     
     # Medical Report methods
+    @retry_on_busy
     def create_medical_report(self, report: MedicalReport) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -671,7 +1489,7 @@ class DatabaseManager:
                 (id, test_request_id, content, signed_by, signed_at, created_at)
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (
-                report.id, report.test_request_id, report.content,
+                report.id, report.test_request_id, compress_content(report.content),
                 report.signed_by, report.signed_at, report.created_at
             ))
             conn.commit()
@@ -682,7 +1500,7 @@ class DatabaseManager:
             conn.close()
     
     def get_medical_report(self, report_id: str) -> Optional[MedicalReport]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM medical_reports WHERE id = ?', (report_id,))
@@ -693,7 +1511,7 @@ class DatabaseManager:
             return MedicalReport(
                 id=row[0],
                 test_request_id=row[1],
-                content=row[2],
+                content=decompress_content(row[2]),
                 signed_by=row[3],
                 signed_at=datetime.fromisoformat(row[4]),
                 created_at=datetime.fromisoformat(row[5])
@@ -701,10 +1519,11 @@ class DatabaseManager:
         return None
     
     def get_medical_reports_by_test_request(self, test_request_id: str) -> List[MedicalReport]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM medical_reports WHERE test_request_id = ?', (test_request_id,))
+        # Lists never load the report body; get_medical_report() does
+        cursor.execute('SELECT id, test_request_id, NULL, signed_by, signed_at, created_at FROM medical_reports WHERE test_request_id = ?', (test_request_id,))
         rows = cursor.fetchall()
         conn.close()
         
@@ -721,10 +1540,11 @@ class DatabaseManager:
         return reports
     
     def get_all_medical_reports(self) -> List[MedicalReport]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM medical_reports')
+        # Lists never load the report body; get_medical_report() does
+        cursor.execute('SELECT id, test_request_id, NULL, signed_by, signed_at, created_at FROM medical_reports')
         rows = cursor.fetchall()
         conn.close()
         
@@ -740,8 +1560,85 @@ class DatabaseManager:
             ))
         return reports
     
+    def get_medical_reports_for_printing(self, start_date: Optional[datetime] = None,
+                                         end_date: Optional[datetime] = None,
+                                         status: Optional[TestStatus] = None,
+                                         patient_id: Optional[str] = None,
+                                         signed_only: bool = False
+                                         ) -> List[Tuple[MedicalReport, Patient, TestType, TestRequest]]:
+        """
+        Reports with everything needed to print them, in one query.
+        
+        Args:
+            start_date, end_date: Report creation dates to include
+            status: Only reports whose test request has this status
+            patient_id: Only reports of this patient
+            signed_only: Leave out reports nobody has signed
+        
+        Returns:
+            (report, patient, test_type, test_request) tuples ordered by report date
+        """
+        conditions, params = [], []
+        # Stored as datetime's default adapter writes them: "YYYY-MM-DD HH:MM:SS"
+        if start_date:
+            conditions.append("r.created_at >= ?")
+            params.append(start_date.isoformat(" "))
+        if end_date:
+            conditions.append("r.created_at <= ?")
+            params.append(end_date.isoformat(" "))
+        if status:
+            conditions.append("t.status = ?")
+            params.append(status.value)
+        if patient_id:
+            conditions.append("t.patient_id = ?")
+            params.append(patient_id)
+        if signed_only:
+            conditions.append("r.signed_by != 'N/A'")
+        
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT r.id, r.test_request_id, r.content, r.signed_by, r.signed_at, r.created_at,
+                   p.id, p.name, p.age, p.gender, p.contact_info, p.created_at, p.updated_at,
+                   y.id, y.name, y.description, y.price, y.category, y.created_at,
+                   t.id, t.patient_id, t.test_type_id, t.status, t.requested_by, t.requested_at, t.completed_at
+            FROM medical_reports r
+            JOIN test_requests t ON t.id = r.test_request_id
+            JOIN patients p ON p.id = t.patient_id
+            JOIN test_types y ON y.id = t.test_type_id
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            ORDER BY r.created_at, r.id
+        ''', params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        # Patients and test types repeat across reports: build each once
+        patients, test_types, results = {}, {}, []
+        for row in rows:
+            patient = patients.get(row[6])
+            if patient is None:
+                patient = patients[row[6]] = Patient(
+                    id=row[6], name=row[7], age=row[8], gender=Gender(row[9]),
+                    contact_info=self.field_cipher.decrypt_or_placeholder(row[10]),
+                    created_at=datetime.fromisoformat(row[11]), updated_at=datetime.fromisoformat(row[12]))
+            test_type = test_types.get(row[13])
+            if test_type is None:
+                test_type = test_types[row[13]] = TestType(
+                    id=row[13], name=row[14], description=row[15], price=row[16], category=row[17],
+                    created_at=datetime.fromisoformat(row[18]))
+            test_request = TestRequest(
+                id=row[19], patient_id=row[20], test_type_id=row[21], status=TestStatus(row[22]),
+                requested_by=row[23], requested_at=datetime.fromisoformat(row[24]),
+                completed_at=datetime.fromisoformat(row[25]) if row[25] else None)
+            report = MedicalReport(
+                id=row[0], test_request_id=row[1], content=decompress_content(row[2]), signed_by=row[3],
+                signed_at=datetime.fromisoformat(row[4]), created_at=datetime.fromisoformat(row[5]))
+            results.append((report, patient, test_type, test_request))
+        return results
+    
+    @retry_on_busy
     def update_medical_report(self, report: MedicalReport) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -750,7 +1647,7 @@ class DatabaseManager:
                 SET content = ?, signed_by = ?, signed_at = ?
                 WHERE id = ?
             ''', (
-                report.content, report.signed_by, report.signed_at,
+                compress_content(report.content), report.signed_by, report.signed_at,
                 report.id
             ))
             conn.commit()
@@ -758,8 +1655,305 @@ class DatabaseManager:
         finally:
             conn.close()
     
+    def compress_stored_content(self, batch_size: int = 500) -> int:
+        """
+        Compress the report and template bodies stored before compression was
+        introduced, batch_size rows per transaction.
+        
+        Returns:
+            Number of rows compressed
+        """
+        compressed = 0
+        for table, column in COMPRESSED_CONTENT_COLUMNS.items():
+            while True:
+                rows = self._compress_content_batch(table, column, batch_size)
+                compressed += rows
+                if rows < batch_size:
+                    break
+        return compressed
+    
+    def encrypt_stored_fields(self, batch_size: int = 500) -> int:
+        """
+        Encrypt the patient fields stored before encryption was introduced,
+        or with a key that has since been rotated out, batch_size rows per
+        transaction.
+        
+        Returns:
+            Number of rows encrypted
+        """
+        encrypted = 0
+        for column, index_column in ENCRYPTED_PATIENT_COLUMNS.items():
+            while True:
+                rows = self._encrypt_fields_batch(column, index_column, batch_size)
+                encrypted += rows
+                if rows < batch_size:
+                    break
+        return encrypted
+    
+    @retry_on_busy
+    def reserve_accession_block(self, day: str, size: int) -> int:
+        """
+        Reserve size consecutive accession sequence numbers of day.
+        
+        The upsert takes the write lock, so workstations sharing the database
+        always get disjoint blocks.
+        
+        Returns:
+            The first number of the block (numbers start at 1 each day)
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                INSERT INTO accession_counters (day, next_seq) VALUES (?, ?)
+                ON CONFLICT(day) DO UPDATE SET next_seq = next_seq + ?
+            ''', (day, 1 + size, size))
+            cursor.execute('SELECT next_seq FROM accession_counters WHERE day = ?', (day,))
+            first = cursor.fetchone()[0] - size
+            conn.commit()
+            return first
+        finally:
+            conn.close()
+    
+    # Mail outbox methods
+    @retry_on_busy
+    def create_outbox_messages(self, messages: List[OutboxMessage]) -> List[int]:
+        """Queue messages for sending, in one transaction; returns their IDs"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        try:
+            ids = []
+            for message in messages:
+                cursor.execute('''
+                    INSERT INTO mail_outbox
+                    (recipient, subject, body, attachment_name, attachment, status, attempts, created_at, next_attempt_at)
+                    VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)
+                ''', (
+                    message.recipient, message.subject, message.body, message.attachment_name, message.attachment,
+                    MailStatus.QUEUED.value, message.created_at, message.next_attempt_at or message.created_at
+                ))
+                ids.append(cursor.lastrowid)
+            conn.commit()
+            return ids
+        finally:
+            conn.close()
+    
+    @retry_on_busy
+    def claim_outbox_messages(self, limit: int, lease_seconds: float, now: Optional[datetime] = None) -> List[OutboxMessage]:
+        """
+        Take up to limit queued messages that are due, oldest first.
+        
+        A claimed message is not handed out again until lease_seconds have
+        passed, so several senders on one database never send it twice; a
+        sender that stops mid-batch leaves its messages to be claimed again.
+        """
+        now = now or datetime.now()
+        token = uuid.uuid4().hex
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE mail_outbox SET claimed_by = ?, claimed_until = ?
+                WHERE id IN (
+                    SELECT id FROM mail_outbox
+                    WHERE status = ? AND next_attempt_at <= ? AND (claimed_until IS NULL OR claimed_until < ?)
+                    ORDER BY id LIMIT ?
+                )
+            ''', (token, now + timedelta(seconds=lease_seconds), MailStatus.QUEUED.value, now, now, limit))
+            cursor.execute('''
+                SELECT id, recipient, subject, body, attachment_name, attachment, status, attempts, last_error,
+                       created_at, next_attempt_at, sent_at
+                FROM mail_outbox WHERE claimed_by = ? ORDER BY id
+            ''', (token,))
+            rows = cursor.fetchall()
+            conn.commit()
+        finally:
+            conn.close()
+        return [self._outbox_message(row) for row in rows]
+    
+    @staticmethod
+    def _outbox_message(row) -> OutboxMessage:
+        return OutboxMessage(
+            id=row[0],
+            recipient=row[1],
+            subject=row[2],
+            body=row[3],
+            attachment_name=row[4],
+            attachment=row[5],
+            status=MailStatus(row[6]),
+            attempts=row[7],
+            last_error=row[8],
+            created_at=datetime.fromisoformat(row[9]),
+            next_attempt_at=datetime.fromisoformat(row[10]),
+            sent_at=datetime.fromisoformat(row[11]) if row[11] else None
+        )
+    
+    @retry_on_busy
+    def update_outbox_message_sent(self, message_id: int, sent_at: Optional[datetime] = None) -> bool:
+        """Mark a message sent; its attachment is dropped to keep the database small"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE mail_outbox
+                SET status = ?, attempts = attempts + 1, sent_at = ?, last_error = NULL, attachment = NULL,
+                    claimed_by = NULL, claimed_until = NULL
+                WHERE id = ?
+            ''', (MailStatus.SENT.value, sent_at or datetime.now(), message_id))
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+    
+    @retry_on_busy
+    def update_outbox_message_failed(self, message_id: int, error: str,
+                                     next_attempt_at: Optional[datetime] = None) -> bool:
+        """Record a failed attempt; retried at next_attempt_at, or failed for good without one"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        try:
+            if next_attempt_at is None:
+                cursor.execute('''
+                    UPDATE mail_outbox
+                    SET status = ?, attempts = attempts + 1, last_error = ?, claimed_by = NULL, claimed_until = NULL
+                    WHERE id = ?
+                ''', (MailStatus.FAILED.value, error, message_id))
+            else:
+                cursor.execute('''
+                    UPDATE mail_outbox
+                    SET attempts = attempts + 1, last_error = ?, next_attempt_at = ?,
+                        claimed_by = NULL, claimed_until = NULL
+                    WHERE id = ?
+                ''', (error, next_attempt_at, message_id))
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+    
+    @retry_on_busy
+    def release_outbox_messages(self, message_ids: List[int]) -> int:
+        """Give claimed messages back without counting an attempt"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany('UPDATE mail_outbox SET claimed_by = NULL, claimed_until = NULL WHERE id = ?',
+                               [(message_id,) for message_id in message_ids])
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+    
+    @retry_on_busy
+    def requeue_failed_outbox_messages(self) -> int:
+        """Send failed messages again, with a fresh set of attempts"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE mail_outbox SET status = ?, attempts = 0, next_attempt_at = ?
+                WHERE status = ?
+            ''', (MailStatus.QUEUED.value, datetime.now(), MailStatus.FAILED.value))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+    
+    def get_outbox_messages(self, status: Optional[MailStatus] = None, limit: int = 200) -> List[OutboxMessage]:
+        """Newest messages first, without their attachments"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        query = '''
+            SELECT id, recipient, subject, body, attachment_name, NULL, status, attempts, last_error,
+                   created_at, next_attempt_at, sent_at
+            FROM mail_outbox
+        '''
+        params = []
+        if status is not None:
+            query += ' WHERE status = ?'
+            params.append(status.value)
+        cursor.execute(query + ' ORDER BY id DESC LIMIT ?', params + [limit])
+        rows = cursor.fetchall()
+        conn.close()
+        return [self._outbox_message(row) for row in rows]
+    
+    def get_outbox_status_counts(self) -> Dict[str, int]:
+        """Number of messages per MailStatus value"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('SELECT status, COUNT(*) FROM mail_outbox GROUP BY status')
+        counts = {status.value: 0 for status in MailStatus}
+        counts.update(cursor.fetchall())
+        conn.close()
+        return counts
+    
+    @retry_on_busy
+    def _compress_content_batch(self, table: str, column: str, batch_size: int) -> int:
+        # Locked before reading, so no edit can land between the read and the rewrite
+        conn = self._locked_connection()
+        cursor = conn.cursor()
+        
+        try:
+            first_seq = cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            cursor.execute(f"SELECT rowid, {column} FROM {table} WHERE typeof({column}) = 'text' LIMIT ?",
+                           (batch_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                return 0
+            cursor.executemany(f"UPDATE {table} SET {column} = ? WHERE rowid = ?",
+                               [(compress_content(text), rowid) for rowid, text in rows])
+            # The text did not change, so sync must not treat the rows as edited.
+            # Entries after first_seq are this transaction's own.
+            cursor.execute("DELETE FROM change_log WHERE seq > ?", (first_seq,))
+            conn.commit()
+            return len(rows)
+        finally:
+            conn.close()
+    
+    @retry_on_busy
+    def _encrypt_fields_batch(self, column: str, index_column: str, batch_size: int) -> int:
+        cipher = self.field_cipher
+        # Locked before reading, so no edit can land between the read and the rewrite
+        conn = self._locked_connection()
+        cursor = conn.cursor()
+        
+        try:
+            first_seq = cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            # Plain values and values under an older key; those under a key
+            # this station does not have are left as they are
+            old_key_ids = cipher.key_ids[1:]
+            cursor.execute(f'''
+                SELECT rowid, {column} FROM patients
+                WHERE {column} IS NOT NULL AND (typeof({column}) != 'blob' OR substr({column}, 1, ?) != ?
+                    OR substr({column}, ?, ?) IN ({", ".join("?" for _ in old_key_ids)}))
+                LIMIT ?
+            ''', (len(ENCRYPTED_FIELD_MARKER), ENCRYPTED_FIELD_MARKER, len(ENCRYPTED_FIELD_MARKER) + 1, KEY_ID_SIZE,
+                  *old_key_ids, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return 0
+            texts = [cipher.decrypt(value) for _rowid, value in rows]
+            cursor.executemany(f"UPDATE patients SET {column} = ?, {index_column} = ? WHERE rowid = ?",
+                               [(cipher.encrypt(text), cipher.blind_index(text), rowid)
+                                for (rowid, _value), text in zip(rows, texts)])
+            # The values did not change, so sync must not treat the rows as edited.
+            # Entries after first_seq are this transaction's own.
+            cursor.execute("DELETE FROM change_log WHERE seq > ?", (first_seq,))
+            conn.commit()
+            return len(rows)
+        finally:
+            conn.close()
+    
+    @retry_on_busy
     def delete_medical_report(self, report_id: str) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM medical_reports WHERE id = ?', (report_id,))
@@ -769,8 +1963,9 @@ class DatabaseManager:
         return success
     
     # User methods
+    @retry_on_busy
     def create_user(self, user: User) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -799,7 +1994,7 @@ class DatabaseManager:
             conn.close()
     
     def get_user(self, user_id: str) -> Optional[User]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
@@ -826,7 +2021,7 @@ class DatabaseManager:
         return None
     
     def get_user_by_username(self, username: str) -> Optional[User]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
@@ -852,8 +2047,9 @@ class DatabaseManager:
             return user
         return None
     
+    @retry_on_busy
     def authenticate_user(self, username: str, password_hash: str) -> Optional[User]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -865,7 +2061,7 @@ class DatabaseManager:
         
         if row:
             # Update last login
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE users SET last_login = CURRENT_TIMESTAMP 
@@ -892,8 +2088,9 @@ class DatabaseManager:
             return user
         return None
     
+    @retry_on_busy(failure_result=False)
     def update_user(self, user: User) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -904,30 +2101,36 @@ class DatabaseManager:
             ''', (
                 user.username, user.email, user.role.value, user.is_active, user.id
             ))
+            updated = cursor.rowcount > 0
             
-            # Update user permissions
+            # Update user permissions in the same transaction; going through
+            # separate connections would wait on this connection's write lock
             # First delete all existing permissions for this user
-            self.delete_user_permissions(user.id)
+            cursor.execute('DELETE FROM user_permissions WHERE user_id = ?', (user.id,))
             
             # Then add the new permissions
-            for permission in user.permissions:
-                user_permission = UserPermission(
-                    id=str(uuid.uuid4()),
-                    user_id=user.id,
-                    permission=permission
-                )
-                self.create_user_permission(user_permission)
+            cursor.executemany('''
+                INSERT INTO user_permissions 
+                (id, user_id, permission, granted_at)
+                VALUES (?, ?, ?, ?)
+            ''', [
+                (str(uuid.uuid4()), user.id, permission.value, datetime.now())
+                for permission in user.permissions
+            ])
             
             conn.commit()
-            return cursor.rowcount > 0
-        except sqlite3.Error:
+            return updated
+        except sqlite3.Error as e:
+            if is_busy_error(e):
+                raise
             return False
         finally:
             conn.close()
 
     # Inventory methods
+    @retry_on_busy
     def create_inventory_item(self, item: InventoryItem) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -948,7 +2151,7 @@ class DatabaseManager:
             conn.close()
     
     def get_inventory_item(self, item_id: str) -> Optional[InventoryItem]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM inventory_items WHERE id = ?', (item_id,))
@@ -970,7 +2173,7 @@ class DatabaseManager:
         return None
     
     def get_all_inventory_items(self) -> List[InventoryItem]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM inventory_items')
@@ -993,7 +2196,7 @@ class DatabaseManager:
         return items
     
     def get_low_stock_items(self) -> List[InventoryItem]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -1019,7 +2222,7 @@ class DatabaseManager:
         return items
     
     def get_inventory_items_by_expiry_date_range(self, start_date: datetime, end_date: datetime) -> List[InventoryItem]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -1044,8 +2247,9 @@ class DatabaseManager:
             ))
         return items
 
+    @retry_on_busy
     def update_inventory_quantity(self, item_id: str, quantity: int) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -1060,8 +2264,9 @@ class DatabaseManager:
             conn.close()
 
     # Test Template methods
+    @retry_on_busy
     def create_test_template(self, template: TestTemplate) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -1070,7 +2275,7 @@ class DatabaseManager:
                 (id, test_type_id, template_content, created_at, updated_at)
                 VALUES (?, ?, ?, ?, ?)
             ''', (
-                template.id, template.test_type_id, template.template_content,
+                template.id, template.test_type_id, compress_content(template.template_content),
                 template.created_at, template.updated_at
             ))
             conn.commit()
@@ -1081,7 +2286,7 @@ class DatabaseManager:
             conn.close()
     
     def get_test_template(self, template_id: str) -> Optional[TestTemplate]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM test_templates WHERE id = ?', (template_id,))
@@ -1092,14 +2297,14 @@ class DatabaseManager:
             return TestTemplate(
                 id=row[0],
                 test_type_id=row[1],
-                template_content=row[2],
+                template_content=decompress_content(row[2]),
                 created_at=datetime.fromisoformat(row[3]),
                 updated_at=datetime.fromisoformat(row[4])
             )
         return None
     
     def get_test_template_by_test_type(self, test_type_id: str) -> Optional[TestTemplate]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM test_templates WHERE test_type_id = ?', (test_type_id,))
@@ -1110,17 +2315,18 @@ class DatabaseManager:
             return TestTemplate(
                 id=row[0],
                 test_type_id=row[1],
-                template_content=row[2],
+                template_content=decompress_content(row[2]),
                 created_at=datetime.fromisoformat(row[3]),
                 updated_at=datetime.fromisoformat(row[4])
             )
         return None
     
     def get_all_test_templates(self) -> List[TestTemplate]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM test_templates')
+        # Lists never load the template body; get_test_template() does
+        cursor.execute('SELECT id, test_type_id, NULL, created_at, updated_at FROM test_templates')
         rows = cursor.fetchall()
         conn.close()
         
@@ -1135,8 +2341,9 @@ class DatabaseManager:
             ))
         return templates
     
+    @retry_on_busy
     def update_test_template(self, template: TestTemplate) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -1145,15 +2352,16 @@ class DatabaseManager:
                 SET template_content = ?, updated_at = ?
                 WHERE id = ?
             ''', (
-                template.template_content, template.updated_at, template.id
+                compress_content(template.template_content), template.updated_at, template.id
             ))
             conn.commit()
             return cursor.rowcount > 0
         finally:
             conn.close()
     
+    @retry_on_busy
     def delete_test_template(self, template_id: str) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM test_templates WHERE id = ?', (template_id,))
@@ -1163,8 +2371,9 @@ class DatabaseManager:
         return success
 
     # User Permission methods
+    @retry_on_busy
     def create_user_permission(self, user_permission: UserPermission) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -1184,7 +2393,7 @@ class DatabaseManager:
             conn.close()
     
     def get_user_permissions(self, user_id: str) -> List[UserPermission]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM user_permissions WHERE user_id = ?', (user_id,))
@@ -1202,7 +2411,7 @@ class DatabaseManager:
         return permissions
     
     def get_all_user_permissions(self) -> List[UserPermission]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM user_permissions')
@@ -1220,7 +2429,7 @@ class DatabaseManager:
         return permissions
     
     def get_all_invoices(self) -> List[Invoice]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM invoices')
@@ -1231,7 +2440,7 @@ class DatabaseManager:
         for row in rows:
             # Get associated test request IDs
             test_request_ids = []
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             cursor.execute('SELECT test_request_id FROM invoice_test_requests WHERE invoice_id = ?', (row[0],))
             test_request_rows = cursor.fetchall()
@@ -1253,7 +2462,7 @@ class DatabaseManager:
         return invoices
     
     def get_invoice(self, invoice_id: str) -> Optional[Invoice]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM invoices WHERE id = ?', (invoice_id,))
@@ -1263,7 +2472,7 @@ class DatabaseManager:
         if row:
             # Get associated test request IDs
             test_request_ids = []
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             cursor.execute('SELECT test_request_id FROM invoice_test_requests WHERE invoice_id = ?', (invoice_id,))
             test_request_rows = cursor.fetchall()
@@ -1285,7 +2494,7 @@ class DatabaseManager:
         return None
     
     def get_invoices_by_date_range(self, start_date: datetime, end_date: datetime) -> List[Invoice]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -1299,7 +2508,7 @@ class DatabaseManager:
         for row in rows:
             # Get associated test request IDs
             test_request_ids = []
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             cursor.execute('SELECT test_request_id FROM invoice_test_requests WHERE invoice_id = ?', (row[0],))
             test_request_rows = cursor.fetchall()
@@ -1320,8 +2529,9 @@ class DatabaseManager:
             ))
         return invoices
 
+    @retry_on_busy
     def delete_user_permission(self, permission_id: str) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM user_permissions WHERE id = ?', (permission_id,))
@@ -1330,8 +2540,9 @@ class DatabaseManager:
         conn.close()
         return success
     
+    @retry_on_busy
     def delete_user_permissions(self, user_id: str) -> bool:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM user_permissions WHERE user_id = ?', (user_id,))
@@ -1340,6 +2551,7 @@ class DatabaseManager:
         conn.close()
         return success
 
+    @retry_on_busy(failure_result=False)
     def update_user_password(self, user_id: str, new_password_hash: str) -> bool:
         """
         Update a user's password hash in the database.
@@ -1351,7 +2563,7 @@ class DatabaseManager:
         Returns:
             bool: True if update was successful, False otherwise
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -1362,7 +2574,9 @@ class DatabaseManager:
             ''', (new_password_hash, user_id))
             conn.commit()
             return cursor.rowcount > 0
-        except sqlite3.Error:
+        except sqlite3.Error as e:
+            if is_busy_error(e):
+                raise
             return False
         finally:
             conn.close()
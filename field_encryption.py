@@ -0,0 +1,273 @@
+"""
+Field-level encryption for the Medical Laboratory Management System
+
+Sensitive patient columns are stored encrypted with AES-256-GCM, so a copy
+of the database file does not give away patients' phone numbers and
+addresses. A FieldCipher derives its keys once, when it is created, and
+get_field_cipher() hands out one cipher per key set for the whole process:
+encrypting or decrypting a value is then a single AES-GCM call, and list
+screens decrypt whole columns with decrypt_many().
+
+Encrypted values cannot be compared in SQL, so each one is stored with a
+blind index: a keyed HMAC-SHA256 of the normalised value, under a key of its
+own. Exact-match lookups (a phone number, a national ID) compare blind
+indexes through an ordinary SQLite index; the blind index only reveals which
+rows hold equal values.
+
+Keys are 32 random bytes, urlsafe base64 encoded (generate_key()). They come
+from FIELD_ENCRYPTION_KEY, or from the key file FIELD_ENCRYPTION_KEY_FILE
+(by default field_encryption.key next to the database), which is created on
+first use. Several comma-separated keys, newest first, rotate the key: new
+values use the first one, the others still decrypt, and
+DatabaseManager.encrypt_stored_fields() re-encrypts with the newest key.
+Stations that sync with each other need the same keys, so once sync is set
+up no key file is created: the shared keys must be configured. The keys must
+also be backed up along with the database: without them the encrypted
+columns cannot be read, and decrypt_many() shows UNREADABLE_FIELD instead.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from config import Config
+
+crypto_logger = logging.getLogger("medical_lab.field_encryption")
+
+# Prefix of encrypted values, followed by the version of the format. Values
+# stored before encryption was introduced are plain TEXT and are returned as
+# they are. After the marker: key ID, nonce, then ciphertext and GCM tag.
+ENCRYPTED_FIELD_MARKER = b"FE1:"
+KEY_ID_SIZE = 4
+NONCE_SIZE = 12
+# Bytes of the HMAC kept in the blind index
+BLIND_INDEX_SIZE = 16
+
+KEY_FILE_NAME = "field_encryption.key"
+
+# Shown in place of a value encrypted with a key this station does not have
+UNREADABLE_FIELD = "[encrypted with an unknown key]"
+
+# Ignored when comparing lookup values: "+249 91-234" and "+24991234" match
+LOOKUP_SEPARATORS = re.compile(r"[\s\-()]+")
+
+
+class FieldEncryptionError(Exception):
+    """The field encryption keys of a database are not available"""
+
+
+def generate_key() -> bytes:
+    """A new random field encryption key"""
+    return base64.urlsafe_b64encode(os.urandom(32))
+
+
+def normalize_lookup(text: str) -> str:
+    """The form of a value that blind indexes are computed over"""
+    return LOOKUP_SEPARATORS.sub("", text).casefold()
+
+
+def key_id_of(value) -> Optional[bytes]:
+    """ID of the key a stored value is encrypted with; None if it is stored in clear"""
+    if isinstance(value, bytes) and value.startswith(ENCRYPTED_FIELD_MARKER):
+        return value[len(ENCRYPTED_FIELD_MARKER):len(ENCRYPTED_FIELD_MARKER) + KEY_ID_SIZE]
+    return None
+
+
+def _derive(key: bytes, purpose: bytes) -> bytes:
+    # Separate keys for encryption, the blind index and the key ID
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                info=b"medical-lab field encryption: " + purpose).derive(key)
+
+
+class FieldCipher:
+    """Encrypt, decrypt and blind-index field values with a fixed set of keys"""
+
+    def __init__(self, keys: Sequence[bytes]):
+        if not keys:
+            raise ValueError("At least one field encryption key is required")
+        self._ciphers: Dict[bytes, AESGCM] = {}
+        self._index_macs = []
+        key_ids = []
+        for key in keys:
+            raw = base64.urlsafe_b64decode(key)
+            if len(raw) != 32:
+                raise ValueError("Field encryption keys must be 32 bytes, urlsafe base64 encoded")
+            key_id = _derive(raw, b"key id")[:KEY_ID_SIZE]
+            key_ids.append(key_id)
+            self._ciphers[key_id] = AESGCM(_derive(raw, b"encryption"))
+            # Keyed once; every value hashes a copy
+            self._index_macs.append(hmac.new(_derive(raw, b"blind index"), digestmod=hashlib.sha256))
+        self.key_id = key_ids[0]
+        self.key_ids = key_ids
+        self._nonce_mac = hmac.new(_derive(base64.urlsafe_b64decode(keys[0]), b"synthetic nonce"),
+                                   digestmod=hashlib.sha256)
+        # Every value encrypted with the newest key starts with this
+        self.prefix = ENCRYPTED_FIELD_MARKER + self.key_id
+        self._cipher = self._ciphers[self.key_id]
+
+    def encrypt(self, text: Optional[str]) -> Optional[bytes]:
+        if text is None:
+            return None
+        nonce = os.urandom(NONCE_SIZE)
+        # The header is authenticated too, so a value cannot be moved to another key ID
+        return self.prefix + nonce + self._cipher.encrypt(nonce, text.encode("utf-8"), self.prefix)
+
+    def encrypt_repeatably(self, text: Optional[str], context: str) -> Optional[bytes]:
+        """
+        Encrypt text so that the same text and context always give the same
+        bytes, for generated data that must be reproducible. The nonce is a
+        keyed hash of both, so it only repeats for an identical value.
+        """
+        if text is None:
+            return None
+        mac = self._nonce_mac.copy()
+        mac.update(f"{context}\0{text}".encode("utf-8"))
+        nonce = mac.digest()[:NONCE_SIZE]
+        return self.prefix + nonce + self._cipher.encrypt(nonce, text.encode("utf-8"), self.prefix)
+
+    def decrypt(self, value) -> Optional[str]:
+        """The text of a stored value, encrypted or not"""
+        if isinstance(value, bytes):
+            if not value.startswith(ENCRYPTED_FIELD_MARKER):
+                return value.decode("utf-8")
+            header_size = len(ENCRYPTED_FIELD_MARKER) + KEY_ID_SIZE
+            cipher = self._ciphers.get(value[len(ENCRYPTED_FIELD_MARKER):header_size])
+            if cipher is None:
+                raise ValueError("Value encrypted with an unknown field encryption key")
+            nonce = value[header_size:header_size + NONCE_SIZE]
+            return cipher.decrypt(nonce, value[header_size + NONCE_SIZE:], value[:header_size]).decode("utf-8")
+        return value
+
+    def decrypt_or_placeholder(self, value) -> Optional[str]:
+        """Like decrypt, but a value that cannot be decrypted reads as UNREADABLE_FIELD"""
+        try:
+            return self.decrypt(value)
+        except (ValueError, InvalidTag):
+            crypto_logger.warning("Could not decrypt a field value encrypted with key ID %s",
+                                  (key_id_of(value) or b"").hex() or "?")
+            return UNREADABLE_FIELD
+
+    def encrypt_many(self, texts: Iterable[Optional[str]]) -> List[Optional[bytes]]:
+        encrypt = self.encrypt
+        return [encrypt(text) for text in texts]
+
+    def decrypt_many(self, values: Iterable) -> List[Optional[str]]:
+        """Decrypt a column; one unreadable value does not fail the others"""
+        decrypt = self.decrypt_or_placeholder
+        return [decrypt(value) for value in values]
+
+    def blind_index(self, text: Optional[str]) -> Optional[str]:
+        """Blind index of text under the newest key; None for empty values"""
+        value = normalize_lookup(text or "")
+        if not value:
+            return None
+        mac = self._index_macs[0].copy()
+        mac.update(value.encode("utf-8"))
+        return mac.hexdigest()[:BLIND_INDEX_SIZE * 2]
+
+    def blind_indexes(self, text: str) -> List[str]:
+        """Blind indexes of text under every key, to find rows not yet re-encrypted after a rotation"""
+        value = normalize_lookup(text).encode("utf-8")
+        indexes = []
+        for base in self._index_macs:
+            mac = base.copy()
+            mac.update(value)
+            indexes.append(mac.hexdigest()[:BLIND_INDEX_SIZE * 2])
+        return indexes
+
+    def knows(self, value) -> bool:
+        """Whether a stored value is in clear or encrypted with one of this cipher's keys"""
+        key_id = key_id_of(value)
+        return key_id is None or key_id in self._ciphers
+
+    def is_current(self, value) -> bool:
+        """Whether a stored value is encrypted with the newest key"""
+        return value is None or (isinstance(value, bytes) and value.startswith(self.prefix))
+
+
+_ciphers: Dict[Tuple[bytes, ...], FieldCipher] = {}
+_ephemeral_key: Optional[bytes] = None
+_lock = threading.Lock()
+
+
+def _parse_keys(text: str) -> List[bytes]:
+    return [key.strip().encode("ascii") for key in re.split(r"[,\s]+", text) if key.strip()]
+
+
+def keys_configured() -> bool:
+    """Whether the keys are set explicitly, as stations that sync must share them"""
+    return bool(Config.FIELD_ENCRYPTION_KEY or Config.FIELD_ENCRYPTION_KEY_FILE)
+
+
+def key_file_path(db_path: Optional[str] = None) -> Optional[str]:
+    """The key file of a database; None if its keys do not come from a file"""
+    if Config.FIELD_ENCRYPTION_KEY:
+        return None
+    if Config.FIELD_ENCRYPTION_KEY_FILE:
+        return Config.FIELD_ENCRYPTION_KEY_FILE
+    if db_path is None:
+        return None
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), KEY_FILE_NAME)
+
+
+def _read_key_file(path: str, create: bool) -> List[bytes]:
+    if not os.path.exists(path):
+        if not create:
+            raise FieldEncryptionError(
+                f"Field encryption key file {path} not found. Stations that sync must share their keys: "
+                "set FIELD_ENCRYPTION_KEY or FIELD_ENCRYPTION_KEY_FILE to the keys of the other stations")
+        # Written aside and linked into place, so no process reads a half-written file
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with os.fdopen(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+            f.write(generate_key() + b"\n")
+        try:
+            os.link(temp_path, path)
+            crypto_logger.warning("Created field encryption key %s; back it up with the database", path)
+        except FileExistsError:
+            pass  # another workstation created it first
+        finally:
+            os.remove(temp_path)
+    with open(path, "r", encoding="ascii") as f:
+        return _parse_keys(f.read())
+
+
+def load_keys(db_path: Optional[str] = None, create: bool = True) -> List[bytes]:
+    """
+    Field encryption keys, newest first.
+
+    Args:
+        db_path: Database file, whose directory holds the default key file;
+            None for an in-memory database, which uses a key that lives as
+            long as the process
+        create: Create a missing key file with a new key; otherwise raise
+            FieldEncryptionError
+    """
+    global _ephemeral_key
+    if Config.FIELD_ENCRYPTION_KEY:
+        return _parse_keys(Config.FIELD_ENCRYPTION_KEY)
+    path = key_file_path(db_path)
+    with _lock:
+        if path is None:
+            if _ephemeral_key is None:
+                _ephemeral_key = generate_key()
+            return [_ephemeral_key]
+        return _read_key_file(path, create)
+
+
+def get_field_cipher(db_path: Optional[str] = None, create: bool = True) -> FieldCipher:
+    """The shared cipher for the keys of a database (see load_keys)"""
+    keys = tuple(load_keys(db_path, create))
+    with _lock:
+        cipher = _ciphers.get(keys)
+        if cipher is None:
+            cipher = _ciphers[keys] = FieldCipher(keys)
+        return cipher
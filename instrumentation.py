@@ -0,0 +1,273 @@
+"""
+Query instrumentation for the Medical Laboratory Management System
+
+DatabaseManager.enable_instrumentation() switches its connections to the
+InstrumentedConnection factory below and wraps its public methods, so that
+every statement and every method call is timed. When instrumentation is off
+none of this code runs.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Latency samples kept per method/statement for percentile calculation
+SAMPLE_WINDOW = 1000
+
+slow_query_logger = logging.getLogger("medical_lab.slow_queries")
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class TimingStats:
+    """Call count, cumulative time, recent latencies and rows for one method or statement"""
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+
+    def record(self, elapsed_ms: float, rows: int = 0):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.rows += rows
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+        self.samples.append(elapsed_ms)
+
+    def snapshot(self) -> Dict[str, float]:
+        samples = sorted(self.samples)
+        return {
+            "calls": self.calls,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "p50_ms": round(_percentile(samples, 50), 3),
+            "p95_ms": round(_percentile(samples, 95), 3),
+            "p99_ms": round(_percentile(samples, 99), 3),
+            "max_ms": round(self.max_ms, 3),
+            "rows": self.rows,
+        }
+
+
+class QueryInstrumentation:
+    """Collects per-method and per-statement statistics and the slow-query log"""
+
+    def __init__(self, slow_query_ms: float = 100.0, log_path: Optional[str] = None,
+                 capture_plans: bool = True):
+        self.slow_query_ms = slow_query_ms
+        self.capture_plans = capture_plans
+        self.lock = threading.Lock()
+        self.methods = {}
+        self.statements = {}
+        self.slow_queries = deque(maxlen=200)
+        # Name of the DatabaseManager method running on each thread
+        self.local = threading.local()
+        self.handler = None
+        if log_path:
+            self.handler = logging.FileHandler(log_path, encoding="utf-8")
+            self.handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            slow_query_logger.addHandler(self.handler)
+            slow_query_logger.setLevel(logging.INFO)
+
+    def close(self):
+        if self.handler:
+            slow_query_logger.removeHandler(self.handler)
+            self.handler.close()
+            self.handler = None
+
+    @property
+    def current_method(self) -> Optional[str]:
+        return getattr(self.local, "method", None)
+
+    def wrap_method(self, name: str, method):
+        """Return method wrapped so its calls are timed under name"""
+        def timed(*args, **kwargs):
+            outer = self.current_method
+            outer_rows = getattr(self.local, "rows", 0)
+            self.local.method = name
+            self.local.rows = 0
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000.0
+                rows = self.local.rows
+                self.local.method = outer
+                # Rows of nested method calls also count towards the caller
+                self.local.rows = outer_rows + rows
+                with self.lock:
+                    self.methods.setdefault(name, TimingStats()).record(elapsed_ms, rows)
+        timed.__name__ = name
+        timed.__doc__ = method.__doc__
+        return timed
+
+    def record_statement(self, conn: sqlite3.Connection, sql: str, params, elapsed_ms: float, rows: int):
+        key = " ".join(sql.split())
+        if self.current_method is not None:
+            self.local.rows += rows
+        with self.lock:
+            self.statements.setdefault(key, TimingStats()).record(elapsed_ms, rows)
+
+        if elapsed_ms >= self.slow_query_ms:
+            plan = self.explain(conn, sql, params) if self.capture_plans else []
+            entry = {
+                "at": datetime.now().isoformat(timespec="seconds"),
+                "method": self.current_method,
+                "sql": key,
+                "elapsed_ms": round(elapsed_ms, 3),
+                "rows": rows,
+                "plan": plan,
+            }
+            with self.lock:
+                self.slow_queries.append(entry)
+            slow_query_logger.info(
+                "%.1fms rows=%d method=%s sql=%s plan=%s",
+                elapsed_ms, rows, entry["method"], key, " | ".join(plan)
+            )
+
+    @staticmethod
+    def explain(conn: sqlite3.Connection, sql: str, params) -> List[str]:
+        """Return the EXPLAIN QUERY PLAN lines for a statement"""
+        try:
+            cursor = sqlite3.Cursor(conn)
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params if params is not None else ())
+            return [row[-1] for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            return [f"plan unavailable: {e}"]
+
+    def reset(self):
+        with self.lock:
+            self.methods.clear()
+            self.statements.clear()
+            self.slow_queries.clear()
+
+    def snapshot(self) -> Dict[str, object]:
+        """Return the collected statistics, slowest cumulative time first"""
+        with self.lock:
+            methods = {name: stats.snapshot() for name, stats in self.methods.items()}
+            statements = {sql: stats.snapshot() for sql, stats in self.statements.items()}
+            slow_queries = list(self.slow_queries)
+        by_total = lambda item: item[1]["total_ms"]
+        return {
+            "methods": [dict(name=name, **stats) for name, stats in sorted(methods.items(), key=by_total, reverse=True)],
+            "statements": [dict(sql=sql, **stats) for sql, stats in sorted(statements.items(), key=by_total, reverse=True)],
+            "slow_queries": slow_queries,
+            "slow_query_ms": self.slow_query_ms,
+        }
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times each statement including the time spent fetching its rows"""
+
+    def _begin(self, sql, params):
+        self._finish()
+        self._sql = sql
+        self._params = params
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def _finish(self):
+        sql = getattr(self, "_sql", None)
+        if sql is None:
+            return
+        self._sql = None
+        rows = self._rows
+        if rows == 0 and self.rowcount > 0:
+            # Rows affected by INSERT/UPDATE/DELETE
+            rows = self.rowcount
+        self.connection.instrumentation.record_statement(
+            self.connection, sql, self._params, self._elapsed * 1000.0, rows
+        )
+
+    def _timed(self, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            if getattr(self, "_sql", None) is not None:
+                self._elapsed += time.perf_counter() - started
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, None)
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is not None and getattr(self, "_sql", None) is not None:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, size if size is not None else self.arraysize)
+        if getattr(self, "_sql", None) is not None:
+            self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if getattr(self, "_sql", None) is not None:
+            self._rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors report to a QueryInstrumentation instance"""
+
+    instrumentation = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cursors = []
+
+    def cursor(self, factory=InstrumentedCursor):
+        cursor = super().cursor(factory)
+        self._cursors.append(cursor)
+        return cursor
+
+    # The sqlite3 shortcuts below run on a plain cursor internally, so route
+    # them through an instrumented one
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        # Statements are recorded when their cursor moves on or the connection closes
+        for cursor in self._cursors:
+            cursor._finish()
+        self._cursors = []
+        super().close()
+
+
+def connection_factory(instrumentation: QueryInstrumentation):
+    """Return an InstrumentedConnection subclass bound to instrumentation"""
+    return type("BoundInstrumentedConnection", (InstrumentedConnection,),
+                {"instrumentation": instrumentation})
@@ -0,0 +1,274 @@
+"""
+Barcode scanner intake for the Medical Laboratory Management System
+
+Receiving a rack of tubes is one scan per tube. A keyboard-wedge scanner
+types the barcode followed by Enter into the intake field; each scan must
+answer at once, so a scan is checked against memory only:
+
+- BarcodeIndex maps every barcode to its sample and status in memory. It is
+  loaded in one query when the application starts and kept current from
+  change_log by refresh_in_background(), which runs on a worker thread when
+  a session starts, whenever ChangeWatcher reports a change to samples
+  (from this or another workstation) and after a scan of an unknown barcode.
+- IntakeSession checks the scan against the index and the sample lifecycle
+  (models.SAMPLE_TRANSITIONS), answers, and queues the status change.
+
+Queued changes are written with DatabaseManager.transition_samples, in one
+short transaction on the calling (Tk) thread, once the scanner pauses
+(flush_ms), when max_batch changes are waiting, or when the oldest change
+has waited max_delay_ms. Samples whose status changed elsewhere in the
+meantime are not moved; they are listed in IntakeSession.rejected.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from accession import is_valid_accession
+from config import Config
+from database import DatabaseManager
+from models import SampleStatus, SAMPLE_TRANSITIONS
+
+# Scan outcomes
+QUEUED = "queued"          # status change queued
+UNCHANGED = "unchanged"    # sample already has the status
+NOT_ALLOWED = "not_allowed"  # the sample's status cannot change to the status
+REPEATED = "repeated"      # scanned before in this session
+UNKNOWN = "unknown"        # no sample has this barcode
+MISREAD = "misread"        # accession number with a wrong check digit
+
+
+class IndexedSample:
+    __slots__ = ("sample_id", "barcode", "status", "patient_name", "test_name")
+
+    def __init__(self, barcode: str, sample_id: str, status: str, patient_name: Optional[str],
+                 test_name: Optional[str]):
+        self.barcode = barcode
+        self.sample_id = sample_id
+        self.status = SampleStatus(status)
+        self.patient_name = patient_name
+        self.test_name = test_name
+
+
+class BarcodeIndex:
+    """In-memory barcode -> sample lookup, refreshed from change_log"""
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+        self._by_barcode: Dict[str, IndexedSample] = {}
+        self._by_id: Dict[str, IndexedSample] = {}
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.ready = threading.Event()
+        # refresh() runs one at a time; _lock only guards the maps
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+        self._refresh_again = False
+        # Set while no background refresh is running
+        self.idle = threading.Event()
+        self.idle.set()
+
+    def warm(self):
+        """Load every sample; run on a worker thread at startup"""
+        # Changes made while loading are applied again by the next refresh
+        try:
+            seq = self.db.get_latest_change_seq()
+            rows = self.db.get_sample_scan_rows()
+            with self._lock:
+                self._by_barcode.clear()
+                self._by_id.clear()
+                for row in rows:
+                    self._put(IndexedSample(*row))
+                self._seq = seq
+        finally:
+            # On failure lookups still answer; refresh() then loads from the start of change_log
+            self.ready.set()
+
+    def _put(self, sample: IndexedSample):
+        previous = self._by_id.pop(sample.sample_id, None)
+        if previous is not None:
+            self._by_barcode.pop(previous.barcode, None)
+        self._by_id[sample.sample_id] = sample
+        self._by_barcode[sample.barcode] = sample
+
+    def _remove(self, sample_id: str):
+        previous = self._by_id.pop(sample_id, None)
+        if previous is not None:
+            self._by_barcode.pop(previous.barcode, None)
+
+    def refresh(self) -> int:
+        """Apply sample changes committed since the last load; returns the number of changed samples"""
+        self.ready.wait()
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self) -> int:
+        changed = 0
+        while True:
+            entries = self.db.changes_since(self._seq, limit=500, tables=["samples"])
+            if not entries:
+                return changed
+            sample_ids = list(dict.fromkeys(entry.row_id for entry in entries))
+            rows = {row[1]: row for row in self.db.get_sample_scan_rows(sample_ids)}
+            with self._lock:
+                for sample_id in sample_ids:
+                    if sample_id in rows:
+                        self._put(IndexedSample(*rows[sample_id]))
+                    else:
+                        self._remove(sample_id)
+                self._seq = entries[-1].seq
+            changed += len(sample_ids)
+
+    def refresh_in_background(self):
+        """Run refresh() on a worker thread, so the Tk thread never waits for the database"""
+        with self._lock:
+            if self._refreshing:
+                # Changes committed during the running refresh may be missed by it
+                self._refresh_again = True
+                return
+            self._refreshing = True
+            self.idle.clear()
+        threading.Thread(target=self._background_refresh, name="barcode-index", daemon=True).start()
+
+    def _background_refresh(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                # Locked or unreachable; the next change notification tries again
+                print(f"Barcode index refresh failed: {e}")
+            with self._lock:
+                if not self._refresh_again:
+                    self._refreshing = False
+                    self.idle.set()
+                    return
+                self._refresh_again = False
+
+    def get(self, barcode: str) -> Optional[IndexedSample]:
+        self.ready.wait()
+        with self._lock:
+            return self._by_barcode.get(barcode)
+
+    def set_status(self, sample_id: str, status: SampleStatus):
+        with self._lock:
+            sample = self._by_id.get(sample_id)
+            if sample is not None:
+                sample.status = status
+
+    def __len__(self):
+        return len(self._by_id)
+
+
+class ScanResult:
+    __slots__ = ("barcode", "outcome", "sample")
+
+    def __init__(self, barcode: str, outcome: str, sample: Optional[IndexedSample] = None):
+        self.barcode = barcode
+        self.outcome = outcome
+        self.sample = sample
+
+
+class IntakeSession:
+    """Turn scans into status changes, written to the database in batches"""
+
+    def __init__(self, db: DatabaseManager, index: BarcodeIndex, status: SampleStatus, root=None,
+                 flush_ms: Optional[int] = None, max_batch: Optional[int] = None,
+                 max_delay_ms: Optional[int] = None, on_flush: Optional[Callable[[int, Optional[Exception]], None]] = None,
+                 changed_by: Optional[str] = None):
+        self.db = db
+        self.index = index
+        self.status = SampleStatus(status.value)
+        self.changed_by = changed_by
+        self.root = root
+        self.flush_ms = flush_ms or Config.INTAKE_FLUSH_MS
+        self.max_batch = max_batch or Config.INTAKE_MAX_BATCH
+        self.max_delay = (max_delay_ms or Config.INTAKE_MAX_DELAY_MS) / 1000.0
+        self.on_flush = on_flush
+        # Queued sample IDs, in scan order
+        self.pending: Dict[str, None] = {}
+        # Samples whose status changed elsewhere before the write, with that status
+        self.rejected: Dict[str, Optional[SampleStatus]] = {}
+        # Those rejected by the last flush, for the screen to report
+        self.last_rejected: Dict[str, Optional[SampleStatus]] = {}
+        self._first_pending_at = None
+        self._after_id = None
+        self._scanned = set()
+        self.scanned = 0
+        self.written = 0
+        # Statuses may have changed since the index was last refreshed
+        index.refresh_in_background()
+
+    def scan(self, barcode: str) -> ScanResult:
+        """Handle one scanned barcode"""
+        barcode = barcode.strip()
+        self.scanned += 1
+        if len(barcode) == 14 and barcode.isdigit() and not is_valid_accession(barcode):
+            return ScanResult(barcode, MISREAD)
+
+        sample = self.index.get(barcode)
+        if sample is None:
+            # Perhaps added at another workstation just now; found when scanned again
+            self.index.refresh_in_background()
+            return ScanResult(barcode, UNKNOWN)
+        if sample.sample_id in self._scanned:
+            return ScanResult(barcode, REPEATED, sample)
+        self._scanned.add(sample.sample_id)
+        if sample.status == self.status:
+            return ScanResult(barcode, UNCHANGED, sample)
+        if self.status not in SAMPLE_TRANSITIONS[sample.status]:
+            return ScanResult(barcode, NOT_ALLOWED, sample)
+
+        self.pending[sample.sample_id] = None
+        self.index.set_status(sample.sample_id, self.status)
+        if self._first_pending_at is None:
+            self._first_pending_at = time.monotonic()
+        if len(self.pending) >= self.max_batch or time.monotonic() - self._first_pending_at >= self.max_delay:
+            self.flush()
+        else:
+            self._schedule_flush()
+        return ScanResult(barcode, QUEUED, sample)
+
+    def _schedule_flush(self):
+        if self.root is None:
+            return
+        # Debounce: write once the scanner pauses
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        self._after_id = self.root.after(self.flush_ms, self._scheduled_flush)
+
+    def _scheduled_flush(self):
+        self._after_id = None
+        self.flush()
+
+    def flush(self) -> int:
+        """Write the queued status changes in one transaction; returns the number written"""
+        if self._after_id is not None and self.root is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if not self.pending:
+            return 0
+        sample_ids: List[str] = list(self.pending)
+        try:
+            result = self.db.transition_samples(sample_ids, self.status, self.changed_by)
+        except Exception as e:
+            # Keep the changes and try again after the next pause
+            self._schedule_flush()
+            if self.on_flush:
+                self.on_flush(0, e)
+            return 0
+        for sample_id in sample_ids:
+            self.pending.pop(sample_id, None)
+        self.last_rejected = dict(result.rejected)
+        for sample_id, status in result.rejected.items():
+            self.rejected[sample_id] = status
+            if status is not None:
+                self.index.set_status(sample_id, status)
+        self._first_pending_at = None
+        written = len(result.moved)
+        self.written += written
+        if self.on_flush:
+            self.on_flush(written, None)
+        return written
+
+    def close(self) -> int:
+        """Write whatever is still queued"""
+        return self.flush()
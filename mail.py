@@ -0,0 +1,296 @@
+"""
+E-mail delivery for the Medical Laboratory Management System
+
+Messages are not sent by the screen that creates them. queue_email() and
+DatabaseManager.create_outbox_messages() store them in the mail_outbox
+table, so nothing is lost if the application closes or the mail server is
+down, and OutboxSender delivers them on a background thread:
+
+- one SMTP connection (STARTTLS and login done once) sends many messages;
+  it is replaced after MAIL_MESSAGES_PER_CONNECTION messages and closed
+  after MAIL_IDLE_SECONDS without mail
+- at most MAIL_RATE_PER_MINUTE messages a minute, to stay under the mail
+  provider's limits
+- a message the server refuses for good (5xx) fails at once; other errors
+  are retried after MAIL_RETRY_SECONDS, doubling each time up to
+  MAIL_RETRY_MAX_SECONDS, until MAIL_MAX_ATTEMPTS attempts have been made
+
+Each message's status, attempts and last error stay in the outbox.
+Delivery is at least once: a message whose sending was interrupted before
+it was marked sent may be sent again.
+"""
+import logging
+import random
+import re
+import smtplib
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Callable, Dict, List, Optional
+
+from config import Config
+from database import DatabaseManager
+from models import OutboxMessage
+
+mail_logger = logging.getLogger("medical_lab.mail")
+
+# SMTP errors that concern the connection rather than one message
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, smtplib.SMTPHeloError,
+                     smtplib.SMTPAuthenticationError, smtplib.SMTPNotSupportedError)
+
+
+EMAIL_ADDRESS = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+
+
+def find_email_address(text: Optional[str]) -> Optional[str]:
+    """The first e-mail address in free text such as a patient's contact info"""
+    match = EMAIL_ADDRESS.search(text or "")
+    return match.group(0) if match else None
+
+
+def queue_email(db: DatabaseManager, recipient: str, subject: str, body: str,
+                attachment_name: Optional[str] = None, attachment: Optional[bytes] = None) -> int:
+    """Put one message in the outbox; returns its ID"""
+    return db.create_outbox_messages([OutboxMessage(recipient, subject, body, attachment_name, attachment)])[0]
+
+
+def build_message(message: OutboxMessage, sender: str) -> EmailMessage:
+    email = EmailMessage()
+    email["From"] = sender
+    email["To"] = message.recipient
+    email["Subject"] = message.subject
+    email.set_content(message.body)
+    if message.attachment is not None:
+        subtype = "pdf" if (message.attachment_name or "").lower().endswith(".pdf") else "octet-stream"
+        email.add_attachment(message.attachment, maintype="application", subtype=subtype,
+                             filename=message.attachment_name or "attachment")
+    return email
+
+
+def is_connection_error(error: Exception) -> bool:
+    """Whether no message can be sent until the server can be reached again"""
+    # SMTPException is an OSError too; other OSErrors are network failures
+    return isinstance(error, CONNECTION_ERRORS) or (isinstance(error, OSError)
+                                                    and not isinstance(error, smtplib.SMTPException))
+
+
+def is_permanent(error: Exception) -> bool:
+    """Whether the server refused the message for good, so retrying cannot help"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _message in error.recipients.values())
+    if is_connection_error(error):
+        return False
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+class RateLimiter:
+    """Token bucket: per_minute messages a minute, in bursts of at most burst"""
+
+    def __init__(self, per_minute: int, burst: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.per_second = per_minute / 60.0
+        self.capacity = burst or max(1, per_minute // 10)
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.updated = clock()
+
+    def delay(self) -> float:
+        """Take a token; returns how long to wait before using it"""
+        if self.per_second <= 0:
+            return 0.0
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.per_second)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.per_second
+
+
+class SmtpSession:
+    """One authenticated SMTP connection, reused for many messages"""
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, use_tls: Optional[bool] = None,
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 max_messages: Optional[int] = None, idle_seconds: Optional[float] = None, timeout: float = 30.0):
+        self.host = host or Config.MAIL_SERVER
+        self.port = port or Config.MAIL_PORT
+        self.use_tls = Config.MAIL_USE_TLS if use_tls is None else use_tls
+        self.username = username if username is not None else Config.MAIL_USERNAME
+        self.password = password if password is not None else Config.MAIL_PASSWORD
+        self.max_messages = max_messages or Config.MAIL_MESSAGES_PER_CONNECTION
+        self.idle_seconds = Config.MAIL_IDLE_SECONDS if idle_seconds is None else idle_seconds
+        self.timeout = timeout
+        self.smtp = None
+        self.sent_on_connection = 0
+        self.last_used = 0.0
+        self.connections = 0
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.use_tls:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.username:
+                smtp.login(self.username, self.password or "")
+        except BaseException:
+            smtp.close()
+            raise
+        self.smtp = smtp
+        self.sent_on_connection = 0
+        self.connections += 1
+
+    def send(self, email: EmailMessage):
+        if self.smtp is not None and (self.sent_on_connection >= self.max_messages
+                                      or time.monotonic() - self.last_used > self.idle_seconds):
+            self.close()
+        if self.smtp is None:
+            self._connect()
+        try:
+            self.smtp.send_message(email)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped a connection we kept open; try once on a new one
+            self.close()
+            self._connect()
+            self.smtp.send_message(email)
+        except smtplib.SMTPResponseException:
+            # The connection stays usable after the server refuses one message
+            self._reset()
+            raise
+        finally:
+            self.last_used = time.monotonic()
+        self.sent_on_connection += 1
+
+    def _reset(self):
+        try:
+            self.smtp.rset()
+        except (smtplib.SMTPException, OSError):
+            self.close()
+
+    def close_if_idle(self):
+        if self.smtp is not None and time.monotonic() - self.last_used > self.idle_seconds:
+            self.close()
+
+    def close(self):
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+        self.smtp = None
+
+
+class OutboxSender:
+    """Deliver the mail outbox on a background thread"""
+
+    def __init__(self, db: DatabaseManager, session: Optional[SmtpSession] = None,
+                 rate_per_minute: Optional[int] = None, batch_size: int = 50, max_attempts: Optional[int] = None,
+                 retry_seconds: Optional[float] = None, retry_max_seconds: Optional[float] = None,
+                 poll_seconds: Optional[float] = None, sender: Optional[str] = None,
+                 sleep: Callable[[float], None] = None):
+        self.db = db
+        self.session = session or SmtpSession()
+        self.limiter = RateLimiter(Config.MAIL_RATE_PER_MINUTE if rate_per_minute is None else rate_per_minute)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts or Config.MAIL_MAX_ATTEMPTS
+        self.retry_seconds = Config.MAIL_RETRY_SECONDS if retry_seconds is None else retry_seconds
+        self.retry_max_seconds = Config.MAIL_RETRY_MAX_SECONDS if retry_max_seconds is None else retry_max_seconds
+        self.poll_seconds = Config.MAIL_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self.sender = sender or Config.MAIL_FROM or Config.MAIL_USERNAME or f"lab@{socket.getfqdn()}"
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.sleep = sleep or self.stop_event.wait
+        self.last_status = {"state": "idle", "at": None, "sent": 0, "retrying": 0, "failed": 0, "error": None}
+
+    # Background thread
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="medical-lab-mail", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self.session.close()
+
+    def wake(self):
+        """Send now instead of at the next poll, e.g. right after queueing mail"""
+        self.wake_event.set()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.send_due()
+            except Exception:
+                mail_logger.exception("Unexpected mail delivery failure")
+            self.wake_event.wait(self.poll_seconds)
+            self.wake_event.clear()
+            self.session.close_if_idle()
+
+    # Delivery
+    def send_due(self) -> Dict[str, int]:
+        """Send every message that is due; returns how many were sent, will be retried and failed"""
+        with self.lock:
+            counts = {"sent": 0, "retrying": 0, "failed": 0}
+            self.last_status = dict(self.last_status, state="sending", error=None)
+            while not self.stop_event.is_set():
+                # Long enough to send the whole batch at the rate limit, with room for a slow server
+                per_message = 1 / self.limiter.per_second if self.limiter.per_second else 1
+                lease = 120 + self.batch_size * per_message
+                messages = self.db.claim_outbox_messages(self.batch_size, lease)
+                if not messages:
+                    break
+                if not self._send_batch(messages, counts):
+                    # The server cannot be reached; the messages wait for their retry time
+                    break
+            self.last_status = dict(counts, state="idle", at=datetime.now().isoformat(timespec="seconds"),
+                                    error=self.last_status["error"])
+            return counts
+
+    def _send_batch(self, messages: List[OutboxMessage], counts: Dict[str, int]) -> bool:
+        for position, message in enumerate(messages):
+            if self.stop_event.is_set():
+                self.db.release_outbox_messages([m.id for m in messages[position:]])
+                return False
+            delay = self.limiter.delay()
+            if delay > 0:
+                self.sleep(delay)
+            try:
+                self.session.send(build_message(message, self.sender))
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                self.last_status["error"] = error
+                if is_connection_error(e):
+                    mail_logger.warning("Mail server unavailable: %s", error)
+                    self.session.close()
+                    # Every message of the batch waits, as none can be sent now
+                    for waiting in messages[position:]:
+                        self._record_failure(waiting, error, counts, permanent=False)
+                    return False
+                self._record_failure(message, error, counts, permanent=is_permanent(e))
+                continue
+            self.db.update_outbox_message_sent(message.id)
+            counts["sent"] += 1
+        return True
+
+    def _record_failure(self, message: OutboxMessage, error: str, counts: Dict[str, int], permanent: bool):
+        attempts = message.attempts + 1
+        if permanent or attempts >= self.max_attempts:
+            self.db.update_outbox_message_failed(message.id, error)
+            counts["failed"] += 1
+            return
+        delay = min(self.retry_max_seconds, self.retry_seconds * 2 ** (attempts - 1))
+        # Spread retries so queued messages do not all come back at once
+        delay *= random.uniform(0.9, 1.1)
+        self.db.update_outbox_message_failed(message.id, error, datetime.now() + timedelta(seconds=delay))
+        counts["retrying"] += 1
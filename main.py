@@ -10,19 +10,61 @@ from datetime import datetime
 from typing import List, Optional
 import hashlib
 import uuid
-from docx import Document
+import os
+import threading
+import contextlib
+import multiprocessing
+import shutil
+import subprocess
+import sys
+import tempfile
+from config import Config
 from database import DatabaseManager
 from models import (
     Patient, TestType, TestRequest, Sample, MedicalReport, 
     Invoice, User, InventoryItem, PurchaseOrder, TestTemplate, Gender, 
-    TestStatus, SampleStatus, UserRole, PaymentMethod, Permission, UserPermission
+    TestStatus, SampleStatus, UserRole, PaymentMethod, Permission, UserPermission, SAMPLE_TRANSITIONS,
+    MailStatus, OutboxMessage
 )
-from utils import generate_barcode, send_email, encrypt_data, decrypt_data
+from utils import send_email, encrypt_data, decrypt_data
 from translations import _, set_language, register_language_change_callback
+from responsiveness import ResponsivenessMonitor
+from change_watcher import ChangeWatcher
+from replica import AnalyticsReplica
+from backup import BackupManager
+from archive import Archiver
+from result_templates import TemplateEngine
+from word_import import DocumentIngestor
+from pdf_render import PdfRenderer, result_document, cumulative_document, invoice_document
+from batch_reports import BatchReportJob
+from barcodes import Label, label_sheet_pdf, zpl_labels
+from accession import AccessionAllocator
+from intake import BarcodeIndex, IntakeSession, QUEUED, UNCHANGED, NOT_ALLOWED, REPEATED, UNKNOWN, MISREAD
+from mail import OutboxSender, find_email_address
+from sync import SyncClient, SyncEngine, SyncError, check_field_keys, engine_from_settings
+from field_encryption import FieldEncryptionError
+from screen_data import build_results_rows, build_samples_rows, build_statistics, build_statistics_for_period
 
 from translations import _, set_language, register_language_change_callback
 
 class MedicalLabApp:
+    # Methods that replace the content frame with a screen (timed by the responsiveness monitor)
+    NAVIGATION_SCREENS = (
+        "show_login_screen", "show_dashboard", "show_patients", "show_tests", "show_samples",
+        "show_reports", "show_results", "show_billing", "show_inventory", "show_users",
+        "show_statistics",
+    )
+
+    # Tables shown by each screen and the method that reloads it in place
+    SCREEN_TABLES = {
+        "show_dashboard": ({"patients", "test_requests", "samples", "invoices", "inventory_items"}, "show_dashboard"),
+        "show_patients": ({"patients"}, "load_patients_data"),
+        "show_tests": ({"test_types"}, "load_tests_data"),
+        "show_samples": ({"samples", "test_requests", "patients", "test_types"}, "load_samples_data"),
+        "show_results": ({"medical_reports", "test_requests", "patients", "test_types"}, "load_results_data"),
+        "show_reports": ({"medical_reports", "test_requests", "patients", "test_types"}, "load_reports_data"),
+    }
+
     def __init__(self, root):
         self.root = root
         self.root.title(_("Medical Laboratory Management System"))
@@ -31,8 +73,68 @@ class MedicalLabApp:
         # Configure 3D style
         self.configure_3d_style()
         
+        # Event-loop lag and screen build time monitoring. Screens are wrapped
+        # before setup_ui so the navigation buttons bind the timed methods.
+        self.responsiveness = None
+        if Config.RESPONSIVENESS_MONITOR:
+            self.responsiveness = ResponsivenessMonitor(self.root, log_path=Config.RESPONSIVENESS_LOG)
+            self.responsiveness.instrument(self, self.NAVIGATION_SCREENS)
+            self.responsiveness.start()
+        
         # Initialize database
-        self.db = DatabaseManager()
+        try:
+            self.db = DatabaseManager()
+        except FieldEncryptionError as e:
+            # A syncing station without the shared keys could not read its patients
+            messagebox.showerror(_("Error"), str(e))
+            raise SystemExit(1)
+        
+        # Compress report and template bodies saved before compression was added
+        threading.Thread(target=self.db.compress_stored_content, daemon=True).start()
+        # Encrypt patient contact info saved before field encryption was added
+        threading.Thread(target=self.db.encrypt_stored_fields, daemon=True).start()
+        
+        # Background head-office sync, if the server settings were saved
+        try:
+            self.sync_engine = engine_from_settings(self.db)
+        except SyncError as e:
+            self.sync_engine = None
+            messagebox.showwarning(_("Sync"), _("Sync is disabled: {}").format(e))
+        if self.sync_engine:
+            self.sync_engine.start()
+        
+        # Reload the current screen when another workstation changes its tables
+        self.change_watcher = ChangeWatcher(self.db, self.root, Config.CHANGE_WATCH_INTERVAL_MS)
+        self.change_watcher.subscribe(
+            {table for tables, _refresh in self.SCREEN_TABLES.values() for table in tables},
+            self.on_database_changed
+        )
+        self.change_watcher.start()
+        
+        # Fills patient and test details into result templates
+        self.template_engine = TemplateEngine()
+        self.word_import = DocumentIngestor()
+        self.pdf_renderer = PdfRenderer()
+        self.accessions = AccessionAllocator(self.db)
+        
+        # Barcode -> sample lookup for scan intake, loaded in the background
+        self.barcode_index = BarcodeIndex(self.db)
+        threading.Thread(target=self.barcode_index.warm, daemon=True).start()
+        # Statuses changed here or elsewhere reach the index off the UI thread
+        self.change_watcher.subscribe({"samples"}, lambda _changed: self.barcode_index.refresh_in_background())
+        
+        # E-mail goes through the outbox table and is sent in the background
+        self.mail_sender = OutboxSender(self.db)
+        self.mail_sender.start()
+        
+        # Old closed records live in yearly archive files
+        self.archiver = Archiver(self.db)
+        
+        # Statistics and reports read an in-memory replica of the database
+        self.analytics = None
+        if Config.ANALYTICS_REPLICA:
+            self.analytics = AnalyticsReplica(self.db, self.root, Config.ANALYTICS_REFRESH_MS)
+            self.analytics.start()
         
         # Current user
         self.current_user = None
@@ -46,6 +148,30 @@ class MedicalLabApp:
         # Load initial data
         self.load_initial_data()
     
+    def analytics_snapshot(self, from_date=None, to_date=None):
+        """Consistent read-only view of the database for statistics and reports"""
+        years = self.archiver.archived_years_between(from_date, to_date) if from_date and to_date else []
+        if years:
+            # The period reaches into archived years
+            return self.archiver.including_archives(years)
+        if self.analytics is None:
+            return self.db.snapshot()
+        try:
+            self.analytics.refresh()
+        except sqlite3.Error as e:
+            # Report from the last refresh rather than not at all
+            print(f"Analytics replica refresh failed: {e}")
+        return contextlib.nullcontext(self.analytics.db)
+    
+    def on_database_changed(self, changed_tables):
+        """Reload the current screen if one of its tables changed"""
+        screen = getattr(getattr(self, "current_screen", None), "__name__", None)
+        if screen not in self.SCREEN_TABLES or not self.current_user:
+            return
+        tables, refresh = self.SCREEN_TABLES[screen]
+        if tables & changed_tables:
+            getattr(self, refresh)()
+    
     def configure_3d_style(self):
         """Configure 3D style with beautiful colors for the application"""
         style = ttk.Style()
@@ -123,6 +249,10 @@ class MedicalLabApp:
         self.footer_frame = ttk.Frame(self.root, style="Card.TFrame")
         self.footer_frame.pack(fill=tk.X, padx=10, pady=5)
         
+        # Optional responsiveness indicator in the status bar
+        if self.responsiveness and Config.RESPONSIVENESS_INDICATOR:
+            self.setup_responsiveness_indicator()
+        
         # Header with login info and language selector
         self.setup_header()
         
@@ -132,6 +262,17 @@ class MedicalLabApp:
         # Initial content
         self.show_login_screen()
     
+    def setup_responsiveness_indicator(self):
+        self.responsiveness_label = ttk.Label(self.footer_frame, text="", font=("Arial", 9))
+        self.responsiveness_label.pack(side=tk.RIGHT, padx=10)
+        self.update_responsiveness_indicator()
+    
+    def update_responsiveness_indicator(self):
+        snapshot = self.responsiveness.snapshot()
+        color = "red" if snapshot["lag_p95_ms"] >= self.responsiveness.lag_threshold_ms else "#000080"
+        self.responsiveness_label.config(text=self.responsiveness.status_text(), foreground=color)
+        self.root.after(1000, self.update_responsiveness_indicator)
+    
     def setup_header(self):
         # Language selector
         lang_frame = ttk.Frame(self.header_frame, style="Header.TFrame")
@@ -157,6 +298,18 @@ class MedicalLabApp:
                                              relief="raised", bd=4)
         self.edit_system_name_btn.pack(side=tk.RIGHT, padx=10)
         
+        # Admin tools menu (only visible when logged in as admin)
+        self.admin_tools_btn = tk.Button(user_controls_frame, text=_("Tools"), 
+                                         command=self.show_admin_tools_menu, state=tk.DISABLED,
+                                         bg="#3498db", fg="#000080",  # Blue background with dark blue text
+                                         font=("Arial", 11, "bold"),
+                                         relief="raised", bd=4)
+        self.admin_tools_btn.pack(side=tk.RIGHT, padx=10)
+        self.admin_tools_menu = tk.Menu(self.root, tearoff=0)
+        self.admin_tools_menu.add_command(label=_("Query Statistics"), command=self.show_query_statistics)
+        self.admin_tools_menu.add_command(label=_("Backups"), command=self.show_backups)
+        self.admin_tools_menu.add_command(label=_("Archive Old Records"), command=self.show_archive_records)
+        
         # Server connection icon (only visible when logged in as admin)
         self.server_icon_btn = tk.Button(user_controls_frame, text=_("Server"), 
                                         command=self.show_server_connection, state=tk.DISABLED,
@@ -250,6 +403,10 @@ class MedicalLabApp:
         self.logout_btn.config(text=_("Logout"))
         self.change_password_btn.config(text=_("Change Password"))
         self.server_icon_btn.config(text=_("Server"))
+        self.admin_tools_btn.config(text=_("Tools"))
+        self.admin_tools_menu.entryconfig(0, label=_("Query Statistics"))
+        self.admin_tools_menu.entryconfig(1, label=_("Backups"))
+        self.admin_tools_menu.entryconfig(2, label=_("Archive Old Records"))
         
         # Update navigation header
         self.nav_header_label.config(text=_("Navigation"))
@@ -376,10 +533,12 @@ class MedicalLabApp:
                 self.change_password_btn["state"] = tk.NORMAL
                 self.server_icon_btn["state"] = tk.NORMAL
                 self.edit_system_name_btn["state"] = tk.NORMAL
+                self.admin_tools_btn["state"] = tk.NORMAL
             else:
                 self.change_password_btn["state"] = tk.DISABLED
                 self.server_icon_btn["state"] = tk.DISABLED
                 self.edit_system_name_btn["state"] = tk.DISABLED
+                self.admin_tools_btn["state"] = tk.DISABLED
             
             # Enable navigation buttons based on role
             self.enable_navigation()
@@ -396,6 +555,7 @@ class MedicalLabApp:
         self.change_password_btn["state"] = tk.DISABLED
         self.server_icon_btn["state"] = tk.DISABLED
         self.edit_system_name_btn["state"] = tk.DISABLED
+        self.admin_tools_btn["state"] = tk.DISABLED
         
         # Disable navigation
         for btn in self.nav_buttons.values():
@@ -413,6 +573,7 @@ class MedicalLabApp:
             self.change_password_btn["state"] = tk.NORMAL
             self.server_icon_btn["state"] = tk.NORMAL
             self.edit_system_name_btn["state"] = tk.NORMAL
+            self.admin_tools_btn["state"] = tk.NORMAL
         else:
             # Enable based on role (simplified for demo)
             for btn in self.nav_buttons.values():
@@ -421,6 +582,7 @@ class MedicalLabApp:
             self.change_password_btn["state"] = tk.DISABLED
             self.server_icon_btn["state"] = tk.DISABLED
             self.edit_system_name_btn["state"] = tk.DISABLED
+            self.admin_tools_btn["state"] = tk.DISABLED
     def show_dashboard(self):
         self.current_screen = self.show_dashboard
         self.clear_content()
@@ -722,147 +884,13 @@ class MedicalLabApp:
             messagebox.showerror(_("Error"), _("Test type not found"))
             return
         
-        # Create print preview dialog
-        dialog = tk.Toplevel(self.root)
-        dialog.title(_("Print Result"))
-        dialog.geometry("600x700")
-        dialog.transient(self.root)
-        dialog.grab_set()
-        
-        # Result header
-        header_frame = ttk.Frame(dialog)
-        header_frame.pack(fill=tk.X, padx=10, pady=10)
-        
-        ttk.Label(header_frame, text=_("MEDICAL LABORATORY REPORT"), 
-                 font=("Arial", 16, "bold")).pack()
-        ttk.Label(header_frame, text=_("Result ID: {}").format(report.id), 
-                 font=("Arial", 10)).pack()
-        
-        # Patient information
-        patient_frame = ttk.LabelFrame(dialog, text=_("Patient Information"))
-        patient_frame.pack(fill=tk.X, padx=10, pady=5)
-        
-        info_frame = ttk.Frame(patient_frame)
-        info_frame.pack(fill=tk.X, padx=5, pady=5)
-        
-        ttk.Label(info_frame, text=_("Patient: {}").format(patient.name)).grid(row=0, column=0, sticky=tk.W, padx=5)
-        ttk.Label(info_frame, text=_("Age: {}").format(patient.age)).grid(row=0, column=1, sticky=tk.W, padx=5)
-        ttk.Label(info_frame, text=_("Gender: {}").format(_(patient.gender.value))).grid(row=1, column=0, sticky=tk.W, padx=5)
-        ttk.Label(info_frame, text=_("Contact: {}").format(patient.contact_info or _("N/A"))).grid(row=1, column=1, sticky=tk.W, padx=5)
-        
-        # Test information
-        test_frame = ttk.LabelFrame(dialog, text=_("Test Information"))
-        test_frame.pack(fill=tk.X, padx=10, pady=5)
-        
-        test_info_frame = ttk.Frame(test_frame)
-        test_info_frame.pack(fill=tk.X, padx=5, pady=5)
-        
-        ttk.Label(test_info_frame, text=_("Test: {}").format(test_type.name)).grid(row=0, column=0, sticky=tk.W, padx=5)
-        ttk.Label(test_info_frame, text=_("Category: {}").format(test_type.category)).grid(row=0, column=1, sticky=tk.W, padx=5)
-        ttk.Label(test_info_frame, text=_("Requested By: {}").format(test_request.requested_by)).grid(row=1, column=0, sticky=tk.W, padx=5)
-        ttk.Label(test_info_frame, text=_("Requested At: {}").format(
-            test_request.requested_at.strftime("%Y-%m-%d %H:%M"))).grid(row=1, column=1, sticky=tk.W, padx=5)
-        
-        # Result content
-        content_frame = ttk.LabelFrame(dialog, text=_("Result Details"))
-        content_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
-        
-        content_text = tk.Text(content_frame, wrap=tk.WORD)
-        content_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        content_text.insert("1.0", report.content)
-        
-        # Signature information
-        signature_frame = ttk.Frame(dialog)
-        signature_frame.pack(fill=tk.X, padx=10, pady=5)
-        
-        ttk.Label(signature_frame, text=_("Signed By: {}").format(
-            report.signed_by if report.signed_by != "N/A" else _("Not signed yet"))).pack(anchor=tk.W, padx=5)
-        ttk.Label(signature_frame, text=_("Signed At: {}").format(
-            report.signed_at.strftime("%Y-%m-%d %H:%M") if report.signed_at else _("Not signed yet"))).pack(anchor=tk.W, padx=5)
-        
-        # Print buttons
-        button_frame = ttk.Frame(dialog)
-        button_frame.pack(fill=tk.X, padx=10, pady=10)
-        
-        ttk.Button(button_frame, text=_("Print"), 
-                  command=lambda: self.do_print_result(dialog, report, patient, test_type, test_request)).pack(side=tk.LEFT, padx=5)
-        ttk.Button(button_frame, text=_("Close"), 
-                  command=dialog.destroy).pack(side=tk.RIGHT, padx=5)
-
-        header_frame = ttk.Frame(dialog)
-        header_frame.pack(fill=tk.X, padx=10, pady=10)
-        
-        ttk.Label(header_frame, text=_("MEDICAL LABORATORY REPORT"), 
-                 font=("Arial", 16, "bold")).pack()
-        ttk.Label(header_frame, text=_("Result ID: {}").format(report.id), 
-                 font=("Arial", 10)).pack()
-        
-        # Patient information
-        patient_frame = ttk.LabelFrame(dialog, text=_("Patient Information"))
-        patient_frame.pack(fill=tk.X, padx=10, pady=5)
-        
-        info_frame = ttk.Frame(patient_frame)
-        info_frame.pack(fill=tk.X, padx=5, pady=5)
-        
-        ttk.Label(info_frame, text=_("Patient: {}").format(patient.name)).grid(row=0, column=0, sticky=tk.W, padx=5)
-        ttk.Label(info_frame, text=_("Age: {}").format(patient.age)).grid(row=0, column=1, sticky=tk.W, padx=5)
-        ttk.Label(info_frame, text=_("Gender: {}").format(_(patient.gender.value))).grid(row=1, column=0, sticky=tk.W, padx=5)
-        ttk.Label(info_frame, text=_("Contact: {}").format(patient.contact_info or _("N/A"))).grid(row=1, column=1, sticky=tk.W, padx=5)
-        
-        # Test information
-        test_frame = ttk.LabelFrame(dialog, text=_("Test Information"))
-        test_frame.pack(fill=tk.X, padx=10, pady=5)
-        
-        test_info_frame = ttk.Frame(test_frame)
-        test_info_frame.pack(fill=tk.X, padx=5, pady=5)
-        
-        ttk.Label(test_info_frame, text=_("Test: {}").format(test_type.name)).grid(row=0, column=0, sticky=tk.W, padx=5)
-        ttk.Label(test_info_frame, text=_("Category: {}").format(test_type.category)).grid(row=0, column=1, sticky=tk.W, padx=5)
-        ttk.Label(test_info_frame, text=_("Requested By: {}").format(test_request.requested_by)).grid(row=1, column=0, sticky=tk.W, padx=5)
-        ttk.Label(test_info_frame, text=_("Requested At: {}").format(
-            test_request.requested_at.strftime("%Y-%m-%d %H:%M"))).grid(row=1, column=1, sticky=tk.W, padx=5)
-        
-        # Result content
-        content_frame = ttk.LabelFrame(dialog, text=_("Result Details"))
-        content_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
-        
-        content_text = tk.Text(content_frame, wrap=tk.WORD)
-        content_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        content_text.insert("1.0", report.content)
-        
-        # Signature information
-        signature_frame = ttk.Frame(dialog)
-        signature_frame.pack(fill=tk.X, padx=10, pady=5)
-        
-        ttk.Label(signature_frame, text=_("Signed By: {}").format(
-            report.signed_by if report.signed_by != "N/A" else _("Not signed yet"))).pack(anchor=tk.W, padx=5)
-        ttk.Label(signature_frame, text=_("Signed At: {}").format(
-            report.signed_at.strftime("%Y-%m-%d %H:%M") if report.signed_at else _("Not signed yet"))).pack(anchor=tk.W, padx=5)
-        
-        # Print buttons
-        button_frame = ttk.Frame(dialog)
-        button_frame.pack(fill=tk.X, padx=10, pady=10)
-        
-        ttk.Button(button_frame, text=_("Print"), 
-                  command=lambda: self.do_print_result(dialog, report, patient, test_type, test_request)).pack(side=tk.LEFT, padx=5)
-        ttk.Button(button_frame, text=_("Close"), 
-                  command=dialog.destroy).pack(side=tk.RIGHT, padx=5)
+        self.create_result_print_dialog(report, patient, test_type, test_request)
 
     def remove_test(self):
         selected_index = self.test_list.curselection()
         if selected_index:
             self.test_list.delete(selected_index)
 
-    def do_print_result(self, dialog, report, patient, test_type, test_request):
-        # In a real application, this would send the result to a printer
-        # For now, we'll show a message
-        messagebox.showinfo(_("Print"), _("In a real application, this would print the result.\n\n"
-                                         "Patient: {}\n"
-                                         "Test: {}\n"
-                                         "Result: {}").format(
-                                         patient.name, test_type.name, report.content[:50] + "..."))
-        dialog.destroy()
-    
     def show_patients(self):
         self.current_screen = self.show_patients
         self.clear_content()
@@ -892,6 +920,14 @@ class MedicalLabApp:
         ttk.Button(action_frame, text=_("View Test Requests"), 
                   command=self.view_patient_test_requests, style="Accent.TButton").pack(side=tk.LEFT, padx=5)
         
+        # Exact contact lookup (phone number, national ID); contact info is encrypted
+        self.contact_search_var = tk.StringVar()
+        ttk.Button(action_frame, text=_("Find by Contact"),
+                  command=self.find_patients_by_contact, style="Accent.TButton").pack(side=tk.RIGHT, padx=5)
+        contact_search_entry = ttk.Entry(action_frame, textvariable=self.contact_search_var, width=20)
+        contact_search_entry.pack(side=tk.RIGHT, padx=5)
+        contact_search_entry.bind("<Return>", lambda event: self.find_patients_by_contact())
+        
         # Patients table with enhanced styling
         table_frame = ttk.Frame(self.content_frame, style="Card.TFrame")
         table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -915,7 +951,7 @@ class MedicalLabApp:
         # Load patients data
         self.load_patients_data()
     
-    def load_patients_data(self):
+    def load_patients_data(self, patients=None):
         # Check if patients_tree exists
         if not hasattr(self, 'patients_tree'):
             return
@@ -925,7 +961,8 @@ class MedicalLabApp:
             self.patients_tree.delete(item)
         
         # Load patients from database
-        patients = self.db.get_all_patients()
+        if patients is None:
+            patients = self.db.get_all_patients()
         
         for patient in patients:
             # Insert item with full 8-digit ID
@@ -939,6 +976,17 @@ class MedicalLabApp:
             # Store the full ID in the item's tags for later retrieval
             self.patients_tree.item(item_id, tags=(patient.id,))
     
+    def find_patients_by_contact(self):
+        """Show only the patients with the contact info typed in the search field; all when empty"""
+        contact = self.contact_search_var.get().strip()
+        if not contact:
+            self.load_patients_data()
+            return
+        patients = self.db.get_patients_by_contact(contact)
+        self.load_patients_data(patients)
+        if not patients:
+            messagebox.showinfo(_("Info"), _("No patient has this contact info"))
+    
     def add_patient(self):
         # Create add patient dialog
         dialog = tk.Toplevel(self.root)
@@ -2132,7 +2180,7 @@ class MedicalLabApp:
         # Create server connection dialog
         dialog = tk.Toplevel(self.root)
         dialog.title(_("Server Connection"))
-        dialog.geometry("400x300")
+        dialog.geometry("480x460")
         dialog.transient(self.root)
         dialog.grab_set()
         
@@ -2163,14 +2211,68 @@ class MedicalLabApp:
         password_entry.pack(padx=20, pady=5)
         password_entry.insert(0, "password")  # Default value
         
+        # Saved settings replace the defaults; the password is never stored
+        for entry, key in ((server_url_entry, "server_url"), (api_key_entry, "api_key"), (username_entry, "username")):
+            saved = self.db.get_sync_state(key)
+            if saved:
+                entry.delete(0, tk.END)
+                entry.insert(0, saved)
+        if self.db.get_sync_state("server_url"):
+            password_entry.delete(0, tk.END)
+        
+        status_label = ttk.Label(dialog, text=self.sync_status_text(), foreground="#000080")
+        status_label.pack(padx=20, pady=5)
+        
+        def make_client(**kwargs):
+            server_url = server_url_entry.get().strip()
+            if not server_url.startswith(("http://", "https://")):
+                messagebox.showerror(_("Error"), _("Please enter a valid server URL"))
+                return None
+            return SyncClient(server_url, api_key_entry.get().strip(), username_entry.get().strip(),
+                              password_entry.get(), **kwargs)
+        
         def save_settings():
-            # In a real application, this would save the server settings
+            try:
+                check_field_keys()
+            except SyncError as e:
+                messagebox.showerror(_("Error"), str(e))
+                return
+            client = make_client(timeout=Config.SYNC_TIMEOUT)
+            if not client:
+                return
+            for key, value in (("server_url", client.server_url), ("api_key", client.api_key),
+                               ("username", client.username)):
+                self.db.set_sync_state(key, value)
+            if self.sync_engine:
+                self.sync_engine.stop()
+            self.sync_engine = SyncEngine(self.db, client)
+            self.sync_engine.start()
             messagebox.showinfo(_("Success"), _("Server settings saved successfully"))
             dialog.destroy()
         
         def test_connection():
-            # In a real application, this would test the server connection
-            messagebox.showinfo(_("Test Connection"), _("Connection test functionality would be implemented here"))
+            client = make_client(timeout=10, retries=0)
+            if not client:
+                return
+            status_label.config(text=_("Testing connection..."))
+            def done(value, error):
+                status_label.config(text=self.sync_status_text())
+                if error:
+                    messagebox.showerror(_("Test Connection"), _("Connection failed: {}").format(error))
+                else:
+                    messagebox.showinfo(_("Test Connection"), _("Connection successful"))
+            self.run_in_background(dialog, client.ping, done)
+        
+        def sync_now():
+            if not self.sync_engine:
+                messagebox.showerror(_("Error"), _("Please save the server settings first"))
+                return
+            status_label.config(text=_("Synchronizing..."))
+            def done(value, error):
+                status_label.config(text=self.sync_status_text())
+                if error:
+                    messagebox.showerror(_("Sync"), _("Sync failed: {}").format(error))
+            self.run_in_background(dialog, self.sync_engine.sync_once, done)
         
         # Buttons
         button_frame = ttk.Frame(dialog)
@@ -2180,8 +2282,320 @@ class MedicalLabApp:
                   style="Accent.TButton").pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text=_("Test Connection"), command=test_connection, 
                   style="Accent.TButton").pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text=_("Sync Now"), command=sync_now, 
+                  style="Accent.TButton").pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text=_("Cancel"), command=dialog.destroy, 
                   style="Accent.TButton").pack(side=tk.LEFT, padx=5)
+    
+    def sync_status_text(self):
+        """One-line summary of the last head-office sync"""
+        if not self.sync_engine:
+            return _("Sync not configured")
+        status = self.sync_engine.last_status
+        if status["state"] == "error":
+            return _("Last sync failed at {}: {}").format(status["at"], status["error"])
+        if status["at"] is None:
+            return _("Not synchronized yet")
+        return _("Last sync at {}: {} sent, {} received").format(status["at"], status["pushed"], status["pulled"])
+
+    def run_in_background(self, widget, work, done):
+        """
+        Run work() on a worker thread so it does not block the Tk event loop,
+        then call done(result, error) on the Tk thread.
+        """
+        result = {}
+        def target():
+            try:
+                result["value"] = work()
+            except Exception as e:
+                result["error"] = e
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        def poll():
+            if thread.is_alive():
+                widget.after(100, poll)
+            else:
+                done(result.get("value"), result.get("error"))
+        poll()
+    
+    def load_word_template(self, dialog, text_widget):
+        """Ask for a Word file and load it into text_widget without blocking the dialog"""
+        file_path = filedialog.askopenfilename(
+            parent=dialog,
+            title=_("Select Word Template File"),
+            filetypes=[(_("Word files"), "*.docx"), (_("All files"), "*.*")]
+        )
+        if not file_path:
+            return
+        
+        dialog.config(cursor="watch")
+        def done(content, error):
+            if not dialog.winfo_exists():
+                return
+            dialog.config(cursor="")
+            if error:
+                messagebox.showerror(_("Error"), f"{_('Failed to load template')}: {str(error)}", parent=dialog)
+                return
+            text_widget.delete("1.0", tk.END)
+            text_widget.insert("1.0", content)
+            messagebox.showinfo(_("Success"), _("Template loaded successfully from Word file"), parent=dialog)
+        self.run_in_background(dialog, lambda: self.word_import.load(file_path), done)
+    
+    def show_backups(self):
+        """Show the backup list with back up and restore actions for admin users"""
+        if not self.current_user or self.current_user.role != UserRole.ADMIN:
+            messagebox.showerror(_("Error"), _("Access denied. Admin privileges required."))
+            return
+        
+        manager = BackupManager(self.db)
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title(_("Backups"))
+        dialog.geometry("600x420")
+        dialog.transient(self.root)
+        
+        ttk.Label(dialog, text=_("Backups"), font=("Arial", 14, "bold")).pack(pady=10)
+        
+        tree_frame = ttk.Frame(dialog)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+        tree = ttk.Treeview(tree_frame, columns=("File", "Size"), show="headings", selectmode="browse")
+        tree.heading("File", text=_("File"))
+        tree.heading("Size", text=_("Size"))
+        tree.column("File", width=420)
+        tree.column("Size", width=100, anchor=tk.E)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        status_label = ttk.Label(dialog, text="", foreground="#000080")
+        status_label.pack(pady=5)
+        
+        def load_backups():
+            tree.delete(*tree.get_children())
+            for path in manager.list_backups():
+                tree.insert("", tk.END, iid=path, values=(
+                    os.path.basename(path), f"{os.path.getsize(path) / 1024 / 1024:.1f} MB"))
+        
+        busy = {"running": False}
+        progress = {"copied": 0, "total": 0}
+        
+        def show_progress():
+            if not busy["running"]:
+                return
+            if progress["total"]:
+                status_label.config(text=_("Backing up: {}%").format(
+                    progress["copied"] * 100 // progress["total"]))
+            dialog.after(200, show_progress)
+        
+        def backup_now():
+            if busy["running"]:
+                return
+            busy["running"] = True
+            status_label.config(text=_("Backing up..."), foreground="#000080")
+            def on_progress(copied, total):
+                progress["copied"], progress["total"] = copied, total
+            def done(path, error):
+                busy["running"] = False
+                if error:
+                    status_label.config(text=_("Backup failed: {}").format(error), foreground="red")
+                else:
+                    status_label.config(text=_("Backup saved: {}").format(os.path.basename(path)),
+                                        foreground="green")
+                    load_backups()
+            self.run_in_background(dialog, lambda: manager.create_backup(progress=on_progress), done)
+            show_progress()
+        
+        def restore_selected():
+            selected = tree.selection()
+            if not selected or busy["running"]:
+                return
+            if not messagebox.askyesno(_("Confirm Restore"), _(
+                    "Replace all current data with {}? The current data is backed up first.").format(
+                    os.path.basename(selected[0])), parent=dialog):
+                return
+            busy["running"] = True
+            status_label.config(text=_("Restoring..."), foreground="#000080")
+            def done(result, error):
+                busy["running"] = False
+                if error:
+                    status_label.config(text=_("Restore failed: {}").format(error), foreground="red")
+                    return
+                status_label.config(text=_("Restore complete"), foreground="green")
+                load_backups()
+                # Screens reload through the change watcher
+                self.change_watcher.check()
+            self.run_in_background(dialog, lambda: manager.restore(selected[0]), done)
+        
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Button(button_frame, text=_("Back Up Now"), command=backup_now,
+                   style="Accent.TButton").pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text=_("Restore Selected"), command=restore_selected,
+                   style="Accent.TButton").pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text=_("Close"), command=dialog.destroy,
+                   style="Accent.TButton").pack(side=tk.RIGHT, padx=5)
+        
+        load_backups()
+    
+    def show_archive_records(self):
+        """Move closed records older than a cutoff date into yearly archive files"""
+        if not self.current_user or self.current_user.role != UserRole.ADMIN:
+            messagebox.showerror(_("Error"), _("Access denied. Admin privileges required."))
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title(_("Archive Old Records"))
+        dialog.geometry("460x300")
+        dialog.transient(self.root)
+        dialog.grab_set()
+        
+        ttk.Label(dialog, text=_("Archive Old Records"), font=("Arial", 14, "bold")).pack(pady=10)
+        ttk.Label(dialog, text=_("Paid invoices and completed or cancelled tests dated before the cutoff "
+                                 "are moved into yearly archive files. They remain available in reports."),
+                  wraplength=420, foreground="#000080").pack(padx=20)
+        
+        ttk.Label(dialog, text=_("Cutoff date (YYYY-MM-DD):"), foreground="#000080").pack(anchor=tk.W, padx=20, pady=(10, 0))
+        cutoff_entry = ttk.Entry(dialog, width=20)
+        cutoff_entry.pack(anchor=tk.W, padx=20, pady=5)
+        cutoff_entry.insert(0, f"{datetime.now().year - Config.ARCHIVE_AFTER_YEARS + 1}-01-01")
+        
+        status_label = ttk.Label(dialog, text="", foreground="#000080", wraplength=420)
+        status_label.pack(pady=5)
+        
+        def archive():
+            try:
+                cutoff = datetime.strptime(cutoff_entry.get().strip(), "%Y-%m-%d")
+            except ValueError:
+                messagebox.showerror(_("Error"), _("Invalid date format. Use YYYY-MM-DD."), parent=dialog)
+                return
+            archive_button.config(state=tk.DISABLED)
+            status_label.config(text=_("Archiving..."), foreground="#000080")
+            def done(moved, error):
+                archive_button.config(state=tk.NORMAL)
+                if error:
+                    status_label.config(text=_("Archiving failed: {}").format(error), foreground="red")
+                    return
+                status_label.config(text=_("Archived {} invoices and {} test requests").format(
+                    moved["invoices"], moved["test_requests"]), foreground="green")
+            self.run_in_background(dialog, lambda: self.archiver.archive_before(cutoff), done)
+        
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+        archive_button = ttk.Button(button_frame, text=_("Archive"), command=archive, style="Accent.TButton")
+        archive_button.pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text=_("Close"), command=dialog.destroy,
+                   style="Accent.TButton").pack(side=tk.RIGHT, padx=5)
+    
+    def show_admin_tools_menu(self):
+        """Drop down the admin tools menu below its header button"""
+        x = self.admin_tools_btn.winfo_rootx()
+        y = self.admin_tools_btn.winfo_rooty() + self.admin_tools_btn.winfo_height()
+        self.admin_tools_menu.tk_popup(x, y)
+    
+    def show_query_statistics(self):
+        """Show per-method and per-statement database timings for admin users"""
+        if not self.current_user or self.current_user.role != UserRole.ADMIN:
+            messagebox.showerror(_("Error"), _("Access denied. Admin privileges required."))
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title(_("Query Statistics"))
+        dialog.geometry("1000x600")
+        dialog.transient(self.root)
+        
+        ttk.Label(dialog, text=_("Query Statistics"), font=("Arial", 14, "bold")).pack(pady=10)
+        
+        # Instrumentation controls
+        controls_frame = ttk.Frame(dialog)
+        controls_frame.pack(fill=tk.X, padx=10)
+        
+        enabled_var = tk.BooleanVar(value=self.db.instrumentation is not None)
+        threshold_var = tk.StringVar(value=str(
+            self.db.instrumentation.slow_query_ms if self.db.instrumentation else Config.SLOW_QUERY_MS))
+        
+        ttk.Label(controls_frame, text=_("Slow query threshold (ms):"), foreground="#000080").pack(side=tk.LEFT)
+        ttk.Entry(controls_frame, textvariable=threshold_var, width=8).pack(side=tk.LEFT, padx=5)
+        
+        # Statistics tables
+        notebook = ttk.Notebook(dialog)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        timing_columns = ("Calls", "Total ms", "Mean ms", "p50 ms", "p95 ms", "p99 ms", "Max ms", "Rows")
+        
+        def make_tree(title, first_column, columns, first_width):
+            frame = ttk.Frame(notebook)
+            notebook.add(frame, text=title)
+            tree = ttk.Treeview(frame, columns=(first_column,) + columns, show="headings")
+            tree.heading(first_column, text=_(first_column))
+            tree.column(first_column, width=first_width)
+            for col in columns:
+                tree.heading(col, text=_(col))
+                tree.column(col, width=70, anchor=tk.E)
+            scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            return tree
+        
+        methods_tree = make_tree(_("Methods"), "Method", timing_columns, 250)
+        statements_tree = make_tree(_("Statements"), "SQL", timing_columns, 400)
+        slow_tree = make_tree(_("Slow Queries"), "SQL", ("At", "Method", "Elapsed ms", "Rows", "Plan"), 350)
+        
+        def refresh():
+            for tree in (methods_tree, statements_tree, slow_tree):
+                for item in tree.get_children():
+                    tree.delete(item)
+            
+            stats = self.db.get_query_stats()
+            if not stats:
+                return
+            
+            for key, tree, field in (("methods", methods_tree, "name"), ("statements", statements_tree, "sql")):
+                for entry in stats[key]:
+                    tree.insert("", tk.END, values=(
+                        entry[field], entry["calls"], f"{entry['total_ms']:.1f}", f"{entry['mean_ms']:.2f}",
+                        f"{entry['p50_ms']:.2f}", f"{entry['p95_ms']:.2f}", f"{entry['p99_ms']:.2f}",
+                        f"{entry['max_ms']:.2f}", entry["rows"]
+                    ))
+            for entry in reversed(stats["slow_queries"]):
+                slow_tree.insert("", tk.END, values=(
+                    entry["sql"], entry["at"], entry["method"] or "", f"{entry['elapsed_ms']:.1f}",
+                    entry["rows"], " | ".join(entry["plan"])
+                ))
+        
+        def toggle_instrumentation():
+            if enabled_var.get():
+                try:
+                    threshold = float(threshold_var.get())
+                except ValueError:
+                    messagebox.showerror(_("Error"), _("Please enter a valid threshold"))
+                    enabled_var.set(False)
+                    return
+                self.db.enable_instrumentation(slow_query_ms=threshold)
+            else:
+                self.db.disable_instrumentation()
+            refresh()
+        
+        def reset():
+            self.db.reset_query_stats()
+            refresh()
+        
+        ttk.Checkbutton(controls_frame, text=_("Enable instrumentation"), variable=enabled_var,
+                        command=toggle_instrumentation).pack(side=tk.LEFT, padx=10)
+        
+        # Buttons
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(pady=10)
+        
+        ttk.Button(button_frame, text=_("Refresh"), command=refresh, 
+                  style="Accent.TButton").pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text=_("Reset"), command=reset, 
+                  style="Accent.TButton").pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text=_("Close"), command=dialog.destroy, 
+                  style="Accent.TButton").pack(side=tk.LEFT, padx=5)
+        
+        refresh()
 
     def change_admin_password(self):
         """Show change admin password dialog"""
@@ -2551,6 +2965,8 @@ class MedicalLabApp:
         
         ttk.Button(header_frame, text=_("Add Sample"), 
                   command=self.add_sample, style="Accent.TButton").pack(side=tk.RIGHT)
+        ttk.Button(header_frame, text=_("Scan Intake"), 
+                  command=self.scan_intake, style="Accent.TButton").pack(side=tk.RIGHT, padx=5)
         
         # Samples table with enhanced styling
         table_frame = ttk.Frame(self.content_frame, style="Card.TFrame")
@@ -2558,7 +2974,8 @@ class MedicalLabApp:
         
         # Create treeview with custom styling
         columns = (_("ID"), _("Barcode"), _("Test Request"), _("Collected At"), _("Status"))
-        self.samples_tree = ttk.Treeview(table_frame, columns=columns, show="headings")
+        # Several samples can be selected to move them on together
+        self.samples_tree = ttk.Treeview(table_frame, columns=columns, show="headings", selectmode="extended")
         
         for col in columns:
             self.samples_tree.heading(col, text=col)
@@ -2585,6 +3002,15 @@ class MedicalLabApp:
                   command=self.update_sample_status, style="Accent.TButton").pack(side=tk.LEFT, padx=5)
         ttk.Button(action_frame, text=_("Generate Barcode"), 
                   command=self.generate_sample_barcode, style="Accent.TButton").pack(side=tk.LEFT, padx=5)
+        ttk.Button(action_frame, text=_("Print Labels"), 
+                  command=self.print_selected_sample_labels, style="Accent.TButton").pack(side=tk.LEFT, padx=5)
+        
+        select_var = tk.StringVar()
+        select_combo = ttk.Combobox(action_frame, textvariable=select_var, state="readonly", width=15,
+                                    values=[_(status.value) for status in SampleStatus])
+        select_combo.pack(side=tk.RIGHT, padx=5)
+        select_combo.bind("<<ComboboxSelected>>", lambda event: self.select_samples_by_status(select_var.get()))
+        ttk.Label(action_frame, text=_("Select by status:")).pack(side=tk.RIGHT)
     
     def load_samples_data(self):
         # Clear existing data
@@ -2592,32 +3018,8 @@ class MedicalLabApp:
             self.samples_tree.delete(item)
         
         # Load samples from database
-        samples = self.db.get_all_samples()
-        
-        for sample in samples:
-            # Get test request to get patient and test type info
-            test_request = self.db.get_test_request(sample.test_request_id)
-            patient_name = _("Unknown Patient")
-            test_name = _("Unknown Test")
-            
-            if test_request:
-                # Get patient info
-                patient = self.db.get_patient(test_request.patient_id)
-                if patient:
-                    patient_name = patient.name
-                
-                # Get test type info
-                test_type = self.db.get_test_type(test_request.test_type_id)
-                if test_type:
-                    test_name = test_type.name
-            
-            self.samples_tree.insert("", tk.END, values=(
-                sample.id[:8],
-                sample.barcode,
-                f"{patient_name} - {test_name}",
-                sample.collected_at.strftime("%Y-%m-%d %H:%M"),
-                _(sample.status.value)
-            ))
+        for sample_id, values in build_samples_rows(self.db):
+            self.samples_tree.insert("", tk.END, iid=sample_id, values=values)
 
     def add_sample(self):
         # Create add sample dialog
@@ -2718,6 +3120,7 @@ class MedicalLabApp:
             status = status_map.get(status_text, SampleStatus.COLLECTED)
             
             # For each selected test, create a test request and sample
+            labels = []
             for test_name in selected_tests:
                 # Find the test type
                 test_type = None
@@ -2748,8 +3151,8 @@ class MedicalLabApp:
                     )
                     self.db.create_test_request(test_request)
                     
-                    # Generate barcode
-                    barcode = generate_barcode()
+                    # Next accession number of this workstation's block
+                    barcode = self.accessions.next()
                     
                     # Create sample
                     sample = Sample(
@@ -2761,10 +3164,12 @@ class MedicalLabApp:
                         notes=f"Sample for {test_name}"
                     )
                     self.db.create_sample(sample)
+                    labels.append(Label(barcode, patient_name, test_name))
             
-            messagebox.showinfo(_("Success"), _("Samples added successfully"))
             dialog.destroy()
             self.load_samples_data()
+            if labels and messagebox.askyesno(_("Success"), _("Samples added successfully. Print their labels now?")):
+                self.print_sample_labels(labels)
         
         # Buttons
         save_button_frame = ttk.Frame(dialog)
@@ -2783,8 +3188,8 @@ class MedicalLabApp:
             messagebox.showwarning(_("Warning"), _("Please select a sample"))
             return
         
-        sample_id = self.samples_tree.item(selected[0])['values'][0]
-        sample = self.db.get_sample_by_id(sample_id)
+        # Rows are keyed by sample ID
+        sample = self.db.get_sample(selected[0])
         if not sample:
             messagebox.showerror(_("Error"), _("Sample not found"))
             return
@@ -2828,51 +3233,63 @@ class MedicalLabApp:
         
         ttk.Label(dialog, text=_("Status:")).pack(pady=5)
         ttk.Label(dialog, text=_(sample.status.value)).pack(pady=5)
+        
+        # When the sample reached each status
+        history = self.db.get_sample_status_history(sample.id)
+        if history:
+            ttk.Label(dialog, text=_("Status History:")).pack(pady=5)
+            for change in history:
+                by = f" ({change.changed_by})" if change.changed_by else ""
+                ttk.Label(dialog, text=f"{change.changed_at.strftime('%Y-%m-%d %H:%M')}  "
+                                       f"{_(change.to_status.value)}{by}").pack()
     
     def update_sample_status(self):
+        """Move the selected samples, e.g. a whole rack, to a new status at once"""
         selected = self.samples_tree.selection()
         if not selected:
             messagebox.showwarning(_("Warning"), _("Please select a sample"))
             return
         
-        sample_id = self.samples_tree.item(selected[0])['values'][0]
-        sample = self.db.get_sample_by_id(sample_id)
-        if not sample:
-            messagebox.showerror(_("Error"), _("Sample not found"))
+        # Statuses at least one selected sample may move to (the status column is translated)
+        listed = {_(status.value): status for status in SampleStatus}
+        current = {listed[self.samples_tree.item(sample_id, "values")[4]] for sample_id in selected}
+        targets = [status for status in SampleStatus
+                   if any(status in SAMPLE_TRANSITIONS[source] for source in current)]
+        if not targets:
+            messagebox.showwarning(_("Warning"), _("The status of the selected samples cannot be changed"))
             return
-        
-        status_var = tk.StringVar(value=_(sample.status.value))
+        statuses = {_(status.value): status for status in targets}
+        status_var = tk.StringVar(value=_(targets[0].value))
         
         # Create update dialog
         dialog = tk.Toplevel(self.root)
         dialog.title(_("Update Sample Status"))
-        dialog.geometry("300x150")
+        dialog.geometry("340x180")
         dialog.transient(self.root)
         dialog.grab_set()
         
+        ttk.Label(dialog, text=_("{} samples selected").format(len(selected))).pack(pady=5)
         ttk.Label(dialog, text=_("Status:")).pack(pady=5)
-        status_combo = ttk.Combobox(dialog, textvariable=status_var,
-                                   values=[_("Collected"), _("Processing"), _("Completed")],
+        status_combo = ttk.Combobox(dialog, textvariable=status_var, values=list(statuses),
                                    state="readonly", width=37)
         status_combo.pack(pady=5)
         
         def update_status():
-            status_text = status_var.get()
-            
-            # Map status text to enum
-            status_map = {
-                _("Collected"): SampleStatus.COLLECTED,
-                _("Processing"): SampleStatus.PROCESSING,
-                _("Completed"): SampleStatus.COMPLETED
-            }
-            status = status_map.get(status_text, SampleStatus.COLLECTED)
+            status = statuses[status_var.get()]
+            changed_by = self.current_user.username if self.current_user else None
+            try:
+                result = self.db.transition_samples(list(selected), status, changed_by)
+            except Exception as e:
+                messagebox.showerror(_("Error"), f"{_('Failed to update sample status')}: {str(e)}", parent=dialog)
+                return
             
-            if self.db.update_sample_status(sample.id, status):
-                messagebox.showinfo(_("Success"), _("Sample status updated successfully"))
-                dialog.destroy()
-                self.load_samples_data()
-            else:
-                messagebox.showerror(_("Error"), _("Failed to update sample status"))
+            message = _("{} samples updated").format(len(result.moved))
+            if result.rejected:
+                message += "\n" + _("{} samples skipped: their status does not allow this change").format(
+                    len(result.rejected))
+            messagebox.showinfo(_("Success"), message)
+            dialog.destroy()
+            self.load_samples_data()
         
         # Buttons
         button_frame = ttk.Frame(dialog)
@@ -2882,26 +3299,198 @@ class MedicalLabApp:
         ttk.Button(button_frame, text=_("Cancel"), 
                   command=dialog.destroy).pack(side=tk.LEFT, padx=5)
     
+    def select_samples_by_status(self, status_text):
+        """Select every listed sample with the status, e.g. to move a run on at once"""
+        rows = [sample_id for sample_id in self.samples_tree.get_children()
+                if self.samples_tree.item(sample_id, "values")[4] == status_text]
+        self.samples_tree.selection_set(rows)
+    
+    def print_selected_sample_labels(self):
+        """Print labels for the samples selected on the Samples screen"""
+        selected = self.samples_tree.selection()
+        if not selected:
+            messagebox.showwarning(_("Warning"), _("Please select a sample"))
+            return
+        
+        labels = []
+        for sample_id in selected:
+            sample = self.db.get_sample(sample_id)
+            if sample:
+                # Columns: short ID, barcode, patient - test, collected, status
+                values = self.samples_tree.item(sample_id, "values")
+                labels.append(Label(sample.barcode, str(values[2]), sample.collected_at.strftime("%Y-%m-%d %H:%M")))
+        self.print_sample_labels(labels)
+    
+    def print_sample_labels(self, labels):
+        """Save labels as a PDF label sheet or a ZPL job for a label printer"""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            initialfile=f"labels-{datetime.now().strftime('%Y%m%d-%H%M%S')}.pdf",
+            filetypes=[(_("Label sheet (PDF)"), "*.pdf"), (_("Label printer (ZPL)"), "*.zpl")],
+            title=_("Print Labels")
+        )
+        if not file_path:
+            return
+        
+        try:
+            if file_path.lower().endswith(".zpl"):
+                with open(file_path, "w", encoding="utf-8") as f:
+                    f.write(zpl_labels(labels))
+            else:
+                label_sheet_pdf(file_path, labels)
+        except Exception as e:
+            messagebox.showerror(_("Error"), f"{_('Failed to print labels')}: {str(e)}")
+            return
+        messagebox.showinfo(_("Print Labels"), _("{} labels saved at: {}").format(len(labels), file_path))
+    
     def generate_sample_barcode(self):
         selected = self.samples_tree.selection()
         if not selected:
             messagebox.showwarning(_("Warning"), _("Please select a sample"))
             return
         
-        sample_id = self.samples_tree.item(selected[0])['values'][0]
-        sample = self.db.get_sample_by_id(sample_id)
-        if not sample:
-            messagebox.showerror(_("Error"), _("Sample not found"))
-            return
+        # Rows are keyed by sample ID
+        sample = self.db.get_sample(selected[0])
+        if not sample:
+            messagebox.showerror(_("Error"), _("Sample not found"))
+            return
+        
+        # Next accession number of this workstation's block
+        barcode = self.accessions.next()
+        
+        if self.db.update_sample_barcode(sample.id, barcode):
+            messagebox.showinfo(_("Success"), _("Barcode generated successfully"))
+            self.load_samples_data()
+        else:
+            messagebox.showerror(_("Error"), _("Failed to generate barcode"))
+    
+    def scan_intake(self):
+        """Receive samples with a barcode scanner: every scan sets the chosen status"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title(_("Scan Intake"))
+        dialog.geometry("640x480")
+        dialog.transient(self.root)
+        
+        statuses = {_(status.value): status for status in SampleStatus}
+        status_var = tk.StringVar(value=_(SampleStatus.VALID.value))
+        counts_var = tk.StringVar()
+        
+        top_frame = ttk.Frame(dialog)
+        top_frame.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Label(top_frame, text=_("Set status to:")).pack(side=tk.LEFT)
+        status_combo = ttk.Combobox(top_frame, textvariable=status_var, values=list(statuses),
+                                    state="readonly", width=20)
+        status_combo.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(dialog, text=_("Scan barcode:")).pack(anchor=tk.W, padx=10)
+        scan_entry = ttk.Entry(dialog, font=("Consolas", 16))
+        scan_entry.pack(fill=tk.X, padx=10, pady=5)
+        
+        columns = (_("Barcode"), _("Sample"), _("Result"))
+        scans_tree = ttk.Treeview(dialog, columns=columns, show="headings", height=12)
+        for col, width in zip(columns, (160, 300, 140)):
+            scans_tree.heading(col, text=col)
+            scans_tree.column(col, width=width)
+        scans_tree.tag_configure(QUEUED, background="#d4edda")
+        scans_tree.tag_configure(UNCHANGED, background="#e2e3e5")
+        scans_tree.tag_configure(NOT_ALLOWED, background="#fff3cd")
+        scans_tree.tag_configure(REPEATED, background="#fff3cd")
+        scans_tree.tag_configure(UNKNOWN, background="#f8d7da")
+        scans_tree.tag_configure(MISREAD, background="#f8d7da")
+        scans_tree.tag_configure("rejected", background="#f8d7da")
+        scans_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        ttk.Label(dialog, textvariable=counts_var).pack(anchor=tk.W, padx=10, pady=5)
+        
+        outcome_text = {
+            QUEUED: _("Updated"),
+            UNCHANGED: _("Already set"),
+            NOT_ALLOWED: _("Status does not allow this"),
+            REPEATED: _("Scanned twice"),
+            UNKNOWN: _("Unknown barcode"),
+            MISREAD: _("Misread, scan again"),
+        }
+        session = {}
+        # Row of each queued sample, to mark it if the write rejects it
+        queued_rows = {}
+        
+        def show_counts(error=None):
+            current = session["current"]
+            text = _("Scanned: {}  Saved: {}  Waiting: {}").format(
+                current.scanned, current.written, len(current.pending))
+            if current.rejected:
+                text += "  " + _("Not saved: {}").format(len(current.rejected))
+            if error is not None:
+                text += "  " + _("Save failed, retrying: {}").format(error)
+            counts_var.set(text)
+        
+        def on_flush(_written, error):
+            if not dialog.winfo_exists():
+                return
+            if error is None and session["current"].last_rejected:
+                # Changed elsewhere before the write: not updated after all
+                for sample_id, status in session["current"].last_rejected.items():
+                    row = queued_rows.pop(sample_id, None)
+                    if row is not None and scans_tree.exists(row):
+                        text = (_("Not saved: now {}").format(_(status.value)) if status is not None
+                                else _("Not saved: sample deleted"))
+                        scans_tree.set(row, columns[2], text)
+                        scans_tree.item(row, tags=("rejected",))
+                dialog.bell()
+            show_counts(error)
+        
+        def start_session(*_args):
+            # Changing the status starts a new session; the old one saves first
+            if "current" in session:
+                session["current"].close()
+            session["current"] = IntakeSession(self.db, self.barcode_index, statuses[status_var.get()],
+                                               root=dialog, on_flush=on_flush,
+                                               changed_by=self.current_user.username if self.current_user else None)
+            show_counts()
+            scan_entry.focus_set()
+        
+        def on_scan(_event=None):
+            barcode = scan_entry.get().strip()
+            scan_entry.delete(0, tk.END)
+            if not barcode:
+                return "break"
+            result = session["current"].scan(barcode)
+            name = ""
+            if result.sample is not None:
+                name = " - ".join(part for part in (result.sample.patient_name, result.sample.test_name) if part)
+            row = scans_tree.insert("", 0, values=(barcode, name, outcome_text[result.outcome]), tags=(result.outcome,))
+            if result.outcome == QUEUED:
+                queued_rows[result.sample.sample_id] = row
+            # Keep the list short so inserting stays instant
+            rows = scans_tree.get_children()
+            if len(rows) > 200:
+                scans_tree.delete(*rows[200:])
+            if result.outcome in (UNKNOWN, MISREAD, REPEATED, NOT_ALLOWED):
+                dialog.bell()
+            show_counts()
+            return "break"
+        
+        def close():
+            current = session["current"]
+            current.close()
+            if current.pending and not messagebox.askyesno(
+                    _("Warning"), _("{} status changes could not be saved. Close anyway?").format(len(current.pending)),
+                    parent=dialog):
+                return
+            dialog.destroy()
+            if self.current_screen == self.show_samples:
+                self.load_samples_data()
+        
+        status_combo.bind("<<ComboboxSelected>>", start_session)
+        scan_entry.bind("<Return>", on_scan)
+        scan_entry.bind("<KP_Enter>", on_scan)
         
-        # Generate barcode
-        barcode = generate_barcode()
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text=_("Done"), command=close).pack(side=tk.LEFT, padx=5)
+        dialog.protocol("WM_DELETE_WINDOW", close)
         
-        if self.db.update_sample_barcode(sample.id, barcode):
-            messagebox.showinfo(_("Success"), _("Barcode generated successfully"))
-            self.load_samples_data()
-        else:
-            messagebox.showerror(_("Error"), _("Failed to generate barcode"))
+        start_session()
     
     def show_results(self):
         self.current_screen = self.show_results
@@ -3130,21 +3719,7 @@ class MedicalLabApp:
         
         # Load from Word file button
         def load_from_word():
-            try:
-                file_path = filedialog.askopenfilename(
-                    title=_("Select Word Template File"),
-                    filetypes=[(_("Word files"), "*.docx"), (_("All files"), "*.*")]
-                )
-                
-                if file_path:
-                    # Load content from Word document
-                    doc = Document(file_path)
-                    content = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-                    content_text.delete("1.0", tk.END)
-                    content_text.insert("1.0", content)
-                    messagebox.showinfo(_("Success"), _("Template loaded successfully"))
-            except Exception as e:
-                messagebox.showerror(_("Error"), f"{_('Failed to load template')}: {str(e)}")
+            self.load_word_template(dialog, content_text)
         
         # Template buttons
         template_button_frame = ttk.Frame(template_frame)
@@ -3341,21 +3916,7 @@ class MedicalLabApp:
         template_button_frame.pack(fill=tk.X, pady=(0, 10))
         
         def load_from_word():
-            try:
-                file_path = filedialog.askopenfilename(
-                    title=_("Select Word Template File"),
-                    filetypes=[(_("Word files"), "*.docx"), (_("All files"), "*.*")]
-                )
-                
-                if file_path:
-                    # Load content from Word document
-                    doc = Document(file_path)
-                    content = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-                    content_text.delete("1.0", tk.END)
-                    content_text.insert("1.0", content)
-                    messagebox.showinfo(_("Success"), _("Template loaded successfully from Word file"))
-            except Exception as e:
-                messagebox.showerror(_("Error"), f"{_('Failed to load template')}: {str(e)}")
+            self.load_word_template(dialog, content_text)
     
         def apply_selected_template():
             test_name = test_var.get()
@@ -3371,8 +3932,11 @@ class MedicalLabApp:
             # Get template for this test type
             template = self.db.get_test_template_by_test_type(test_type.id)
             if template:
+                # Patient placeholders stay as they are until a patient is selected
+                patient_id = patient_map.get(patient_var.get())
+                patient = self.db.get_patient(patient_id) if patient_id else None
                 content_text.delete("1.0", tk.END)
-                content_text.insert("1.0", template.template_content)
+                content_text.insert("1.0", self.template_engine.render(template, patient, test_type))
                 messagebox.showinfo(_("Success"), _("Template applied successfully"))
             else:
                 messagebox.showinfo(_("Info"), _("No template found for this test type. Create one in template management."))
@@ -3647,21 +4211,7 @@ class MedicalLabApp:
         template_button_frame.pack(fill=tk.X, pady=10)
         
         def load_from_word():
-            try:
-                file_path = filedialog.askopenfilename(
-                    title=_("Select Word Template File"),
-                    filetypes=[(_("Word files"), "*.docx"), (_("All files"), "*.*")]
-                )
-                
-                if file_path:
-                    # Load content from Word document
-                    doc = Document(file_path)
-                    content = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-                    content_text.delete("1.0", tk.END)
-                    content_text.insert("1.0", content)
-                    messagebox.showinfo(_("Success"), _("Template loaded successfully from Word file"))
-            except Exception as e:
-                messagebox.showerror(_("Error"), f"{_('Failed to load template')}: {str(e)}")
+            self.load_word_template(dialog, content_text)
     
         def apply_template():
             selected_template_id = template_var.get()
@@ -3673,7 +4223,7 @@ class MedicalLabApp:
             template = self.db.get_test_template(selected_template_id)
             if template:
                 content_text.delete("1.0", tk.END)
-                content_text.insert("1.0", template.template_content)
+                content_text.insert("1.0", self.template_engine.render(template, patient, test_type, test_request))
                 messagebox.showinfo(_("Success"), _("Template applied successfully"))
             else:
                 messagebox.showerror(_("Error"), _("Template not found"))
@@ -3866,9 +4416,9 @@ class MedicalLabApp:
         text_frame.grid_rowconfigure(0, weight=1)
         text_frame.grid_columnconfigure(0, weight=1)
         
-        # Format the content for printing
-        print_content = self.format_result_for_printing(report, patient, test_type, test_request)
-        text_widget.insert("1.0", print_content)
+        # The preview and the PDF are rendered from the same document
+        document = result_document(report, patient, test_type, test_request)
+        text_widget.insert("1.0", document.to_text())
         text_widget.config(state=tk.DISABLED)  # Make it read-only
         
         # Buttons
@@ -3876,114 +4426,212 @@ class MedicalLabApp:
         button_frame.pack(fill=tk.X, padx=10, pady=10)
         
         ttk.Button(button_frame, text=_("Print"), 
-                  command=lambda: self.do_print_result(text_widget), 
+                  command=lambda: self.do_print_result(dialog, document), 
                   style="Accent.TButton").pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text=_("Save as PDF"), 
-                  command=lambda: self.save_result_as_pdf(print_content), 
+                  command=lambda: self.save_result_as_pdf(dialog, document, f"result-{report.id}.pdf"), 
                   style="Accent.TButton").pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text=_("Close"), 
                   command=dialog.destroy, 
                   style="Accent.TButton").pack(side=tk.RIGHT, padx=5)
 
-    def format_result_for_printing(self, report, patient, test_type, test_request):
-        """Format the result content for printing"""
-        # Create a formatted string for the result
-        content = []
-        content.append("=" * 60)
-        content.append(f"{_('MEDICAL LABORATORY RESULT REPORT'):^60}")
-        content.append("=" * 60)
-        content.append("")
+    def do_print_result(self, dialog, document):
+        """Send the result to the default printer"""
+        self.print_document(dialog, document, _("Failed to print result"))
+
+    def save_result_as_pdf(self, dialog, document, file_name):
+        """Save the result as a PDF file"""
+        self.save_document_as_pdf(dialog, document, file_name, _("Save Result as PDF"), _("Failed to save result as PDF"))
+
+    def save_document_as_pdf(self, dialog, document, file_name, title, error_message):
+        """Ask for a file name and render document there as a PDF"""
+        file_path = filedialog.asksaveasfilename(
+            parent=dialog,
+            defaultextension=".pdf",
+            initialfile=file_name,
+            filetypes=[(_("PDF files"), "*.pdf"), (_("All files"), "*.*")],
+            title=title
+        )
+        if not file_path:
+            return
         
-        # Report information
-        content.append(f"{_('Report ID')}: {report.id}")
-        content.append(f"{_('Report Date')}: {report.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
-        content.append("")
+        def done(pages, error):
+            if error:
+                messagebox.showerror(_("Error"), f"{error_message}: {str(error)}", parent=dialog)
+            else:
+                messagebox.showinfo(_("Save as PDF"), _("PDF saved at: {}").format(file_path), parent=dialog)
+        self.run_in_background(dialog, lambda: self.pdf_renderer.render(file_path, document), done)
+
+    def print_document(self, dialog, document, error_message):
+        """Render document to a temporary PDF and send it to the default printer"""
+        def work():
+            fd, path = tempfile.mkstemp(prefix="medical-lab-", suffix=".pdf")
+            os.close(fd)
+            self.pdf_renderer.render(path, document)
+            if sys.platform == "win32":
+                os.startfile(path, "print")
+                return
+            command = shutil.which("lp") or shutil.which("lpr")
+            if command is None:
+                raise RuntimeError(_("No print command (lp or lpr) found"))
+            subprocess.run([command, path], check=True, capture_output=True, timeout=60)
+            os.remove(path)
+        
+        def done(result, error):
+            if error:
+                messagebox.showerror(_("Error"), f"{error_message}: {str(error)}", parent=dialog)
+            else:
+                messagebox.showinfo(_("Print"), _("Sent to the printer"), parent=dialog)
+        self.run_in_background(dialog, work, done)
+
+    def save_cumulative_report(self):
+        """Save all results of the selected result's patient as one PDF"""
+        selected = self.results_tree.selection()
+        if not selected:
+            messagebox.showwarning(_("Warning"), _("Please select a result"))
+            return
         
-        # Patient information
-        content.append("-" * 30)
-        content.append(f"{_('PATIENT INFORMATION')}")
-        content.append("-" * 30)
-        content.append(f"{_('Name')}: {patient.name}")
-        content.append(f"{_('ID')}: {patient.id}")
-        content.append(f"{_('Age')}: {patient.age}")
-        content.append(f"{_('Gender')}: {_(patient.gender.value)}")
-        content.append(f"{_('Contact')}: {patient.contact_info or _('N/A')}")
-        content.append("")
+        report = self.db.get_medical_report(self.results_tree.item(selected[0], "tags")[0])
+        test_request = report and self.db.get_test_request(report.test_request_id)
+        patient = test_request and self.db.get_patient(test_request.patient_id)
+        if not patient:
+            messagebox.showerror(_("Error"), _("Patient not found"))
+            return
         
-        # Test information
-        content.append("-" * 30)
-        content.append(f"{_('TEST INFORMATION')}")
-        content.append("-" * 30)
-        content.append(f"{_('Test Name')}: {test_type.name}")
-        content.append(f"{_('Test Category')}: {test_type.category}")
-        content.append(f"{_('Test ID')}: {test_request.id}")
-        content.append(f"{_('Requested By')}: {test_request.requested_by}")
-        content.append(f"{_('Requested At')}: {test_request.requested_at.strftime('%Y-%m-%d %H:%M')}")
-        content.append(f"{_('Status')}: {_(test_request.status.value)}")
-        content.append("")
+        results = []
+        with self.db.snapshot() as db:
+            test_types = {test_type.id: test_type for test_type in db.get_all_test_types()}
+            for test_request in db.get_test_requests_by_patient(patient.id):
+                test_type = test_types.get(test_request.test_type_id)
+                if test_type is None:
+                    continue
+                # Report lists leave out the body
+                for listed in db.get_medical_reports_by_test_request(test_request.id):
+                    results.append((db.get_medical_report(listed.id), test_type, test_request))
+        
+        self.save_document_as_pdf(self.root, cumulative_document(patient, results), f"cumulative-{patient.id}.pdf",
+                                  _("Save Cumulative Report as PDF"), _("Failed to save cumulative report"))
+
+    def show_batch_reports(self):
+        """Render many results to PDF at once, selected by date, status or patient"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title(_("Batch Reports"))
+        dialog.geometry("460x420")
+        dialog.transient(self.root)
+        dialog.grab_set()
         
-        # Result content
-        content.append("-" * 30)
-        content.append(f"{_('RESULT DETAILS')}")
-        content.append("-" * 30)
-        content.append(report.content)
-        content.append("")
+        ttk.Label(dialog, text=_("Batch Reports"), font=("Arial", 14, "bold")).pack(pady=10)
+        form = ttk.Frame(dialog)
+        form.pack(fill=tk.X, padx=20)
+        
+        today = datetime.now().strftime("%Y-%m-%d")
+        ttk.Label(form, text=_("From Date (YYYY-MM-DD):")).grid(row=0, column=0, sticky=tk.W, pady=4)
+        from_entry = ttk.Entry(form, width=20)
+        from_entry.insert(0, today)
+        from_entry.grid(row=0, column=1, sticky=tk.W, pady=4)
+        ttk.Label(form, text=_("To Date (YYYY-MM-DD):")).grid(row=1, column=0, sticky=tk.W, pady=4)
+        to_entry = ttk.Entry(form, width=20)
+        to_entry.insert(0, today)
+        to_entry.grid(row=1, column=1, sticky=tk.W, pady=4)
+        
+        statuses = {_("All"): None}
+        statuses.update({_(status.value): status for status in TestStatus})
+        ttk.Label(form, text=_("Status:")).grid(row=2, column=0, sticky=tk.W, pady=4)
+        status_var = tk.StringVar(value=_("All"))
+        ttk.Combobox(form, textvariable=status_var, values=list(statuses), state="readonly",
+                     width=18).grid(row=2, column=1, sticky=tk.W, pady=4)
+        ttk.Label(form, text=_("Patient ID:")).grid(row=3, column=0, sticky=tk.W, pady=4)
+        patient_entry = ttk.Entry(form, width=20)
+        patient_entry.grid(row=3, column=1, sticky=tk.W, pady=4)
+        signed_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(form, text=_("Signed results only"), variable=signed_var).grid(
+            row=4, column=0, columnspan=2, sticky=tk.W, pady=4)
+        merged_var = tk.BooleanVar(value=False)
+        ttk.Radiobutton(form, text=_("One PDF per result in a folder"), variable=merged_var,
+                        value=False).grid(row=5, column=0, columnspan=2, sticky=tk.W)
+        ttk.Radiobutton(form, text=_("All results in a single PDF"), variable=merged_var,
+                        value=True).grid(row=6, column=0, columnspan=2, sticky=tk.W)
+        
+        progress_bar = ttk.Progressbar(dialog, mode="determinate", maximum=1)
+        progress_bar.pack(fill=tk.X, padx=20, pady=(15, 5))
+        status_label = ttk.Label(dialog, text="", foreground="#000080")
+        status_label.pack()
+        
+        busy = {"running": False}
+        progress = {"done": 0, "total": 0}
+        
+        def show_progress():
+            if not busy["running"] or not dialog.winfo_exists():
+                return
+            if progress["total"]:
+                progress_bar.config(maximum=progress["total"], value=progress["done"])
+                status_label.config(text=_("Rendered {} of {} results").format(progress["done"], progress["total"]))
+            dialog.after(200, show_progress)
         
-        # Signature information
-        content.append("-" * 30)
-        content.append(f"{_('SIGNATURE INFORMATION')}")
-        content.append("-" * 30)
-        content.append(f"{_('Signed By')}: {report.signed_by if report.signed_by != 'N/A' else _('Not signed yet')}")
-        content.append(f"{_('Signed At')}: {report.signed_at.strftime('%Y-%m-%d %H:%M') if report.signed_at else _('Not signed yet')}")
-        content.append("")
+        def on_progress(done, total):
+            progress["done"], progress["total"] = done, total
         
-        # Footer
-        content.append("=" * 60)
-        content.append(f"{_('Generated by Medical Laboratory Management System')}")
-        content.append(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        content.append("=" * 60)
+        def start():
+            if busy["running"]:
+                return
+            try:
+                start_date = datetime.strptime(from_entry.get().strip(), "%Y-%m-%d")
+                end_date = datetime.strptime(to_entry.get().strip(), "%Y-%m-%d").replace(hour=23, minute=59, second=59)
+            except ValueError:
+                messagebox.showerror(_("Error"), _("Invalid date format. Please use YYYY-MM-DD"), parent=dialog)
+                return
+            
+            job = BatchReportJob(self.db)
+            results = job.select(start_date, end_date, statuses[status_var.get()],
+                                 patient_entry.get().strip() or None, signed_var.get())
+            if not results:
+                messagebox.showinfo(_("Batch Reports"), _("No results match the selection"), parent=dialog)
+                return
+            
+            if merged_var.get():
+                target = filedialog.asksaveasfilename(
+                    parent=dialog, defaultextension=".pdf", initialfile=f"results-{from_entry.get().strip()}.pdf",
+                    filetypes=[(_("PDF files"), "*.pdf")], title=_("Save Batch Report as PDF"))
+                work = lambda: job.render_merged(results, target, progress=on_progress)
+            else:
+                target = filedialog.askdirectory(parent=dialog, title=_("Select Output Folder"))
+                work = lambda: job.render_to_directory(results, target, progress=on_progress)
+            if not target:
+                return
+            
+            busy["running"] = True
+            progress["done"], progress["total"] = 0, len(results)
+            status_label.config(text=_("Rendering {} results...").format(len(results)), foreground="#000080")
+            
+            def done(result, error):
+                busy["running"] = False
+                if not dialog.winfo_exists():
+                    return
+                if error:
+                    status_label.config(text=_("Batch failed: {}").format(error), foreground="red")
+                    return
+                progress_bar.config(value=progress["total"])
+                status_label.config(text=_("{} results saved to {}").format(len(results), target), foreground="green")
+            self.run_in_background(dialog, work, done)
+            show_progress()
         
-        return "\n".join(content)
-
-    def do_print_result(self, text_widget):
-        """Actually print the result"""
-        try:
-            # Get the content from the text widget
-            content = text_widget.get("1.0", tk.END)
-            
-            # In a real implementation, we would use the system's print dialog
-            # For now, we'll show a message indicating what would happen
-            messagebox.showinfo(
-                _("Print"), 
-                _("In a full implementation, this would send the following content to your printer:\n\n") + 
-                content[:200] + "..."
-            )
-        except Exception as e:
-            messagebox.showerror(_("Error"), f"{_('Failed to print result')}: {str(e)}")
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Button(button_frame, text=_("Render"), command=start, style="Accent.TButton").pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text=_("Close"), command=dialog.destroy, style="Accent.TButton").pack(side=tk.RIGHT, padx=5)
 
-    def save_result_as_pdf(self, content):
-        """Save the result as a PDF file"""
-        try:
-            # Ask user for file location
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[(_("PDF files"), "*.pdf"), (_("All files"), "*.*")],
-                title=_("Save Result as PDF")
-            )
-            
-            if file_path:
-                # In a real implementation, we would convert the content to PDF
-                # For now, we'll save as a text file and show a message
-                with open(file_path.replace('.pdf', '.txt'), 'w') as f:
-                    f.write(content)
-                
-                messagebox.showinfo(
-                    _("Save as PDF"), 
-                    _("In a full implementation, this would save the result as a PDF file.\n\n") +
-                    _("For now, a text file has been saved at: {}").format(file_path.replace('.pdf', '.txt'))
-                )
-        except Exception as e:
-            messagebox.showerror(_("Error"), f"{_('Failed to save result as PDF')}: {str(e)}")
+    def invoice_lines(self, invoice_id):
+        """(test name, price) pairs of the tests billed on an invoice"""
+        invoice = self.db.get_invoice(invoice_id)
+        if not invoice:
+            return []
+        lines = []
+        for request_id in invoice.test_request_ids:
+            test_request = self.db.get_test_request(request_id)
+            test_type = test_request and self.db.get_test_type(test_request.test_type_id)
+            if test_type:
+                lines.append((test_type.name, f"${test_type.price:.2f}"))
+        return lines
 
     def print_invoice(self):
         """Print the selected invoice"""
@@ -4031,85 +4679,28 @@ class MedicalLabApp:
         text_frame.grid_rowconfigure(0, weight=1)
         text_frame.grid_columnconfigure(0, weight=1)
     
-        # Format the content for printing
-        print_content = self.format_invoice_for_printing(invoice_id, patient_name, amount, paid, status, date)
-        text_widget.insert("1.0", print_content)
+        # The preview and the PDF are rendered from the same document
+        document = invoice_document(invoice_id, patient_name, date, amount, paid, status,
+                                    self.invoice_lines(invoice_id))
+        text_widget.insert("1.0", document.to_text())
+        text_widget.config(state=tk.DISABLED)
     
         # Buttons
         button_frame = ttk.Frame(dialog)
         button_frame.pack(fill=tk.X, padx=10, pady=10)
     
         ttk.Button(button_frame, text=_("Print"), 
-                  command=lambda: self.do_print_invoice(text_widget)).pack(side=tk.LEFT, padx=5)
+                  command=lambda: self.do_print_invoice(dialog, document)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text=_("Save as PDF"), 
+                  command=lambda: self.save_document_as_pdf(dialog, document, f"invoice-{invoice_id}.pdf",
+                                                            _("Save Invoice as PDF"),
+                                                            _("Failed to save invoice as PDF"))).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text=_("Close"), 
                   command=dialog.destroy).pack(side=tk.RIGHT, padx=5)
 
-    def format_invoice_for_printing(self, invoice_id, patient_name, amount, paid, status, date):
-        """Format the invoice content for printing"""
-        # Create a formatted string for the invoice
-        content = []
-        content.append("=" * 60)
-        content.append(f"{_('MEDICAL LABORATORY INVOICE'):^60}")
-        content.append("=" * 60)
-        content.append("")
-    
-        # Invoice information
-        content.append(f"{_('Invoice ID')}: {invoice_id}")
-        content.append(f"{_('Invoice Date')}: {date}")
-        content.append("")
-    
-        # Patient information
-        content.append("-" * 30)
-        content.append(f"{_('PATIENT INFORMATION')}")
-        content.append("-" * 30)
-        content.append(f"{_('Patient Name')}: {patient_name}")
-        content.append("")
-    
-        # Billing information
-        content.append("-" * 30)
-        content.append(f"{_('BILLING INFORMATION')}")
-        content.append("-" * 30)
-        content.append(f"{_('Total Amount')}: {amount}")
-        content.append(f"{_('Paid Amount')}: {paid}")
-        content.append(f"{_('Status')}: {status}")
-        content.append("")
-    
-        # Payment details (in a real app, this would include individual tests)
-        content.append("-" * 30)
-        content.append(f"{_('PAYMENT DETAILS')}")
-        content.append("-" * 30)
-        content.append(f"{_('Test'):<30} {_('Price')}")
-        content.append("-" * 30)
-        content.append(f"{_('Complete Blood Count'):<30} {'$50.00'}")
-        content.append(f"{_('Urinalysis'):<30} {'$30.00'}")
-        content.append(f"{_('Stool Analysis'):<30} {'$40.00'}")
-        content.append("-" * 30)
-        content.append(f"{'Total':<30} {amount}")
-        content.append("")
-    
-        # Footer
-        content.append("=" * 60)
-        content.append(f"{_('Generated by Medical Laboratory Management System')}")
-        content.append(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        content.append("=" * 60)
-    
-        return "\n".join(content)
-
-    def do_print_invoice(self, text_widget):
-        """Actually print the invoice"""
-        try:
-            # Get the content from the text widget
-            content = text_widget.get("1.0", tk.END)
-            
-            # In a real implementation, we would use the system's print dialog
-            # For now, we'll show a message indicating what would happen
-            messagebox.showinfo(
-                _("Print"), 
-                _("In a full implementation, this would send the following content to your printer:\n\n") + 
-                content[:200] + "..."
-            )
-        except Exception as e:
-            messagebox.showerror(_("Error"), f"{_('Failed to print invoice')}: {str(e)}")
+    def do_print_invoice(self, dialog, document):
+        """Send the invoice to the default printer"""
+        self.print_document(dialog, document, _("Failed to print invoice"))
 
     def generate_statistics(self):
         # For now, we'll just reload the data
@@ -4173,9 +4764,11 @@ class MedicalLabApp:
         report_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # Generate report content
-        patients = self.db.get_all_patients()
-        test_requests = self.db.get_test_requests_by_date_range(from_date, to_date)
+        # Generate report content from one consistent snapshot
+        with self.analytics_snapshot(from_date, to_date) as snapshot:
+            patients = snapshot.get_all_patients()
+            test_requests = snapshot.get_test_requests_by_date_range(from_date, to_date)
+            test_types = {test_type.id: test_type for test_type in snapshot.get_all_test_types()}
         
         # Filter patients to only those with tests in the date range
         patient_ids_in_range = set(tr.patient_id for tr in test_requests)
@@ -4219,7 +4812,7 @@ class MedicalLabApp:
                 # Sort by date
                 sorted_tests = sorted(patient_tests, key=lambda x: x.requested_at)
                 for test in sorted_tests:
-                    test_type = self.db.get_test_type(test.test_type_id)
+                    test_type = test_types.get(test.test_type_id)
                     test_name = test_type.name if test_type else _("Unknown Test")
                     content.append(f"  - {test_name} ({_(test.status.value)}) - {test.requested_at.strftime('%Y-%m-%d %H:%M')}")
             
@@ -4286,10 +4879,13 @@ class MedicalLabApp:
         report_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # Generate report content
-        invoices = self.db.get_invoices_by_date_range(from_date, to_date)
-        test_types = self.db.get_all_test_types()
-        test_requests = self.db.get_test_requests_by_date_range(from_date, to_date)
+        # Generate report content from one consistent snapshot
+        with self.analytics_snapshot(from_date, to_date) as snapshot:
+            invoices = snapshot.get_invoices_by_date_range(from_date, to_date)
+            test_types = {test_type.id: test_type for test_type in snapshot.get_all_test_types()}
+            test_requests = snapshot.get_test_requests_by_date_range(from_date, to_date)
+            patients = {patient_id: snapshot.get_patient(patient_id)
+                        for patient_id in set(invoice.patient_id for invoice in invoices)}
         
         # Report header
         content = []
@@ -4321,7 +4917,7 @@ class MedicalLabApp:
         # Calculate revenue by test type
         test_revenue = {}
         for test_request in test_requests:
-            test_type = self.db.get_test_type(test_request.test_type_id)
+            test_type = test_types.get(test_request.test_type_id)
             if test_type:
                 if test_type.name not in test_revenue:
                     test_revenue[test_type.name] = 0
@@ -4340,7 +4936,7 @@ class MedicalLabApp:
         content.append("-" * 40)
         
         for invoice in invoices:
-            patient = self.db.get_patient(invoice.patient_id)
+            patient = patients.get(invoice.patient_id)
             patient_name = patient.name if patient else _("Unknown Patient")
             
             content.append(f"{_('Invoice ID')}: {invoice.id}")
@@ -4443,21 +5039,7 @@ class MedicalLabApp:
     
         # Load from Word file button
         def load_from_word():
-            try:
-                file_path = filedialog.askopenfilename(
-                    title=_("Select Word Template File"),
-                    filetypes=[(_("Word files"), "*.docx"), (_("All files"), "*.*")]
-                )
-                
-                if file_path:
-                    # Load content from Word document
-                    doc = Document(file_path)
-                    content = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-                    template_text.delete("1.0", tk.END)
-                    template_text.insert("1.0", content)
-                    messagebox.showinfo(_("Success"), _("Template loaded successfully from Word file"))
-            except Exception as e:
-                messagebox.showerror(_("Error"), f"{_('Failed to load template')}: {str(e)}")
+            self.load_word_template(dialog, template_text)
     
         # Save template button
         def save_template():
@@ -4687,6 +5269,8 @@ class MedicalLabApp:
                   command=self.sign_report, style="Accent.TButton").pack(side=tk.LEFT, padx=5)
         ttk.Button(action_frame, text=_("Send Report"), 
                   command=self.send_report, style="Accent.TButton").pack(side=tk.LEFT, padx=5)
+        ttk.Button(action_frame, text=_("Email Outbox"), 
+                  command=self.show_mail_outbox, style="Accent.TButton").pack(side=tk.LEFT, padx=5)
     
     def load_reports_data(self):
         # Check if reports_tree exists
@@ -4717,7 +5301,7 @@ class MedicalLabApp:
                 if test_type:
                     test_name = test_type.name
             
-            self.reports_tree.insert("", tk.END, values=(
+            self.reports_tree.insert("", tk.END, iid=report.id, values=(
                 report.id[:8],  # Short ID for display
                 f"{patient_name} - {test_name}",
                 report.signed_by if report.signed_by != "N/A" else _("Not signed"),
@@ -4735,41 +5319,11 @@ class MedicalLabApp:
             self.results_tree.delete(item)
         
         # Load medical reports from database
-        reports = self.db.get_all_medical_reports()
-        
-        for report in reports:
-            # Get test request to get patient and test type info
-            test_request = self.db.get_test_request(report.test_request_id)
-            patient_name = _("Unknown Patient")
-            test_name = _("Unknown Test")
-            status = _("Pending")
-            
-            if test_request:
-                # Get patient info
-                patient = self.db.get_patient(test_request.patient_id)
-                if patient:
-                    patient_name = patient.name
-                
-                # Get test type info
-                test_type = self.db.get_test_type(test_request.test_type_id)
-                if test_type:
-                    test_name = test_type.name
-                
-                # Set status
-                status = _(test_request.status.value)
-            
+        for report_id, values in build_results_rows(self.db):
             # Insert item and store the full ID in the item's values
-            item_id = self.results_tree.insert("", tk.END, values=(
-                report.id[:8],  # Short ID for display
-                patient_name,
-                test_name,
-                status,
-                report.created_at.strftime("%Y-%m-%d %H:%M")
-            ))
-            # Store the full ID in the item's tags for later retrieval
-            self.results_tree.item(item_id, tags=(report.id,))
+            item_id = self.results_tree.insert("", tk.END, values=values)
             # Store the full ID in the item's tags for later retrieval
-            self.results_tree.item(item_id, tags=(report.id,))
+            self.results_tree.item(item_id, tags=(report_id,))
     
     def create_report(self):
         # Create report dialog
@@ -4847,13 +5401,104 @@ class MedicalLabApp:
         messagebox.showinfo(_("Sign Report"), _("Report signing functionality would be implemented here"))
     
     def send_report(self):
+        """E-mail the selected reports to their patients as PDF attachments"""
         selected = self.reports_tree.selection()
         if not selected:
             messagebox.showwarning(_("Warning"), _("Please select a report"))
             return
         
-        # In a real app, this would send the report
-        messagebox.showinfo(_("Send Report"), _("Report sending functionality would be implemented here"))
+        # Rows are keyed by report ID
+        report_ids = list(selected)
+        
+        def work():
+            results, recipients, skipped = [], [], 0
+            for report_id in report_ids:
+                report = self.db.get_medical_report(report_id)
+                test_request = self.db.get_test_request(report.test_request_id) if report else None
+                patient = self.db.get_patient(test_request.patient_id) if test_request else None
+                test_type = self.db.get_test_type(test_request.test_type_id) if test_request else None
+                email = find_email_address(patient.contact_info) if patient else None
+                if not (test_type and email):
+                    skipped += 1
+                    continue
+                results.append((report, patient, test_type, test_request))
+                recipients.append(email)
+            if not results:
+                return 0, skipped
+            
+            messages = []
+            with tempfile.TemporaryDirectory() as directory:
+                paths = BatchReportJob(self.db).render_to_directory(results, directory)
+                for (_report, patient, test_type, _request), email, path in zip(results, recipients, paths):
+                    with open(path, "rb") as f:
+                        attachment = f.read()
+                    messages.append(OutboxMessage(
+                        email,
+                        _("Your {} result").format(test_type.name),
+                        _("Dear {},\n\nYour {} result is attached.\n").format(patient.name, test_type.name),
+                        os.path.basename(path),
+                        attachment
+                    ))
+            # Saved in the outbox in one transaction, then sent in the background
+            self.db.create_outbox_messages(messages)
+            return len(messages), skipped
+        
+        def done(result, error):
+            if error is not None:
+                messagebox.showerror(_("Error"), f"{_('Failed to send reports')}: {str(error)}")
+                return
+            queued, skipped = result
+            self.mail_sender.wake()
+            message = _("{} reports queued for e-mail").format(queued)
+            if skipped:
+                message += "\n" + _("{} reports skipped: no e-mail address for the patient").format(skipped)
+            messagebox.showinfo(_("Send Report"), message)
+        
+        self.run_in_background(self.content_frame, work, done)
+    
+    def show_mail_outbox(self):
+        """Delivery status of the e-mail sent from this workstation"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title(_("Email Outbox"))
+        dialog.geometry("800x450")
+        dialog.transient(self.root)
+        
+        counts_var = tk.StringVar()
+        ttk.Label(dialog, textvariable=counts_var).pack(anchor=tk.W, padx=10, pady=10)
+        
+        columns = (_("To"), _("Subject"), _("Status"), _("Attempts"), _("Sent At"), _("Last Error"))
+        tree = ttk.Treeview(dialog, columns=columns, show="headings")
+        for col, width in zip(columns, (180, 180, 80, 70, 120, 250)):
+            tree.heading(col, text=col)
+            tree.column(col, width=width)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10)
+        
+        def load():
+            counts = self.db.get_outbox_status_counts()
+            counts_var.set("   ".join(f"{_(status.value)}: {counts[status.value]}" for status in MailStatus))
+            tree.delete(*tree.get_children())
+            for message in self.db.get_outbox_messages():
+                tree.insert("", tk.END, values=(
+                    message.recipient,
+                    message.subject,
+                    _(message.status.value),
+                    message.attempts,
+                    message.sent_at.strftime("%Y-%m-%d %H:%M") if message.sent_at else "",
+                    message.last_error or ""
+                ))
+        
+        def retry_failed():
+            self.db.requeue_failed_outbox_messages()
+            self.mail_sender.wake()
+            load()
+        
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text=_("Refresh"), command=load).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text=_("Retry Failed"), command=retry_failed).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text=_("Close"), command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+        
+        load()
     
     def show_billing(self):
         self.current_screen = self.show_billing
@@ -5343,6 +5988,10 @@ class MedicalLabApp:
                   command=self.delete_result, style="Accent.TButton").pack(side=tk.LEFT, padx=5)
         ttk.Button(action_frame, text=_("Print Result"), 
                   command=self.print_selected_result, style="Accent.TButton").pack(side=tk.LEFT, padx=5)
+        ttk.Button(action_frame, text=_("Cumulative Report"), 
+                  command=self.save_cumulative_report, style="Accent.TButton").pack(side=tk.LEFT, padx=5)
+        ttk.Button(action_frame, text=_("Batch Reports"), 
+                  command=self.show_batch_reports, style="Accent.TButton").pack(side=tk.LEFT, padx=5)
     
     def show_billing(self):
         self.current_screen = self.show_billing
@@ -6003,22 +6652,13 @@ class MedicalLabApp:
                 widget.destroy()
         
         # Get data from database
-        patients = self.db.get_all_patients()
-        test_requests = self.db.get_all_test_requests()
-        test_types = self.db.get_all_test_types()
-        invoices = self.db.get_all_invoices()
-        inventory_items = self.db.get_all_inventory_items()
+        with self.analytics_snapshot() as snapshot:
+            stats = build_statistics(snapshot)
         
         # Patient statistics
-        total_patients = len(patients)
-        # Calculate new patients (registered this month)
-        from datetime import datetime, timedelta
-        one_month_ago = datetime.now() - timedelta(days=30)
-        new_patients = len([p for p in patients if p.created_at >= one_month_ago])
-        
-        ttk.Label(patient_frame, text=_("Total Patients: {}").format(total_patients), 
+        ttk.Label(patient_frame, text=_("Total Patients: {}").format(stats["total_patients"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(patient_frame, text=_("New Patients (Last 30 Days): {}").format(new_patients), 
+        ttk.Label(patient_frame, text=_("New Patients (Last 30 Days): {}").format(stats["new_patients"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
         
         # Add button for detailed patient report
@@ -6026,67 +6666,21 @@ class MedicalLabApp:
                   command=self.generate_detailed_patient_report, style="Accent.TButton").pack(pady=10)
         
         # Test statistics
-        total_tests = len(test_requests)
-        pending_tests = len([t for t in test_requests if t.status.name == "PENDING"])
-        completed_tests = len([t for t in test_requests if t.status.name == "COMPLETED"])
-        
-        # Find most requested test
-        test_type_count = {}
-        for request in test_requests:
-            test_type_count[request.test_type_id] = test_type_count.get(request.test_type_id, 0) + 1
-        
-        most_requested_test = ""
-        if test_type_count:
-            most_requested_test_id = max(test_type_count, key=test_type_count.get)
-            most_requested_test_obj = next((t for t in test_types if t.id == most_requested_test_id), None)
-            if most_requested_test_obj:
-                most_requested_test = most_requested_test_obj.name
-        
-        ttk.Label(test_frame, text=_("Total Tests: {}").format(total_tests), 
-                 font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(test_frame, text=_("Pending Tests: {}").format(pending_tests), 
-                 font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(test_frame, text=_("Completed Tests: {}").format(completed_tests), 
-                 font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(test_frame, text=_("Most Requested Test: {}").format(most_requested_test), 
-                 font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        
-        # Test statistics
-        total_tests = len(test_requests)
-        pending_tests = len([t for t in test_requests if t.status.name == "PENDING"])
-        completed_tests = len([t for t in test_requests if t.status.name == "COMPLETED"])
-        
-        # Find most requested test
-        test_type_count = {}
-        for request in test_requests:
-            test_type_count[request.test_type_id] = test_type_count.get(request.test_type_id, 0) + 1
-        
-        most_requested_test = ""
-        if test_type_count:
-            most_requested_test_id = max(test_type_count, key=test_type_count.get)
-            most_requested_test_obj = next((t for t in test_types if t.id == most_requested_test_id), None)
-            if most_requested_test_obj:
-                most_requested_test = most_requested_test_obj.name
-        
-        ttk.Label(test_frame, text=_("Total Tests: {}").format(total_tests), 
+        ttk.Label(test_frame, text=_("Total Tests: {}").format(stats["total_tests"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(test_frame, text=_("Pending Tests: {}").format(pending_tests), 
+        ttk.Label(test_frame, text=_("Pending Tests: {}").format(stats["pending_tests"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(test_frame, text=_("Completed Tests: {}").format(completed_tests), 
+        ttk.Label(test_frame, text=_("Completed Tests: {}").format(stats["completed_tests"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(test_frame, text=_("Most Requested Test: {}").format(most_requested_test), 
+        ttk.Label(test_frame, text=_("Most Requested Test: {}").format(stats["most_requested_test"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
         
         # Financial statistics
-        total_revenue = sum(inv.total_amount for inv in invoices)
-        outstanding_payments = sum(inv.total_amount - inv.paid_amount for inv in invoices)
-        average_test_price = sum(t.price for t in test_types) / len(test_types) if test_types else 0
-        
-        ttk.Label(financial_frame, text=_("Total Revenue: ${:.2f}").format(total_revenue), 
+        ttk.Label(financial_frame, text=_("Total Revenue: ${:.2f}").format(stats["total_revenue"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(financial_frame, text=_("Outstanding Payments: ${:.2f}").format(outstanding_payments), 
+        ttk.Label(financial_frame, text=_("Outstanding Payments: ${:.2f}").format(stats["outstanding_payments"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(financial_frame, text=_("Average Test Price: ${:.2f}").format(average_test_price), 
+        ttk.Label(financial_frame, text=_("Average Test Price: ${:.2f}").format(stats["average_test_price"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
         
         # Add button for detailed financial report
@@ -6094,21 +6688,11 @@ class MedicalLabApp:
                   command=self.generate_detailed_financial_report, style="Accent.TButton").pack(pady=10)
         
         # Inventory statistics
-        total_inventory = len(inventory_items)
-        low_stock_items = len([i for i in inventory_items if i.quantity <= i.min_quantity])
-        # Find items expiring soon (within 30 days)
-        expiring_soon = 0
-        for item in inventory_items:
-            if item.expiry_date:
-                days_until_expiry = (item.expiry_date - datetime.now()).days
-                if 0 <= days_until_expiry <= 30:
-                    expiring_soon += 1
-        
-        ttk.Label(inventory_frame, text=_("Total Inventory Items: {}").format(total_inventory), 
+        ttk.Label(inventory_frame, text=_("Total Inventory Items: {}").format(stats["total_inventory"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(inventory_frame, text=_("Low Stock Items: {}").format(low_stock_items), 
+        ttk.Label(inventory_frame, text=_("Low Stock Items: {}").format(stats["low_stock_items"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(inventory_frame, text=_("Expiring Soon (30 days): {}").format(expiring_soon), 
+        ttk.Label(inventory_frame, text=_("Expiring Soon (30 days): {}").format(stats["expiring_soon"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
     
     def load_statistics_data_with_dates(self, patient_frame, test_frame, financial_frame, inventory_frame, from_date, to_date):
@@ -6244,24 +6828,13 @@ class MedicalLabApp:
                 widget.destroy()
         
         # Get data from database filtered by date range
-        patients = self.db.get_all_patients()  # Patients don't have date filtering in current schema
-        test_requests = self.db.get_test_requests_by_date_range(from_date, to_date)
-        test_types = self.db.get_all_test_types()
-        invoices = self.db.get_invoices_by_date_range(from_date, to_date)
-        inventory_items = self.db.get_all_inventory_items()  # Inventory doesn't have date filtering in current schema
-        
-        # Filter patients to only those with tests in the date range
-        patient_ids_in_range = set(tr.patient_id for tr in test_requests)
-        patients_in_range = [p for p in patients if p.id in patient_ids_in_range]
+        with self.analytics_snapshot(from_date, to_date) as snapshot:
+            stats = build_statistics_for_period(snapshot, from_date, to_date)
         
         # Patient statistics
-        total_patients = len(patients_in_range)
-        # Calculate new patients in date range
-        new_patients = len([p for p in patients_in_range if p.created_at >= from_date])
-        
-        ttk.Label(patient_frame, text=_("Patients in Period: {}").format(total_patients), 
+        ttk.Label(patient_frame, text=_("Patients in Period: {}").format(stats["total_patients"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(patient_frame, text=_("New Patients in Period: {}").format(new_patients), 
+        ttk.Label(patient_frame, text=_("New Patients in Period: {}").format(stats["new_patients"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
         
         # Add button for detailed patient report
@@ -6269,41 +6842,21 @@ class MedicalLabApp:
                   command=self.generate_detailed_patient_report, style="Accent.TButton").pack(pady=10)
         
         # Test statistics
-        total_tests = len(test_requests)
-        pending_tests = len([t for t in test_requests if t.status.name == "PENDING"])
-        completed_tests = len([t for t in test_requests if t.status.name == "COMPLETED"])
-        
-        # Find most requested test
-        test_type_count = {}
-        for request in test_requests:
-            test_type_count[request.test_type_id] = test_type_count.get(request.test_type_id, 0) + 1
-        
-        most_requested_test = ""
-        if test_type_count:
-            most_requested_test_id = max(test_type_count, key=test_type_count.get)
-            most_requested_test_obj = next((t for t in test_types if t.id == most_requested_test_id), None)
-            if most_requested_test_obj:
-                most_requested_test = most_requested_test_obj.name
-        
-        ttk.Label(test_frame, text=_("Tests in Period: {}").format(total_tests), 
+        ttk.Label(test_frame, text=_("Tests in Period: {}").format(stats["total_tests"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(test_frame, text=_("Pending Tests: {}").format(pending_tests), 
+        ttk.Label(test_frame, text=_("Pending Tests: {}").format(stats["pending_tests"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(test_frame, text=_("Completed Tests: {}").format(completed_tests), 
+        ttk.Label(test_frame, text=_("Completed Tests: {}").format(stats["completed_tests"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(test_frame, text=_("Most Requested Test: {}").format(most_requested_test), 
+        ttk.Label(test_frame, text=_("Most Requested Test: {}").format(stats["most_requested_test"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
         
         # Financial statistics
-        total_revenue = sum(inv.total_amount for inv in invoices)
-        outstanding_payments = sum(inv.total_amount - inv.paid_amount for inv in invoices)
-        average_test_price = sum(t.price for t in test_types) / len(test_types) if test_types else 0
-        
-        ttk.Label(financial_frame, text=_("Revenue in Period: ${:.2f}").format(total_revenue), 
+        ttk.Label(financial_frame, text=_("Revenue in Period: ${:.2f}").format(stats["total_revenue"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(financial_frame, text=_("Outstanding Payments: ${:.2f}").format(outstanding_payments), 
+        ttk.Label(financial_frame, text=_("Outstanding Payments: ${:.2f}").format(stats["outstanding_payments"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(financial_frame, text=_("Average Test Price: ${:.2f}").format(average_test_price), 
+        ttk.Label(financial_frame, text=_("Average Test Price: ${:.2f}").format(stats["average_test_price"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
         
         # Add button for detailed financial report
@@ -6311,21 +6864,11 @@ class MedicalLabApp:
                   command=self.generate_detailed_financial_report, style="Accent.TButton").pack(pady=10)
         
         # Inventory statistics (no date filtering for inventory in current schema)
-        total_inventory = len(inventory_items)
-        low_stock_items = len([i for i in inventory_items if i.quantity <= i.min_quantity])
-        # Find items expiring soon (within 30 days from to_date)
-        expiring_soon = 0
-        for item in inventory_items:
-            if item.expiry_date:
-                days_until_expiry = (item.expiry_date - to_date).days
-                if 0 <= days_until_expiry <= 30:
-                    expiring_soon += 1
-        
-        ttk.Label(inventory_frame, text=_("Total Inventory Items: {}").format(total_inventory), 
+        ttk.Label(inventory_frame, text=_("Total Inventory Items: {}").format(stats["total_inventory"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(inventory_frame, text=_("Low Stock Items: {}").format(low_stock_items), 
+        ttk.Label(inventory_frame, text=_("Low Stock Items: {}").format(stats["low_stock_items"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
-        ttk.Label(inventory_frame, text=_("Expiring Soon (30 days): {}").format(expiring_soon), 
+        ttk.Label(inventory_frame, text=_("Expiring Soon (30 days): {}").format(stats["expiring_soon"]), 
                  font=("Arial", 12, "bold"), foreground="#000080").pack(pady=10)
     
     def clear_content(self):
@@ -6338,4 +6881,6 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # Batch report workers start a fresh interpreter (also in frozen builds)
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
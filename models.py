@@ -3,7 +3,7 @@ Data models for the Medical Laboratory Management System
 """
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, List, Optional
 from dataclasses import dataclass, field
 
 class Gender(Enum):
@@ -18,10 +18,31 @@ class TestStatus(Enum):
     CANCELLED = "Cancelled"
 
 class SampleStatus(Enum):
+    COLLECTED = "Collected"
     VALID = "Valid"
+    PROCESSING = "Processing"
+    COMPLETED = "Completed"
     DAMAGED = "Damaged"
     INSUFFICIENT = "Insufficient"
 
+# Sample lifecycle: the statuses a sample may move to from each status.
+# Received samples are checked; only sound samples are processed. Damaged and
+# insufficient samples are recollected as new samples.
+SAMPLE_TRANSITIONS = {
+    SampleStatus.COLLECTED: (SampleStatus.VALID, SampleStatus.PROCESSING,
+                             SampleStatus.DAMAGED, SampleStatus.INSUFFICIENT),
+    SampleStatus.VALID: (SampleStatus.PROCESSING, SampleStatus.DAMAGED, SampleStatus.INSUFFICIENT),
+    SampleStatus.PROCESSING: (SampleStatus.COMPLETED, SampleStatus.DAMAGED, SampleStatus.INSUFFICIENT),
+    SampleStatus.COMPLETED: (),
+    SampleStatus.DAMAGED: (),
+    SampleStatus.INSUFFICIENT: (),
+}
+
+class MailStatus(Enum):
+    QUEUED = "Queued"  # waiting to be sent, or to be retried
+    SENT = "Sent"
+    FAILED = "Failed"  # rejected by the server, or out of attempts
+
 class UserRole(Enum):
     ADMIN = "Admin"
     TECHNICIAN = "Technician"
@@ -120,11 +141,25 @@ class Sample:
     status: SampleStatus
     notes: Optional[str] = None
 
+@dataclass
+class SampleStatusChange:
+    sample_id: str
+    from_status: Optional[SampleStatus]  # None when the sample was created
+    to_status: SampleStatus
+    changed_at: datetime
+    changed_by: Optional[str] = None
+
+@dataclass
+class SampleTransitionResult:
+    moved: List[str] = field(default_factory=list)
+    # Samples left as they were, with their status (None if there is no such sample)
+    rejected: Dict[str, Optional[SampleStatus]] = field(default_factory=dict)
+
 @dataclass
 class MedicalReport:
     id: str
     test_request_id: str
-    content: str
+    content: Optional[str]  # None in lists; get_medical_report() loads it
     signed_by: str  # Doctor ID
     signed_at: datetime
     created_at: datetime = field(default_factory=datetime.now)
@@ -185,6 +220,29 @@ class PurchaseOrder:
 class TestTemplate:
     id: str
     test_type_id: str
-    template_content: str
+    template_content: Optional[str]  # None in lists; get_test_template() loads it
+    created_at: datetime = field(default_factory=datetime.now)
+    updated_at: datetime = field(default_factory=datetime.now)
+
+@dataclass
+class ChangeLogEntry:
+    seq: int
+    table_name: str
+    row_id: str
+    operation: str  # INSERT, UPDATE, DELETE, ARCHIVE (moved to an archive file)
+    changed_at: datetime
+
+@dataclass
+class OutboxMessage:
+    recipient: str
+    subject: str
+    body: str
+    attachment_name: Optional[str] = None
+    attachment: Optional[bytes] = None  # None in lists, and once the message is sent
+    id: Optional[int] = None  # Assigned by the outbox
+    status: MailStatus = MailStatus.QUEUED
+    attempts: int = 0
+    last_error: Optional[str] = None
     created_at: datetime = field(default_factory=datetime.now)
-    updated_at: datetime = field(default_factory=datetime.now)
\ No newline at end of file
+    next_attempt_at: Optional[datetime] = None
+    sent_at: Optional[datetime] = None
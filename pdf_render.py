@@ -0,0 +1,419 @@
+"""
+PDF rendering for the Medical Laboratory Management System
+
+Result reports, cumulative patient reports and invoices are described once as
+a PrintDocument (title, headings, label/value fields, free text and tables).
+The same document gives the plain-text print preview (to_text) and the PDF
+(PdfRenderer.render), so the preview always matches the printout.
+
+PdfRenderer draws directly on a reportlab canvas instead of building a
+platypus story, which keeps a 50-page cumulative report well under a second:
+
+- the TrueType fonts are registered once per process (register_fonts). An
+  Arabic-capable font is preferred; when arabic_reshaper and python-bidi are
+  installed, Arabic text is shaped and reordered for display.
+- the page template (header, footer, text geometry) is laid out once per
+  title and page size and drawn once per document as a PDF form that every
+  page reuses.
+- the PDF is written to a temporary file next to the target and renamed, so a
+  failed render never leaves a half-written file behind.
+"""
+import functools
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
+
+import translations
+from config import Config
+from models import MedicalReport, Patient, TestRequest, TestType
+from translations import _
+
+try:
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+except ImportError:  # Arabic is printed unshaped without them
+    arabic_reshaper = None
+    get_display = None
+
+# (regular, bold, monospace) font files, Arabic-capable fonts first
+FONT_FILES = (
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf"),
+    ("C:/Windows/Fonts/arial.ttf", "C:/Windows/Fonts/arialbd.ttf", "C:/Windows/Fonts/cour.ttf"),
+    ("/System/Library/Fonts/Supplemental/Arial.ttf",
+     "/System/Library/Fonts/Supplemental/Arial Bold.ttf",
+     "/System/Library/Fonts/Supplemental/Courier New.ttf"),
+)
+# Always available, but without Arabic glyphs
+BUILTIN_FONTS = ("Helvetica", "Helvetica-Bold", "Courier")
+
+Fonts = namedtuple("Fonts", "regular bold mono")
+
+_fonts: Optional[Fonts] = None
+_fonts_lock = threading.Lock()
+
+
+def _font_candidates() -> List[Tuple[str, ...]]:
+    candidates = list(FONT_FILES)
+    if Config.PDF_FONT_FILES:
+        files = [path.strip() for path in Config.PDF_FONT_FILES.split(",") if path.strip()]
+        # Missing bold or monospace files fall back to the regular font
+        candidates.insert(0, tuple((files + files[:1] * 3)[:3]))
+    return candidates
+
+
+def register_fonts() -> Fonts:
+    """Register the report fonts with reportlab, once per process"""
+    global _fonts
+    with _fonts_lock:
+        if _fonts is not None:
+            return _fonts
+        for files in _font_candidates():
+            if not all(os.path.isfile(path) for path in files):
+                continue
+            names = tuple(f"LabReport-{kind}" for kind in Fonts._fields)
+            try:
+                for name, path in zip(names, files):
+                    pdfmetrics.registerFont(TTFont(name, path))
+            except Exception:
+                continue
+            _fonts = Fonts(*names)
+            break
+        else:
+            _fonts = Fonts(*BUILTIN_FONTS)
+        return _fonts
+
+
+def is_rtl() -> bool:
+    return translations.CURRENT_LANGUAGE == "ar"
+
+
+@functools.lru_cache(maxsize=4096)
+def shape(text: str) -> str:
+    """Text in display order: Arabic letters joined and right-to-left runs reversed"""
+    if arabic_reshaper is None or not any("\u0600" <= char <= "\u06ff" for char in text):
+        return text
+    return get_display(arabic_reshaper.reshape(text))
+
+
+class PrintDocument:
+    """A printable report: a title followed by blocks of content"""
+
+    def __init__(self, title: str):
+        self.title = title
+        self.blocks = []
+
+    def fields(self, *pairs: Tuple[str, object]) -> "PrintDocument":
+        self.blocks.append(("fields", [(label, "" if value is None else str(value)) for label, value in pairs]))
+        return self
+
+    def heading(self, text: str) -> "PrintDocument":
+        self.blocks.append(("heading", text))
+        return self
+
+    def text(self, text: str) -> "PrintDocument":
+        self.blocks.append(("text", text or ""))
+        return self
+
+    def table(self, columns: Sequence[str], rows: Sequence[Sequence[str]],
+              total: Optional[Sequence[str]] = None) -> "PrintDocument":
+        self.blocks.append(("table", (list(columns), [list(row) for row in rows], total)))
+        return self
+
+    def new_page(self) -> "PrintDocument":
+        """Continue on a new page, unless nothing was drawn on this one yet"""
+        self.blocks.append(("page", None))
+        return self
+
+    def extend(self, other: "PrintDocument") -> "PrintDocument":
+        self.blocks.extend(other.blocks)
+        return self
+
+    def to_text(self, generated_at: Optional[datetime] = None) -> str:
+        """The plain-text form used by the print preview"""
+        generated_at = generated_at or datetime.now()
+        lines = ["=" * 60, f"{self.title:^60}", "=" * 60, ""]
+        for kind, value in self.blocks:
+            if kind == "heading":
+                lines += ["-" * 30, value, "-" * 30]
+            elif kind == "fields":
+                lines += [f"{label}: {field}" for label, field in value] + [""]
+            elif kind == "text":
+                lines += [value, ""]
+            elif kind == "page":
+                lines.append("\f")
+            elif kind == "table":
+                columns, rows, total = value
+                lines.append(f"{columns[0]:<30} {' '.join(columns[1:])}")
+                lines.append("-" * 30)
+                lines += [f"{row[0]:<30} {' '.join(row[1:])}" for row in rows]
+                if total:
+                    lines.append("-" * 30)
+                    lines.append(f"{total[0]:<30} {' '.join(total[1:])}")
+                lines.append("")
+        lines += ["=" * 60, _("Generated by Medical Laboratory Management System"),
+                  generated_at.strftime("%Y-%m-%d %H:%M:%S"), "=" * 60]
+        return "\n".join(lines)
+
+
+def _not_signed(value):
+    return value if value else _("Not signed yet")
+
+
+def result_document(report: MedicalReport, patient: Patient, test_type: TestType,
+                    test_request: TestRequest) -> PrintDocument:
+    """The printed form of one medical result"""
+    document = PrintDocument(_("MEDICAL LABORATORY RESULT REPORT"))
+    document.fields(
+        (_("Report ID"), report.id),
+        (_("Report Date"), report.created_at.strftime("%Y-%m-%d %H:%M:%S")),
+    )
+    document.heading(_("PATIENT INFORMATION")).fields(
+        (_("Name"), patient.name),
+        (_("ID"), patient.id),
+        (_("Age"), patient.age),
+        (_("Gender"), _(patient.gender.value)),
+        (_("Contact"), patient.contact_info or _("N/A")),
+    )
+    document.heading(_("TEST INFORMATION")).fields(
+        (_("Test Name"), test_type.name),
+        (_("Test Category"), test_type.category),
+        (_("Test ID"), test_request.id),
+        (_("Requested By"), test_request.requested_by),
+        (_("Requested At"), test_request.requested_at.strftime("%Y-%m-%d %H:%M")),
+        (_("Status"), _(test_request.status.value)),
+    )
+    document.heading(_("RESULT DETAILS")).text(report.content)
+    document.heading(_("SIGNATURE INFORMATION")).fields(
+        (_("Signed By"), _not_signed(report.signed_by if report.signed_by != "N/A" else None)),
+        (_("Signed At"), _not_signed(report.signed_at.strftime("%Y-%m-%d %H:%M") if report.signed_at else None)),
+    )
+    return document
+
+
+def cumulative_document(patient: Patient,
+                        results: Sequence[Tuple[MedicalReport, TestType, TestRequest]]) -> PrintDocument:
+    """All results of one patient, oldest first, in one report"""
+    document = PrintDocument(_("CUMULATIVE RESULT REPORT"))
+    document.heading(_("PATIENT INFORMATION")).fields(
+        (_("Name"), patient.name),
+        (_("ID"), patient.id),
+        (_("Age"), patient.age),
+        (_("Gender"), _(patient.gender.value)),
+    )
+    for report, test_type, test_request in sorted(results, key=lambda result: result[0].created_at):
+        document.heading(f"{test_type.name} - {report.created_at.strftime('%Y-%m-%d %H:%M')}")
+        document.fields(
+            (_("Report ID"), report.id),
+            (_("Requested By"), test_request.requested_by),
+            (_("Signed By"), _not_signed(report.signed_by if report.signed_by != "N/A" else None)),
+        )
+        document.text(report.content)
+    return document
+
+
+def invoice_document(invoice_id: str, patient_name: str, date: str, amount: str, paid: str, status: str,
+                     lines: Sequence[Tuple[str, str]]) -> PrintDocument:
+    """The printed form of an invoice; lines are (test name, price) pairs"""
+    document = PrintDocument(_("MEDICAL LABORATORY INVOICE"))
+    document.fields((_("Invoice ID"), invoice_id), (_("Invoice Date"), date))
+    document.heading(_("PATIENT INFORMATION")).fields((_("Patient Name"), patient_name))
+    document.heading(_("BILLING INFORMATION")).fields(
+        (_("Total Amount"), amount),
+        (_("Paid Amount"), paid),
+        (_("Status"), status),
+    )
+    document.heading(_("PAYMENT DETAILS")).table(
+        [_("Test"), _("Price")], [list(line) for line in lines], total=[_("Total"), amount])
+    return document
+
+
+class PageTemplate:
+    """Geometry and static text of the pages of one kind of document"""
+
+    TITLE_SIZE = 14
+    BODY_SIZE = 10
+    FOOTER_SIZE = 8
+
+    def __init__(self, title: str, page_size: Tuple[float, float], fonts: Fonts, rtl: bool):
+        self.page_size = page_size
+        self.fonts = fonts
+        self.rtl = rtl
+        width, height = page_size
+        self.left = 18 * mm
+        self.right = width - 18 * mm
+        self.width = self.right - self.left
+        self.title = shape(title)
+        self.title_y = height - 20 * mm
+        self.header_rule_y = self.title_y - 4 * mm
+        self.top = self.header_rule_y - 8 * mm
+        self.footer_rule_y = 16 * mm
+        self.footer_y = 11 * mm
+        self.bottom = self.footer_rule_y + 6 * mm
+        self.generated_by = shape(_("Generated by Medical Laboratory Management System"))
+        self.page_label = _("Page")
+
+    def draw_form(self, canvas: Canvas, name: str, generated_at: datetime):
+        """Draw the parts shared by every page once, as a reusable form"""
+        canvas.beginForm(name)
+        canvas.setFont(self.fonts.bold, self.TITLE_SIZE)
+        canvas.drawCentredString((self.left + self.right) / 2, self.title_y, self.title)
+        canvas.setLineWidth(0.8)
+        canvas.line(self.left, self.header_rule_y, self.right, self.header_rule_y)
+        canvas.setLineWidth(0.4)
+        canvas.line(self.left, self.footer_rule_y, self.right, self.footer_rule_y)
+        canvas.setFont(self.fonts.regular, self.FOOTER_SIZE)
+        footer = f"{self.generated_by} - {generated_at.strftime('%Y-%m-%d %H:%M:%S')}"
+        if self.rtl:
+            canvas.drawRightString(self.right, self.footer_y, footer)
+        else:
+            canvas.drawString(self.left, self.footer_y, footer)
+        canvas.endForm()
+
+    def draw_page_number(self, canvas: Canvas, number: int):
+        canvas.setFont(self.fonts.regular, self.FOOTER_SIZE)
+        label = shape(f"{self.page_label} {number}")
+        if self.rtl:
+            canvas.drawString(self.left, self.footer_y, label)
+        else:
+            canvas.drawRightString(self.right, self.footer_y, label)
+
+
+@functools.lru_cache(maxsize=64)
+def page_template(title: str, page_size: Tuple[float, float], fonts: Fonts, rtl: bool,
+                  language: str) -> PageTemplate:
+    # language is part of the key: the footer text is translated
+    return PageTemplate(title, page_size, fonts, rtl)
+
+
+class _PageWriter:
+    """Lays out lines top to bottom, starting new pages as needed"""
+
+    def __init__(self, canvas: Canvas, template: PageTemplate, form: str):
+        self.canvas = canvas
+        self.template = template
+        self.form = form
+        self.pages = 0
+        # Page numbers restart after a page break (e.g. for each result of a batch)
+        self.section_start = 1
+        self.y = None
+
+    def new_page(self):
+        if self.pages:
+            self.canvas.showPage()
+        self.pages += 1
+        self.canvas.doForm(self.form)
+        self.template.draw_page_number(self.canvas, self.pages - self.section_start + 1)
+        self.y = self.template.top
+
+    def page_break(self):
+        if self.y is not None and self.y < self.template.top:
+            self.section_start = self.pages + 1
+            self.new_page()
+
+    def room(self, height: float):
+        if self.y is None or self.y - height < self.template.bottom:
+            self.new_page()
+
+    def line(self, text: str, font: str, size: float, indent: float = 0, right: Optional[str] = None):
+        """Draw one line; right is drawn right-aligned on the same line"""
+        leading = size * 1.35
+        self.room(leading)
+        self.y -= leading
+        template, canvas = self.template, self.canvas
+        canvas.setFont(font, size)
+        if template.rtl:
+            canvas.drawRightString(template.right - indent, self.y, shape(text))
+            if right is not None:
+                canvas.drawString(template.left, self.y, shape(right))
+        else:
+            canvas.drawString(template.left + indent, self.y, shape(text))
+            if right is not None:
+                canvas.drawRightString(template.right, self.y, shape(right))
+
+    def wrapped(self, text: str, font: str, size: float, indent: float = 0):
+        width = self.template.width - indent
+        for paragraph in text.split("\n"):
+            for line in simpleSplit(paragraph, font, size, width) or [""]:
+                self.line(line, font, size, indent)
+
+    def space(self, height: float):
+        if self.y is not None:
+            self.y -= height
+
+
+class PdfRenderer:
+    """Render PrintDocuments to PDF files"""
+
+    def __init__(self, page_size: Tuple[float, float] = A4, compress: bool = True):
+        self.page_size = page_size
+        self.compress = compress
+        self.fonts = register_fonts()
+
+    def render(self, path: str, document: PrintDocument, generated_at: Optional[datetime] = None) -> int:
+        """
+        Write document to path as a PDF.
+
+        Returns:
+            Number of pages written
+        """
+        generated_at = generated_at or datetime.now()
+        rtl = is_rtl()
+        template = page_template(document.title, tuple(self.page_size), self.fonts, rtl,
+                                 translations.CURRENT_LANGUAGE)
+        temp_path = f"{path}.{os.getpid()}.part"
+        canvas = Canvas(temp_path, pagesize=self.page_size, pageCompression=1 if self.compress else 0)
+        canvas.setTitle(document.title)
+        canvas.setCreator("Medical Laboratory Management System")
+        try:
+            template.draw_form(canvas, "page", generated_at)
+            writer = _PageWriter(canvas, template, "page")
+            self._draw_blocks(writer, document)
+            if writer.pages == 0:
+                writer.new_page()
+            canvas.save()
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return writer.pages
+
+    def _draw_blocks(self, writer: _PageWriter, document: PrintDocument):
+        fonts = self.fonts
+        size = PageTemplate.BODY_SIZE
+        for kind, value in document.blocks:
+            if kind == "heading":
+                # Keep a heading with at least two lines of what follows
+                writer.room(size * 1.35 * 4)
+                writer.space(size * 0.6)
+                writer.line(value, fonts.bold, size + 1)
+                writer.space(size * 0.2)
+            elif kind == "fields":
+                for label, field in value:
+                    writer.wrapped(f"{label}: {field}", fonts.regular, size)
+                writer.space(size * 0.4)
+            elif kind == "text":
+                # Result text is often laid out in columns: keep it monospaced
+                writer.wrapped(value, fonts.mono, size - 1)
+                writer.space(size * 0.4)
+            elif kind == "page":
+                writer.page_break()
+            elif kind == "table":
+                columns, rows, total = value
+                writer.line(columns[0], fonts.bold, size, right=" ".join(columns[1:]))
+                for row in rows:
+                    writer.line(row[0], fonts.regular, size, indent=2 * mm, right=" ".join(row[1:]))
+                if total:
+                    writer.line(total[0], fonts.bold, size, right=" ".join(total[1:]))
+                writer.space(size * 0.4)
@@ -0,0 +1,125 @@
+"""
+In-memory analytics replica for the Medical Laboratory Management System
+
+The replica starts as a copy of the database made with the backup API. It is
+kept current by replaying change_log: for every row changed since the last
+refresh the row is read from the database and written to the replica (or
+removed from it). Statistics and reports read the replica, so their heavy
+queries run at memory speed and never hold locks on the database file.
+
+The Tk timer replays at most batch_size changes per tick, so a large
+backlog (a sync pull, an import) is worked off between UI events instead of
+freezing the window; while changes are left the next tick follows at once.
+"""
+import sqlite3
+from typing import Dict, Optional, Tuple
+
+from database import DatabaseManager, TABLE_PRIMARY_KEYS
+
+
+class AnalyticsReplica:
+    """Read-only in-memory copy of a database, refreshed incrementally"""
+
+    def __init__(self, db: DatabaseManager, root=None, interval_ms: int = 5000, batch_size: int = 1000):
+        self.source = db
+        self.root = root
+        self.interval_ms = interval_ms
+        self.batch_size = batch_size
+        self._after_id = None
+        self.running = False
+        # Whether the last refresh stopped with changes left to replay
+        self.behind = False
+        # Changes made during the copy are replayed again; replaying is idempotent
+        self.seq = db.get_latest_change_seq()
+        self.db = DatabaseManager.from_template(db)
+        self._drop_triggers()
+
+    def _drop_triggers(self):
+        # Replayed rows are not changes of their own
+        conn = self.db._connect()
+        try:
+            for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+                conn.execute(f"DROP TRIGGER {name}")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def refresh(self, max_batches: Optional[int] = None) -> int:
+        """
+        Replay the changes committed since the last refresh.
+
+        Args:
+            max_batches: Stop after this many batches of batch_size changes
+                (all changes by default); behind then tells whether any are left
+
+        Returns:
+            Number of changed rows copied into the replica
+        """
+        copied = 0
+        batches = 0
+        self.behind = False
+        while max_batches is None or batches < max_batches:
+            entries = self.source.changes_since(self.seq, limit=self.batch_size)
+            if not entries:
+                return copied
+            # Only the current state of each row matters
+            rows = {(entry.table_name, entry.row_id): None for entry in entries}
+            self._copy_rows(rows)
+            self.seq = entries[-1].seq
+            copied += len(rows)
+            batches += 1
+            self.behind = len(entries) == self.batch_size
+        return copied
+
+    def _copy_rows(self, rows: Dict[Tuple[str, str], None]):
+        source_conn = self.source._open_connection()
+        replica_conn = self.db._open_connection(isolation_level=None)
+        try:
+            replica_conn.execute("BEGIN")
+            for table, row_id in rows:
+                columns = TABLE_PRIMARY_KEYS.get(table, ("id",))
+                values = row_id.split(":", len(columns) - 1) if len(columns) > 1 else [row_id]
+                condition = " AND ".join(f"{column} = ?" for column in columns)
+                cursor = source_conn.execute(f"SELECT * FROM {table} WHERE {condition}", values)
+                row = cursor.fetchone()
+                replica_conn.execute(f"DELETE FROM {table} WHERE {condition}", values)
+                if row is not None:
+                    names = [column[0] for column in cursor.description]
+                    replica_conn.execute(
+                        f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})",
+                        row
+                    )
+            replica_conn.execute("COMMIT")
+        except sqlite3.Error:
+            if replica_conn.in_transaction:
+                replica_conn.execute("ROLLBACK")
+            raise
+        finally:
+            replica_conn.close()
+            source_conn.close()
+
+    def start(self):
+        """Refresh every interval_ms on the Tk event loop"""
+        if self.running or not self.root or self.interval_ms <= 0:
+            return
+        self.running = True
+        self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        try:
+            # One batch per tick keeps the UI responsive during a large backlog
+            self.refresh(max_batches=1)
+        except sqlite3.Error as e:
+            # Locked or unreachable; the changes are replayed next time
+            self.behind = False
+            print(f"Analytics replica refresh failed: {e}")
+        if self.running:
+            # Let pending UI events run, then carry on with the backlog
+            self._after_id = self.root.after(1 if self.behind else self.interval_ms, self._tick)
+
+    def stop(self):
+        self.running = False
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self.db.close()
@@ -0,0 +1,170 @@
+"""
+Tk event-loop responsiveness monitor for the Medical Laboratory Management System
+
+A heartbeat scheduled with root.after() measures how late the event loop runs
+it (the lag a user perceives as "freezing"), and wrapped screen and
+load_*_data methods record how long each screen takes to build. Events over the
+thresholds go to a rotating log file so slow screens can be found on the lab
+PCs themselves.
+"""
+import logging
+import logging.handlers
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+responsiveness_logger = logging.getLogger("medical_lab.responsiveness")
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class ScreenTiming:
+    """Build times of one show_*/load_*_data method"""
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+        # Build time plus the time until Tk was idle again (layout and drawing)
+        self.last_render_ms = 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "mean_ms": round(self.total_ms / self.calls, 1) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 1),
+            "last_ms": round(self.last_ms, 1),
+            "last_render_ms": round(self.last_render_ms, 1),
+        }
+
+
+class ResponsivenessMonitor:
+    """Measure event-loop lag and per-screen build time of a Tk application"""
+
+    def __init__(self, root, interval_ms: int = 100, lag_threshold_ms: float = 200.0,
+                 screen_threshold_ms: float = 500.0, log_path: Optional[str] = None,
+                 history: int = 600):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.lag_threshold_ms = lag_threshold_ms
+        self.screen_threshold_ms = screen_threshold_ms
+        # One lag sample per heartbeat; 600 samples is one minute at 100 ms
+        self.lag_samples = deque(maxlen=history)
+        self.events = deque(maxlen=200)
+        self.screens = {}
+        self.last_screen = None
+        self.running = False
+        self._expected = None
+        self._after_id = None
+        self.handler = None
+        if log_path:
+            self.handler = logging.handlers.RotatingFileHandler(
+                log_path, maxBytes=1024 * 1024, backupCount=3, encoding="utf-8")
+            self.handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            responsiveness_logger.addHandler(self.handler)
+            responsiveness_logger.setLevel(logging.INFO)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._expected = time.perf_counter() + self.interval_ms / 1000.0
+        self._after_id = self.root.after(self.interval_ms, self._beat)
+
+    def stop(self):
+        self.running = False
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if self.handler:
+            responsiveness_logger.removeHandler(self.handler)
+            self.handler.close()
+            self.handler = None
+
+    def _beat(self):
+        now = time.perf_counter()
+        lag_ms = max(0.0, (now - self._expected) * 1000.0)
+        self.lag_samples.append(lag_ms)
+        if lag_ms >= self.lag_threshold_ms:
+            self._log_event("lag", self.last_screen, lag_ms)
+        if self.running:
+            self._expected = now + self.interval_ms / 1000.0
+            self._after_id = self.root.after(self.interval_ms, self._beat)
+
+    def _log_event(self, kind: str, name: Optional[str], elapsed_ms: float):
+        self.events.append({
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "kind": kind,
+            "name": name,
+            "elapsed_ms": round(elapsed_ms, 1),
+        })
+        responsiveness_logger.info("%s %s %.1fms", kind, name or "-", elapsed_ms)
+
+    def wrap(self, name: str, method):
+        """Return method wrapped so each call records its build time under name"""
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._record_screen(name, started)
+        timed.__name__ = name
+        timed.__doc__ = method.__doc__
+        return timed
+
+    def _record_screen(self, name: str, started: float):
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        timing = self.screens.setdefault(name, ScreenTiming())
+        timing.calls += 1
+        timing.total_ms += elapsed_ms
+        timing.last_ms = elapsed_ms
+        timing.max_ms = max(timing.max_ms, elapsed_ms)
+        if name.startswith("show_"):
+            self.last_screen = name
+        if elapsed_ms >= self.screen_threshold_ms:
+            self._log_event("screen", name, elapsed_ms)
+
+        def rendered():
+            timing.last_render_ms = (time.perf_counter() - started) * 1000.0
+        self.root.after_idle(rendered)
+
+    def instrument(self, app, screens):
+        """
+        Wrap the navigation screens and every load_*_data method of app on the instance.
+
+        Args:
+            screens: Names of the show_* methods that build a screen. Dialogs
+                and popup menus are left out so they never become last_screen.
+        """
+        for name in dir(type(app)):
+            if name in screens or (name.startswith("load_") and name.endswith("_data")):
+                method = getattr(app, name)
+                if callable(method):
+                    setattr(app, name, self.wrap(name, method))
+
+    def snapshot(self) -> Dict[str, object]:
+        lags = sorted(self.lag_samples)
+        return {
+            "lag_ms": round(self.lag_samples[-1] if self.lag_samples else 0.0, 1),
+            "lag_p50_ms": round(_percentile(lags, 50), 1),
+            "lag_p95_ms": round(_percentile(lags, 95), 1),
+            "lag_max_ms": round(lags[-1] if lags else 0.0, 1),
+            "last_screen": self.last_screen,
+            "screens": {name: timing.snapshot() for name, timing in self.screens.items()},
+            "events": list(self.events),
+        }
+
+    def status_text(self) -> str:
+        """One-line summary for the status bar"""
+        snap = self.snapshot()
+        text = f"UI lag: {snap['lag_p95_ms']:.0f} ms p95, {snap['lag_max_ms']:.0f} ms max"
+        if self.last_screen:
+            text += f" | {self.last_screen}: {self.screens[self.last_screen].last_ms:.0f} ms"
+        return text
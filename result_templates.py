@@ -0,0 +1,178 @@
+"""
+Result template engine for the Medical Laboratory Management System
+
+Test templates may contain placeholders that are filled in from the patient,
+the test and the request when a template is applied to a result:
+
+    Patient: {patient_name} ({patient_age} years, {patient_gender})
+    Test: {test_name} - {test_category}
+    Haemoglobin: ____ g/dL  (reference {range male=13.5-17.5 female=12.0-15.5 child=11.0-14.0})
+
+Placeholders:
+    patient_name, patient_id, patient_age, patient_gender, patient_contact
+    test_name, test_category, test_description, test_price
+    request_id, requested_at, requested_by
+    date, time                      (when the result is written)
+    range male=... female=... child=... default=...
+                                    (reference range for the patient; child
+                                    applies below CHILD_AGE)
+
+Unknown placeholders such as {value} are left in the text for the technician
+to fill in, and {{ and }} stand for literal braces.
+
+A template is compiled once into a render plan: a list of literal strings and
+field functions. Plans are cached by template id and updated_at, so editing a
+template compiles it again and rendering a result only joins strings.
+"""
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Union
+
+from models import Patient, TestRequest, TestTemplate, TestType
+from translations import _
+
+# Patients younger than this use the child reference range
+CHILD_AGE = 12
+
+PLACEHOLDER = re.compile(r"\{\{|\}\}|\{([a-z_]+)((?:\s+[a-z]+=[^\s{}]+)*)\s*\}")
+
+
+class RenderContext:
+    """Everything a placeholder can refer to"""
+
+    __slots__ = ("patient", "test_type", "test_request", "now")
+
+    def __init__(self, patient: Optional[Patient] = None, test_type: Optional[TestType] = None,
+                 test_request: Optional[TestRequest] = None, now: Optional[datetime] = None):
+        self.patient = patient
+        self.test_type = test_type
+        self.test_request = test_request
+        self.now = now or datetime.now()
+
+
+def _from(source: str, getter: Callable) -> Callable[[RenderContext], Optional[str]]:
+    def field(context):
+        value = getattr(context, source)
+        return None if value is None else getter(value)
+    return field
+
+
+FIELDS: Dict[str, Callable[[RenderContext], Optional[str]]] = {
+    "patient_name": _from("patient", lambda p: p.name),
+    "patient_id": _from("patient", lambda p: p.id),
+    "patient_age": _from("patient", lambda p: str(p.age)),
+    "patient_gender": _from("patient", lambda p: _(p.gender.value)),
+    "patient_contact": _from("patient", lambda p: p.contact_info or _("N/A")),
+    "test_name": _from("test_type", lambda t: t.name),
+    "test_category": _from("test_type", lambda t: t.category or ""),
+    "test_description": _from("test_type", lambda t: t.description or ""),
+    "test_price": _from("test_type", lambda t: f"{t.price:.2f}"),
+    "request_id": _from("test_request", lambda r: r.id),
+    "requested_at": _from("test_request", lambda r: r.requested_at.strftime("%Y-%m-%d %H:%M")),
+    "requested_by": _from("test_request", lambda r: r.requested_by),
+    "date": lambda context: context.now.strftime("%Y-%m-%d"),
+    "time": lambda context: context.now.strftime("%H:%M"),
+}
+
+
+def _reference_range(ranges: Dict[str, str]) -> Callable[[RenderContext], Optional[str]]:
+    def field(context):
+        patient = context.patient
+        if patient is None:
+            return ranges.get("default")
+        if patient.age < CHILD_AGE and "child" in ranges:
+            return ranges["child"]
+        return ranges.get(patient.gender.value.lower(), ranges.get("default"))
+    return field
+
+
+def _placeholder(raw: str, field: Callable[[RenderContext], Optional[str]]):
+    # Fields without a value (e.g. no patient chosen yet) keep the placeholder
+    def part(context):
+        value = field(context)
+        return raw if value is None else value
+    return part
+
+
+Plan = List[Union[str, Callable[[RenderContext], str]]]
+
+
+def compile_template(text: str) -> Plan:
+    """Split template text into literal strings and placeholder functions"""
+    plan: Plan = []
+    literal = []
+    position = 0
+    for match in PLACEHOLDER.finditer(text):
+        literal.append(text[position:match.start()])
+        position = match.end()
+        token = match.group(0)
+        name = match.group(1)
+        if token in ("{{", "}}"):
+            literal.append(token[0])
+            continue
+        if name == "range":
+            ranges = dict(option.split("=", 1) for option in match.group(2).split())
+            field = _reference_range(ranges)
+        elif name in FIELDS and not match.group(2):
+            field = FIELDS[name]
+        else:
+            literal.append(token)
+            continue
+        if literal:
+            plan.append("".join(literal))
+            literal = []
+        plan.append(_placeholder(token, field))
+    literal.append(text[position:])
+    if any(literal):
+        plan.append("".join(literal))
+    return plan
+
+
+def render_plan(plan: Plan, context: RenderContext) -> str:
+    return "".join(part if isinstance(part, str) else part(context) for part in plan)
+
+
+class TemplateEngine:
+    """Render test templates, compiling each template version only once"""
+
+    def __init__(self, max_templates: int = 256):
+        self.max_templates = max_templates
+        self._plans = OrderedDict()  # template id -> (updated_at, plan)
+        self._lock = threading.Lock()
+        self.compiled = 0
+
+    def plan(self, template: TestTemplate) -> Plan:
+        with self._lock:
+            cached = self._plans.get(template.id)
+            if cached is not None and cached[0] == template.updated_at:
+                self._plans.move_to_end(template.id)
+                return cached[1]
+        plan = compile_template(template.template_content or "")
+        with self._lock:
+            self._plans[template.id] = (template.updated_at, plan)
+            self._plans.move_to_end(template.id)
+            while len(self._plans) > self.max_templates:
+                self._plans.popitem(last=False)
+            self.compiled += 1
+        return plan
+
+    def render(self, template: TestTemplate, patient: Optional[Patient] = None,
+               test_type: Optional[TestType] = None, test_request: Optional[TestRequest] = None,
+               now: Optional[datetime] = None) -> str:
+        """Fill in the placeholders of template for one result"""
+        return render_plan(self.plan(template), RenderContext(patient, test_type, test_request, now))
+
+    def render_many(self, template: TestTemplate, contexts: List[RenderContext]) -> List[str]:
+        """Fill in the placeholders of template for many results"""
+        plan = self.plan(template)
+        return [render_plan(plan, context) for context in contexts]
+
+    def invalidate(self, template_id: Optional[str] = None):
+        """Forget the plan of one template, or of all templates"""
+        with self._lock:
+            if template_id is None:
+                self._plans.clear()
+            else:
+                self._plans.pop(template_id, None)
@@ -0,0 +1,167 @@
+"""
+Data shaping for the list and statistics screens of the Medical Laboratory
+Management System
+
+These functions turn DatabaseManager results into the rows and figures the
+Tk screens display. They have no Tk dependency so they can be benchmarked and
+tested on their own.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from database import DatabaseManager
+from models import TestStatus
+from translations import _
+
+
+def build_results_rows(db: DatabaseManager) -> List[Tuple[str, tuple]]:
+    """
+    Build the rows of the Results screen.
+
+    Returns:
+        List of (report_id, values) where values are the tree columns
+        (short ID, patient, test, status, created)
+    """
+    rows = []
+    for report in db.get_all_medical_reports():
+        # Get test request to get patient and test type info
+        test_request = db.get_test_request(report.test_request_id)
+        patient_name = _("Unknown Patient")
+        test_name = _("Unknown Test")
+        status = _("Pending")
+
+        if test_request:
+            patient = db.get_patient(test_request.patient_id)
+            if patient:
+                patient_name = patient.name
+
+            test_type = db.get_test_type(test_request.test_type_id)
+            if test_type:
+                test_name = test_type.name
+
+            status = _(test_request.status.value)
+
+        rows.append((report.id, (
+            report.id[:8],  # Short ID for display
+            patient_name,
+            test_name,
+            status,
+            report.created_at.strftime("%Y-%m-%d %H:%M")
+        )))
+    return rows
+
+
+def build_samples_rows(db: DatabaseManager) -> List[Tuple[str, tuple]]:
+    """
+    Build the rows of the Samples screen.
+
+    Returns:
+        List of (sample_id, values) where values are the tree columns
+        (short ID, barcode, patient - test, collected, status)
+    """
+    rows = []
+    for sample in db.get_all_samples():
+        # Get test request to get patient and test type info
+        test_request = db.get_test_request(sample.test_request_id)
+        patient_name = _("Unknown Patient")
+        test_name = _("Unknown Test")
+
+        if test_request:
+            patient = db.get_patient(test_request.patient_id)
+            if patient:
+                patient_name = patient.name
+
+            test_type = db.get_test_type(test_request.test_type_id)
+            if test_type:
+                test_name = test_type.name
+
+        rows.append((sample.id, (
+            sample.id[:8],
+            sample.barcode,
+            f"{patient_name} - {test_name}",
+            sample.collected_at.strftime("%Y-%m-%d %H:%M"),
+            _(sample.status.value)
+        )))
+    return rows
+
+
+def _test_statistics(test_requests, test_types) -> Dict[str, object]:
+    test_type_count = {}
+    for request in test_requests:
+        test_type_count[request.test_type_id] = test_type_count.get(request.test_type_id, 0) + 1
+
+    most_requested_test = ""
+    if test_type_count:
+        most_requested_test_id = max(test_type_count, key=test_type_count.get)
+        most_requested_test_obj = next((t for t in test_types if t.id == most_requested_test_id), None)
+        if most_requested_test_obj:
+            most_requested_test = most_requested_test_obj.name
+
+    return {
+        "total_tests": len(test_requests),
+        "pending_tests": len([t for t in test_requests if t.status == TestStatus.PENDING]),
+        "completed_tests": len([t for t in test_requests if t.status == TestStatus.COMPLETED]),
+        "most_requested_test": most_requested_test,
+    }
+
+
+def _inventory_statistics(inventory_items, reference_date: datetime) -> Dict[str, int]:
+    # Items expiring within 30 days of the reference date
+    expiring_soon = 0
+    for item in inventory_items:
+        if item.expiry_date:
+            days_until_expiry = (item.expiry_date - reference_date).days
+            if 0 <= days_until_expiry <= 30:
+                expiring_soon += 1
+
+    return {
+        "total_inventory": len(inventory_items),
+        "low_stock_items": len([i for i in inventory_items if i.quantity <= i.min_quantity]),
+        "expiring_soon": expiring_soon,
+    }
+
+
+def build_statistics(db: DatabaseManager, now: Optional[datetime] = None) -> Dict[str, object]:
+    """Build the figures shown on the Statistics screen for all data"""
+    now = now or datetime.now()
+    patients = db.get_all_patients()
+    test_requests = db.get_all_test_requests()
+    test_types = db.get_all_test_types()
+    invoices = db.get_all_invoices()
+    inventory_items = db.get_all_inventory_items()
+
+    one_month_ago = now - timedelta(days=30)
+    stats = {
+        "total_patients": len(patients),
+        "new_patients": len([p for p in patients if p.created_at >= one_month_ago]),
+        "total_revenue": sum(inv.total_amount for inv in invoices),
+        "outstanding_payments": sum(inv.total_amount - inv.paid_amount for inv in invoices),
+        "average_test_price": sum(t.price for t in test_types) / len(test_types) if test_types else 0,
+    }
+    stats.update(_test_statistics(test_requests, test_types))
+    stats.update(_inventory_statistics(inventory_items, now))
+    return stats
+
+
+def build_statistics_for_period(db: DatabaseManager, from_date: datetime, to_date: datetime) -> Dict[str, object]:
+    """Build the figures shown on the Statistics screen for a date range"""
+    patients = db.get_all_patients()  # Patients don't have date filtering in current schema
+    test_requests = db.get_test_requests_by_date_range(from_date, to_date)
+    test_types = db.get_all_test_types()
+    invoices = db.get_invoices_by_date_range(from_date, to_date)
+    inventory_items = db.get_all_inventory_items()
+
+    # Only patients with tests in the date range count towards the period
+    patient_ids_in_range = set(tr.patient_id for tr in test_requests)
+    patients_in_range = [p for p in patients if p.id in patient_ids_in_range]
+
+    stats = {
+        "total_patients": len(patients_in_range),
+        "new_patients": len([p for p in patients_in_range if p.created_at >= from_date]),
+        "total_revenue": sum(inv.total_amount for inv in invoices),
+        "outstanding_payments": sum(inv.total_amount - inv.paid_amount for inv in invoices),
+        "average_test_price": sum(t.price for t in test_types) / len(test_types) if test_types else 0,
+    }
+    stats.update(_test_statistics(test_requests, test_types))
+    stats.update(_inventory_statistics(inventory_items, to_date))
+    return stats
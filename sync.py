@@ -0,0 +1,426 @@
+"""
+Head-office sync for the Medical Laboratory Management System
+
+SyncEngine pushes the rows this station changed (found through change_log)
+to the sync server and pulls the rows other stations changed, in batches of
+gzip-compressed JSON. Watermarks stored in sync_state are only advanced once
+a batch has been acknowledged or applied, so an interrupted sync resumes
+where it stopped and only changed rows are ever transferred.
+
+Conflicts are resolved last-writer-wins on the change time of each row;
+every decision where both sides changed a row, or an older remote change was
+discarded, is recorded in sync_conflicts. So is every remote row whose
+encrypted fields use a key this station does not have: stations that sync
+must share their field encryption keys (see field_encryption.py).
+
+Server protocol (all bodies gzip-compressed JSON):
+    GET  /sync/ping
+    POST /sync/push  {"station_id", "batch_id", "changes": [change, ...]}
+         -> {"accepted": n}
+    GET  /sync/pull?station_id=...&since=<server seq>&limit=n
+         -> {"changes": [change, ...], "next": <server seq>, "more": bool}
+
+where change is {"table", "row_id", "operation": "UPSERT"|"DELETE",
+"row": {column: value} or null, "changed_at", "station_id"}.
+"""
+import base64
+import gzip
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from database import CHANGE_TRACKED_TABLES, ENCRYPTED_PATIENT_COLUMNS, TABLE_PRIMARY_KEYS, DatabaseManager
+from field_encryption import keys_configured
+
+sync_logger = logging.getLogger("medical_lab.sync")
+
+
+class SyncError(Exception):
+    """The sync server rejected a request or could not be reached"""
+
+
+def _encode_value(value):
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "__bytes__" in value:
+        return base64.b64decode(value["__bytes__"])
+    return value
+
+
+def encode_payload(payload: dict) -> bytes:
+    return gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_payload(body: bytes) -> dict:
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    return json.loads(body.decode("utf-8")) if body else {}
+
+
+class SyncClient:
+    """HTTP client for the sync server with retry and backoff"""
+
+    def __init__(self, server_url: str, api_key: str, username: str = "", password: str = "",
+                 timeout: float = 30.0, retries: int = 4, retry_delay: float = 1.0):
+        self.server_url = server_url.rstrip("/")
+        self.api_key = api_key
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    def _request(self, method: str, path: str, payload: Optional[dict] = None,
+                 params: Optional[dict] = None) -> dict:
+        url = self.server_url + path
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        body = encode_payload(payload) if payload is not None else None
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Accept-Encoding": "gzip",
+            "Content-Type": "application/json",
+        }
+        if body is not None:
+            headers["Content-Encoding"] = "gzip"
+        if self.username:
+            credentials = f"{self.username}:{self.password}".encode("utf-8")
+            headers["X-Sync-Credentials"] = base64.b64encode(credentials).decode("ascii")
+
+        for attempt in range(self.retries + 1):
+            request = urllib.request.Request(url, data=body, method=method, headers=headers)
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return decode_payload(response.read())
+            except urllib.error.HTTPError as e:
+                # Client errors will not go away by retrying
+                if e.code < 500 and e.code != 429:
+                    raise SyncError(f"{method} {path} failed: HTTP {e.code} {e.reason}") from e
+                error = e
+            except (urllib.error.URLError, OSError) as e:
+                error = e
+            if attempt < self.retries:
+                time.sleep(random.uniform(0.5, 1.0) * self.retry_delay * (2 ** attempt))
+        raise SyncError(f"{method} {path} failed after {self.retries + 1} attempts: {error}")
+
+    def ping(self) -> dict:
+        return self._request("GET", "/sync/ping")
+
+    def push(self, station_id: str, batch_id: str, changes: List[dict]) -> dict:
+        return self._request("POST", "/sync/push",
+                             {"station_id": station_id, "batch_id": batch_id, "changes": changes})
+
+    def pull(self, station_id: str, since: int, limit: int) -> dict:
+        return self._request("GET", "/sync/pull", params={"station_id": station_id, "since": since, "limit": limit})
+
+
+def _format_time(value: datetime) -> str:
+    # Same format as change_log.changed_at so times compare as strings
+    return value.isoformat(sep=" ", timespec="milliseconds")
+
+
+class SyncEngine:
+    """Push and pull row-level deltas between this station and the sync server"""
+
+    def __init__(self, db: DatabaseManager, client: SyncClient, station_id: Optional[str] = None,
+                 batch_size: Optional[int] = None, interval: Optional[float] = None):
+        self.db = db
+        self.client = client
+        self.batch_size = batch_size or Config.SYNC_BATCH_SIZE
+        self.interval = Config.SYNC_INTERVAL_SECONDS if interval is None else interval
+        self.station_id = station_id or db.get_sync_state("station_id")
+        if not self.station_id:
+            self.station_id = uuid.uuid4().hex
+            db.set_sync_state("station_id", self.station_id)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.last_status = {"state": "idle", "at": None, "pushed": 0, "pulled": 0, "error": None}
+
+    # Background thread
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="medical-lab-sync", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.sync_once()
+            except (SyncError, sqlite3.Error):
+                # Logged and recorded in last_status; the next cycle resumes from the watermarks
+                pass
+            except Exception:
+                sync_logger.exception("Unexpected sync failure")
+            self.stop_event.wait(self.interval)
+
+    def sync_once(self) -> Dict[str, int]:
+        """Push local changes, then pull remote ones; returns the row counts"""
+        with self.lock:
+            self.last_status = dict(self.last_status, state="syncing", error=None)
+            try:
+                pushed = self.push()
+                pulled = self.pull()
+            except (SyncError, sqlite3.Error) as e:
+                sync_logger.warning("Sync failed: %s", e)
+                self.last_status = dict(self.last_status, state="error", error=str(e),
+                                        at=datetime.now().isoformat(timespec="seconds"))
+                raise
+            self.last_status = {"state": "idle", "at": datetime.now().isoformat(timespec="seconds"),
+                                "pushed": pushed, "pulled": pulled, "error": None}
+            return {"pushed": pushed, "pulled": pulled}
+
+    # Push
+    def push(self) -> int:
+        pushed = 0
+        while True:
+            watermark = int(self.db.get_sync_state("push_seq", "0"))
+            entries = self.db.changes_since(watermark, limit=self.batch_size, tables=list(CHANGE_TRACKED_TABLES))
+            if not entries:
+                return pushed
+            last_seq = entries[-1].seq
+            changes = self._collect_changes(entries)
+            if changes:
+                # The batch id lets the server ignore a batch it already applied
+                # when only our acknowledgement got lost
+                self.client.push(self.station_id, f"{self.station_id}:{watermark}-{last_seq}", changes)
+            self._acknowledge_push(last_seq, changes)
+            pushed += len(changes)
+            if len(entries) < self.batch_size:
+                return pushed
+
+    def _collect_changes(self, entries) -> List[dict]:
+        conn = self.db._connect()
+        try:
+            ranges = conn.execute("SELECT first_seq, last_seq FROM sync_applied_ranges").fetchall()
+            # Newest entry per row; rows changed by applying pulled data are not echoed back
+            latest = {}
+            for entry in entries:
+                if any(first <= entry.seq <= last for first, last in ranges):
+                    continue
+                latest[(entry.table_name, entry.row_id)] = entry
+            changes = []
+            for (table, row_id), entry in sorted(latest.items(), key=lambda item: item[1].seq):
+                if entry.operation == "ARCHIVE":
+                    # Moved to an archive file here; the head office keeps its copy
+                    continue
+                row = self._read_row(conn, table, row_id)
+                changes.append({
+                    "table": table,
+                    "row_id": row_id,
+                    "operation": "DELETE" if row is None else "UPSERT",
+                    "row": row,
+                    "changed_at": _format_time(entry.changed_at),
+                    "station_id": self.station_id,
+                })
+            return changes
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _key_condition(table: str, row_id: str) -> Tuple[str, list]:
+        columns = TABLE_PRIMARY_KEYS.get(table, ("id",))
+        values = row_id.split(":", len(columns) - 1) if len(columns) > 1 else [row_id]
+        return " AND ".join(f"{column} = ?" for column in columns), values
+
+    def _read_row(self, conn, table: str, row_id: str) -> Optional[dict]:
+        condition, values = self._key_condition(table, row_id)
+        cursor = conn.execute(f"SELECT * FROM {table} WHERE {condition}", values)
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return {column[0]: _encode_value(value) for column, value in zip(cursor.description, row)}
+
+    def _acknowledge_push(self, last_seq: int, changes: List[dict]):
+        conn = self.db._open_connection(isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany('''
+                INSERT INTO sync_row_versions (table_name, row_id, changed_at, station_id)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(table_name, row_id) DO UPDATE
+                SET changed_at = excluded.changed_at, station_id = excluded.station_id
+            ''', [(c["table"], c["row_id"], c["changed_at"], c["station_id"]) for c in changes])
+            conn.execute("DELETE FROM sync_applied_ranges WHERE last_seq <= ?", (last_seq,))
+            conn.execute('''
+                INSERT INTO sync_state (key, value) VALUES ('push_seq', ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            ''', (str(last_seq),))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    # Pull
+    def pull(self) -> int:
+        pulled = 0
+        while True:
+            since = int(self.db.get_sync_state("pull_seq", "0"))
+            response = self.client.pull(self.station_id, since, self.batch_size)
+            changes = response.get("changes", [])
+            if changes:
+                self.apply_changes(changes, response.get("next", since))
+                pulled += len(changes)
+            elif response.get("next", since) != since:
+                self.db.set_sync_state("pull_seq", str(response["next"]))
+            if not response.get("more"):
+                return pulled
+
+    def apply_changes(self, changes: List[dict], next_seq: int):
+        """Apply one pulled batch and advance the pull watermark in the same transaction"""
+        push_seq = int(self.db.get_sync_state("push_seq", "0"))
+        conn = self.db._open_connection(isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            for change in changes:
+                if change["table"] not in CHANGE_TRACKED_TABLES:
+                    continue
+                self._apply_change(conn, change, push_seq, before)
+            after = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            if after > before:
+                # Our own triggers logged these; they must not be pushed back
+                conn.execute("INSERT INTO sync_applied_ranges (first_seq, last_seq) VALUES (?, ?)",
+                             (before + 1, after))
+            conn.execute('''
+                INSERT INTO sync_state (key, value) VALUES ('pull_seq', ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            ''', (str(next_seq),))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _apply_change(self, conn, change: dict, push_seq: int, applied_from: int):
+        table, row_id = change["table"], change["row_id"]
+        remote_at, remote_station = change["changed_at"], change["station_id"]
+
+        known = conn.execute(
+            "SELECT changed_at, station_id FROM sync_row_versions WHERE table_name = ? AND row_id = ?",
+            (table, row_id)).fetchone()
+        # Local change not pushed yet (made after the push of this cycle);
+        # entries logged by this batch itself start after applied_from
+        pending = conn.execute('''
+            SELECT MAX(changed_at) FROM change_log
+            WHERE table_name = ? AND row_id = ? AND seq > ? AND seq <= ?
+              AND NOT EXISTS (SELECT 1 FROM sync_applied_ranges r WHERE seq BETWEEN r.first_seq AND r.last_seq)
+        ''', (table, row_id, push_seq, applied_from)).fetchone()[0]
+
+        candidates = []
+        if known:
+            candidates.append((known[0], known[1]))
+        if pending:
+            candidates.append((pending, self.station_id))
+        local_at, local_station = max(candidates) if candidates else (None, None)
+
+        remote_wins = local_at is None or (remote_at, remote_station) > (local_at, local_station)
+        if pending or not remote_wins:
+            self._record_conflict(conn, change, local_at, "remote" if remote_wins else "local")
+        if not remote_wins:
+            return
+
+        if not self._readable(table, change["row"]):
+            # Stored as is, it would be unreadable here; keep ours and the audit entry
+            sync_logger.warning("Rejected remote change to %s %s: encrypted with an unknown field encryption key",
+                                table, row_id)
+            self._record_conflict(conn, change, local_at, "rejected")
+            return
+        try:
+            if change["operation"] == "DELETE":
+                condition, values = self._key_condition(table, row_id)
+                conn.execute(f"DELETE FROM {table} WHERE {condition}", values)
+            else:
+                self._upsert(conn, table, change["row"])
+        except sqlite3.IntegrityError as e:
+            # E.g. a username taken by a different local user; keep ours and the audit entry
+            sync_logger.warning("Rejected remote change to %s %s: %s", table, row_id, e)
+            self._record_conflict(conn, change, local_at, "rejected")
+            return
+        conn.execute('''
+            INSERT INTO sync_row_versions (table_name, row_id, changed_at, station_id)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(table_name, row_id) DO UPDATE
+            SET changed_at = excluded.changed_at, station_id = excluded.station_id
+        ''', (table, row_id, remote_at, remote_station))
+
+    def _readable(self, table: str, row: Optional[dict]) -> bool:
+        if table != "patients" or row is None:
+            return True
+        cipher = self.db.field_cipher
+        return all(cipher.knows(_decode_value(row.get(column))) for column in ENCRYPTED_PATIENT_COLUMNS)
+
+    def _upsert(self, conn, table: str, row: dict):
+        # Only columns this schema knows; the payload is never trusted as SQL
+        known_columns = {info[1] for info in conn.execute(f"PRAGMA table_info({table})")}
+        columns = [column for column in row if column in known_columns]
+        keys = TABLE_PRIMARY_KEYS.get(table, ("id",))
+        updates = [column for column in columns if column not in keys]
+        conflict = f"DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in updates)}" if updates else "DO NOTHING"
+        conn.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT({', '.join(keys)}) {conflict}",
+            [_decode_value(row[column]) for column in columns]
+        )
+
+    def _record_conflict(self, conn, change: dict, local_at: Optional[str], winner: str):
+        local_row = self._read_row(conn, change["table"], change["row_id"])
+        conn.execute('''
+            INSERT INTO sync_conflicts
+            (table_name, row_id, local_changed_at, remote_changed_at, remote_station, winner, local_row, remote_row)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            change["table"], change["row_id"], local_at, change["changed_at"], change["station_id"], winner,
+            json.dumps(local_row) if local_row is not None else None,
+            json.dumps(change["row"]) if change["row"] is not None else None
+        ))
+
+
+def check_field_keys():
+    """Raise SyncError unless the field encryption keys shared by the stations are configured"""
+    if not keys_configured():
+        raise SyncError("Set FIELD_ENCRYPTION_KEY or FIELD_ENCRYPTION_KEY_FILE to the field encryption keys "
+                        "shared by the stations before synchronizing")
+
+
+def engine_from_settings(db: DatabaseManager, password: str = "") -> Optional[SyncEngine]:
+    """
+    Build a SyncEngine from the settings saved in the Server Connection
+    dialog; None if there are none. Raises SyncError if the field encryption
+    keys are not configured.
+    """
+    server_url = db.get_sync_state("server_url")
+    api_key = db.get_sync_state("api_key")
+    if not server_url or not api_key:
+        return None
+    check_field_keys()
+    client = SyncClient(server_url, api_key, db.get_sync_state("username", ""), password,
+                        timeout=Config.SYNC_TIMEOUT)
+    return SyncEngine(db, client)
@@ -0,0 +1,402 @@
+"""
+Deterministic synthetic data generator for load testing the Medical Laboratory
+Management System
+
+Usage:
+    python synthetic_data.py --orders 1000000 --seed 42 --output loadtest.db
+
+The same seed and arguments always produce the same database, row for row.
+Rows are streamed through executemany() in chunks, so even a 1M-order database
+is built without holding the whole dataset in memory.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database import DatabaseManager, compress_content
+from models import Gender, TestStatus, SampleStatus, UserRole, PaymentMethod, Permission
+
+FIRST_NAMES = [
+    "Ahmed", "Mohamed", "Fatima", "Aisha", "Omar", "Layla", "Hassan", "Mariam",
+    "Youssef", "Nour", "Khalid", "Sara", "Ali", "Huda", "Ibrahim", "Zainab",
+    "John", "Mary", "David", "Sarah", "Michael", "Emma", "James", "Olivia",
+]
+LAST_NAMES = [
+    "Hassan", "Ali", "Ibrahim", "Mahmoud", "Abdallah", "Osman", "Saleh", "Nasser",
+    "Khalil", "Haddad", "Smith", "Johnson", "Brown", "Taylor", "Wilson", "Moore",
+]
+
+# Category -> test names offered by the lab
+TEST_CATALOG = {
+    "Blood": ["Complete Blood Count", "ESR", "Blood Film", "Reticulocyte Count",
+              "Coagulation Profile", "Blood Group", "HbA1c", "Ferritin"],
+    "Urine": ["Urinalysis", "Urine Culture", "24h Urine Protein", "Microalbumin"],
+    "Stool": ["Stool Analysis", "Occult Blood", "H. pylori Antigen", "Stool Culture"],
+    "Radiology": ["X-Ray Chest", "Ultrasound Abdomen", "CT Head", "MRI Knee"],
+    "Biochemistry": ["Lipid Profile", "Liver Function", "Kidney Function",
+                     "Fasting Glucose", "Electrolytes", "Uric Acid", "Calcium"],
+    "Hormones": ["TSH", "Free T4", "Prolactin", "Testosterone", "Vitamin D", "Cortisol"],
+    "Immunology": ["CRP", "Rheumatoid Factor", "ANA", "HIV Screen", "Hepatitis B Surface Antigen"],
+    "Microbiology": ["Throat Swab Culture", "Wound Culture", "Blood Culture", "Sputum AFB"],
+}
+
+INVENTORY_ITEMS = [
+    "EDTA Tubes", "Serum Tubes", "Urine Containers", "Stool Containers", "Gloves",
+    "Needles 21G", "Syringes 5ml", "Alcohol Swabs", "Glucose Reagent", "CBC Reagent",
+    "Lipid Reagent", "Culture Media", "Microscope Slides", "Pipette Tips", "X-Ray Film",
+]
+SUPPLIERS = ["MedSupply Co", "LabSource", "Gulf Diagnostics", "BioReagents Ltd", "Nile Medical"]
+
+ROLE_PERMISSIONS = {
+    UserRole.DOCTOR: [Permission.VIEW_PATIENTS, Permission.VIEW_REPORTS, Permission.SIGN_REPORT],
+    UserRole.TECHNICIAN: [Permission.VIEW_SAMPLES, Permission.ADD_SAMPLE, Permission.EDIT_SAMPLE,
+                          Permission.ADD_REPORT],
+    UserRole.RECEPTIONIST: [Permission.VIEW_PATIENTS, Permission.ADD_PATIENT, Permission.ADD_TEST,
+                            Permission.VIEW_BILLING, Permission.ADD_INVOICE],
+}
+
+# Fixed anchor so generated dates do not depend on the day the data is built
+DEFAULT_END_DATE = datetime(2025, 12, 31, 18, 0, 0)
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    """Format a datetime the same way the sqlite3 adapter used by DatabaseManager does"""
+    return value.isoformat(" ") if value else None
+
+
+class SyntheticDataGenerator:
+    """Build a realistic, reproducible dataset in a DatabaseManager database"""
+
+    def __init__(self, db: DatabaseManager, seed: int = 42, chunk_size: int = 10000,
+                 end_date: datetime = DEFAULT_END_DATE):
+        self.db = db
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.end_date = end_date
+        self.rng = random.Random(seed)
+
+    def _uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def generate(self, orders: int = 1000, patients: Optional[int] = None, days: int = 365,
+                 progress: Optional[Callable[[str, int], None]] = None) -> Dict[str, int]:
+        """
+        Generate a dataset with roughly `orders` test requests.
+
+        Args:
+            orders: Number of test requests to create
+            patients: Number of patients (defaults to a quarter of orders)
+            days: Length of the period the requests are spread over
+            progress: Optional callback(table, rows_written)
+
+        Returns:
+            Dict mapping table name to number of rows inserted
+        """
+        patients = patients or max(1, orders // 4)
+        counts = {}
+        conn = self.db._connect()
+        conn.execute("PRAGMA synchronous = OFF")
+
+        try:
+            users = self._generate_users(conn, counts, max(3, orders // 20000))
+            test_types = self._generate_test_types(conn, counts)
+            patient_ids = self._generate_patients(conn, counts, patients, days)
+            self._generate_inventory(conn, counts)
+            self._generate_orders(conn, counts, orders, days, patient_ids, test_types, users, progress)
+            conn.commit()
+        finally:
+            conn.close()
+        return counts
+
+    def _insert(self, conn: sqlite3.Connection, counts: Dict[str, int], table: str, sql: str,
+                rows: List[Tuple], progress: Optional[Callable[[str, int], None]] = None):
+        if not rows:
+            return
+        conn.executemany(sql, rows)
+        counts[table] = counts.get(table, 0) + len(rows)
+        rows.clear()
+        if progress:
+            progress(table, counts[table])
+
+    def _generate_users(self, conn, counts, per_role: int) -> Dict[UserRole, List[str]]:
+        users = {role: [] for role in UserRole}
+        user_rows = []
+        permission_rows = []
+        created_at = _timestamp(self.end_date - timedelta(days=3 * 365))
+
+        for role in UserRole:
+            role_count = 1 if role == UserRole.ADMIN else per_role
+            for index in range(role_count):
+                user_id = self._uuid()
+                username = f"{role.value.lower()}{index + 1}"
+                users[role].append(user_id)
+                user_rows.append((
+                    user_id, username, f"{username}@lab.com",
+                    # Every generated account uses the password "password"
+                    "5e884898da28047151d0e56f8dc6292773603d0d6aabbdd62a11ef721d1542d8",
+                    role.value, True, created_at, None
+                ))
+                for permission in ROLE_PERMISSIONS.get(role, []):
+                    permission_rows.append((self._uuid(), user_id, permission.value, created_at))
+
+        self._insert(conn, counts, "users", '''
+            INSERT INTO users (id, username, email, password_hash, role, is_active, created_at, last_login)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', user_rows)
+        self._insert(conn, counts, "user_permissions", '''
+            INSERT INTO user_permissions (id, user_id, permission, granted_at)
+            VALUES (?, ?, ?, ?)
+        ''', permission_rows)
+        return users
+
+    def _generate_test_types(self, conn, counts) -> List[Tuple[str, float]]:
+        rows = []
+        test_types = []
+        created_at = _timestamp(self.end_date - timedelta(days=3 * 365))
+        next_id = 1
+
+        for category, names in TEST_CATALOG.items():
+            for name in names:
+                # Sequential three-digit IDs, matching DatabaseManager.get_next_test_id
+                test_id = f"{next_id:03d}"
+                price = float(self.rng.randrange(20, 400, 5))
+                rows.append((test_id, name, f"{name} ({category})", price, category, created_at))
+                test_types.append((test_id, price))
+                next_id += 1
+
+        self._insert(conn, counts, "test_types", '''
+            INSERT INTO test_types (id, name, description, price, category, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        return test_types
+
+    def _generate_patients(self, conn, counts, patients: int, days: int) -> List[str]:
+        sql = '''
+            INSERT INTO patients (id, name, age, gender, contact_info, contact_info_index, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        '''
+        # Unique 8-digit IDs, as produced by DatabaseManager.generate_patient_id
+        patient_ids = [str(value) for value in self.rng.sample(range(10000000, 100000000), patients)]
+        genders = [Gender.MALE.value, Gender.FEMALE.value, Gender.OTHER.value]
+        start = self.end_date - timedelta(days=days * 2)
+        span_seconds = days * 2 * 86400
+        # Stored encrypted, as DatabaseManager.create_patient does, but
+        # repeatably so the same seed still gives the same database
+        cipher = self.db.field_cipher
+        rows = []
+
+        for patient_id in patient_ids:
+            created_at = start + timedelta(seconds=self.rng.randrange(span_seconds))
+            name = f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+            age = min(100, int(self.rng.triangular(0, 95, 38)))
+            gender = self.rng.choices(genders, weights=[49, 49, 2])[0]
+            contact_info = f"+249 9{self.rng.randrange(10000000, 99999999)}"
+            rows.append((
+                patient_id,
+                name,
+                age,
+                gender,
+                cipher.encrypt_repeatably(contact_info, patient_id),
+                cipher.blind_index(contact_info),
+                _timestamp(created_at),
+                _timestamp(created_at)
+            ))
+            if len(rows) >= self.chunk_size:
+                self._insert(conn, counts, "patients", sql, rows)
+        self._insert(conn, counts, "patients", sql, rows)
+        return patient_ids
+
+    def _generate_inventory(self, conn, counts):
+        rows = []
+        for name in INVENTORY_ITEMS:
+            for supplier in self.rng.sample(SUPPLIERS, 2):
+                min_quantity = self.rng.randrange(10, 200, 10)
+                created_at = self.end_date - timedelta(days=self.rng.randrange(30, 720))
+                expiry = self.end_date + timedelta(days=self.rng.randrange(-30, 540))
+                rows.append((
+                    self._uuid(), name, f"{name} from {supplier}",
+                    self.rng.randrange(0, min_quantity * 5), min_quantity, supplier,
+                    _timestamp(expiry), _timestamp(created_at), _timestamp(created_at)
+                ))
+        self._insert(conn, counts, "inventory_items", '''
+            INSERT INTO inventory_items
+            (id, name, description, quantity, min_quantity, supplier, expiry_date, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+    def _request_time(self, days: int) -> datetime:
+        """Pick a request time during opening hours, weighted towards mornings and weekdays"""
+        while True:
+            day = self.end_date.date() - timedelta(days=self.rng.randrange(days))
+            # Friday is the weekly day off; Saturdays are quieter than weekdays
+            if day.weekday() == 4 or (day.weekday() == 5 and self.rng.random() < 0.5):
+                continue
+            hour = min(19, int(self.rng.triangular(7, 20, 9)))
+            return datetime(day.year, day.month, day.day, hour,
+                            self.rng.randrange(60), self.rng.randrange(60))
+
+    def _request_status(self, requested_at: datetime) -> TestStatus:
+        age_days = (self.end_date - requested_at).days
+        if age_days > 7:
+            weights = [1, 2, 92, 5]
+        elif age_days > 1:
+            weights = [15, 25, 55, 5]
+        else:
+            weights = [55, 30, 12, 3]
+        return self.rng.choices(
+            [TestStatus.PENDING, TestStatus.IN_PROGRESS, TestStatus.COMPLETED, TestStatus.CANCELLED],
+            weights=weights
+        )[0]
+
+    def _generate_orders(self, conn, counts, orders: int, days: int, patient_ids: List[str],
+                         test_types: List[Tuple[str, float]], users: Dict[UserRole, List[str]],
+                         progress):
+        """Generate visits: each visit is 1-4 test requests, their samples, reports and one invoice"""
+        request_sql = '''
+            INSERT INTO test_requests
+            (id, patient_id, test_type_id, status, requested_by, requested_at, completed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        '''
+        sample_sql = '''
+            INSERT INTO samples (id, test_request_id, barcode, collected_at, status, notes)
+            VALUES (?, ?, ?, ?, ?, ?)
+        '''
+        report_sql = '''
+            INSERT INTO medical_reports (id, test_request_id, content, signed_by, signed_at, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        '''
+        invoice_sql = '''
+            INSERT INTO invoices (id, patient_id, total_amount, paid_amount, payment_method, created_at, paid_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        '''
+        link_sql = '''
+            INSERT INTO invoice_test_requests (invoice_id, test_request_id)
+            VALUES (?, ?)
+        '''
+        doctors = users[UserRole.DOCTOR]
+        payment_methods = [method.value for method in PaymentMethod]
+        sample_statuses = [SampleStatus.VALID.value, SampleStatus.DAMAGED.value, SampleStatus.INSUFFICIENT.value]
+        # Popular tests are ordered far more often than rare ones
+        test_weights = [1.0 / (rank + 1) for rank in range(len(test_types))]
+        self.rng.shuffle(test_weights)
+
+        requests, samples, reports, invoices, links = [], [], [], [], []
+        created = 0
+        barcode_seq = 0
+
+        while created < orders:
+            patient_id = self.rng.choice(patient_ids)
+            doctor_id = self.rng.choice(doctors)
+            requested_at = self._request_time(days)
+            visit_size = min(orders - created, self.rng.choices([1, 2, 3, 4], weights=[45, 30, 15, 10])[0])
+            visit_tests = self.rng.choices(test_types, weights=test_weights, k=visit_size)
+            invoice_id = self._uuid()
+            total = 0.0
+
+            for test_type_id, price in visit_tests:
+                request_id = self._uuid()
+                status = self._request_status(requested_at)
+                completed_at = None
+                if status == TestStatus.COMPLETED:
+                    completed_at = requested_at + timedelta(minutes=self.rng.randrange(30, 72 * 60))
+                requests.append((
+                    request_id, patient_id, test_type_id, status.value, doctor_id,
+                    _timestamp(requested_at), _timestamp(completed_at)
+                ))
+                links.append((invoice_id, request_id))
+                total += price
+
+                if status != TestStatus.CANCELLED:
+                    barcode_seq += 1
+                    collected_at = requested_at + timedelta(minutes=self.rng.randrange(1, 45))
+                    sample_status = self.rng.choices(sample_statuses, weights=[95, 3, 2])[0]
+                    samples.append((
+                        self._uuid(), request_id,
+                        f"LAB{requested_at:%y%m%d}{barcode_seq:09d}",
+                        _timestamp(collected_at), sample_status,
+                        None if sample_status == SampleStatus.VALID.value else "Recollection requested"
+                    ))
+
+                if completed_at:
+                    reports.append((
+                        self._uuid(), request_id,
+                        compress_content(
+                            f"Result for test {test_type_id}: value {self.rng.uniform(0.1, 250):.2f}. "
+                            f"Within reference range: {'yes' if self.rng.random() < 0.8 else 'no'}."
+                        ),
+                        doctor_id, _timestamp(completed_at), _timestamp(completed_at)
+                    ))
+                created += 1
+
+            payment = self.rng.random()
+            if payment < 0.8:
+                paid = total
+            elif payment < 0.9:
+                paid = round(total * self.rng.uniform(0.2, 0.8), 2)
+            else:
+                paid = 0.0
+            invoices.append((
+                invoice_id, patient_id, total, paid,
+                self.rng.choice(payment_methods) if paid else None,
+                _timestamp(requested_at), _timestamp(requested_at) if paid >= total else None
+            ))
+
+            if len(requests) >= self.chunk_size:
+                self._flush_orders(conn, counts, progress, request_sql, requests, sample_sql, samples,
+                                   report_sql, reports, invoice_sql, invoices, link_sql, links)
+
+        self._flush_orders(conn, counts, progress, request_sql, requests, sample_sql, samples,
+                           report_sql, reports, invoice_sql, invoices, link_sql, links)
+
+    def _flush_orders(self, conn, counts, progress, request_sql, requests, sample_sql, samples,
+                      report_sql, reports, invoice_sql, invoices, link_sql, links):
+        self._insert(conn, counts, "test_requests", request_sql, requests, progress)
+        self._insert(conn, counts, "samples", sample_sql, samples)
+        self._insert(conn, counts, "medical_reports", report_sql, reports)
+        self._insert(conn, counts, "invoices", invoice_sql, invoices)
+        self._insert(conn, counts, "invoice_test_requests", link_sql, links)
+        conn.commit()
+
+
+def generate_dataset(db: DatabaseManager, orders: int = 1000, seed: int = 42, **kwargs) -> Dict[str, int]:
+    """Convenience wrapper around SyntheticDataGenerator.generate"""
+    generator_args = {key: kwargs.pop(key) for key in ("chunk_size", "end_date") if key in kwargs}
+    return SyntheticDataGenerator(db, seed=seed, **generator_args).generate(orders=orders, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic medical lab database")
+    parser.add_argument("--output", default="loadtest.db", help="Database file to create")
+    parser.add_argument("--orders", type=int, default=1000, help="Number of test requests")
+    parser.add_argument("--patients", type=int, default=None, help="Number of patients")
+    parser.add_argument("--days", type=int, default=365, help="Period covered by the requests")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--overwrite", action="store_true", help="Replace an existing output file")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        if not args.overwrite:
+            parser.error(f"{args.output} already exists (use --overwrite to replace it)")
+        # Generating into an existing dataset would collide on unique columns
+        for suffix in ("", "-journal", "-wal", "-shm"):
+            if os.path.exists(args.output + suffix):
+                os.remove(args.output + suffix)
+
+    db = DatabaseManager(args.output)
+    started = datetime.now()
+    counts = generate_dataset(
+        db, orders=args.orders, seed=args.seed, patients=args.patients, days=args.days,
+        progress=lambda table, rows: print(f"  {table}: {rows} rows", end="\r")
+    )
+    print()
+    for table, rows in counts.items():
+        print(f"{table}: {rows}")
+    print(f"Done in {(datetime.now() - started).total_seconds():.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script to verify accession number allocation
+"""
+import sys
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.accession import AccessionAllocator, check_digit, is_valid_accession
+
+def test_accession_format():
+    """Test the date prefix, site code, sequence and check digit"""
+    print("Testing accession number format...")
+
+    db = DatabaseManager(":memory:")
+    allocator = AccessionAllocator(db, site="07", block_size=5, clock=lambda: datetime(2024, 3, 15, 10, 0))
+    numbers = allocator.allocate(12)
+    assert numbers[0] == "24031507000013" and numbers[1].startswith("2403150700002"), f"Unexpected: {numbers[:2]}"
+    assert [int(n[8:13]) for n in numbers] == list(range(1, 13)), "Numbers not sequential"
+    assert all(is_valid_accession(n) for n in numbers)
+    assert check_digit("7992739871") == "3", "Not the Luhn check digit"
+
+    # Any single mistyped digit is caught
+    number = numbers[3]
+    for position in range(13):
+        typo = number[:position] + str((int(number[position]) + 1) % 10) + number[position + 1:]
+        assert not is_valid_accession(typo), f"Typo not detected: {typo}"
+    print("✓ Date-prefixed sequential numbers with a check digit")
+
+    # Sequences restart every day
+    tomorrow = AccessionAllocator(db, site="07", block_size=5, clock=lambda: datetime(2024, 3, 16, 8, 0))
+    assert tomorrow.next()[:13] == "2403160700001"
+    db.close()
+
+def test_stations_never_collide():
+    """Test that workstations sharing a database get disjoint blocks"""
+    print("Testing accession blocks across workstations...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "shared.db")
+        DatabaseManager(path)
+        numbers, errors = [], []
+        lock = threading.Lock()
+
+        def station():
+            try:
+                # Each workstation opens the shared database itself
+                allocator = AccessionAllocator(DatabaseManager(path), block_size=7)
+                issued = allocator.allocate(200)
+                with lock:
+                    numbers.extend(issued)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=station) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors, f"Allocation failed: {errors}"
+        assert len(numbers) == 800 and len(set(numbers)) == 800, "Accession numbers collided"
+        print("✓ 800 numbers from 4 workstations, no collisions")
+
+if __name__ == "__main__":
+    try:
+        test_accession_format()
+        test_stations_never_collide()
+        print("✅ Accession test PASSED")
+    except Exception as e:
+        print(f"❌ Accession test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test script to verify year-partitioned archiving of closed records
+"""
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.archive import Archiver, ARCHIVED_TABLES
+from medical_lab_system.synthetic_data import generate_dataset
+
+def count_rows(db):
+    conn = db._connect()
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ARCHIVED_TABLES}
+    conn.close()
+    return counts
+
+def test_archive():
+    """Test that old closed records move to yearly files and stay readable"""
+    print("Testing archiving...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "medical_lab.db"))
+        generate_dataset(db, orders=400, seed=7, days=3 * 365)
+        before = count_rows(db)
+        start, end = datetime.now() - timedelta(days=4 * 365), datetime.now()
+        requests_before = sorted(r.id for r in db.get_test_requests_by_date_range(start, end))
+        invoices_before = sorted(i.id for i in db.get_invoices_by_date_range(start, end))
+        start_seq = db.get_latest_change_seq()
+
+        cutoff = datetime(datetime.now().year - 1, 1, 1)
+        archiver = Archiver(db, archive_dir=os.path.join(tmp, "archives"), batch_size=25)
+        batches = []
+        moved = archiver.archive_before(cutoff, progress=lambda year, rows: batches.append(year))
+        assert moved["test_requests"] > 0 and moved["invoices"] > 0, f"Nothing archived: {moved}"
+        assert len(batches) > 2, "Records were not moved in batches"
+        assert archiver.archived_years() == sorted(set(batches)) and max(batches) < cutoff.year
+        print(f"✓ Archived {moved} into years {archiver.archived_years()}")
+
+        after = count_rows(db)
+        assert all(after[table] == before[table] - moved[table] for table in ARCHIVED_TABLES)
+        conn = db._connect()
+        assert conn.execute('''
+            SELECT COUNT(*) FROM test_requests
+            WHERE requested_at < ? AND status IN ('Completed', 'Cancelled')
+              AND NOT EXISTS (SELECT 1 FROM invoice_test_requests l WHERE l.test_request_id = test_requests.id)
+        ''', (cutoff.isoformat(" "),)).fetchone()[0] == 0, "Closed uninvoiced requests left behind"
+        assert conn.execute("SELECT COUNT(*) FROM invoices WHERE paid_at IS NULL AND created_at < ?",
+                            (cutoff.isoformat(" "),)).fetchone()[0] > 0, "Unpaid invoices were archived"
+        conn.close()
+        print("✓ Only closed records before the cutoff were moved")
+
+        archived_id = next(r for r in requests_before if db.get_test_request(r) is None)
+        with archiver.including_archives() as history:
+            assert count_rows(history) == before, "Union views do not add up"
+            assert sorted(r.id for r in history.get_test_requests_by_date_range(start, end)) == requests_before
+            assert sorted(i.id for i in history.get_invoices_by_date_range(start, end)) == invoices_before
+            assert history.get_test_request(archived_id) is not None, "Archived request not found"
+        print("✓ Archived records readable through the union views")
+
+        operations = {entry.operation for entry in db.changes_since(start_seq)}
+        assert operations == {"ARCHIVE"}, f"Archived rows logged as {operations}"
+        assert archiver.archive_before(cutoff) == {table: 0 for table in ARCHIVED_TABLES}
+        print("✓ Change log marks moves as ARCHIVE and a second run moves nothing")
+
+        db.close()
+
+if __name__ == "__main__":
+    try:
+        test_archive()
+        print("✅ Archive test PASSED")
+    except Exception as e:
+        print(f"❌ Archive test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test script to verify online backup, rotation and restore
+"""
+import sys
+import os
+import gzip
+import tempfile
+import threading
+import time
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.backup import BackupManager, BackupError
+from medical_lab_system.models import Patient, Gender
+from medical_lab_system.field_encryption import FieldCipher, KEY_FILE_NAME, generate_key
+
+def make_patient(patient_id, name="Backup Patient"):
+    return Patient(
+        id=patient_id,
+        name=name,
+        age=29,
+        gender=Gender.MALE,
+        contact_info="backup@example.com"
+    )
+
+def test_backup_and_restore():
+    """Test a stepped online backup, its verification and a restore"""
+    print("Testing backup and restore...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "medical_lab.db"))
+        for i in range(50):
+            db.create_patient(make_patient(f"8200{i:04d}"))
+        manager = BackupManager(db, backup_dir=os.path.join(tmp, "backups"), keep=3,
+                                pages_per_step=2, step_pause_ms=1)
+
+        steps = []
+        # Writes from another thread go ahead while the backup is stepping
+        writer = threading.Thread(target=db.create_patient, args=(make_patient("82009999"),))
+        def on_progress(copied, total):
+            steps.append((copied, total))
+            if len(steps) == 2:
+                writer.start()
+        path = manager.create_backup(progress=on_progress)
+        writer.join()
+        assert len(steps) > 2, f"Backup was not copied in steps: {steps}"
+        assert path.endswith(".db.gz") and os.path.exists(path)
+        with gzip.open(path, "rb") as f:
+            assert f.read(16) == b"SQLite format 3\x00", "Backup is not a compressed database"
+        manager.verify_backup(path)
+        assert sorted(os.listdir(manager.backup_dir)) == sorted(
+            os.path.basename(name) for name in (path, manager.key_copy_path(path))), "Temporary files left behind"
+        print("✓ Online backup copied in steps, compressed and verified")
+
+        db.update_patient(make_patient("82000001", name="Changed After Backup"))
+        db.delete_patient("82000002")
+        current = manager.restore(path)
+        assert current and os.path.exists(current), "Current data not backed up before restore"
+        assert db.get_patient("82000001").name == "Backup Patient", "Restore did not replace data"
+        assert db.get_patient("82000002") is not None
+        print("✓ Backup restored after backing up the current data")
+
+        for _ in range(4):
+            manager.create_backup()
+        backups = manager.list_backups()
+        assert len(backups) == 3, f"Retention not applied: {backups}"
+        assert len(os.listdir(manager.backup_dir)) == 6, "Key copies not rotated with their backups"
+        assert backups == sorted(backups, reverse=True)
+        print("✓ Old backups rotated out")
+
+        corrupt = os.path.join(manager.backup_dir, "medical_lab-00000000-000000.db.gz")
+        with gzip.open(corrupt, "wb") as f:
+            f.write(b"not a database" * 100)
+        try:
+            manager.restore(corrupt)
+            raise AssertionError("Corrupt backup was restored")
+        except BackupError:
+            pass
+        assert db.get_patient("82000001").name == "Backup Patient", "Failed restore changed the data"
+        print("✓ Corrupt backup rejected")
+
+        db.close()
+
+def fill(db, rows):
+    conn = db._open_connection()
+    conn.executemany("INSERT INTO patients (id, name, age, gender) VALUES (?, ?, 30, 'Male')",
+                     [(f"fill-{i}", "Filler " + "x" * 400) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+def test_backup_under_sustained_writes():
+    """Test that a stepped backup finishes while another connection keeps committing"""
+    print("Testing backup during sustained writes...")
+
+    for profile in ("wal", "default"):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = DatabaseManager(os.path.join(tmp, "medical_lab.db"), storage_profile=profile)
+            fill(db, 2000)
+            manager = BackupManager(db, backup_dir=os.path.join(tmp, "backups"), pages_per_step=5,
+                                    step_pause_ms=1, max_restarts=3)
+
+            stop = threading.Event()
+            commits = []
+            def keep_writing():
+                while not stop.is_set():
+                    try:
+                        db.create_patient(make_patient(f"83{len(commits):06d}"))
+                        commits.append(1)
+                    except Exception:
+                        pass  # held off by the final single-step copy
+                    time.sleep(0.002)
+            writer = threading.Thread(target=keep_writing)
+            writer.start()
+            steps = []
+            try:
+                path = manager.create_backup(progress=lambda copied, total: steps.append(copied))
+            finally:
+                stop.set()
+                writer.join()
+            assert len(commits) > 5, f"Writer was held off during the {profile} backup"
+            if profile == "wal":
+                assert manager.restarts == 0, f"WAL backup restarted {manager.restarts} times"
+            else:
+                assert manager.restarts <= 4, f"Restarts not bounded: {manager.restarts}"
+            manager.verify_backup(path)
+            restored = DatabaseManager(os.path.join(tmp, "restored.db"))
+            BackupManager(restored, backup_dir=manager.backup_dir).restore(path, keep_current=False)
+            assert restored.get_patient("fill-1999") is not None, "Backup incomplete"
+            restored.close()
+            db.close()
+            print(f"✓ {profile}: {len(steps)} steps, {manager.restarts} restarts, {len(commits)} commits meanwhile")
+
+def test_backup_keys():
+    """Test that the key file is kept with each backup and a restore needs its keys"""
+    print("Testing backups of the field encryption key...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "medical_lab.db"))
+        db.create_patient(make_patient("84100001"))
+        manager = BackupManager(db, backup_dir=os.path.join(tmp, "backups"))
+        path = manager.create_backup()
+        with open(os.path.join(tmp, KEY_FILE_NAME), "rb") as key, open(manager.key_copy_path(path), "rb") as copy:
+            assert copy.read() == key.read(), "Key file not kept with the backup"
+        if os.name == "posix":
+            assert os.stat(manager.key_copy_path(path)).st_mode & 0o077 == 0, "Key copy readable by others"
+        print("✓ Key file kept with the backup")
+
+        # Another station, with a key of its own
+        os.makedirs(os.path.join(tmp, "other"))
+        other = DatabaseManager(os.path.join(tmp, "other", "medical_lab.db"),
+                                field_cipher=FieldCipher([generate_key()]))
+        other.create_patient(make_patient("84100002", name="Other Station Patient"))
+        try:
+            BackupManager(other, backup_dir=manager.backup_dir).restore(path, keep_current=False)
+            raise AssertionError("Backup restored without its keys")
+        except BackupError as e:
+            assert manager.key_copy_path(path) in str(e), f"Key copy not pointed to: {e}"
+        assert other.get_patient("84100002") is not None and other.get_patient("84100001") is None, \
+            "Refused restore changed the data"
+
+        # With the backup's key added, the restore goes ahead and reads back
+        with open(manager.key_copy_path(path), "rb") as copy:
+            backup_key = copy.read().strip()
+        other.field_cipher = FieldCipher([generate_key(), backup_key])
+        BackupManager(other, backup_dir=manager.backup_dir).restore(path, keep_current=False)
+        assert other.get_patient("84100001").contact_info == "backup@example.com"
+        print("✓ Restore refused without the backup's keys")
+        other.close()
+        db.close()
+
+if __name__ == "__main__":
+    try:
+        test_backup_and_restore()
+        test_backup_under_sustained_writes()
+        test_backup_keys()
+        print("✅ Backup test PASSED")
+    except Exception as e:
+        print(f"❌ Backup test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
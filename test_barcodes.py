@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test script to verify in-memory barcode rendering and label batches
+"""
+import sys
+import os
+import io
+import tempfile
+import time
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from PIL import Image
+
+from medical_lab_system.barcodes import Label, bar_runs, render_svg, render_png, label_sheet_pdf, zpl_labels
+
+def test_render_in_memory():
+    """Test SVG and PNG rendering without files and the encoding cache"""
+    print("Testing barcode rendering...")
+
+    cwd_files = set(os.listdir("."))
+    total, runs = bar_runs("S240315000123")
+    assert runs and runs[0][0] == 0, "Code128 starts with a bar"
+    assert all(start + width <= total for start, width in runs)
+
+    svg = render_svg("S240315000123")
+    assert svg.startswith("<svg") and svg.count("<rect") == len(runs) + 1
+    image = Image.open(io.BytesIO(render_png("S240315000123", module_width=2, height=40)))
+    assert image.size == ((total + 20) * 2, 40)
+    assert set(os.listdir(".")) == cwd_files, "Rendering wrote files"
+
+    hits = bar_runs.cache_info().hits
+    render_png("S240315000123")
+    assert bar_runs.cache_info().hits > hits, "Encoding not cached"
+    print("✓ SVG and PNG rendered in memory from cached bars")
+
+def test_label_batches():
+    """Test that 300 labels become label sheets and a ZPL job quickly"""
+    print("Testing label batches...")
+
+    labels = [Label(f"S2403150{i:05d}", f"Patient {i} - Complete Blood Count", "2024-03-15 09:30")
+              for i in range(300)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "labels.pdf")
+        start = time.perf_counter()
+        sheets = label_sheet_pdf(path, labels, sheet="L7651")
+        zpl = zpl_labels(labels)
+        elapsed = time.perf_counter() - start
+        with open(path, "rb") as f:
+            assert f.read(4) == b"%PDF"
+        assert os.listdir(tmp) == ["labels.pdf"]
+
+    assert sheets == 5, f"300 labels on 65-label sheets should take 5 sheets, got {sheets}"
+    assert zpl.count("^XA") == 300 and zpl.count("^XZ") == 300
+    assert "^FDS240315000042^FS" in zpl
+    assert elapsed < 1.5, f"300 labels took {elapsed:.2f}s"
+    print(f"✓ 300 labels rendered in {elapsed * 1000:.0f} ms")
+
+    # Labels already used on a sheet are skipped
+    with tempfile.TemporaryDirectory() as tmp:
+        assert label_sheet_pdf(os.path.join(tmp, "labels.pdf"), labels[:10], sheet="L7651", skip=60) == 2
+    assert "_5E" in zpl_labels([Label("S1", "caret ^ name")]), "ZPL control character not escaped"
+    print("✓ Partly used sheets and ZPL escaping handled")
+
+if __name__ == "__main__":
+    try:
+        test_render_in_memory()
+        test_label_batches()
+        print("✅ Barcodes test PASSED")
+    except Exception as e:
+        print(f"❌ Barcodes test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
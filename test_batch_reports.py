@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script to verify batch rendering of result reports
+"""
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.models import Patient, Gender, TestType, TestRequest, TestStatus, MedicalReport
+from medical_lab_system.batch_reports import BatchReportJob
+
+DAY = datetime(2024, 3, 1, 9, 0)
+
+def seed(db):
+    test_type = TestType(id="tt-batch", name="Batch Panel", description="", price=20.0, category="Chemistry")
+    db.create_test_type(test_type)
+    for p in range(3):
+        db.create_patient(Patient(id=f"8100000{p}", name=f"Batch Patient {p}", age=30 + p, gender=Gender.MALE,
+                                  contact_info="batch@example.com"))
+    for i in range(12):
+        request = TestRequest(id=f"req-batch-{i}", patient_id=f"8100000{i % 3}", test_type_id=test_type.id,
+                              status=TestStatus.COMPLETED if i % 4 else TestStatus.IN_PROGRESS,
+                              requested_by="Dr. Batch", requested_at=DAY + timedelta(hours=i))
+        db.create_test_request(request)
+        db.create_medical_report(MedicalReport(
+            id=f"rep-batch-{i}", test_request_id=request.id, content=f"Glucose: {90 + i} mg/dL",
+            signed_by="N/A" if i == 5 else "doctor-1", signed_at=request.requested_at,
+            created_at=request.requested_at + timedelta(days=i // 6)))
+
+def test_select():
+    """Test that results are selected by date, status and patient in one query"""
+    print("Testing batch report selection...")
+
+    db = DatabaseManager(":memory:")
+    seed(db)
+    job = BatchReportJob(db)
+
+    first_day = job.select(DAY, DAY.replace(hour=23))
+    assert [report.id for report, *_ in first_day] == [f"rep-batch-{i}" for i in range(6)], \
+        f"Wrong date selection: {[r.id for r, *_ in first_day]}"
+    report, patient, test_type, request = first_day[1]
+    assert report.content == "Glucose: 91 mg/dL" and patient.id == "81000001" and test_type.name == "Batch Panel"
+    assert request.id == "req-batch-1"
+
+    assert len(job.select(status=TestStatus.IN_PROGRESS)) == 3
+    assert {patient.id for _r, patient, *_ in job.select(patient_id="81000002")} == {"81000002"}
+    assert len(job.select(signed_only=True)) == 11
+    # Patients shared by several results are built once
+    results = job.select()
+    assert results[0][1] is results[3][1]
+    print("✓ Results selected by date, status, patient and signature")
+    db.close()
+
+def test_render_to_directory():
+    """Test rendering one PDF per result in a process pool with progress"""
+    print("Testing batch rendering...")
+
+    db = DatabaseManager(":memory:")
+    seed(db)
+    job = BatchReportJob(db, workers=2, chunk_size=3)
+    results = job.select()
+    updates = []
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = job.render_to_directory(results, os.path.join(tmp, "out"),
+                                        progress=lambda done, total: updates.append((done, total)))
+        assert len(paths) == 12 and sorted(os.listdir(os.path.join(tmp, "out"))) == sorted(map(os.path.basename, paths))
+        for path in paths:
+            with open(path, "rb") as f:
+                assert f.read(4) == b"%PDF"
+    assert updates[0] == (0, 12) and updates[-1] == (12, 12), f"Progress not reported: {updates}"
+    assert [done for done, _total in updates] == sorted(done for done, _total in updates)
+    print("✓ One PDF per result rendered by worker processes")
+
+    try:
+        import PyPDF2  # noqa: F401
+    except ImportError:
+        print("- PyPDF2 not installed, merged output not checked")
+        db.close()
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "merged.pdf")
+        pages = job.render_merged(results, path)
+        from PyPDF2 import PdfReader
+        assert len(PdfReader(path).pages) == pages >= 12
+        assert os.listdir(tmp) == ["merged.pdf"], "Part files left behind"
+    print("✓ Merged PDF written")
+    db.close()
+
+if __name__ == "__main__":
+    try:
+        test_select()
+        test_render_to_directory()
+        print("✅ Batch reports test PASSED")
+    except Exception as e:
+        print(f"❌ Batch reports test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the benchmark harness
+"""
+import sys
+import os
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.benchmark import run_suite, compare_to_baseline
+
+def test_benchmark():
+    """Test that the suite produces results and flags regressions"""
+    print("Testing benchmark harness...")
+
+    results = run_suite([200], repeat=3, time_budget=0.5,
+                        only=["get_patient", "create_test_request", "screen:", "login"])
+    scale_results = results["200"]
+    for name in ["get_patient", "create_test_request", "screen:results", "screen:samples",
+                 "screen:statistics", "login"]:
+        assert name in scale_results, f"Missing benchmark {name}"
+    print(f"✓ Ran {len(scale_results)} benchmarks")
+
+    result = scale_results["get_patient"]
+    assert 0 < result["p50_ms"] <= result["p95_ms"] <= result["max_ms"], f"Inconsistent percentiles: {result}"
+
+    # Pretend the baseline was twice as fast for one benchmark
+    baseline = {"200": {"login": dict(scale_results["login"], p50_ms=scale_results["login"]["p50_ms"] / 2)}}
+    regressions = compare_to_baseline(results, baseline, threshold=0.2)
+    assert len(regressions) == 1 and "login" in regressions[0], f"Regression not reported: {regressions}"
+    print("✓ Regression against baseline detected")
+
+if __name__ == "__main__":
+    try:
+        test_benchmark()
+        print("✅ Benchmark harness test PASSED")
+    except Exception as e:
+        print(f"❌ Benchmark harness test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the change_log feed
+"""
+import sys
+import os
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.models import Patient, Gender
+
+def make_patient(patient_id, name="Logged Patient"):
+    return Patient(
+        id=patient_id,
+        name=name,
+        age=61,
+        gender=Gender.MALE,
+        contact_info="log@example.com"
+    )
+
+def test_change_log():
+    """Test that changes are fed in order, paged, filtered and compacted"""
+    print("Testing change log...")
+
+    db = DatabaseManager(":memory:")
+    start = db.get_latest_change_seq()
+
+    db.create_patient(make_patient("60000001"))
+    db.update_patient(make_patient("60000001", name="Renamed Patient"))
+    db.create_patient(make_patient("60000002"))
+    db.delete_patient("60000002")
+
+    changes = db.changes_since(start, tables=["patients"])
+    assert [(c.row_id, c.operation) for c in changes] == [
+        ("60000001", "INSERT"), ("60000001", "UPDATE"), ("60000002", "INSERT"), ("60000002", "DELETE")
+    ], f"Unexpected changes: {changes}"
+    assert [c.seq for c in changes] == sorted(c.seq for c in changes)
+    print("✓ Changes recorded in order")
+
+    # Paging with the last seen seq returns every change exactly once
+    seen, seq = [], start
+    while True:
+        page = db.changes_since(seq, limit=1, tables=["patients"])
+        if not page:
+            break
+        seen.extend(page)
+        seq = page[-1].seq
+    assert seen == changes, "Paging lost or repeated changes"
+    print("✓ Paging through changes works")
+
+    removed = db.compact_change_log(db.get_latest_change_seq() + 1)
+    compacted = db.changes_since(start, tables=["patients"])
+    assert removed >= 2, f"Only {removed} entries compacted"
+    assert [(c.row_id, c.operation) for c in compacted] == [("60000001", "UPDATE"), ("60000002", "DELETE")], \
+        f"Compaction lost the latest change of a row: {compacted}"
+    print("✓ Compaction keeps the latest change per row")
+
+    db.close()
+
+def test_change_log_composite_key(db):
+    """Test that link tables without an id column are logged too"""
+    start = db.get_latest_change_seq()
+    conn = db._connect()
+    conn.execute("INSERT INTO invoice_test_requests (invoice_id, test_request_id) VALUES ('inv-1', 'req-1')")
+    conn.commit()
+    conn.close()
+    changes = db.changes_since(start)
+    assert [(c.table_name, c.row_id) for c in changes] == [("invoice_test_requests", "inv-1:req-1")]
+
+if __name__ == "__main__":
+    try:
+        test_change_log()
+        print("✅ Change log test PASSED")
+    except Exception as e:
+        print(f"❌ Change log test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test script to verify change detection for auto-refreshing screens
+"""
+import sys
+import os
+import tempfile
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.change_watcher import ChangeWatcher
+from medical_lab_system.models import Patient, Gender, TestType
+
+def make_patient(patient_id):
+    return Patient(
+        id=patient_id,
+        name="Watched Patient",
+        age=52,
+        gender=Gender.FEMALE,
+        contact_info="watch@example.com"
+    )
+
+def test_change_watcher():
+    """Test that only subscribers of changed tables are notified"""
+    print("Testing change watcher...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "watch.db")
+        station = DatabaseManager(path)
+        other_station = DatabaseManager(path)
+        watcher = ChangeWatcher(station)
+
+        patient_changes, test_type_changes = [], []
+        watcher.subscribe({"patients"}, patient_changes.append)
+        watcher.subscribe({"test_types"}, test_type_changes.append)
+
+        assert watcher.check() == set(), "Idle database reported changes"
+
+        other_station.create_patient(make_patient("50000001"))
+        assert watcher.check() == {"patients"}, "Patient change not detected"
+        assert patient_changes == [{"patients"}] and test_type_changes == [], \
+            f"Wrong subscribers notified: {patient_changes} {test_type_changes}"
+        assert watcher.check() == set(), "Change reported twice"
+        print("✓ Changes from another station detected per table")
+
+        other_station.update_patient(make_patient("50000001"))
+        other_station.create_test_type(TestType(
+            id="watch-test", name="Watch Test", description="", price=10.0, category="Blood"
+        ))
+        assert watcher.check() == {"patients", "test_types"}
+        assert len(patient_changes) == 2 and len(test_type_changes) == 1
+        print("✓ Several tables changed between checks")
+
+        watcher.stop()
+    print("✓ Change watcher works")
+
+def test_change_watcher_memory(db):
+    """Test change detection on the shared in-memory test database"""
+    watcher = ChangeWatcher(db)
+    assert watcher.check() == set()
+    db.create_patient(make_patient("50000002"))
+    assert watcher.check() == {"patients"}
+    watcher.stop()
+
+if __name__ == "__main__":
+    try:
+        test_change_watcher()
+        print("✅ Change watcher test PASSED")
+    except Exception as e:
+        print(f"❌ Change watcher test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test script to verify compressed storage of report and template bodies
+"""
+import sys
+import os
+import uuid
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager, COMPRESSED_CONTENT_MARKER
+from medical_lab_system.models import MedicalReport, TestTemplate
+
+REPORT_BODY = "Haemoglobin 13.5 g/dL (reference 12.0-15.5)\nWhite cells 6.1 x10^9/L\n" * 200
+
+def make_report(test_request_id="req-compress"):
+    return MedicalReport(
+        id=str(uuid.uuid4()),
+        test_request_id=test_request_id,
+        content=REPORT_BODY,
+        signed_by="Doctor",
+        signed_at=datetime.now()
+    )
+
+def stored_value(db, table, column, row_id):
+    conn = db._connect()
+    value = conn.execute(f"SELECT {column} FROM {table} WHERE id = ?", (row_id,)).fetchone()[0]
+    conn.close()
+    return value
+
+def test_content_compression():
+    """Test that bodies are stored compressed and read back unchanged"""
+    print("Testing content compression...")
+
+    db = DatabaseManager(":memory:")
+    report = make_report()
+    assert db.create_medical_report(report)
+    stored = stored_value(db, "medical_reports", "content", report.id)
+    assert isinstance(stored, bytes) and stored.startswith(COMPRESSED_CONTENT_MARKER), "Report not compressed"
+    assert len(stored) < len(REPORT_BODY) / 10, f"Compressed body is {len(stored)} bytes"
+    assert db.get_medical_report(report.id).content == REPORT_BODY
+
+    report.content = "Amended: " + REPORT_BODY
+    assert db.update_medical_report(report)
+    assert db.get_medical_report(report.id).content == report.content
+
+    test_type_id = "tt-compress"
+    template = TestTemplate(id=str(uuid.uuid4()), test_type_id=test_type_id, template_content="Résultat: {value}\n" * 50)
+    assert db.create_test_template(template)
+    assert isinstance(stored_value(db, "test_templates", "template_content", template.id), bytes)
+    assert db.get_test_template(template.id).template_content == template.template_content
+    assert db.get_test_template_by_test_type(test_type_id).template_content == template.template_content
+    print("✓ Bodies stored compressed and read back unchanged")
+
+    db.enable_instrumentation(log_path=None)
+    reports = db.get_all_medical_reports()
+    by_request = db.get_medical_reports_by_test_request("req-compress")
+    templates = db.get_all_test_templates()
+    assert [r.id for r in by_request] == [report.id] and report.id in [r.id for r in reports]
+    assert all(r.content is None for r in reports + by_request)
+    assert all(t.template_content is None for t in templates) and template.id in [t.id for t in templates]
+    statements = [s["sql"] for s in db.get_query_stats()["statements"]]
+    assert statements and not any("content" in sql for sql in statements), f"List query read bodies: {statements}"
+    db.disable_instrumentation()
+    print("✓ Lists never select the bodies")
+
+    db.close()
+
+def test_content_migration(db):
+    """Test that bodies stored as plain text are still readable and get compressed"""
+    report = make_report("req-legacy")
+    conn = db._connect()
+    conn.execute('''
+        INSERT INTO medical_reports (id, test_request_id, content, signed_by, signed_at, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (report.id, report.test_request_id, REPORT_BODY, "Doctor", report.signed_at, report.created_at))
+    conn.commit()
+    conn.close()
+    assert db.get_medical_report(report.id).content == REPORT_BODY, "Plain text body not readable"
+
+    latest_seq = db.get_latest_change_seq()
+    assert db.compress_stored_content(batch_size=2) >= 1
+    assert stored_value(db, "medical_reports", "content", report.id).startswith(COMPRESSED_CONTENT_MARKER)
+    assert db.get_medical_report(report.id).content == REPORT_BODY
+    assert db.get_latest_change_seq() == latest_seq, "Migration logged the rows as changed"
+    assert db.compress_stored_content() == 0, "Second migration found work"
+
+def test_migration_waits_for_writers():
+    """Test that a body edited while the migration waits for the lock is not overwritten"""
+    print("Testing migration during an edit...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "compress.db"))
+        report = make_report("req-race")
+        conn = db._open_connection()
+        conn.execute('''
+            INSERT INTO medical_reports (id, test_request_id, content, signed_by, signed_at, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (report.id, report.test_request_id, "Old body", "Doctor", report.signed_at, report.created_at))
+        conn.commit()
+
+        # Another station edits the body and commits while the migration waits
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("UPDATE medical_reports SET content = 'Amended body' WHERE id = ?", (report.id,))
+        migration = threading.Thread(target=db.compress_stored_content)
+        migration.start()
+        time.sleep(0.3)
+        conn.execute("COMMIT")
+        edit_seq = db.get_latest_change_seq()
+        conn.close()
+        migration.join()
+
+        assert db.get_medical_report(report.id).content == "Amended body", "Edit overwritten by the migration"
+        assert db.get_latest_change_seq() == edit_seq, "The edit's change_log entry was removed"
+        db.close()
+    print("✓ Concurrent edit kept and still synced")
+
+if __name__ == "__main__":
+    try:
+        test_content_compression()
+        test_migration_waits_for_writers()
+        print("✅ Content compression test PASSED")
+    except Exception as e:
+        print(f"❌ Content compression test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Test script to verify encrypted patient contact info and blind-index lookups
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.models import Patient, Gender
+from medical_lab_system.field_encryption import (FieldCipher, ENCRYPTED_FIELD_MARKER, KEY_FILE_NAME,
+                                                 UNREADABLE_FIELD, generate_key)
+
+def make_patient(patient_id, contact_info="+249 912 345 678", name="Encrypted Patient"):
+    return Patient(id=patient_id, name=name, age=35, gender=Gender.FEMALE, contact_info=contact_info)
+
+def stored_row(db, patient_id):
+    conn = db._open_connection()
+    row = conn.execute("SELECT contact_info, contact_info_index FROM patients WHERE id = ?",
+                       (patient_id,)).fetchone()
+    conn.close()
+    return row
+
+def test_contact_info_encrypted():
+    """Test that contact info is stored encrypted and read back unchanged"""
+    print("Testing encrypted contact info...")
+
+    db = DatabaseManager(":memory:")
+    assert db.create_patient(make_patient("84000001"))
+    stored, index = stored_row(db, "84000001")
+    assert isinstance(stored, bytes) and stored.startswith(ENCRYPTED_FIELD_MARKER), "Contact info stored in clear"
+    assert b"912" not in stored and index and "912" not in index
+    assert db.get_patient("84000001").contact_info == "+249 912 345 678"
+
+    patient = make_patient("84000001", contact_info="Résidence 4, أم درمان")
+    assert db.update_patient(patient)
+    assert db.get_patient("84000001").contact_info == patient.contact_info
+    assert stored_row(db, "84000001")[1] != index, "Blind index not updated"
+
+    # The same value encrypts differently each time, but has one blind index
+    assert db.create_patient(make_patient("84000002", contact_info="same@example.com"))
+    assert db.create_patient(make_patient("84000003", contact_info="same@example.com"))
+    assert stored_row(db, "84000002")[0] != stored_row(db, "84000003")[0]
+    assert stored_row(db, "84000002")[1] == stored_row(db, "84000003")[1]
+
+    assert db.create_patient(make_patient("84000004", contact_info=None))
+    assert stored_row(db, "84000004") == (None, None)
+    assert db.get_patient("84000004").contact_info is None
+    print("✓ Stored encrypted, read back unchanged")
+    db.close()
+
+def test_lookup_by_contact():
+    """Test exact-match lookups through the blind index"""
+    print("Testing contact lookups...")
+
+    db = DatabaseManager(":memory:")
+    for i in range(200):
+        db.create_patient(make_patient(f"8500{i:04d}", contact_info=f"+249 91{i:07d}"))
+    found = db.get_patients_by_contact("+249 910000123")
+    assert [p.id for p in found] == ["85000123"]
+    assert [p.id for p in db.get_patients_by_contact("+249-91-0000123")] == ["85000123"], "Separators not ignored"
+    assert db.get_patients_by_contact("+249 91000012") == [], "Prefix matched"
+    assert db.get_patients_by_contact("") == []
+
+    conn = db._open_connection()
+    plan = " ".join(str(row) for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM patients WHERE contact_info_index IN (?)", ("x",)))
+    conn.close()
+    assert "idx_patients_contact_info_index" in plan, f"Lookup not indexed: {plan}"
+    print("✓ Lookups use the blind index")
+    db.close()
+
+def test_batch_decrypt():
+    """Test that list screens decrypt in one batch with the shared cipher"""
+    print("Testing bulk reads...")
+
+    db = DatabaseManager(":memory:")
+    other = DatabaseManager(":memory:")
+    assert db.field_cipher is other.field_cipher, "Cipher not shared"
+    other.close()
+    for i in range(2000):
+        db.create_patient(make_patient(f"8600{i:04d}", contact_info=f"patient{i}@example.com"))
+
+    started = time.perf_counter()
+    patients = db.get_all_patients()
+    elapsed = time.perf_counter() - started
+    assert len(patients) == 2000
+    assert {p.contact_info for p in patients} == {f"patient{i}@example.com" for i in range(2000)}
+
+    cipher = db.field_cipher
+    texts = [f"value {i}" for i in range(100)]
+    assert cipher.decrypt_many(cipher.encrypt_many(texts)) == texts
+    print(f"✓ 2000 patients read and decrypted in {elapsed * 1000:.1f} ms")
+    db.close()
+
+def test_legacy_values_and_rotation():
+    """Test that plain-text values are read and then encrypted, and that keys rotate"""
+    print("Testing migration and key rotation...")
+
+    old_key, new_key = generate_key(), generate_key()
+    old_cipher = FieldCipher([old_key])
+    db = DatabaseManager(":memory:", field_cipher=old_cipher)
+    db.create_patient(make_patient("87000001", contact_info="+249 911111111"))
+    conn = db._open_connection()
+    conn.execute('''
+        INSERT INTO patients (id, name, age, gender, contact_info, created_at, updated_at)
+        VALUES ('87000002', 'Legacy Patient', 60, 'Male', 'legacy@example.com', '2023-01-01 00:00:00', '2023-01-01 00:00:00')
+    ''')
+    conn.commit()
+    conn.close()
+    assert db.get_patient("87000002").contact_info == "legacy@example.com"
+    seq = db.get_latest_change_seq()
+    assert db.encrypt_stored_fields() == 1
+    assert stored_row(db, "87000002")[0].startswith(old_cipher.prefix)
+    assert [p.id for p in db.get_patients_by_contact("legacy@example.com")] == ["87000002"]
+    assert db.get_latest_change_seq() == seq, "Migration recorded as edits"
+    assert db.encrypt_stored_fields() == 0
+
+    # New key first: old values still read and are found, then re-encrypted
+    rotated = DatabaseManager.from_template(db)
+    rotated.field_cipher = FieldCipher([new_key, old_key])
+    assert rotated.get_patient("87000001").contact_info == "+249 911111111"
+    assert [p.id for p in rotated.get_patients_by_contact("+249 911111111")] == ["87000001"]
+    assert rotated.encrypt_stored_fields() == 2
+    assert stored_row(rotated, "87000001")[0].startswith(rotated.field_cipher.prefix)
+    assert [p.id for p in rotated.get_patients_by_contact("+249 911111111")] == ["87000001"]
+
+    # Without the key the values cannot be read, but the other rows still can
+    stranger = DatabaseManager.from_template(rotated)
+    stranger.field_cipher = FieldCipher([old_key])
+    try:
+        stranger.field_cipher.decrypt(stored_row(rotated, "87000001")[0])
+        assert False, "Read with the wrong key"
+    except ValueError:
+        pass
+    assert stranger.get_patient("87000001").contact_info == UNREADABLE_FIELD
+    conn = stranger._open_connection()
+    conn.execute('''
+        INSERT INTO patients (id, name, age, gender, contact_info, created_at, updated_at)
+        VALUES ('87000003', 'Legacy Patient', 60, 'Male', 'plain@example.com', '2023-01-01 00:00:00', '2023-01-01 00:00:00')
+    ''')
+    conn.commit()
+    conn.close()
+    contacts = {p.id: p.contact_info for p in stranger.get_all_patients()}
+    assert contacts == {"87000001": UNREADABLE_FIELD, "87000002": UNREADABLE_FIELD, "87000003": "plain@example.com"}
+    print("✓ Legacy values encrypted, rotated keys re-encrypted")
+    for manager in (db, rotated, stranger):
+        manager.close()
+
+def test_migration_waits_for_writers():
+    """Test that contact info edited while the migration waits for the lock is not overwritten"""
+    print("Testing migration during an edit...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseManager(os.path.join(directory, "lab.db"))
+        conn = db._open_connection()
+        conn.execute('''
+            INSERT INTO patients (id, name, age, gender, contact_info, created_at, updated_at)
+            VALUES ('87100001', 'Legacy Patient', 60, 'Male', 'old@example.com', '2023-01-01 00:00:00', '2023-01-01 00:00:00')
+        ''')
+        conn.commit()
+
+        # Another station edits the value and commits while the migration waits
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("UPDATE patients SET contact_info = 'new@example.com' WHERE id = '87100001'")
+        migration = threading.Thread(target=db.encrypt_stored_fields)
+        migration.start()
+        time.sleep(0.3)
+        conn.execute("COMMIT")
+        edit_seq = db.get_latest_change_seq()
+        conn.close()
+        migration.join()
+
+        assert db.get_patient("87100001").contact_info == "new@example.com", "Edit overwritten by the migration"
+        assert stored_row(db, "87100001")[0].startswith(db.field_cipher.prefix)
+        assert db.get_latest_change_seq() == edit_seq, "The edit's change_log entry was removed"
+        db.close()
+    print("✓ Concurrent edit kept and still synced")
+
+def test_key_file():
+    """Test that a file database gets a key file next to it, used by every manager"""
+    print("Testing key file...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "lab.db")
+        db = DatabaseManager(path)
+        key_path = os.path.join(directory, KEY_FILE_NAME)
+        assert os.path.exists(key_path), "Key file not created"
+        if os.name == "posix":
+            assert os.stat(key_path).st_mode & 0o077 == 0, "Key file readable by others"
+        db.create_patient(make_patient("88000001"))
+        db.close()
+
+        reopened = DatabaseManager(path)
+        assert reopened.field_cipher is db.field_cipher
+        assert reopened.get_patient("88000001").contact_info == "+249 912 345 678"
+        reopened.close()
+        # Nothing readable without the key
+        conn = sqlite3.connect(path)
+        assert b"912" not in conn.execute("SELECT contact_info FROM patients").fetchone()[0]
+        conn.close()
+    print("✓ Key file created once and reused")
+
+if __name__ == "__main__":
+    try:
+        test_contact_info_encrypted()
+        test_lookup_by_contact()
+        test_batch_decrypt()
+        test_legacy_values_and_rotation()
+        test_migration_waits_for_writers()
+        test_key_file()
+        print("✅ Field encryption test PASSED")
+    except Exception as e:
+        print(f"❌ Field encryption test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Test script to verify barcode scanner intake
+"""
+import sys
+import os
+import time
+from datetime import datetime
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.models import Patient, TestType, TestRequest, Sample, Gender, TestStatus, SampleStatus
+from medical_lab_system.accession import AccessionAllocator
+from medical_lab_system.intake import (BarcodeIndex, IntakeSession, QUEUED, UNCHANGED, NOT_ALLOWED, REPEATED,
+                                       UNKNOWN, MISREAD)
+
+def make_database(samples=120):
+    db = DatabaseManager(":memory:")
+    db.create_test_type(TestType(id="tt-intake", name="Glucose", description="", price=5.0, category="Chemistry"))
+    db.create_patient(Patient(id="82000000", name="Intake Patient", age=40, gender=Gender.FEMALE,
+                              contact_info="intake@example.com"))
+    db.create_test_request(TestRequest(id="req-intake", patient_id="82000000", test_type_id="tt-intake",
+                                       status=TestStatus.PENDING, requested_by="Dr. Intake",
+                                       requested_at=datetime(2024, 3, 15, 8, 0)))
+    allocator = AccessionAllocator(db, site="03", clock=lambda: datetime(2024, 3, 15, 9, 0))
+    barcodes = allocator.allocate(samples)
+    for i, barcode in enumerate(barcodes):
+        db.create_sample(Sample(id=f"smp-{i:04d}", test_request_id="req-intake", barcode=barcode,
+                                collected_at=datetime(2024, 3, 15, 9, 0), status=SampleStatus.VALID))
+    return db, barcodes
+
+def statuses(db):
+    return {row[1]: row[2] for row in db.get_sample_scan_rows()}
+
+class FakeRoot:
+    """Stand-in for Tk's after()/after_cancel(); due callbacks run from run_due()"""
+    def __init__(self):
+        self.calls = {}
+        self.next_id = 0
+
+    def after(self, ms, callback):
+        self.next_id += 1
+        self.calls[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.calls.pop(after_id, None)
+
+    def run_due(self):
+        calls, self.calls = self.calls, {}
+        for callback in calls.values():
+            callback()
+
+def test_scan_outcomes():
+    """Test how every kind of scan is answered"""
+    print("Testing scan outcomes...")
+
+    db, barcodes = make_database(10)
+    index = BarcodeIndex(db)
+    index.warm()
+    assert len(index) == 10
+    session = IntakeSession(db, index, SampleStatus.DAMAGED, max_batch=100)
+
+    first = session.scan(barcodes[0])
+    assert first.outcome == QUEUED and first.sample.sample_id == "smp-0000"
+    assert first.sample.patient_name == "Intake Patient" and first.sample.test_name == "Glucose"
+    assert session.scan(barcodes[0]).outcome == REPEATED
+    assert session.scan("24031503999990").outcome in (UNKNOWN, MISREAD)
+    typo = barcodes[1][:5] + str((int(barcodes[1][5]) + 1) % 10) + barcodes[1][6:]
+    assert session.scan(typo).outcome == MISREAD, "Mistyped accession number not caught"
+    assert session.scan("NOT-A-BARCODE").outcome == UNKNOWN
+
+    # Nothing is written before the flush
+    assert statuses(db)["smp-0000"] == SampleStatus.VALID.value
+    assert session.close() == 1
+    assert statuses(db)["smp-0000"] == SampleStatus.DAMAGED.value
+
+    # A new session for the same status finds the sample already set
+    again = IntakeSession(db, index, SampleStatus.DAMAGED)
+    assert again.scan(barcodes[0]).outcome == UNCHANGED
+    assert not again.pending
+
+    # Damaged samples are not processed
+    processing = IntakeSession(db, index, SampleStatus.PROCESSING)
+    assert processing.scan(barcodes[0]).outcome == NOT_ALLOWED
+    assert processing.scan(barcodes[2]).outcome == QUEUED
+    processing.close()
+    assert [change.to_status.value for change in db.get_sample_status_history("smp-0002")] == \
+        [SampleStatus.VALID.value, SampleStatus.PROCESSING.value]
+    assert index.idle.wait(5)
+    print("✓ Queued, repeated, unknown, misread, unchanged and not allowed scans")
+    db.close()
+
+def test_batched_writes():
+    """Test that scans are written in batches, after a pause or when the batch is full"""
+    print("Testing batched writes...")
+
+    db, barcodes = make_database(60)
+    index = BarcodeIndex(db)
+    index.warm()
+    root = FakeRoot()
+    flushes = []
+    session = IntakeSession(db, index, SampleStatus.INSUFFICIENT, root=root, max_batch=25,
+                            max_delay_ms=60000, on_flush=lambda written, error: flushes.append(written))
+
+    started = time.perf_counter()
+    for barcode in barcodes:
+        assert session.scan(barcode).outcome == QUEUED
+    elapsed = time.perf_counter() - started
+    # Two full batches written during the scans, the rest waits for the pause
+    assert flushes == [25, 25], f"Unexpected flushes: {flushes}"
+    assert len(session.pending) == 10
+    assert len(root.calls) == 1, "Flush should be debounced to a single pending timer"
+    root.run_due()
+    assert flushes == [25, 25, 10] and not session.pending
+    assert set(statuses(db).values()) == {SampleStatus.INSUFFICIENT.value}
+    print(f"✓ 60 scans in {elapsed * 1000:.1f} ms, written in 3 transactions")
+    index.idle.wait(5)
+    db.close()
+
+def test_failed_flush_is_retried():
+    """Test that queued changes survive a failed write"""
+    print("Testing failed writes...")
+
+    db, barcodes = make_database(3)
+    index = BarcodeIndex(db)
+    index.warm()
+    root = FakeRoot()
+    errors = []
+    session = IntakeSession(db, index, SampleStatus.DAMAGED, root=root,
+                            on_flush=lambda written, error: errors.append(error))
+    session.scan(barcodes[0])
+
+    real_transition = db.transition_samples
+    def failing_transition(*args, **kwargs):
+        raise RuntimeError("database is locked")
+    db.transition_samples = failing_transition
+    root.run_due()
+    assert isinstance(errors[-1], RuntimeError) and len(session.pending) == 1
+    assert len(root.calls) == 1, "Failed write not rescheduled"
+
+    db.transition_samples = real_transition
+    root.run_due()
+    assert errors[-1] is None and not session.pending
+    assert statuses(db)["smp-0000"] == SampleStatus.DAMAGED.value
+    print("✓ Failed write kept and retried")
+    index.idle.wait(5)
+    db.close()
+
+def test_index_follows_other_workstations():
+    """Test that samples added or changed elsewhere are found"""
+    print("Testing index refresh...")
+
+    db, barcodes = make_database(5)
+    index = BarcodeIndex(db)
+    index.warm()
+
+    # Another workstation adds a sample and relabels one
+    db.create_sample(Sample(id="smp-new", test_request_id="req-intake", barcode="S-NEW-1",
+                            collected_at=datetime(2024, 3, 15, 10, 0), status=SampleStatus.VALID))
+    db.update_sample_barcode("smp-0001", "S-RELABELLED")
+
+    session = IntakeSession(db, index, SampleStatus.DAMAGED)
+    # The session refreshes the index in the background
+    assert index.idle.wait(5)
+    result = session.scan("S-NEW-1")
+    assert result.outcome == QUEUED and result.sample.sample_id == "smp-new", "New sample not found"
+    assert session.scan("S-RELABELLED").sample.sample_id == "smp-0001"
+    assert index.get(barcodes[1]) is None, "Old barcode still indexed"
+
+    # A sample completed elsewhere after the scan is left alone
+    db.transition_samples(["smp-0002"], SampleStatus.PROCESSING)
+    assert session.scan(barcodes[2]).outcome == QUEUED
+    db.transition_samples(["smp-0002"], SampleStatus.COMPLETED)
+    session.close()
+    assert {sample_id: status.value for sample_id, status in session.rejected.items()} == \
+        {"smp-0002": SampleStatus.COMPLETED.value}
+    assert list(session.last_rejected) == ["smp-0002"], "Rejected sample not reported by the flush"
+    assert statuses(db)["smp-0002"] == SampleStatus.COMPLETED.value
+
+    # A barcode added after the last refresh is unknown at first, found once refreshed
+    db.create_sample(Sample(id="smp-late", test_request_id="req-intake", barcode="S-LATE-1",
+                            collected_at=datetime(2024, 3, 15, 11, 0), status=SampleStatus.VALID))
+    assert session.scan("S-LATE-1").outcome == UNKNOWN
+    assert index.idle.wait(5)
+    assert session.scan("S-LATE-1").outcome == QUEUED
+    session.close()
+    print("✓ Index picks up samples from change_log")
+    db.close()
+
+def test_statuses_refreshed_at_session_start():
+    """Test that status changes made after warm-up are seen by a new session"""
+    print("Testing stale statuses...")
+
+    db, barcodes = make_database(5)
+    index = BarcodeIndex(db)
+    index.warm()
+    # e.g. a bulk transition on this station's Samples screen
+    db.transition_samples(["smp-0003"], SampleStatus.DAMAGED)
+    db.transition_samples(["smp-0004"], SampleStatus.PROCESSING)
+
+    session = IntakeSession(db, index, SampleStatus.PROCESSING)
+    assert index.idle.wait(5)
+    assert session.scan(barcodes[3]).outcome == NOT_ALLOWED, "Damaged sample judged on its old status"
+    assert session.scan(barcodes[4]).outcome == UNCHANGED
+    assert session.scan(barcodes[0]).outcome == QUEUED
+    session.close()
+    print("✓ Session starts from current statuses")
+    db.close()
+
+if __name__ == "__main__":
+    try:
+        test_scan_outcomes()
+        test_batched_writes()
+        test_failed_flush_is_retried()
+        test_index_follows_other_workstations()
+        test_statuses_refreshed_at_session_start()
+        print("✅ Intake test PASSED")
+    except Exception as e:
+        print(f"❌ Intake test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
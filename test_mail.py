@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Test script to verify e-mail delivery through the outbox, against a local SMTP stand-in
+"""
+import sys
+import os
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.models import OutboxMessage, MailStatus
+from medical_lab_system.mail import OutboxSender, SmtpSession, RateLimiter, queue_email
+
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server that records what it receives"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SmtpHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.logins = 0
+        self.messages = []
+        # Recipients refused for good, and how many messages to answer with a temporary error
+        self.refused = set()
+        self.temporary_failures = 0
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply("220 stand-in ready")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-stand-in")
+                self.reply("250-8BITMIME")
+                self.reply("250 AUTH PLAIN")
+            elif verb == "AUTH":
+                with server.lock:
+                    server.logins += 1
+                self.reply("235 accepted")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 ok")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip("<> ")
+                if address in server.refused:
+                    self.reply("550 no such mailbox")
+                else:
+                    recipients.append(address)
+                    self.reply("250 ok")
+            elif verb == "DATA":
+                self.reply("354 go ahead")
+                data = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if data_line in (b".\r\n", b".\n", b""):
+                        break
+                    data.append(data_line)
+                with server.lock:
+                    if server.temporary_failures:
+                        server.temporary_failures -= 1
+                        self.reply("451 try again later")
+                        continue
+                    server.messages.append((recipients, b"".join(data)))
+                self.reply("250 queued")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 ok")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+def make_sender(db, server, **kwargs):
+    session = SmtpSession("127.0.0.1", server.port, use_tls=False, username="lab", password="secret",
+                          max_messages=kwargs.pop("max_messages", 100))
+    return OutboxSender(db, session, rate_per_minute=kwargs.pop("rate_per_minute", 0), sender="lab@example.com",
+                        **kwargs)
+
+def test_bulk_delivery_reuses_connections():
+    """Test that 500 messages go out over a handful of connections"""
+    print("Testing bulk delivery...")
+
+    db = DatabaseManager(":memory:")
+    server = SmtpStandIn()
+    try:
+        db.create_outbox_messages([
+            OutboxMessage(f"patient{i}@example.com", f"Result {i}", f"Dear patient {i},\nYour result is ready.",
+                          f"result-{i}.pdf", b"%PDF-1.4 test")
+            for i in range(500)])
+        assert db.get_outbox_status_counts()[MailStatus.QUEUED.value] == 500
+
+        sender = make_sender(db, server)
+        started = time.perf_counter()
+        counts = sender.send_due()
+        elapsed = time.perf_counter() - started
+        sender.session.close()
+        assert counts == {"sent": 500, "retrying": 0, "failed": 0}, counts
+        assert len(server.messages) == 500
+        assert server.connections == 5 and server.logins == 5, f"{server.connections} connections"
+        assert db.get_outbox_status_counts()[MailStatus.SENT.value] == 500
+        assert b"result-7.pdf" in server.messages[7][1] and server.messages[7][0] == ["patient7@example.com"]
+
+        sent = db.get_outbox_messages(MailStatus.SENT, limit=1)[0]
+        assert sent.sent_at is not None and sent.attempts == 1 and sent.attachment is None
+        print(f"✓ 500 messages in {elapsed:.2f}s over {server.connections} connections")
+    finally:
+        server.close()
+        db.close()
+
+def test_failures_are_retried_or_failed():
+    """Test per-message status for refused and temporarily failed messages"""
+    print("Testing retries...")
+
+    db = DatabaseManager(":memory:")
+    server = SmtpStandIn()
+    try:
+        server.refused.add("nobody@example.com")
+        server.temporary_failures = 1
+        good = queue_email(db, "patient@example.com", "Result", "Ready")
+        bad = queue_email(db, "nobody@example.com", "Result", "Ready")
+        sender = make_sender(db, server, retry_seconds=60)
+
+        counts = sender.send_due()
+        assert counts == {"sent": 0, "retrying": 1, "failed": 1}, counts
+        messages = {m.id: m for m in db.get_outbox_messages()}
+        assert messages[bad].status.value == MailStatus.FAILED.value and "550" in messages[bad].last_error
+        assert messages[good].status.value == MailStatus.QUEUED.value and "451" in messages[good].last_error
+        assert messages[good].next_attempt_at > datetime.now() + timedelta(seconds=50), "No backoff"
+
+        # Not due yet
+        assert sender.send_due()["sent"] == 0
+        conn = db._open_connection()
+        conn.execute("UPDATE mail_outbox SET next_attempt_at = ?", (datetime.now() - timedelta(seconds=1),))
+        conn.commit()
+        conn.close()
+        assert sender.send_due()["sent"] == 1
+        assert db.get_outbox_messages(MailStatus.SENT)[0].attempts == 2
+
+        # Failed messages can be sent again once the address is fixed
+        server.refused.clear()
+        assert db.requeue_failed_outbox_messages() == 1
+        assert sender.send_due()["sent"] == 1
+        sender.session.close()
+        print("✓ Refused messages fail, temporary failures back off and are retried")
+    finally:
+        server.close()
+        db.close()
+
+def test_server_down():
+    """Test that messages wait in the outbox while the server is unreachable"""
+    print("Testing unreachable server...")
+
+    db = DatabaseManager(":memory:")
+    server = SmtpStandIn()
+    port = server.port
+    server.close()
+    for i in range(3):
+        queue_email(db, f"p{i}@example.com", "Result", "Ready")
+    session = SmtpSession("127.0.0.1", port, use_tls=False, username="", password="", timeout=2)
+    sender = OutboxSender(db, session, rate_per_minute=0, max_attempts=2, retry_seconds=0, sender="lab@example.com")
+    assert sender.send_due() == {"sent": 0, "retrying": 3, "failed": 0}
+    assert sender.last_status["error"]
+    # Out of attempts after the second failure
+    assert sender.send_due() == {"sent": 0, "retrying": 0, "failed": 3}
+    print("✓ Unreachable server: messages retried, then failed")
+    db.close()
+
+def test_rate_limit():
+    """Test the token bucket"""
+    print("Testing rate limit...")
+
+    now = [0.0]
+    limiter = RateLimiter(60, burst=3, clock=lambda: now[0])
+    assert [limiter.delay() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert abs(limiter.delay() - 1.0) < 1e-9
+    now[0] += 10
+    assert limiter.delay() == 0.0
+    assert RateLimiter(0).delay() == 0.0
+    print("✓ Bursts, then one message per second at 60 a minute")
+
+def test_background_sender():
+    """Test the background thread and wake()"""
+    print("Testing background sender...")
+
+    db = DatabaseManager(":memory:")
+    server = SmtpStandIn()
+    try:
+        sender = make_sender(db, server, poll_seconds=60)
+        sender.start()
+        queue_email(db, "patient@example.com", "Result", "Ready")
+        sender.wake()
+        deadline = time.time() + 10
+        while not server.messages and time.time() < deadline:
+            time.sleep(0.05)
+        sender.stop()
+        assert len(server.messages) == 1, "Woken sender did not send"
+        print("✓ Queued mail sent by the background thread")
+    finally:
+        server.close()
+        db.close()
+
+if __name__ == "__main__":
+    try:
+        test_bulk_delivery_reuses_connections()
+        test_failures_are_retried_or_failed()
+        test_server_down()
+        test_rate_limit()
+        test_background_sender()
+        print("✅ Mail test PASSED")
+    except Exception as e:
+        print(f"❌ Mail test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
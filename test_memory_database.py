@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test script to verify in-memory databases and template cloning
+"""
+import sys
+import os
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.models import Patient, Gender
+
+def test_memory_database():
+    """Test that an in-memory database keeps its tables between calls"""
+    print("Testing in-memory database...")
+
+    db = DatabaseManager(":memory:")
+    assert db.is_memory, "Database is not in memory"
+
+    patient = Patient(
+        id="20000001",
+        name="Memory Patient",
+        age=33,
+        gender=Gender.MALE,
+        contact_info="memory@example.com"
+    )
+    assert db.create_patient(patient), "Failed to create patient"
+    assert len(db.get_all_patients()) == 1, "Patient was lost between connections"
+
+    # A second in-memory manager must not see the first one's data
+    other = DatabaseManager(":memory:")
+    assert not other.get_all_patients(), "In-memory databases are not isolated"
+
+    other.close()
+    db.close()
+    print("✓ In-memory database works")
+
+def test_template_clone():
+    """Test that clones start from the template and diverge independently"""
+    print("Testing template cloning...")
+
+    template = DatabaseManager(":memory:")
+    template.create_patient(Patient(
+        id="20000002",
+        name="Template Patient",
+        age=50,
+        gender=Gender.FEMALE,
+        contact_info="template@example.com"
+    ))
+
+    clone = DatabaseManager.from_template(template)
+    assert clone.get_patient("20000002") is not None, "Clone is missing template data"
+
+    clone.delete_patient("20000002")
+    assert template.get_patient("20000002") is not None, "Changing the clone modified the template"
+
+    clone.close()
+    template.close()
+    print("✓ Template cloning works")
+
+def test_clone_fixture(db):
+    """Test that the pytest db fixture provides the seeded template"""
+    assert db.is_memory
+    assert db.get_user_by_username("admin") is not None
+    assert len(db.get_all_test_types()) == 4
+
+if __name__ == "__main__":
+    try:
+        test_memory_database()
+        test_template_clone()
+        print("✅ In-memory database test PASSED")
+    except Exception as e:
+        print(f"❌ In-memory database test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
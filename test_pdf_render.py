@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script to verify PDF rendering of results and invoices
+"""
+import sys
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.models import Patient, Gender, TestType, TestRequest, TestStatus, MedicalReport
+from medical_lab_system.pdf_render import (
+    PdfRenderer, register_fonts, result_document, cumulative_document, invoice_document
+)
+
+RESULT_TEXT = "\n".join(
+    f"{name:<20} | {value:>6} | {reference}" for name, value, reference in [
+        ("Haemoglobin", "13.9", "13.5-17.5 g/dL"), ("WBC", "7.2", "4.0-11.0 x10^9/L"),
+        ("Platelets", "250", "150-400 x10^9/L"), ("MCV", "88", "80-100 fL"),
+    ]
+) + "\nComments: " + "Sample received in good condition and analysed the same day. " * 4
+
+def make_result(i, patient):
+    test_type = TestType(id=f"tt-{i}", name=f"Complete Blood Count {i}", description="", price=50.0,
+                         category="Hematology")
+    request = TestRequest(id=f"req-{i}", patient_id=patient.id, test_type_id=test_type.id,
+                          status=TestStatus.COMPLETED, requested_by="Dr. Smith",
+                          requested_at=datetime(2024, 1, 1) + timedelta(days=i))
+    report = MedicalReport(id=f"rep-{i}", test_request_id=request.id, content=RESULT_TEXT,
+                           signed_by="Dr. Jones", signed_at=request.requested_at,
+                           created_at=request.requested_at)
+    return report, test_type, request
+
+def test_result_and_invoice_pdf():
+    """Test that results and invoices render as PDF files matching the preview"""
+    print("Testing result and invoice PDFs...")
+
+    patient = Patient(id="80000001", name="PDF Patient", age=40, gender=Gender.FEMALE,
+                      contact_info="pdf@example.com")
+    report, test_type, request = make_result(1, patient)
+    document = result_document(report, patient, test_type, request)
+    preview = document.to_text()
+    assert "Haemoglobin" in preview and "PDF Patient" in preview and "Dr. Jones" in preview
+
+    renderer = PdfRenderer()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "result.pdf")
+        assert renderer.render(path, document) == 1
+        with open(path, "rb") as f:
+            data = f.read()
+        assert data.startswith(b"%PDF") and data.rstrip().endswith(b"%%EOF"), "Not a complete PDF"
+        assert os.listdir(tmp) == ["result.pdf"], "Temporary file left behind"
+
+        invoice = invoice_document("INV-100", "PDF Patient", "2024-01-02", "$80.00", "$80.00", "Paid",
+                                   [("Complete Blood Count", "$50.00"), ("Urinalysis", "$30.00")])
+        assert "Urinalysis" in invoice.to_text()
+        assert renderer.render(os.path.join(tmp, "invoice.pdf"), invoice) == 1
+    print("✓ Result and invoice PDFs written")
+
+def test_fonts_registered_once():
+    """Test that fonts are registered once per process"""
+    fonts = register_fonts()
+    assert register_fonts() is fonts
+    if fonts.regular != "Helvetica":
+        print(f"✓ Unicode fonts registered once ({fonts.regular})")
+
+def test_cumulative_report_speed():
+    """Test that a 50-page cumulative report renders in well under a second"""
+    print("Testing cumulative report speed...")
+
+    patient = Patient(id="80000002", name="Cumulative Patient", age=55, gender=Gender.MALE,
+                      contact_info="cumulative@example.com")
+    results = [make_result(i, patient) for i in range(220)]
+    document = cumulative_document(patient, results)
+    renderer = PdfRenderer()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cumulative.pdf")
+        renderer.render(path, document)  # warm up the font and layout caches
+        start = time.perf_counter()
+        pages = renderer.render(path, document)
+        elapsed = time.perf_counter() - start
+    assert pages >= 50, f"Only {pages} pages"
+    assert elapsed < 1.0, f"{pages} pages took {elapsed:.2f}s"
+    print(f"✓ {pages} pages rendered in {elapsed * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    try:
+        test_result_and_invoice_pdf()
+        test_fonts_registered_once()
+        test_cumulative_report_speed()
+        print("✅ PDF render test PASSED")
+    except Exception as e:
+        print(f"❌ PDF render test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
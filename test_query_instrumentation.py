@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test script to verify DatabaseManager query instrumentation
+"""
+import sys
+import os
+import tempfile
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.models import Patient, Gender
+
+def test_query_instrumentation():
+    """Test method/statement statistics and the slow-query log"""
+    print("Testing query instrumentation...")
+
+    db = DatabaseManager(":memory:")
+    assert db.get_query_stats() is None, "Instrumentation should be disabled by default"
+
+    log_path = os.path.join(tempfile.mkdtemp(), "slow.log")
+    # A zero threshold makes every statement "slow" so plans are captured
+    db.enable_instrumentation(slow_query_ms=0, log_path=log_path)
+
+    for i in range(3):
+        db.create_patient(Patient(
+            id=f"3000000{i}", name=f"Stats Patient {i}", age=30 + i,
+            gender=Gender.FEMALE, contact_info="stats@example.com"
+        ))
+    patients = db.get_all_patients()
+    db.get_patient("30000001")
+
+    stats = db.get_query_stats()
+    methods = {entry["name"]: entry for entry in stats["methods"]}
+    assert methods.get("create_patient", {}).get("calls") == 3, \
+        f"create_patient not counted: {methods.get('create_patient')}"
+    assert methods["get_all_patients"]["rows"] == len(patients), \
+        f"Wrong row count for get_all_patients: {methods['get_all_patients']}"
+    print("✓ Method statistics recorded")
+
+    statements = {entry["sql"]: entry for entry in stats["statements"]}
+    select = statements.get("SELECT * FROM patients WHERE id = ?")
+    assert select and select["calls"] == 1 and select["rows"] == 1, f"Statement statistics wrong: {select}"
+    print("✓ Statement statistics recorded")
+
+    # Statements run through the Connection.execute shortcut are recorded too
+    conn = db._connect()
+    count = conn.execute("SELECT count(*) FROM patients").fetchone()[0]
+    conn.close()
+    shortcut = {entry["sql"]: entry for entry in db.get_query_stats()["statements"]}.get("SELECT count(*) FROM patients")
+    assert count == 3 and shortcut and shortcut["calls"] == 1 and shortcut["rows"] == 1, \
+        f"Connection.execute not recorded: {shortcut}"
+    print("✓ Connection.execute statements recorded")
+
+    plans = [entry for entry in stats["slow_queries"] if entry["sql"] == "SELECT * FROM patients WHERE id = ?"]
+    assert plans and any("patients" in line for line in plans[0]["plan"]), f"Query plan not captured: {plans}"
+    with open(log_path, encoding="utf-8") as f:
+        assert "SELECT * FROM patients" in f.read(), "Slow query log not written"
+    print("✓ Slow queries logged with their plans")
+
+    db.disable_instrumentation()
+    db.get_all_patients()
+    assert db.get_query_stats() is None and "get_all_patients" not in vars(db), \
+        "Instrumentation not fully disabled"
+
+    db.close()
+
+if __name__ == "__main__":
+    try:
+        test_query_instrumentation()
+        print("✅ Query instrumentation test PASSED")
+    except Exception as e:
+        print(f"❌ Query instrumentation test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the in-memory analytics replica
+"""
+import sys
+import os
+import tempfile
+from datetime import datetime
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.replica import AnalyticsReplica
+from medical_lab_system.screen_data import build_statistics
+from medical_lab_system.models import Patient, Gender, TestType
+
+def make_patient(patient_id, name="Replica Patient"):
+    return Patient(
+        id=patient_id,
+        name=name,
+        age=47,
+        gender=Gender.FEMALE,
+        contact_info="replica@example.com"
+    )
+
+def test_analytics_replica():
+    """Test that the replica copies the database and replays later changes"""
+    print("Testing analytics replica...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "replica.db"))
+        db.create_patient(make_patient("81000001"))
+        db.create_patient(make_patient("81000002"))
+
+        replica = AnalyticsReplica(db)
+        assert replica.db.is_memory, "Replica is not in memory"
+        assert replica.db.get_patient("81000001") is not None, "Initial copy is incomplete"
+        assert replica.refresh() == 0, "Idle database replayed changes"
+        print("✓ Database copied into memory")
+
+        db.update_patient(make_patient("81000001", name="Renamed Patient"))
+        db.delete_patient("81000002")
+        db.create_patient(make_patient("81000003"))
+        db.create_test_type(TestType(
+            id="replica-test", name="Replica Test", description="", price=20.0, category="Blood"
+        ))
+        conn = db._connect()
+        conn.execute("INSERT INTO invoice_test_requests (invoice_id, test_request_id) VALUES ('inv-1', 'req-1')")
+        conn.commit()
+        conn.close()
+
+        assert replica.refresh() == 5, "Changed rows not replayed"
+        assert replica.db.get_patient("81000001").name == "Renamed Patient"
+        assert replica.db.get_patient("81000002") is None, "Delete not replayed"
+        assert replica.db.get_patient("81000003") is not None
+        assert replica.db.get_test_type("replica-test").price == 20.0
+        conn = replica.db._connect()
+        assert conn.execute("SELECT COUNT(*) FROM invoice_test_requests WHERE invoice_id = 'inv-1'").fetchone()[0] == 1
+        conn.close()
+        print("✓ Inserts, updates and deletes replayed")
+
+        now = datetime.now()
+        assert build_statistics(replica.db, now) == build_statistics(db, now), "Replica statistics differ"
+        print("✓ Statistics match the database")
+
+        replica.stop()
+        db.close()
+
+class FakeRoot:
+    """Stand-in for Tk's after(); records the delay of each scheduled tick"""
+    def __init__(self):
+        self.delays = []
+        self.callback = None
+
+    def after(self, ms, callback):
+        self.delays.append(ms)
+        self.callback = callback
+        return len(self.delays)
+
+    def after_cancel(self, after_id):
+        self.callback = None
+
+def test_backlog_replayed_in_batches():
+    """Test that the timer replays a large backlog one batch per tick"""
+    print("Testing replica backlog...")
+
+    db = DatabaseManager(":memory:")
+    root = FakeRoot()
+    replica = AnalyticsReplica(db, root, interval_ms=5000, batch_size=10)
+    for i in range(25):
+        db.create_patient(make_patient(f"8110{i:04d}"))
+
+    replica.start()
+    copied = []
+    for _ in range(4):
+        before = replica.seq
+        root.callback()
+        copied.append(replica.seq - before)
+    assert copied == [10, 10, 5, 0], f"Changes replayed per tick: {copied}"
+    # Ticks follow each other at once while behind, then return to the interval
+    assert root.delays == [5000, 1, 1, 5000, 5000], root.delays
+    assert replica.db.get_patient("81100024") is not None
+    print("✓ Backlog replayed one batch per tick")
+    replica.stop()
+    db.close()
+
+if __name__ == "__main__":
+    try:
+        test_analytics_replica()
+        test_backlog_replayed_in_batches()
+        print("✅ Analytics replica test PASSED")
+    except Exception as e:
+        print(f"❌ Analytics replica test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
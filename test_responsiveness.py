@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the Tk responsiveness monitor
+"""
+import sys
+import os
+import time
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.responsiveness import ResponsivenessMonitor
+
+class FakeRoot:
+    """Minimal stand-in for tk.Tk's after() scheduling, so no display is needed"""
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, callback):
+        self.pending.append((time.perf_counter() + ms / 1000.0, callback))
+        return len(self.pending)
+
+    def after_idle(self, callback):
+        self.pending.append((0, callback))
+
+    def after_cancel(self, after_id):
+        pass
+
+    def run_once(self, block_ms=0):
+        """Optionally block like a slow handler, then run the due callbacks"""
+        time.sleep(block_ms / 1000.0)
+        while self.pending and self.pending[0][0] > time.perf_counter():
+            time.sleep(0.001)
+        due, self.pending = self.pending, []
+        for _, callback in due:
+            callback()
+
+class FakeApp:
+    def show_patients(self):
+        time.sleep(0.02)
+        self.load_patients_data()
+
+    def load_patients_data(self):
+        time.sleep(0.01)
+
+    def show_alerts_popup(self):
+        time.sleep(0.01)
+
+    def hash_password(self, password):
+        return password
+
+def test_responsiveness_monitor():
+    """Test lag measurement and per-screen timing"""
+    print("Testing responsiveness monitor...")
+
+    root = FakeRoot()
+    monitor = ResponsivenessMonitor(root, interval_ms=10, lag_threshold_ms=50)
+    app = FakeApp()
+    monitor.instrument(app, ("show_patients",))
+    monitor.start()
+
+    root.run_once()
+    root.run_once(block_ms=80)  # simulate a freeze
+    snapshot = monitor.snapshot()
+    assert snapshot["lag_max_ms"] >= 50, f"Freeze not measured: {snapshot}"
+    assert any(event["kind"] == "lag" for event in snapshot["events"]), "Freeze not logged"
+    print(f"✓ Measured event-loop lag of {snapshot['lag_max_ms']} ms")
+
+    app.show_patients()
+    app.show_alerts_popup()
+    screens = monitor.snapshot()["screens"]
+    # Popups and dialogs are not screens and are left unwrapped
+    assert set(screens) == {"show_patients", "load_patients_data"}, f"Wrong methods wrapped: {sorted(screens)}"
+    assert screens["show_patients"]["last_ms"] >= screens["load_patients_data"]["last_ms"] >= 10, \
+        f"Implausible screen timings: {screens}"
+    assert monitor.last_screen == "show_patients" and "show_patients" in monitor.status_text(), \
+        "Status text does not mention the last screen"
+    print("✓ Screen build times recorded")
+
+    monitor.stop()
+
+if __name__ == "__main__":
+    try:
+        test_responsiveness_monitor()
+        print("✅ Responsiveness monitor test PASSED")
+    except Exception as e:
+        print(f"❌ Responsiveness monitor test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the result template engine
+"""
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.result_templates import TemplateEngine, RenderContext
+from medical_lab_system.models import Patient, Gender, TestType, TestTemplate, TestRequest, TestStatus
+
+TEMPLATE_TEXT = (
+    "Patient: {patient_name} ({patient_age}, {patient_gender}) ID {patient_id}\n"
+    "Test: {test_name} / {test_category} requested {requested_at}\n"
+    "Haemoglobin: {value} g/dL (reference {range male=13.5-17.5 female=12.0-15.5 child=11.0-14.0})\n"
+    "Reported {date} {{not a placeholder}}"
+)
+
+def make_patient(patient_id="83000001", age=40, gender=Gender.FEMALE):
+    return Patient(id=patient_id, name="Template Patient", age=age, gender=gender, contact_info="")
+
+def make_template(content=TEMPLATE_TEXT, updated_at=None):
+    return TestTemplate(id="tpl-1", test_type_id="tt-1", template_content=content,
+                        updated_at=updated_at or datetime(2024, 1, 1))
+
+TEST_TYPE = TestType(id="tt-1", name="Full Blood Count", description="", price=25.0, category="Blood")
+
+def test_render():
+    """Test that placeholders are filled in for one result"""
+    print("Testing template rendering...")
+    engine = TemplateEngine()
+    now = datetime(2024, 3, 5, 9, 30)
+    request = TestRequest(id="req-1", patient_id="83000001", test_type_id="tt-1", status=TestStatus.PENDING,
+                          requested_by="doctor", requested_at=datetime(2024, 3, 4, 16, 0))
+
+    text = engine.render(make_template(), make_patient(), TEST_TYPE, request, now=now)
+    assert text == (
+        "Patient: Template Patient (40, Female) ID 83000001\n"
+        "Test: Full Blood Count / Blood requested 2024-03-04 16:00\n"
+        "Haemoglobin: {value} g/dL (reference 12.0-15.5)\n"
+        "Reported 2024-03-05 {not a placeholder}"
+    ), text
+    assert "13.5-17.5" in engine.render(make_template(), make_patient(gender=Gender.MALE), TEST_TYPE)
+    assert "11.0-14.0" in engine.render(make_template(), make_patient(age=8), TEST_TYPE)
+    print("✓ Placeholders and reference ranges filled in")
+
+    # Without a patient the patient placeholders are kept for later
+    text = engine.render(make_template(), None, TEST_TYPE, now=now)
+    assert text.startswith("Patient: {patient_name} ({patient_age}, {patient_gender})")
+    assert "Full Blood Count" in text
+    print("✓ Missing details leave placeholders in place")
+
+def test_render_cache():
+    """Test that templates are compiled once per version"""
+    print("Testing template cache...")
+    engine = TemplateEngine()
+    template = make_template()
+    patients = [make_patient(f"8300{i:04d}", age=20 + i % 50) for i in range(5000)]
+
+    started = time.perf_counter()
+    results = engine.render_many(template, [RenderContext(p, TEST_TYPE) for p in patients])
+    elapsed = time.perf_counter() - started
+    assert len(results) == 5000 and results[1].count("8300") == 1
+    assert engine.compiled == 1, f"Compiled {engine.compiled} times"
+    assert elapsed < 2.0, f"Rendering 5000 results took {elapsed:.2f}s"
+
+    engine.render(template, patients[0], TEST_TYPE)
+    assert engine.compiled == 1, "Unchanged template compiled again"
+    edited = make_template("Edited for {patient_name}", updated_at=template.updated_at + timedelta(minutes=1))
+    assert engine.render(edited, patients[0], TEST_TYPE) == "Edited for Template Patient"
+    assert engine.compiled == 2, "Edited template not compiled again"
+    print(f"✓ 5000 results rendered in {elapsed * 1000:.0f}ms from one compiled plan")
+
+if __name__ == "__main__":
+    try:
+        test_render()
+        test_render_cache()
+        print("✅ Result template test PASSED")
+    except Exception as e:
+        print(f"❌ Result template test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script to verify sample status transitions
+"""
+import sys
+import os
+import time
+from datetime import datetime
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.models import (Patient, TestType, TestRequest, Sample, Gender, TestStatus, SampleStatus,
+                                       SAMPLE_TRANSITIONS)
+
+def make_database(samples):
+    db = DatabaseManager(":memory:")
+    db.create_test_type(TestType(id="tt-life", name="CBC", description="", price=8.0, category="Hematology"))
+    db.create_patient(Patient(id="83000000", name="Lifecycle Patient", age=52, gender=Gender.MALE,
+                              contact_info="life@example.com"))
+    db.create_test_request(TestRequest(id="req-life", patient_id="83000000", test_type_id="tt-life",
+                                       status=TestStatus.PENDING, requested_by="Dr. Life",
+                                       requested_at=datetime(2024, 5, 2, 8, 0)))
+    for i in range(samples):
+        db.create_sample(Sample(id=f"life-{i:04d}", test_request_id="req-life", barcode=f"L{i:06d}",
+                                collected_at=datetime(2024, 5, 2, 8, 30), status=SampleStatus.COLLECTED))
+    return db
+
+def history_count(db):
+    conn = db._open_connection()
+    count = conn.execute("SELECT COUNT(*) FROM sample_status_history").fetchone()[0]
+    conn.close()
+    return count
+
+def test_transitions():
+    """Test that only lifecycle transitions are allowed"""
+    print("Testing sample lifecycle...")
+
+    assert all(status in SAMPLE_TRANSITIONS for status in SampleStatus), "Status missing from the lifecycle"
+    db = make_database(3)
+    assert db.update_sample_status("life-0000", SampleStatus.VALID, "tech1")
+    assert db.update_sample_status("life-0000", SampleStatus.PROCESSING, "tech1")
+    assert not db.update_sample_status("life-0000", SampleStatus.VALID), "Processing sample moved back"
+    assert db.update_sample_status("life-0000", SampleStatus.COMPLETED, "tech2")
+    assert not db.update_sample_status("life-0000", SampleStatus.PROCESSING), "Completed sample moved on"
+    assert db.update_sample_status("life-0001", SampleStatus.DAMAGED)
+    assert not db.update_sample_status("life-0001", SampleStatus.PROCESSING), "Damaged sample processed"
+    assert not db.update_sample_status("no-such-sample", SampleStatus.VALID)
+    assert db.get_sample("life-0000").status.value == SampleStatus.COMPLETED.value
+
+    history = db.get_sample_status_history("life-0000")
+    assert [(c.from_status and c.from_status.value, c.to_status.value) for c in history] == [
+        (None, "Collected"), ("Collected", "Valid"), ("Valid", "Processing"), ("Processing", "Completed")]
+    assert history[0].changed_at == datetime(2024, 5, 2, 8, 30)
+    assert history[-1].changed_by == "tech2"
+    assert all(a.changed_at <= b.changed_at for a, b in zip(history, history[1:]))
+    print("✓ Lifecycle transitions enforced and timestamped")
+    db.close()
+
+def test_bulk_transition():
+    """Test moving a whole run of samples in one call"""
+    print("Testing bulk transitions...")
+
+    db = make_database(600)
+    ids = [f"life-{i:04d}" for i in range(600)]
+    db.transition_samples(ids[:50], SampleStatus.DAMAGED)
+    before = history_count(db)
+
+    started = time.perf_counter()
+    result = db.transition_samples(ids + ["no-such-sample"], SampleStatus.PROCESSING, "tech1")
+    elapsed = time.perf_counter() - started
+    assert len(result.moved) == 550 and result.moved[0] == "life-0050"
+    assert len(result.rejected) == 51
+    assert result.rejected["life-0000"].value == SampleStatus.DAMAGED.value
+    assert result.rejected["no-such-sample"] is None
+    assert history_count(db) == before + 550, "History not written for every moved sample"
+    assert db.get_sample("life-0599").status.value == SampleStatus.PROCESSING.value
+    assert db.get_sample("life-0000").status.value == SampleStatus.DAMAGED.value
+
+    # The run is finished; damaged samples stay as they are
+    result = db.transition_samples(ids, SampleStatus.COMPLETED)
+    assert len(result.moved) == 550
+    print(f"✓ 600 samples moved in {elapsed * 1000:.1f} ms")
+    db.close()
+
+if __name__ == "__main__":
+    try:
+        test_transitions()
+        test_bulk_transition()
+        print("✅ Sample lifecycle test PASSED")
+    except Exception as e:
+        print(f"❌ Sample lifecycle test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script to verify consistent snapshot reads for reports
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.models import Patient, Gender
+
+def make_patient(patient_id, name="Snapshot Patient"):
+    return Patient(
+        id=patient_id,
+        name=name,
+        age=38,
+        gender=Gender.MALE,
+        contact_info="snapshot@example.com"
+    )
+
+def check_snapshot(path, storage_profile):
+    reader = DatabaseManager(path, storage_profile=storage_profile)
+    writer = DatabaseManager(path, storage_profile=storage_profile)
+    reader.create_patient(make_patient("80000001"))
+    count = len(reader.get_all_patients())
+
+    with reader.snapshot() as s:
+        assert len(s.get_all_patients()) == count
+        # Writers on other connections are not blocked by the open snapshot
+        assert writer.create_patient(make_patient("80000002")), "Writer blocked by snapshot"
+        assert writer.update_patient(make_patient("80000001", name="Renamed Patient"))
+        assert len(s.get_all_patients()) == count, "Snapshot saw a later insert"
+        assert s.get_patient("80000001").name == "Snapshot Patient", "Snapshot saw a later update"
+        # The snapshot is read-only
+        try:
+            s.create_patient(make_patient("80000003"))
+            raise AssertionError("Write succeeded inside a snapshot")
+        except sqlite3.OperationalError:
+            pass
+
+    assert len(reader.get_all_patients()) == count + 1
+    assert reader.get_patient("80000001").name == "Renamed Patient"
+    reader.close()
+    writer.close()
+
+def test_snapshot_wal():
+    """Test that a WAL snapshot is consistent and does not block writers"""
+    print("Testing WAL snapshot...")
+    with tempfile.TemporaryDirectory() as tmp:
+        check_snapshot(os.path.join(tmp, "snapshot.db"), "wal")
+    print("✓ WAL snapshot is consistent and writers continue")
+
+def test_snapshot_rollback_journal():
+    """Test that a rollback-journal snapshot is consistent and does not block writers"""
+    print("Testing rollback-journal snapshot...")
+    with tempfile.TemporaryDirectory() as tmp:
+        check_snapshot(os.path.join(tmp, "snapshot.db"), "default")
+    print("✓ Rollback-journal snapshot is consistent and writers continue")
+
+def test_snapshot_memory(db):
+    """Test snapshots of the shared in-memory test database"""
+    count = len(db.get_all_patients())
+    with db.snapshot() as s:
+        # Other threads keep their own connections
+        writer = threading.Thread(target=db.create_patient, args=(make_patient("80000004"),))
+        writer.start()
+        writer.join()
+        assert len(s.get_all_patients()) == count
+    assert len(db.get_all_patients()) == count + 1
+
+if __name__ == "__main__":
+    try:
+        test_snapshot_wal()
+        test_snapshot_rollback_journal()
+        print("✅ Snapshot test PASSED")
+    except Exception as e:
+        print(f"❌ Snapshot test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Test script to verify storage profiles and retrying of locked writes
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.models import Patient, Gender, User, UserRole, Permission
+
+def make_patient(patient_id):
+    return Patient(
+        id=patient_id,
+        name="Storage Patient",
+        age=40,
+        gender=Gender.FEMALE,
+        contact_info="storage@example.com"
+    )
+
+def test_wal_profile():
+    """Test that the wal profile switches the database file to WAL"""
+    print("Testing wal storage profile...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "wal.db"), storage_profile="wal")
+        conn = db._connect()
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+        temp_store = conn.execute("PRAGMA temp_store").fetchone()[0]
+        conn.close()
+
+        assert journal_mode.lower() == "wal", f"Expected WAL journal mode, got {journal_mode}"
+        # 1 = NORMAL, 2 = MEMORY
+        assert synchronous == 1 and temp_store == 2, \
+            f"Unexpected pragmas: synchronous={synchronous} temp_store={temp_store}"
+        assert db.create_patient(make_patient("30000001")), "Failed to write in WAL mode"
+
+    print("✓ wal storage profile works")
+
+def test_multi_station_profile():
+    """Test that the multi_station profile keeps the rollback journal"""
+    print("Testing multi_station storage profile...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "shared.db"), storage_profile="multi_station")
+        conn = db._connect()
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+        conn.close()
+
+        # 2 = FULL
+        assert journal_mode.lower() == "delete" and synchronous == 2, \
+            f"Unexpected pragmas: journal_mode={journal_mode} synchronous={synchronous}"
+
+    print("✓ multi_station storage profile works")
+
+def test_busy_retry():
+    """Test that a write waits for a lock held by another station and then succeeds"""
+    print("Testing retry of locked writes...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "busy.db")
+        db = DatabaseManager(path, storage_profile={
+            "busy_timeout": 50, "busy_retries": 20, "busy_retry_delay": 0.02,
+            "busy_retry_max_delay": 0.05, "busy_retry_max_wait": 2.0
+        })
+
+        # Another station holds the write lock for a while
+        other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        other.execute("BEGIN IMMEDIATE")
+        releaser = threading.Timer(0.3, lambda: other.execute("COMMIT"))
+        releaser.start()
+
+        started = time.perf_counter()
+        try:
+            created = db.create_patient(make_patient("30000002"))
+        finally:
+            releaser.join()
+            other.close()
+        elapsed = time.perf_counter() - started
+
+        assert created, "Write failed while the database was locked"
+        assert elapsed >= 0.25, "Write did not wait for the lock"
+
+    print("✓ Locked writes are retried")
+
+def test_busy_retry_is_bounded():
+    """Test that a write gives up after busy_timeout + busy_retry_max_wait"""
+    print("Testing bounded retry of locked writes...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "locked.db")
+        db = DatabaseManager(path, storage_profile={
+            "busy_timeout": 100, "busy_retries": 1000, "busy_retry_delay": 0.05,
+            "busy_retry_max_delay": 0.1, "busy_retry_max_wait": 0.3
+        })
+        user = User(
+            id="locked-user",
+            username="locked",
+            email="locked@example.com",
+            password_hash="x",
+            role=UserRole.TECHNICIAN
+        )
+        db.create_user(user)
+
+        other = sqlite3.connect(path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            # Methods that report errors with False keep doing so
+            started = time.perf_counter()
+            assert db.update_user_password(user.id, "y") is False
+            elapsed = time.perf_counter() - started
+            assert elapsed < 1.0, f"Locked write waited {elapsed:.1f}s"
+
+            # The others raise once the retries are used up
+            started = time.perf_counter()
+            try:
+                db.create_patient(make_patient("30000003"))
+                raise AssertionError("Locked write did not raise")
+            except sqlite3.OperationalError:
+                pass
+            elapsed = time.perf_counter() - started
+            assert elapsed < 1.0, f"Locked write waited {elapsed:.1f}s"
+        finally:
+            other.execute("COMMIT")
+            other.close()
+
+    print("✓ Locked writes give up in time")
+
+def test_update_user_permissions():
+    """Test that update_user replaces permissions without waiting on its own lock"""
+    print("Testing update_user permissions...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "users.db"))
+        user = User(
+            id="storage-user",
+            username="storage",
+            email="storage@example.com",
+            password_hash="x",
+            role=UserRole.TECHNICIAN,
+            permissions=[Permission.VIEW_PATIENTS]
+        )
+        db.create_user(user)
+
+        user.permissions = [Permission.VIEW_PATIENTS, Permission.VIEW_TESTS]
+        started = time.perf_counter()
+        assert db.update_user(user), "update_user failed"
+        elapsed = time.perf_counter() - started
+
+        assert elapsed < 1.0, f"update_user took {elapsed:.1f}s"
+        permissions = {p.permission.value for p in db.get_user_permissions(user.id)}
+        assert permissions == {Permission.VIEW_PATIENTS.value, Permission.VIEW_TESTS.value}, \
+            f"Unexpected permissions: {permissions}"
+
+    print("✓ update_user replaces permissions")
+
+if __name__ == "__main__":
+    try:
+        test_wal_profile()
+        test_multi_station_profile()
+        test_busy_retry()
+        test_busy_retry_is_bounded()
+        test_update_user_permissions()
+    except AssertionError as e:
+        print(f"✗ {e}")
+        print("\n❌ Some storage profile tests failed!")
+        sys.exit(1)
+    print("\n✅ All storage profile tests passed!")
+    sys.exit(0)
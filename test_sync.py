@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Test script to verify head-office sync against a local stand-in server
+"""
+import sys
+import os
+import json
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.models import Patient, Gender
+from medical_lab_system.sync import (SyncClient, SyncEngine, SyncError, Config, encode_payload, decode_payload,
+                                     engine_from_settings)
+from medical_lab_system.field_encryption import (FieldCipher, FieldEncryptionError, KEY_FILE_NAME,
+                                                 UNREADABLE_FIELD, generate_key)
+
+API_KEY = "test-key"
+
+class StandInServer:
+    """Minimal head-office server: last-writer-wins change log shared by all stations"""
+
+    def __init__(self):
+        self.changes = []  # (seq, change)
+        self.versions = {}  # (table, row_id) -> (changed_at, station_id)
+        self.batches = set()
+        self.fail_next = 0
+        self.pushed_bytes = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def reply(self, code, payload=None):
+                body = encode_payload(payload or {})
+                self.send_response(code)
+                self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def handle_request(self):
+                if self.headers.get("Authorization") != f"Bearer {API_KEY}":
+                    return self.reply(401)
+                with server.lock:
+                    if server.fail_next:
+                        server.fail_next -= 1
+                        return self.reply(503)
+                url = urllib.parse.urlparse(self.path)
+                if url.path == "/sync/ping":
+                    return self.reply(200, {"ok": True})
+                if url.path == "/sync/push":
+                    body = self.rfile.read(int(self.headers["Content-Length"]))
+                    payload = decode_payload(body)
+                    server.pushed_bytes.append((len(body), len(json.dumps(payload))))
+                    return self.reply(200, server.push(payload))
+                if url.path == "/sync/pull":
+                    query = dict(urllib.parse.parse_qsl(url.query))
+                    return self.reply(200, server.pull(query["station_id"], int(query["since"]), int(query["limit"])))
+                self.reply(404)
+
+            do_GET = handle_request
+            do_POST = handle_request
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def push(self, payload):
+        with self.lock:
+            if payload["batch_id"] in self.batches:
+                return {"accepted": 0}
+            self.batches.add(payload["batch_id"])
+            accepted = 0
+            for change in payload["changes"]:
+                key = (change["table"], change["row_id"])
+                version = (change["changed_at"], change["station_id"])
+                if key in self.versions and self.versions[key] >= version:
+                    continue
+                self.versions[key] = version
+                self.changes.append((len(self.changes) + 1, change))
+                accepted += 1
+            return {"accepted": accepted}
+
+    def pull(self, station_id, since, limit):
+        with self.lock:
+            pending = [(seq, change) for seq, change in self.changes if seq > since]
+            page = pending[:limit]
+            return {
+                "changes": [change for seq, change in page if change["station_id"] != station_id],
+                "next": page[-1][0] if page else since,
+                "more": len(pending) > limit,
+            }
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def make_patient(patient_id, name):
+    return Patient(id=patient_id, name=name, age=44, gender=Gender.FEMALE, contact_info="sync@example.com")
+
+def make_station(tmp, name, server, field_cipher=None, **client_args):
+    db = DatabaseManager(os.path.join(tmp, f"{name}.db"), field_cipher=field_cipher)
+    client = SyncClient(server.url, API_KEY, retry_delay=0.01, **client_args)
+    return db, SyncEngine(db, client, station_id=name, batch_size=2)
+
+def test_sync_round_trip():
+    """Test push, pull, delta-only transfer and no echo between two stations"""
+    print("Testing sync round trip...")
+
+    server = StandInServer()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_a, sync_a = make_station(tmp, "branch-a", server)
+        db_b, sync_b = make_station(tmp, "branch-b", server)
+        # Both start from the same seeded data; only what changes from here is sent
+        sync_a.sync_once()
+        sync_b.sync_once()
+        baseline = len(server.changes)
+
+        for i in range(5):
+            db_a.create_patient(make_patient(f"7000000{i}", f"Branch A Patient {i}"))
+        assert sync_a.sync_once() == {"pushed": 5, "pulled": 0}
+        assert sync_b.sync_once() == {"pushed": 0, "pulled": 5}, "Changes not pulled"
+        assert db_b.get_patient("70000003").name == "Branch A Patient 3"
+        # Pulled rows are not echoed back
+        assert sync_b.sync_once() == {"pushed": 0, "pulled": 0}
+        assert sync_a.sync_once() == {"pushed": 0, "pulled": 0}
+        print("✓ Rows pushed, pulled in batches and not echoed back")
+
+        db_a.update_patient(make_patient("70000001", "Renamed at A"))
+        db_a.delete_patient("70000002")
+        assert sync_a.sync_once()["pushed"] == 2, "More than the changed rows were sent"
+        sync_b.sync_once()
+        assert db_b.get_patient("70000001").name == "Renamed at A"
+        assert db_b.get_patient("70000002") is None, "Delete not synced"
+        assert len(server.changes) == baseline + 7
+        print("✓ Only changed rows transferred")
+
+    server.close()
+
+def test_sync_conflict():
+    """Test last-writer-wins with an audit entry"""
+    print("Testing sync conflicts...")
+
+    server = StandInServer()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_a, sync_a = make_station(tmp, "branch-a", server)
+        db_b, sync_b = make_station(tmp, "branch-b", server)
+        db_a.create_patient(make_patient("71000001", "Original"))
+        sync_a.sync_once()
+        sync_b.sync_once()
+
+        db_a.update_patient(make_patient("71000001", "Edited at A"))
+        time.sleep(0.01)
+        db_b.update_patient(make_patient("71000001", "Edited at B"))
+        sync_a.sync_once()
+        sync_b.sync_once()
+        sync_a.sync_once()
+
+        assert db_a.get_patient("71000001").name == "Edited at B", "Later write did not win at A"
+        assert db_b.get_patient("71000001").name == "Edited at B", "Later write did not win at B"
+        conflicts = db_b.get_sync_conflicts()
+        assert conflicts and conflicts[0]["winner"] == "local" and conflicts[0]["row_id"] == "71000001", \
+            f"Conflict not audited: {conflicts}"
+        assert json.loads(conflicts[0]["remote_row"])["name"] == "Edited at A"
+        print("✓ Last writer wins and the losing change is audited")
+
+    server.close()
+
+def test_sync_retry_and_resume():
+    """Test retry of server errors and resuming from the watermark"""
+    print("Testing sync retry and resume...")
+
+    server = StandInServer()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_a, sync_a = make_station(tmp, "branch-a", server, retries=3)
+        sync_a.sync_once()
+        for i in range(3):
+            db_a.create_patient(make_patient(f"7200000{i}", f"Retry Patient {i}"))
+
+        server.fail_next = 2
+        assert sync_a.sync_once()["pushed"] == 3, "Transient errors were not retried"
+        compressed, uncompressed = server.pushed_bytes[-1]
+        assert compressed < uncompressed, "Payload is not compressed"
+
+        db_a.create_patient(make_patient("72000009", "Resume Patient"))
+        watermark = db_a.get_sync_state("push_seq")
+        server.fail_next = 100
+        try:
+            sync_a.sync_once()
+            raise AssertionError("Unreachable server did not fail the sync")
+        except SyncError:
+            pass
+        assert db_a.get_sync_state("push_seq") == watermark, "Watermark advanced without acknowledgement"
+        assert sync_a.last_status["state"] == "error"
+
+        server.fail_next = 0
+        assert sync_a.sync_once()["pushed"] == 1, "Sync did not resume from the watermark"
+        print("✓ Transient errors retried and interrupted sync resumed")
+
+    server.close()
+
+def test_sync_with_different_keys():
+    """Test that rows encrypted with a key this station lacks are rejected, not stored unreadable"""
+    print("Testing sync between stations with different keys...")
+
+    server = StandInServer()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_a, sync_a = make_station(tmp, "branch-a", server, field_cipher=FieldCipher([generate_key()]))
+        db_b, sync_b = make_station(tmp, "branch-b", server, field_cipher=FieldCipher([generate_key()]))
+        db_b.create_patient(make_patient("73000001", "Local Patient"))
+        db_a.create_patient(make_patient("73000002", "Foreign Patient"))
+        sync_a.sync_once()
+        sync_b.sync_once()
+
+        assert db_b.get_patient("73000002") is None, "Unreadable row stored"
+        conflicts = [c for c in db_b.get_sync_conflicts() if c["row_id"] == "73000002"]
+        assert conflicts and conflicts[0]["winner"] == "rejected", f"Rejection not audited: {conflicts}"
+        patients = db_b.get_all_patients()
+        assert [p.contact_info for p in patients] == ["sync@example.com"]
+        assert [p.id for p in db_b.get_patients_by_contact("sync@example.com")] == ["73000001"]
+        print("✓ Foreign-key rows rejected into sync_conflicts")
+
+        # A row that got in anyway reads as a placeholder, and the list still loads
+        db_a_row = db_a._open_connection().execute(
+            "SELECT contact_info, contact_info_index FROM patients WHERE id = '73000002'").fetchone()
+        conn = db_b._open_connection()
+        conn.execute('''
+            INSERT INTO patients (id, name, age, gender, contact_info, contact_info_index, created_at, updated_at)
+            VALUES ('73000002', 'Foreign Patient', 44, 'Female', ?, ?, '2024-01-01 00:00:00', '2024-01-01 00:00:00')
+        ''', db_a_row)
+        conn.commit()
+        conn.close()
+        contacts = {p.id: p.contact_info for p in db_b.get_all_patients()}
+        assert contacts == {"73000001": "sync@example.com", "73000002": UNREADABLE_FIELD}
+        foreign = db_b.get_patient("73000002")
+        assert foreign.contact_info == UNREADABLE_FIELD
+        foreign.name = "Renamed"
+        assert db_b.update_patient(foreign)
+        stored = db_b._open_connection().execute(
+            "SELECT contact_info FROM patients WHERE id = '73000002'").fetchone()[0]
+        assert stored == db_a_row[0], "Placeholder saved over the encrypted value"
+        assert db_b.encrypt_stored_fields() == 0, "Value under an unknown key re-encrypted"
+        print("✓ Unreadable values shown as a placeholder and left untouched")
+
+    server.close()
+
+def test_sync_requires_shared_keys():
+    """Test that a station set up to sync neither makes its own key nor syncs without the shared one"""
+    print("Testing shared key configuration...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "branch.db")
+        db = DatabaseManager(path)
+        db.set_sync_state("server_url", "http://127.0.0.1:9")
+        db.set_sync_state("api_key", API_KEY)
+        try:
+            engine_from_settings(db)
+            raise AssertionError("Sync started without the shared keys")
+        except SyncError:
+            pass
+        db.close()
+
+        os.remove(os.path.join(tmp, KEY_FILE_NAME))
+        try:
+            DatabaseManager(path)
+            raise AssertionError("Key file created for a syncing station")
+        except Exception as e:
+            # Raised by the app's own import of field_encryption, not medical_lab_system's
+            assert type(e).__name__ == FieldEncryptionError.__name__, e
+        assert not os.path.exists(os.path.join(tmp, KEY_FILE_NAME))
+
+        shared_key = generate_key()
+        Config.FIELD_ENCRYPTION_KEY = shared_key.decode("ascii")
+        try:
+            db = DatabaseManager(path)
+            assert db.field_cipher.key_id == FieldCipher([shared_key]).key_id
+            assert isinstance(engine_from_settings(db), SyncEngine)
+            db.close()
+        finally:
+            Config.FIELD_ENCRYPTION_KEY = None
+    print("✓ Sync needs the configured shared keys")
+
+if __name__ == "__main__":
+    try:
+        test_sync_round_trip()
+        test_sync_conflict()
+        test_sync_retry_and_resume()
+        test_sync_with_different_keys()
+        test_sync_requires_shared_keys()
+        print("✅ Sync test PASSED")
+    except Exception as e:
+        print(f"❌ Sync test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
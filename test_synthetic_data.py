@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the synthetic load-test data generator
+"""
+import sys
+import os
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.synthetic_data import generate_dataset
+
+def dump_tables(db):
+    """Return the full contents of every table in a stable order"""
+    conn = db._connect()
+    # change_log records wall-clock times, so it differs between runs by design
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name != 'change_log' ORDER BY name"
+    )]
+    contents = {table: conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall() for table in tables}
+    conn.close()
+    return contents
+
+def test_synthetic_data():
+    """Test that generation is complete, consistent and deterministic"""
+    print("Testing synthetic data generator...")
+
+    first = DatabaseManager(":memory:")
+    counts = generate_dataset(first, orders=500, seed=7, chunk_size=100)
+    assert counts["test_requests"] == 500, f"Expected 500 test requests, got {counts['test_requests']}"
+    print(f"✓ Generated {counts}")
+
+    assert len(first.get_all_invoices()) == counts["invoices"], "Invoices could not be read back"
+
+    linked = sum(len(invoice.test_request_ids) for invoice in first.get_all_invoices())
+    assert linked == counts["test_requests"], "Not every test request is linked to an invoice"
+    print("✓ Invoices are linked to every test request")
+
+    second = DatabaseManager(":memory:")
+    generate_dataset(second, orders=500, seed=7, chunk_size=100)
+    assert dump_tables(first) == dump_tables(second), "Same seed produced different data"
+    print("✓ Output is deterministic")
+
+    third = DatabaseManager(":memory:")
+    generate_dataset(third, orders=500, seed=8)
+    assert dump_tables(first) != dump_tables(third), "Different seeds produced identical data"
+
+    for db in (first, second, third):
+        db.close()
+
+if __name__ == "__main__":
+    try:
+        test_synthetic_data()
+        print("✅ Synthetic data generator test PASSED")
+    except Exception as e:
+        print(f"❌ Synthetic data generator test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test script to verify Word template import and its cache
+"""
+import sys
+import os
+import tempfile
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from docx import Document
+
+from medical_lab_system.word_import import DocumentIngestor, parse_docx
+
+def make_docx(path, title="Complete Blood Count"):
+    document = Document()
+    document.add_paragraph(title)
+    table = document.add_table(rows=3, cols=3)
+    for i, cell_text in enumerate(["Test", "Result", "Reference"]):
+        table.cell(0, i).text = cell_text
+    table.cell(1, 0).text = "Haemoglobin"
+    table.cell(1, 2).text = "13.5-17.5 g/dL"
+    merged = table.cell(2, 0).merge(table.cell(2, 1))
+    merged.text = "Platelets"
+    table.cell(2, 2).text = "150-400"
+    document.add_paragraph("Comments: ____")
+    document.save(path)
+
+def test_parse_docx():
+    """Test that paragraphs and tables are imported in document order"""
+    print("Testing Word parsing...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cbc.docx")
+        make_docx(path)
+        lines = parse_docx(path).split("\n")
+
+    assert lines[0] == "Complete Blood Count", f"Unexpected text: {lines}"
+    assert lines[-1] == "Comments: ____", "Paragraph after the table out of order"
+    assert [cell.strip() for cell in lines[1].split(" | ")] == ["Test", "Result", "Reference"], \
+        f"Header row lost: {lines[1]}"
+    assert set(lines[2]) <= {"-", "+"}, "No rule under the header row"
+    assert lines[3].split(" | ")[0].strip() == "Haemoglobin" and "13.5-17.5 g/dL" in lines[3]
+    assert lines[4].count("Platelets") == 1, f"Merged cell repeated: {lines[4]}"
+    print("✓ Paragraphs and tables imported in order")
+
+def test_ingestor_cache():
+    """Test the memory and disk caches and pruning"""
+    print("Testing Word import cache...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = os.path.join(tmp, "cache")
+        path = os.path.join(tmp, "cbc.docx")
+        make_docx(path)
+
+        ingestor = DocumentIngestor(cache_dir, max_entries=2)
+        text = ingestor.load(path)
+        assert ingestor.load(path) == text and ingestor.parsed == 1, "Same file parsed twice"
+
+        restarted = DocumentIngestor(cache_dir, max_entries=2)
+        assert restarted.load(path) == text and restarted.parsed == 0, "Disk cache not used"
+        print("✓ Unchanged files are not parsed again")
+
+        make_docx(path, title="Lipid Profile")
+        assert restarted.load(path).startswith("Lipid Profile") and restarted.parsed == 1, \
+            "Changed file served from the cache"
+
+        make_docx(path, title="Liver Function")
+        restarted.load(path)
+        assert len(os.listdir(cache_dir)) == 2, f"Cache not pruned: {os.listdir(cache_dir)}"
+        print("✓ Changed files parsed again and the cache pruned")
+
+if __name__ == "__main__":
+    try:
+        test_parse_docx()
+        test_ingestor_cache()
+        print("✅ Word import test PASSED")
+    except Exception as e:
+        print(f"❌ Word import test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
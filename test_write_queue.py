@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script to verify group commit through the write queue
+"""
+import sys
+import os
+import tempfile
+import threading
+
+# Add the medical_lab_system directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'medical_lab_system'))
+
+from medical_lab_system.database import DatabaseManager
+from medical_lab_system.models import Patient, Gender, User, UserRole, Permission
+
+def make_patient(patient_id):
+    return Patient(
+        id=patient_id,
+        name=f"Queued Patient {patient_id}",
+        age=35,
+        gender=Gender.MALE,
+        contact_info="queue@example.com"
+    )
+
+def test_group_commit():
+    """Test that concurrent writers are committed in groups with per-call results"""
+    print("Testing group commit...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "queue.db"))
+        db.enable_write_queue(window_ms=20, max_batch=50)
+
+        results = []
+        def writer(thread_no):
+            for i in range(25):
+                results.append(db.create_patient(make_patient(f"4{thread_no:02d}{i:05d}")))
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [True] * 200, "Not every queued write succeeded"
+        assert len(db.get_all_patients()) == 200, "Queued writes were lost"
+        stats = db.get_write_queue_stats()
+        assert stats["operations"] == 200 and stats["batches"] < 200, f"Writes were not grouped: {stats}"
+        print(f"✓ 200 writes committed in {stats['batches']} groups")
+
+        # A failing write only affects its own call
+        duplicate = db.submit_write("create_patient", make_patient("40000000"))
+        broken = db.submit_write("create_patient", None)
+        fresh = db.submit_write("create_patient", make_patient("49999999"))
+        assert duplicate.result() is False, "Duplicate patient was not rejected"
+        try:
+            broken.result()
+            raise AssertionError("Broken write did not raise")
+        except AttributeError:
+            pass
+        assert fresh.result() is True and db.get_patient("49999999") is not None, \
+            "Write grouped with failing writes was lost"
+        print("✓ Failing writes are isolated")
+
+        # Write methods calling other write methods share the group transaction
+        user = User(
+            id="queued-user",
+            username="queued",
+            email="queued@example.com",
+            password_hash="x",
+            role=UserRole.TECHNICIAN,
+            permissions=[Permission.VIEW_PATIENTS, Permission.VIEW_TESTS]
+        )
+        assert db.create_user(user), "Nested write failed"
+        assert len(db.get_user_permissions(user.id)) == 2, "Nested writes were lost"
+
+        # Fire-and-forget writes are committed by the time the queue stops
+        futures = [db.submit_write("update_patient", make_patient(f"400{i:05d}")) for i in range(10)]
+        db.disable_write_queue()
+        assert all(future.done() and future.result() for future in futures), "Queued writes were dropped"
+        assert db.get_write_queue_stats() is None
+        assert db.create_patient(make_patient("48888888")), "Direct writes fail after disabling the queue"
+        db.close()
+
+    print("✓ Write queue drains on shutdown")
+
+if __name__ == "__main__":
+    try:
+        test_group_commit()
+        print("✅ Write queue test PASSED")
+    except Exception as e:
+        print(f"❌ Write queue test FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -1,13 +1,13 @@
 """
 Utility functions for the Medical Laboratory Management System
 """
-import barcode
-from barcode.writer import ImageWriter
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from cryptography.fernet import Fernet
+import functools
 import os
+from barcodes import render_png
 
 def generate_barcode(data: str, filename: str = "barcode") -> str:
     """
@@ -15,13 +15,10 @@ def generate_barcode(data: str, filename: str = "barcode") -> str:
     Returns the path to the generated barcode image
     """
     try:
-        # Generate barcode
-        code128 = barcode.get_barcode_class('code128')
-        barcode_obj = code128(data, writer=ImageWriter())
-        
-        # Save barcode
+        # Rendered in memory (see barcodes.py), then saved
         barcode_path = f"{filename}.png"
-        barcode_obj.save(filename)
+        with open(barcode_path, "wb") as f:
+            f.write(render_png(data))
         
         return barcode_path
     except Exception as e:
@@ -68,16 +65,20 @@ def generate_encryption_key() -> bytes:
     """
     return Fernet.generate_key()
 
+@functools.lru_cache(maxsize=8)
+def _fernet(key: bytes) -> Fernet:
+    # One Fernet per key rather than per call
+    return Fernet(key)
+
 def encrypt_data(data: str, key: bytes) -> bytes:
     """
     Encrypt data using the provided key
+    (patient fields are encrypted by field_encryption.py instead)
     """
-    f = Fernet(key)
-    return f.encrypt(data.encode())
+    return _fernet(key).encrypt(data.encode())
 
 def decrypt_data(encrypted_data: bytes, key: bytes) -> str:
     """
     Decrypt data using the provided key
     """
-    f = Fernet(key)
-    return f.decrypt(encrypted_data).decode()
\ No newline at end of file
+    return _fernet(key).decrypt(encrypted_data).decode()
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Word template import for the Medical Laboratory Management System
+
+DocumentIngestor turns a .docx file into template text. Paragraphs and tables
+are read in document order. Each table becomes aligned rows of cells
+separated by " | ", with a rule under the header row, so result tables
+survive the import.
+
+Parsed text is cached in memory and on disk under the SHA-256 of the file
+content, so loading a template that was loaded before skips python-docx
+entirely. Callers on the Tk thread run load() on a worker thread (see
+MedicalLabApp.load_word_template).
+"""
+import hashlib
+import os
+import threading
+from typing import Dict, List
+
+from docx import Document
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+from config import Config
+
+# Part of the cache key: bump when the text produced for a document changes
+PARSER_VERSION = 1
+
+
+def _cell_text(cell) -> str:
+    return " ".join(paragraph.text.strip() for paragraph in cell.paragraphs if paragraph.text.strip())
+
+
+def table_to_text(table: Table) -> str:
+    """Render a Word table as aligned " | "-separated rows"""
+    rows: List[List[str]] = []
+    for row in table.rows:
+        cells, previous = [], None
+        for cell in row.cells:
+            # A merged cell is returned once for every grid column it spans
+            if previous is not None and cell._tc is previous:
+                continue
+            previous = cell._tc
+            cells.append(_cell_text(cell))
+        rows.append(cells)
+    if not rows:
+        return ""
+
+    columns = max(len(row) for row in rows)
+    rows = [row + [""] * (columns - len(row)) for row in rows]
+    widths = [max(len(row[i]) for row in rows) for i in range(columns)]
+    lines = [" | ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows]
+    if len(lines) > 1:
+        lines.insert(1, "-+-".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def parse_docx(path: str) -> str:
+    """Extract the paragraphs and tables of a .docx file as template text"""
+    document = Document(path)
+    blocks = []
+    for element in document.element.body.iterchildren():
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag == "p":
+            blocks.append(Paragraph(element, document).text)
+        elif tag == "tbl":
+            blocks.append(table_to_text(Table(element, document)))
+    return "\n".join(blocks)
+
+
+class DocumentIngestor:
+    """Parse Word templates once and serve them from a content-hash cache"""
+
+    def __init__(self, cache_dir: str = None, max_entries: int = None):
+        self.cache_dir = cache_dir or Config.TEMPLATE_CACHE_DIR
+        self.max_entries = Config.TEMPLATE_CACHE_SIZE if max_entries is None else max_entries
+        self._memory: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.parsed = 0
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"v{PARSER_VERSION}-{key}.txt")
+
+    def load(self, path: str) -> str:
+        """Template text of the .docx at path, parsed only if this content was never seen"""
+        with open(path, "rb") as f:
+            key = hashlib.sha256(f.read()).hexdigest()
+
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+
+        cache_path = self._cache_path(key)
+        try:
+            with open(cache_path, encoding="utf-8") as f:
+                text = f.read()
+            # Keep recently used entries from being pruned
+            os.utime(cache_path)
+        except OSError:
+            text = parse_docx(path)
+            self.parsed += 1
+            self._store(cache_path, text)
+
+        with self._lock:
+            self._memory[key] = text
+        return text
+
+    def _store(self, cache_path: str, text: str):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = cache_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(temp_path, cache_path)
+            self.prune()
+        except OSError:
+            # The cache only saves time; a read-only cache directory is not an error
+            pass
+
+    def prune(self):
+        """Remove the least recently used cache files beyond max_entries"""
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".txt")]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - self.max_entries]:
+            os.remove(path)
@@ -0,0 +1,212 @@
+"""
+Single-writer group commit for the Medical Laboratory Management System
+
+With DatabaseManager.enable_write_queue() every write method is handed to one
+writer thread instead of opening its own connection. The writer runs the
+queued calls inside one transaction and commits them together once the batch
+window has passed or the batch is full, so a burst of small writes pays for
+one fsync instead of one each.
+
+Each call still behaves on its own: it runs inside a SAVEPOINT that is
+released when the method commits and rolled back when it closes its
+connection without committing, and its caller only gets the result after the
+group transaction is durable.
+"""
+import itertools
+import logging
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+write_queue_logger = logging.getLogger("medical_lab.write_queue")
+
+# Queue entry that tells the writer thread to stop once the queue is drained
+_STOP = object()
+
+
+class GroupConnection:
+    """
+    Connection handed to write methods running on the writer thread.
+
+    It shares the writer's transaction: commit() keeps the work done so far,
+    close() rolls back whatever was not committed.
+    """
+
+    _names = itertools.count()
+
+    def __init__(self, conn: sqlite3.Connection, open_connections: list):
+        self._conn = conn
+        # GroupConnections of the running write, outermost first
+        self._open_connections = open_connections
+        self._savepoint = None
+        self._closed = False
+        self._begin()
+        open_connections.append(self)
+
+    def _begin(self):
+        self._savepoint = f"write_{next(self._names)}"
+        self._conn.execute(f"SAVEPOINT {self._savepoint}")
+
+    def cursor(self, *args):
+        return self._conn.cursor(*args)
+
+    def execute(self, sql, parameters=()):
+        return self._conn.execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._conn.executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        # Durability comes with the group COMMIT; here the work is only kept.
+        # A write method calling another one commits on its own connection,
+        # and that must survive the caller closing its connection, so release
+        # the whole savepoint stack and start it again.
+        open_connections = [c for c in self._open_connections if not c._closed]
+        self._conn.execute(f"RELEASE {open_connections[0]._savepoint}")
+        for group_connection in open_connections:
+            group_connection._begin()
+
+    def rollback(self):
+        self._conn.execute(f"ROLLBACK TO {self._savepoint}")
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._conn.execute(f"ROLLBACK TO {self._savepoint}")
+        self._conn.execute(f"RELEASE {self._savepoint}")
+        self._open_connections.remove(self)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class WriteQueue:
+    """One writer thread that commits queued DatabaseManager writes in groups"""
+
+    def __init__(self, db, window_ms: float = 5.0, max_batch: int = 100):
+        self.db = db
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.operations = 0
+        self.largest_batch = 0
+        self._conn = None
+        # GroupConnections handed out to the write running now
+        self._open_connections = []
+        self.thread = threading.Thread(target=self._run, name="medical-lab-writer", daemon=True)
+        self.thread.start()
+
+    def in_writer_thread(self) -> bool:
+        return threading.current_thread() is self.thread
+
+    def connection(self) -> GroupConnection:
+        """Connection for a write method running on the writer thread"""
+        return GroupConnection(self._conn, self._open_connections)
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """Queue func(*args, **kwargs); the future resolves once it is committed"""
+        if not self.thread.is_alive():
+            raise RuntimeError("Write queue is stopped")
+        future = Future()
+        self.queue.put((func, args, kwargs, future))
+        return future
+
+    def stop(self):
+        """Commit everything queued so far and stop the writer thread"""
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "operations": self.operations,
+            "largest_batch": self.largest_batch,
+            "mean_batch": round(self.operations / self.batches, 2) if self.batches else 0.0,
+        }
+
+    def _run(self):
+        conn = self._conn = self.db._open_connection(isolation_level=None)
+        try:
+            stopping = False
+            while not stopping:
+                batch, stopping = self._collect()
+                if batch:
+                    self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _collect(self):
+        """Wait for the first write, then gather more until the window closes or the batch is full"""
+        first = self.queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.window_ms / 1000.0
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _begin(self, conn: sqlite3.Connection):
+        """BEGIN IMMEDIATE, retrying like retry_on_busy while another station holds the lock"""
+        storage = self.db.storage
+        for attempt in itertools.count():
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e).lower() and "busy" not in str(e).lower():
+                    raise
+                if attempt >= storage["busy_retries"]:
+                    raise
+                time.sleep(random.uniform(0, min(storage["busy_retry_delay"] * (2 ** attempt),
+                                                 storage["busy_retry_max_delay"])))
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: List[tuple]):
+        outcomes = []
+        try:
+            self._begin(conn)
+            for func, args, kwargs, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    outcomes.append((future, func(*args, **kwargs), None))
+                except Exception as e:
+                    write_queue_logger.warning("Queued write %s failed: %s",
+                                               getattr(func, "__name__", func), e)
+                    outcomes.append((future, None, e))
+                finally:
+                    # Undo whatever the write left uncommitted, e.g. when it raised
+                    for group_connection in reversed(list(self._open_connections)):
+                        group_connection.close()
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            # Nothing of the batch is durable
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for func, args, kwargs, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.operations += len(outcomes)
+        self.largest_batch = max(self.largest_batch, len(outcomes))
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)